@@ -0,0 +1,37 @@
+"""Один живой импорт на (чат, файл): частичный уникальный индекс
+
+Revision ID: chat_import_active_source
+Revises: add_chat_import_jobs
+Create Date: 2026-10-18
+
+Проверка «этот файл уже импортируется» в attach_import_source идёт под
+FOR UPDATE на строке чата; индекс — страховка от параллельной загрузки.
+Задачи без хэша (ещё спулятся) индекс не ограничивает: NULL-ы различны.
+"""
+from alembic import op
+
+revision = 'chat_import_active_source'
+down_revision = 'add_chat_import_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Зависшие дубликаты прошлых версий не должны сорвать миграцию
+    op.execute(
+        "UPDATE chat_import_jobs SET status = 'error' "
+        "WHERE status IN ('starting', 'processing') AND source_sha256 IS NOT NULL "
+        "AND id NOT IN ("
+        "  SELECT MAX(id) FROM chat_import_jobs "
+        "  WHERE status IN ('starting', 'processing') "
+        "  GROUP BY chat_id, source_sha256)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_import_job_active_source "
+        "ON chat_import_jobs (chat_id, source_sha256) "
+        "WHERE status IN ('starting', 'processing')"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_chat_import_job_active_source")
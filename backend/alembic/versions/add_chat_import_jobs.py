@@ -0,0 +1,67 @@
+"""Потоковый импорт истории Telegram: задачи импорта и индекс дедупа
+
+Revision ID: add_chat_import_jobs
+Revises: fix_enum_drift
+Create Date: 2026-10-18
+
+chat_import_jobs — общее для всех воркеров состояние импорта (прогресс +
+курсор продолжения), вместо process-local словаря import_progress.
+ix_message_chat_telegram_msg — пакетный дедуп по telegram_message_id.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_chat_import_jobs'
+down_revision = 'fix_enum_drift'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(conn, name: str) -> bool:
+    return bool(conn.execute(sa.text(
+        "SELECT 1 FROM information_schema.tables WHERE table_name = :n"
+    ), {"n": name}).scalar())
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    if not _has_table(conn, 'chat_import_jobs'):
+        op.create_table(
+            'chat_import_jobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('import_id', sa.String(64), nullable=False),
+            sa.Column('chat_id', sa.Integer(), sa.ForeignKey('chats.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('org_id', sa.Integer(), sa.ForeignKey('organizations.id', ondelete='CASCADE'), nullable=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+            sa.Column('status', sa.String(20), nullable=False, server_default='starting'),
+            sa.Column('phase', sa.String(30), nullable=True),
+            sa.Column('source_name', sa.String(255), nullable=True),
+            sa.Column('source_sha256', sa.String(64), nullable=True),
+            sa.Column('source_size', sa.BigInteger(), nullable=True),
+            sa.Column('total', sa.Integer(), server_default='0'),
+            sa.Column('processed', sa.Integer(), server_default='0'),
+            sa.Column('imported', sa.Integer(), server_default='0'),
+            sa.Column('skipped', sa.Integer(), server_default='0'),
+            sa.Column('errors_count', sa.Integer(), server_default='0'),
+            sa.Column('current_file', sa.String(255), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('resumed_from', sa.String(64), nullable=True),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_chat_import_jobs_import_id', 'chat_import_jobs', ['import_id'], unique=True)
+        op.create_index('ix_chat_import_jobs_chat_id', 'chat_import_jobs', ['chat_id'])
+        op.create_index('ix_chat_import_jobs_org_id', 'chat_import_jobs', ['org_id'])
+        op.create_index('ix_chat_import_job_chat_source', 'chat_import_jobs', ['chat_id', 'source_sha256'])
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_message_chat_telegram_msg "
+        "ON messages (chat_id, telegram_message_id)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_message_chat_telegram_msg")
+    op.drop_table('chat_import_jobs')
@@ -0,0 +1,76 @@
+"""entity_notes / entity_timeline_reactions / entity_hr_tags — из extra_data в таблицы
+
+Revision ID: entity_extras
+Revises: red_flag_analyses
+Create Date: 2026-10-19
+
+Заметки, реакции таймлайна и авто-метки HR жили в блобе Entity.extra_data:
+каждый писатель брал строку кандидата под FOR UPDATE и перезаписывал весь
+JSON. Теперь это строки своих таблиц (services/entity_extras.py), а в API
+они по-прежнему отдаются внутри extra_data. Перенос идемпотентен.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'entity_extras'
+down_revision = 'red_flag_analyses'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'entity_notes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entities.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('uid', sa.String(64), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('entity_id', 'uid', name='uq_entity_note_uid'),
+    )
+    op.create_index('ix_entity_notes_entity_id_id', 'entity_notes', ['entity_id', 'id'])
+    op.create_index('ix_entity_notes_author_id', 'entity_notes', ['author_id'])
+
+    op.create_table(
+        'entity_timeline_reactions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entities.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('entry_key', sa.String(255), nullable=False),
+        sa.Column('emoji', sa.String(32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user_name', sa.String(255), nullable=True),
+        sa.Column('date', sa.String(64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint('entity_id', 'entry_key', 'user_id', 'emoji', name='uq_entity_timeline_reaction'),
+    )
+    op.create_index('ix_entity_timeline_reactions_entity_id_id', 'entity_timeline_reactions', ['entity_id', 'id'])
+
+    op.create_table(
+        'entity_hr_tags',
+        sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entities.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('hr_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('vacancy_id', sa.Integer(), sa.ForeignKey('vacancies.id', ondelete='CASCADE'), primary_key=True),
+    )
+    op.create_index('ix_entity_hr_tags_hr_id', 'entity_hr_tags', ['hr_id'])
+    op.create_index('ix_entity_hr_tags_vacancy_id', 'entity_hr_tags', ['vacancy_id'])
+
+    from api.services.entity_extras import backfill_from_extra_data
+    from api.services.hr_tags import rebuild_hr_tags
+    bind = op.get_bind()
+    backfill_from_extra_data(bind)
+    rebuild_hr_tags(bind)
+
+
+def downgrade() -> None:
+    # Данные обратно в extra_data не возвращаем — откат только схемы.
+    op.drop_index('ix_entity_hr_tags_vacancy_id', table_name='entity_hr_tags')
+    op.drop_index('ix_entity_hr_tags_hr_id', table_name='entity_hr_tags')
+    op.drop_table('entity_hr_tags')
+    op.drop_index('ix_entity_timeline_reactions_entity_id_id', table_name='entity_timeline_reactions')
+    op.drop_table('entity_timeline_reactions')
+    op.drop_index('ix_entity_notes_author_id', table_name='entity_notes')
+    op.drop_index('ix_entity_notes_entity_id_id', table_name='entity_notes')
+    op.drop_table('entity_notes')
@@ -0,0 +1,41 @@
+"""form_submissions: фоновая обработка анкет и Idempotency-Key
+
+Revision ID: form_intake
+Revises: org_unit_closure
+Create Date: 2026-10-19
+
+Публичный сабмит анкеты теперь только вставляет ответы и файлы и отвечает
+202; превью PDF, уведомления и авто-промоут делает services/form_intake.py.
+Старые анкеты считаются обработанными (server_default 'done').
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'form_intake'
+down_revision = 'org_unit_closure'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('form_submissions', sa.Column(
+        'processing_status', sa.String(20), nullable=False, server_default='done',
+    ))
+    op.add_column('form_submissions', sa.Column('processing_state', sa.JSON(), nullable=True))
+    op.add_column('form_submissions', sa.Column('processing_error', sa.Text(), nullable=True))
+    op.add_column('form_submissions', sa.Column('processing_started_at', sa.DateTime(), nullable=True))
+    op.add_column('form_submissions', sa.Column('idempotency_key', sa.String(64), nullable=True))
+    op.create_index('ix_form_submissions_processing_status', 'form_submissions', ['processing_status'])
+    op.create_unique_constraint(
+        'uq_form_submission_dispatch_idempotency', 'form_submissions', ['dispatch_id', 'idempotency_key'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_form_submission_dispatch_idempotency', 'form_submissions', type_='unique')
+    op.drop_index('ix_form_submissions_processing_status', table_name='form_submissions')
+    op.drop_column('form_submissions', 'idempotency_key')
+    op.drop_column('form_submissions', 'processing_started_at')
+    op.drop_column('form_submissions', 'processing_error')
+    op.drop_column('form_submissions', 'processing_state')
+    op.drop_column('form_submissions', 'processing_status')
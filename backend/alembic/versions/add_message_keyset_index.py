@@ -0,0 +1,52 @@
+"""Индекс (chat_id, timestamp, id) для keyset-пагинации истории сообщений
+
+Revision ID: message_keyset_index
+Revises: chat_import_active_source
+Create Date: 2026-10-18
+
+GET /chats/{id}/messages листает историю курсором (timestamp, id) вместо
+OFFSET. Старый (chat_id, timestamp) — префикс нового, поэтому удаляется.
+Индексы строятся CONCURRENTLY: messages — самая большая таблица, блокировать
+запись импорта и бота на время построения нельзя.
+"""
+from alembic import op
+
+revision = 'message_keyset_index'
+down_revision = 'chat_import_active_source'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_message_chat_timestamp_id",
+            "messages",
+            ["chat_id", "timestamp", "id"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_message_chat_timestamp",
+            table_name="messages",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_message_chat_timestamp",
+            "messages",
+            ["chat_id", "timestamp"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_message_chat_timestamp_id",
+            table_name="messages",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,49 @@
+"""org_unit_closure — транзитивное замыкание дерева org_units
+
+Revision ID: org_unit_closure
+Revises: probation_reminder_ledger
+Create Date: 2026-10-18
+
+Хаб доступов находил компанию холдинга подъёмом по parent_id по одному
+SELECT на уровень. Замыкание (предок, потомок, глубина) даёт всю цепочку
+одним индексным запросом; дальше его поддерживает services/org_hierarchy.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'org_unit_closure'
+down_revision = 'probation_reminder_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'org_unit_closure',
+        sa.Column('ancestor_id', sa.Integer(), sa.ForeignKey('org_units.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('descendant_id', sa.Integer(), sa.ForeignKey('org_units.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('org_id', sa.Integer(), sa.ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_org_unit_closure_org_id', 'org_unit_closure', ['org_id'])
+    op.create_index('ix_org_unit_closure_descendant_depth', 'org_unit_closure', ['descendant_id', 'depth'])
+
+    # Глубина ограничена: цикл в кривых данных не должен повесить миграцию
+    op.execute("""
+        WITH RECURSIVE up(ancestor_id, descendant_id, org_id, depth) AS (
+            SELECT id, id, org_id, 0 FROM org_units
+            UNION ALL
+            SELECT u.parent_id, up.descendant_id, up.org_id, up.depth + 1
+            FROM up JOIN org_units u ON u.id = up.ancestor_id
+            WHERE u.parent_id IS NOT NULL AND up.depth < 32
+        )
+        INSERT INTO org_unit_closure (ancestor_id, descendant_id, org_id, depth)
+        SELECT ancestor_id, descendant_id, org_id, MIN(depth)
+        FROM up GROUP BY ancestor_id, descendant_id, org_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_org_unit_closure_descendant_depth', table_name='org_unit_closure')
+    op.drop_index('ix_org_unit_closure_org_id', table_name='org_unit_closure')
+    op.drop_table('org_unit_closure')
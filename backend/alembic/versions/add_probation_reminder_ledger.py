@@ -0,0 +1,47 @@
+"""entities.probation_end_date + журнал отправленных напоминаний sent_reminders
+
+Revision ID: probation_reminder_ledger
+Revises: saturn_content_hash
+Create Date: 2026-10-18
+
+check_probation_endings больше не парсит extra_data всех нанятых в Python и
+не ищет дубли LIKE по тексту уведомления: дата окончания испытательного срока
+материализуется в индексируемую колонку, а отправленные напоминания пишутся
+в sent_reminders с ключом (application_id, kind, period).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'probation_reminder_ledger'
+down_revision = 'saturn_content_hash'
+branch_labels = None
+depends_on = None
+
+# Только то, что гарантированно переварит ::timestamp; прочее останется NULL
+_ISO_NAIVE = r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$'
+
+
+def upgrade() -> None:
+    op.add_column('entities', sa.Column('probation_end_date', sa.DateTime(), nullable=True))
+    op.create_index('ix_entities_probation_end_date', 'entities', ['probation_end_date'])
+    op.execute(sa.text(
+        "UPDATE entities "
+        "SET probation_end_date = (extra_data->>'probation_end_date')::timestamp "
+        "WHERE extra_data->>'probation_end_date' ~ :pattern"
+    ).bindparams(pattern=_ISO_NAIVE))
+
+    op.create_table(
+        'sent_reminders',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('application_id', sa.Integer(), sa.ForeignKey('vacancy_applications.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('period', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint('application_id', 'kind', 'period', name='uq_sent_reminder_app_kind_period'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sent_reminders')
+    op.drop_index('ix_entities_probation_end_date', table_name='entities')
+    op.drop_column('entities', 'probation_end_date')
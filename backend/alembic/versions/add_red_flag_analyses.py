@@ -0,0 +1,51 @@
+"""entity_red_flag_analyses — сохранённые разборы red flags
+
+Revision ID: red_flag_analyses
+Revises: form_intake
+Create Date: 2026-10-19
+
+Панель red flags на каждый просмотр пересчитывала правила и заново звала
+Claude по чатам и звонкам. Теперь разбор хранится на (кандидат, вакансия) с
+fingerprint входов и пересчитывается в фоне только при его смене
+(services/red_flag_cache.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'red_flag_analyses'
+down_revision = 'form_intake'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'entity_red_flag_analyses',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entities.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('vacancy_id', sa.Integer(), sa.ForeignKey('vacancies.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('communication_fingerprint', sa.String(64), nullable=False),
+        sa.Column('communication_flags', sa.JSON(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=False),
+        sa.Column('risk_score', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_entity_red_flag_analyses_entity_id', 'entity_red_flag_analyses', ['entity_id'])
+    op.create_index('ix_entity_red_flag_analyses_vacancy_id', 'entity_red_flag_analyses', ['vacancy_id'])
+    op.create_index(
+        'uq_red_flag_analysis_entity_vacancy', 'entity_red_flag_analyses', ['entity_id', 'vacancy_id'],
+        unique=True, postgresql_where=sa.text('vacancy_id IS NOT NULL'),
+    )
+    op.create_index(
+        'uq_red_flag_analysis_entity_general', 'entity_red_flag_analyses', ['entity_id'],
+        unique=True, postgresql_where=sa.text('vacancy_id IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_red_flag_analysis_entity_general', table_name='entity_red_flag_analyses')
+    op.drop_index('uq_red_flag_analysis_entity_vacancy', table_name='entity_red_flag_analyses')
+    op.drop_index('ix_entity_red_flag_analyses_vacancy_id', table_name='entity_red_flag_analyses')
+    op.drop_index('ix_entity_red_flag_analyses_entity_id', table_name='entity_red_flag_analyses')
+    op.drop_table('entity_red_flag_analyses')
@@ -0,0 +1,26 @@
+"""content_hash у saturn_projects / saturn_applications
+
+Revision ID: saturn_content_hash
+Revises: message_keyset_index
+Create Date: 2026-10-18
+
+Синк Saturn сравнивает хэш полей из API с сохранённым и не переписывает
+неизменившиеся строки. NULL у существующих строк — первый синк проставит.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'saturn_content_hash'
+down_revision = 'message_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("saturn_projects", sa.Column("content_hash", sa.String(40), nullable=True))
+    op.add_column("saturn_applications", sa.Column("content_hash", sa.String(40), nullable=True))
+
+
+def downgrade():
+    op.drop_column("saturn_applications", "content_hash")
+    op.drop_column("saturn_projects", "content_hash")
@@ -100,6 +100,16 @@ class Settings(BaseSettings):
         default="/app/uploads/calls",
         alias="UPLOAD_DIR"
     )
+    # Дисковый кэш медиа Telegram для /api/chats/file/{file_id}
+    # (пусто — backend/uploads/.telegram_cache)
+    telegram_media_cache_dir: str = Field(
+        default="",
+        alias="TELEGRAM_MEDIA_CACHE_DIR"
+    )
+    telegram_media_cache_mb: int = Field(
+        default=1024,
+        alias="TELEGRAM_MEDIA_CACHE_MB"
+    )
     default_bot_name: str = Field(
         default="HR Recorder",
         alias="DEFAULT_BOT_NAME"
@@ -126,6 +136,21 @@ class Settings(BaseSettings):
         default=3600,  # 1 hour
         alias="CACHE_TTL_SCORING"
     )
+    # Снимок принципала (user/org/роль/отделы) между запросами; 0 — выключить
+    cache_ttl_principal: int = Field(
+        default=30,
+        alias="CACHE_TTL_PRINCIPAL"
+    )
+    # Ростер распознавания участников (users + Entity организации); 0 — выключить
+    cache_ttl_roster: int = Field(
+        default=300,
+        alias="CACHE_TTL_ROSTER"
+    )
+    # Bearer-токен для GET /metrics (пусто — эндпоинт выключен, отвечает 404)
+    metrics_token: str = Field(
+        default="",
+        alias="METRICS_TOKEN"
+    )
 
     def get_allowed_origins_list(self) -> list[str]:
         """Parse comma-separated origins into a list.
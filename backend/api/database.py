@@ -1,6 +1,8 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .models.database import Base
 from .utils.db_url import get_database_url
+from .services.metrics import instrument_engine, instrumented_pool_class
 
 
 database_url = get_database_url()
@@ -19,6 +21,7 @@ if is_postgresql:
         max_overflow=30,         # Extra connections during peak
         pool_recycle=3600,       # Recycle connections every hour
         pool_timeout=30,         # Wait up to 30s for available connection
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool),  # db_pool_wait_seconds
     )
 else:
     # SQLite for testing - no pool configuration needed
@@ -27,6 +30,8 @@ else:
         echo=False,
     )
 
+instrument_engine(engine)
+
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -2,7 +2,8 @@
 Middleware modules for the API.
 """
 
+from .assets import AssetCacheHeadersMiddleware
 from .correlation import CorrelationMiddleware
 from .security import SecurityHeadersMiddleware
 
-__all__ = ["CorrelationMiddleware", "SecurityHeadersMiddleware"]
+__all__ = ["AssetCacheHeadersMiddleware", "CorrelationMiddleware", "SecurityHeadersMiddleware"]
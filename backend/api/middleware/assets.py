@@ -0,0 +1,27 @@
+"""
+Cache headers for the built SPA assets.
+"""
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class AssetCacheHeadersMiddleware:
+    """Mark /assets/* as immutable: Vite puts a content hash into every file name,
+    so a changed file always gets a new URL."""
+
+    def __init__(self, app: ASGIApp, prefix: str = "/assets/") -> None:
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["Cache-Control"] = "public, max-age=31536000, immutable"
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
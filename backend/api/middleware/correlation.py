@@ -6,14 +6,18 @@ Adds a correlation ID to each request for log tracing across services.
 
 import time
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from ..utils.logging import set_correlation_id, get_correlation_id, log_request
+from ..services.metrics import bind_request_scope, observe_request
+
+# Не логируем healthcheck и статику
+_SKIP_LOG_PREFIXES = ("/health", "/static", "/favicon")
 
 
-class CorrelationMiddleware(BaseHTTPMiddleware):
+class CorrelationMiddleware:
     """
     Middleware that adds correlation ID to each request.
 
@@ -22,36 +26,50 @@ class CorrelationMiddleware(BaseHTTPMiddleware):
     2. Generated as a new UUID if not present
     3. Added to response headers
     4. Available in logs via correlation_id context var
+
+    Pure ASGI (not BaseHTTPMiddleware): no extra task per request and streaming
+    responses (SSE, file downloads) pass through untouched. Duration is measured
+    until the last body chunk is sent, not until the headers.
     """
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Get or generate correlation ID
-        correlation_id = request.headers.get("X-Correlation-ID")
+        correlation_id = Headers(scope=scope).get("X-Correlation-ID")
         if not correlation_id:
             correlation_id = str(uuid.uuid4())[:8]
 
         # Set in context for logging
         set_correlation_id(correlation_id)
+        bind_request_scope(scope)
 
-        # Track request timing
         start_time = time.perf_counter()
+        status_code = 500
 
-        # Process request
-        response = await call_next(request)
-
-        # Calculate duration
-        duration_ms = (time.perf_counter() - start_time) * 1000
-
-        # Add correlation ID to response
-        response.headers["X-Correlation-ID"] = correlation_id
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Correlation-ID"] = correlation_id
+            await send(message)
 
-        # Log request (skip health checks and static files)
-        if not request.url.path.startswith(("/health", "/static", "/favicon")):
-            log_request(
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
-                duration_ms=duration_ms
-            )
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            observe_request(scope, scope["method"], status_code, duration)
 
-        return response
+            # Log request (skip health checks and static files)
+            if not scope["path"].startswith(_SKIP_LOG_PREFIXES):
+                log_request(
+                    method=scope["method"],
+                    path=scope["path"],
+                    status_code=status_code,
+                    duration_ms=duration * 1000
+                )
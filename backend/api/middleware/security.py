@@ -2,35 +2,54 @@
 Security middleware for adding security headers to all responses.
 """
 
-from starlette.middleware.base import BaseHTTPMiddleware
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Middleware to add security headers to all responses."""
-
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-
-        # Skip CSP for API responses (JSON) — browsers don't enforce CSP on them
-        path = request.url.path
-        if path.startswith("/api/") or path.startswith("/health"):
-            response.headers["X-Content-Type-Options"] = "nosniff"
-            return response
-
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
-            "font-src 'self' https://fonts.gstatic.com; "
-            # Allow candidate photos fetched from external recruiting sites
-            # (hh.ru CDN, habr career, LinkedIn) — harmless image data.
-            "img-src 'self' data: blob: https:; "
-            "media-src 'self' blob:; "
-            "connect-src 'self' ws: wss:; "
-            "worker-src 'self' blob:"
-        )
-        return response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Skip CSP for API responses (JSON) — browsers don't enforce CSP on them
+_API_PREFIXES = ("/api/", "/health")
+
+_API_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+}
+
+_PAGE_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    "Content-Security-Policy": (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline'; "
+        "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
+        "font-src 'self' https://fonts.gstatic.com; "
+        # Allow candidate photos fetched from external recruiting sites
+        # (hh.ru CDN, habr career, LinkedIn) — harmless image data.
+        "img-src 'self' data: blob: https:; "
+        "media-src 'self' blob:; "
+        "connect-src 'self' ws: wss:; "
+        "worker-src 'self' blob:"
+    ),
+}
+
+
+class SecurityHeadersMiddleware:
+    """Middleware to add security headers to all responses (pure ASGI)."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        extra = _API_HEADERS if scope["path"].startswith(_API_PREFIXES) else _PAGE_HEADERS
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in extra.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
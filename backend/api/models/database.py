@@ -465,8 +465,10 @@ class Message(Base):
     __table_args__ = (
         # Composite index for message filtering by chat and user (common query pattern)
         Index('ix_message_chat_telegram_user', 'chat_id', 'telegram_user_id'),
-        # Composite index for sorting messages by timestamp (common list query)
-        Index('ix_message_chat_timestamp', 'chat_id', 'timestamp'),
+        # Message history: sort + keyset pagination by (timestamp, id) within chat
+        Index('ix_message_chat_timestamp_id', 'chat_id', 'timestamp', 'id'),
+        # Dedup lookup of imported history by Telegram message id (batched IN)
+        Index('ix_message_chat_telegram_msg', 'chat_id', 'telegram_message_id'),
     )
 
     chat = relationship("Chat", back_populates="messages")
@@ -544,6 +546,46 @@ class AnalysisHistory(Base):
     entity = relationship("Entity", back_populates="analyses")
 
 
+class ChatImportJob(Base):
+    """Progress and resume cursor of a Telegram history import.
+
+    Shared across workers (the progress poll may hit any of them). ``processed``
+    is the number of export messages whose batch is committed — a re-upload of
+    the same file (``source_sha256``) continues from there.
+    """
+    __tablename__ = "chat_import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    import_id = Column(String(64), nullable=False, unique=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False, index=True)
+    org_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    status = Column(String(20), nullable=False, default="starting")  # starting, processing, completed, error, resumed
+    phase = Column(String(30), nullable=True)  # reading_file, importing, processing_media, done
+    source_name = Column(String(255), nullable=True)
+    source_sha256 = Column(String(64), nullable=True)
+    source_size = Column(BigInteger, nullable=True)
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    imported = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    errors_count = Column(Integer, default=0)
+    current_file = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    resumed_from = Column(String(64), nullable=True)  # import_id of the interrupted job
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_chat_import_job_chat_source', 'chat_id', 'source_sha256'),
+        # One live import per (chat, file): backstop for the FOR UPDATE check
+        Index('ix_chat_import_job_active_source', 'chat_id', 'source_sha256', unique=True,
+              postgresql_where=text("status IN ('starting', 'processing')"),
+              sqlite_where=text("status IN ('starting', 'processing')")),
+    )
+
+
 class Entity(Base):
     __tablename__ = "entities"
 
@@ -585,6 +627,10 @@ class Entity(Base):
     # GIN-триграммный индекс создаётся в start.sh.
     search_name = Column(Text, nullable=True)
 
+    # Материализованный extra_data["probation_end_date"] — по нему оконный запрос
+    # напоминаний (services/hr_notifications.py, пишется event-листенерами там же).
+    probation_end_date = Column(DateTime, nullable=True, index=True)
+
     organization = relationship("Organization", back_populates="entities")
     department = relationship("Department", back_populates="entities")
     creator = relationship("User", foreign_keys=[created_by])
@@ -628,6 +674,61 @@ class Entity(Base):
     )
 
 
+class EntityNote(Base):
+    """Комментарий карточки кандидата (бывший extra_data["notes"]).
+
+    Добавление — вставка одной строки, без блокировки entities. В API заметка
+    по-прежнему отдаётся внутри extra_data.notes (services/entity_extras.py):
+    payload — исходный словарь заметки без text (id, date, stage, author_name...),
+    NULL — легаси-заметка строкой. Удаление — отметка deleted_at, строка остаётся.
+    """
+    __tablename__ = "entity_notes"
+
+    id = Column(Integer, primary_key=True)
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False)
+    uid = Column(String(64), nullable=False)  # note["id"]; у легаси — см. entity_extras.note_uid
+    text = Column(Text, nullable=False)
+    author_id = Column(Integer, nullable=True, index=True)  # без FK: автор мог быть удалён
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    deleted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('entity_id', 'uid', name='uq_entity_note_uid'),
+        Index('ix_entity_notes_entity_id_id', 'entity_id', 'id'),
+    )
+
+
+class EntityTimelineReaction(Base):
+    """Эмодзи-реакция на запись таймлайна (бывший extra_data["timeline_reactions"])."""
+    __tablename__ = "entity_timeline_reactions"
+
+    id = Column(Integer, primary_key=True)
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False)
+    entry_key = Column(String(255), nullable=False)  # id заметки / history-id / 'created'
+    emoji = Column(String(32), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    user_name = Column(String(255), nullable=True)
+    date = Column(String(64), nullable=True)  # ISO-строка как в легаси-блобе
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('entity_id', 'entry_key', 'user_id', 'emoji', name='uq_entity_timeline_reaction'),
+        Index('ix_entity_timeline_reactions_entity_id_id', 'entity_id', 'id'),
+    )
+
+
+class EntityHrTag(Base):
+    """Авто-метка HR: рекрутер ↔ воронка, куда он забрал кандидата
+    (бывший extra_data["system_hr_tags"]). Имена HR и вакансии не копируем —
+    их подтягивает чтение, так что переименование метки не старит."""
+    __tablename__ = "entity_hr_tags"
+
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), primary_key=True)
+    hr_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+    vacancy_id = Column(Integer, ForeignKey("vacancies.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
 class EntityTransfer(Base):
     __tablename__ = "entity_transfers"
 
@@ -746,6 +847,38 @@ class EntityAnalysis(Base):
     user = relationship("User", back_populates="entity_analyses")
 
 
+class EntityRedFlagAnalysis(Base):
+    """Сохранённый разбор red flags кандидата (общий или под вакансию).
+
+    Поддерживается services/red_flag_cache.py: просмотр отдаёт сохранённый
+    результат, пересчёт в фоне — только когда поменялся fingerprint входов
+    (поля профиля, версии чатов/звонков, требования вакансии).
+    """
+    __tablename__ = "entity_red_flag_analyses"
+
+    id = Column(Integer, primary_key=True)
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False, index=True)
+    vacancy_id = Column(Integer, ForeignKey("vacancies.id", ondelete="CASCADE"), nullable=True, index=True)
+    fingerprint = Column(String(64), nullable=False)
+    # Часть входов, от которой зависит AI-разбор коммуникаций: его флаги
+    # переиспользуются между вакансиями одного кандидата
+    communication_fingerprint = Column(String(64), nullable=False)
+    communication_flags = Column(JSON, nullable=False, default=list)
+    result = Column(JSON, nullable=False)  # RedFlagsAnalysis.to_dict()
+    risk_score = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # NULL в vacancy_id уникальность не держит — общий разбор отдельным индексом
+        Index('uq_red_flag_analysis_entity_vacancy', 'entity_id', 'vacancy_id', unique=True,
+              postgresql_where=text("vacancy_id IS NOT NULL"),
+              sqlite_where=text("vacancy_id IS NOT NULL")),
+        Index('uq_red_flag_analysis_entity_general', 'entity_id', unique=True,
+              postgresql_where=text("vacancy_id IS NULL"),
+              sqlite_where=text("vacancy_id IS NULL")),
+    )
+
+
 class ResourceType(str, enum.Enum):
     """Type of resource that can be shared"""
     chat = "chat"
@@ -1473,6 +1606,8 @@ class SaturnProject(Base):
     description = Column(Text, nullable=True)
     is_archived = Column(Boolean, default=False)
     enceladus_project_id = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True, index=True)
+    # sha1 синхронизируемых полей: совпал с ответом Saturn — строку не переписываем
+    content_hash = Column(String(40), nullable=True)
     last_synced_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1493,6 +1628,7 @@ class SaturnApplication(Base):
     git_repository = Column(String(500), nullable=True)
     git_branch = Column(String(200), nullable=True)
     environment_name = Column(String(100), nullable=True)  # development/uat/production
+    content_hash = Column(String(40), nullable=True)
     last_synced_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1537,6 +1673,25 @@ class Notification(Base):
     user = relationship("User")
 
 
+class SentReminder(Base):
+    """Ledger of scheduled reminders already sent: one row per (application, kind, period).
+
+    period — the date the reminder is about (e.g. probation end); moving that
+    date yields a new period and a new reminder.
+    """
+    __tablename__ = "sent_reminders"
+
+    id = Column(Integer, primary_key=True)
+    application_id = Column(Integer, ForeignKey("vacancy_applications.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(50), nullable=False)  # probation_ending
+    period = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('application_id', 'kind', 'period', name='uq_sent_reminder_app_kind_period'),
+    )
+
+
 # ============================================================
 # FORM CONSTRUCTOR
 # ============================================================
@@ -1574,10 +1729,21 @@ class FormSubmission(Base):
     data = Column(JSON, nullable=False)  # {field_id: value, ...}
     dispatch_id = Column(Integer, ForeignKey("form_dispatches.id", ondelete="SET NULL"), nullable=True, index=True)
     submitted_at = Column(DateTime, default=func.now())
+    # Фоновая обработка (services/form_intake.py): pending/processing/done/error
+    processing_status = Column(String(20), nullable=False, default="done", server_default="done", index=True)
+    processing_state = Column(JSON, nullable=True)  # {"file_ids": [...], "done": [шаги], ...}
+    processing_error = Column(Text, nullable=True)
+    processing_started_at = Column(DateTime, nullable=True)
+    # Idempotency-Key клиента: повтор того же сабмита возвращает ту же анкету
+    idempotency_key = Column(String(64), nullable=True)
 
     form = relationship("FormTemplate", back_populates="submissions")
     entity = relationship("Entity")
 
+    __table_args__ = (
+        UniqueConstraint('dispatch_id', 'idempotency_key', name='uq_form_submission_dispatch_idempotency'),
+    )
+
 
 class FormVacancy(Base):
     """Many-to-many: one form can be linked to multiple vacancies"""
@@ -1652,6 +1818,23 @@ class OrgUnit(Base):
     created_at = Column(DateTime, default=func.now())
 
 
+class OrgUnitClosure(Base):
+    """Транзитивное замыкание дерева org_units: пара (предок, потомок) на каждый
+    уровень, включая (u, u, 0). Поддерживается services/org_hierarchy.py на
+    каждый flush с правкой OrgUnit — руками не писать."""
+    __tablename__ = "org_unit_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("org_units.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("org_units.id", ondelete="CASCADE"), primary_key=True)
+    org_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False, index=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # «цепочка вверх от отдела сотрудника»: WHERE descendant_id = ? ORDER BY depth
+        Index('ix_org_unit_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+
 class Employee(Base):
     """Employee record — created when candidate transitions to staff"""
     __tablename__ = "employees"
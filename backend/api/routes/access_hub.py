@@ -29,10 +29,11 @@ from ..database import get_db
 from ..models.database import (
     AccessRequest, AccessRequestAudit, AccessRequestStatus,
     ResourceCatalog, ResourceCategory, RoleResourceGrant,
-    CustomRole, UserCustomRole, Employee, Entity, OrgUnit,
-    User, OrgMember, OrgRole, UserRole,
+    CustomRole,
+    User, UserRole,
 )
 from ..services.auth import get_current_user, get_user_org
+from ..services.org_hierarchy import get_access_context, org_admin_ids
 
 logger = logging.getLogger("hr-analyzer.access-hub")
 
@@ -181,12 +182,7 @@ async def _is_org_admin(user: User, org, db: AsyncSession) -> bool:
     """Суперадмин / владелец / админ организации."""
     if user.role == UserRole.superadmin:
         return True
-    row = (await db.execute(
-        select(OrgMember.role).where(
-            OrgMember.org_id == org.id, OrgMember.user_id == user.id
-        )
-    )).scalar_one_or_none()
-    return row in (OrgRole.owner, OrgRole.admin)
+    return (await get_access_context(user.id, org.id, db)).is_org_admin
 
 
 async def _is_active_in_org(user_id: Optional[int], org_id: int, db: AsyncSession) -> bool:
@@ -198,25 +194,13 @@ async def _is_active_in_org(user_id: Optional[int], org_id: int, db: AsyncSessio
     """
     if not user_id:
         return False
-    emp = (await db.execute(
-        select(Employee.is_active)
-        .where(Employee.user_id == user_id, Employee.org_id == org_id)
-        .order_by(Employee.id.desc())
-        .limit(1)
-    )).scalar_one_or_none()
     # Нет записи сотрудника — это админ/владелец без оформления в штат,он имеет право
-    return True if emp is None else bool(emp)
+    return (await get_access_context(user_id, org_id, db)).is_active
 
 
 async def _org_admin_ids(org_id: int, db: AsyncSession) -> List[int]:
     """Владельцы и админы организации — запасной адресат осиротевших заявок."""
-    rows = (await db.execute(
-        select(OrgMember.user_id).where(
-            OrgMember.org_id == org_id,
-            OrgMember.role.in_([OrgRole.owner, OrgRole.admin]),
-        )
-    )).scalars().all()
-    return list(rows)
+    return await org_admin_ids(org_id, db)
 
 
 async def _require_active_member(user: User, org, db: AsyncSession) -> bool:
@@ -238,83 +222,47 @@ async def _require_active_member(user: User, org, db: AsyncSession) -> bool:
     return False
 
 
-async def _active_role_id(user_id: int, db: AsyncSession) -> Optional[int]:
+async def _active_role_id(user_id: int, org_id: int, db: AsyncSession) -> Optional[int]:
     """Текущая кастомная роль пользователя (побеждает последняя назначенная —
     та же логика, что в admin/custom_roles)."""
-    return (await db.execute(
-        select(UserCustomRole.role_id)
-        .join(CustomRole, CustomRole.id == UserCustomRole.role_id)
-        .where(UserCustomRole.user_id == user_id, CustomRole.is_active.is_(True))
-        .order_by(UserCustomRole.assigned_at.desc())
-        .limit(1)
-    )).scalar_one_or_none()
+    return (await get_access_context(user_id, org_id, db)).role_id
 
 
 async def _unlock_state(user_id: int, org_id: int, db: AsyncSession) -> Dict[str, bool]:
-    """Условия разблокировки ресурсов для конкретного человека."""
-    emp = (await db.execute(
-        select(Employee).where(Employee.user_id == user_id, Employee.org_id == org_id)
-    )).scalars().first()
-
-    in_staff = bool(emp and emp.is_active)
+    """Условия разблокировки ресурсов для конкретного человека.
 
-    prometheus_ok = False
-    if emp and emp.entity_id:
-        extra = (await db.execute(
-            select(Entity.extra_data).where(Entity.id == emp.entity_id)
-        )).scalar_one_or_none()
-        if isinstance(extra, dict):
-            # Prometheus присылает код ACCEPTED, у нас он лежит уже в русской
-            # канонической форме (см. services/prometheus_status.STATUS_CODE_MAP)
-            prometheus_ok = (
-                extra.get("prometheus_status") == "Принят"
-                or extra.get("prometheus_status_code") == "ACCEPTED"
-            )
-
-    return {"always": True, "in_staff": in_staff, "prometheus_accepted": prometheus_ok}
+    Статус практики Prometheus присылает кодом ACCEPTED, у нас он лежит уже в
+    русской канонической форме (см. services/prometheus_status.STATUS_CODE_MAP).
+    """
+    return (await get_access_context(user_id, org_id, db)).unlock_state
 
 
-async def _used_this_month(user_id: int, resource_id: int, db: AsyncSession) -> tuple[int, int]:
-    """Сколько штук и на какую сумму человек уже получил по этому ресурсу
+async def _used_this_month(user_id: int, resource_ids: List[int],
+                           db: AsyncSession) -> Dict[int, tuple[int, int]]:
+    """Сколько штук и на какую сумму человек уже получил по ресурсам
     в текущем календарном месяце (учитываем только реально выданное)."""
+    if not resource_ids:
+        return {}
     now = datetime.utcnow()
     start = datetime(now.year, now.month, 1)
-    row = (await db.execute(
-        select(func.count(AccessRequest.id), func.coalesce(func.sum(AccessRequest.amount), 0))
+    rows = (await db.execute(
+        select(AccessRequest.resource_id,
+               func.count(AccessRequest.id), func.coalesce(func.sum(AccessRequest.amount), 0))
         .where(
-            AccessRequest.resource_id == resource_id,
+            AccessRequest.resource_id.in_(resource_ids),
             AccessRequest.status == AccessRequestStatus.granted,
             AccessRequest.granted_at >= start,
             func.coalesce(AccessRequest.target_user_id, AccessRequest.requester_user_id) == user_id,
         )
-    )).one()
-    return int(row[0] or 0), int(row[1] or 0)
-
+        .group_by(AccessRequest.resource_id)
+    )).all()
+    return {r[0]: (int(r[1] or 0), int(r[2] or 0)) for r in rows}
 
-async def _company_unit_id(user_id: int, db: AsyncSession) -> Optional[int]:
-    """Компания холдинга = КОРНЕВОЙ org_unit в ветке сотрудника.
 
-    Компания — отдельный уровень над отделом, поэтому поднимаемся по parent_id
-    до корня. Ограничиваем глубину, чтобы кривые данные с циклом не повесили
-    запрос.
-    """
-    emp = (await db.execute(
-        select(Employee.org_unit_id).where(Employee.user_id == user_id)
-    )).scalar_one_or_none()
-    if not emp:
-        return None
-    unit_id, seen = emp, set()
-    for _ in range(10):
-        if unit_id in seen:
-            break
-        seen.add(unit_id)
-        parent = (await db.execute(
-            select(OrgUnit.parent_id).where(OrgUnit.id == unit_id)
-        )).scalar_one_or_none()
-        if not parent:
-            return unit_id
-        unit_id = parent
-    return unit_id
+async def _company_unit_id(user_id: int, org_id: int, db: AsyncSession) -> Optional[int]:
+    """Компания холдинга = КОРНЕВОЙ org_unit в ветке сотрудника (верх цепочки
+    из org_unit_closure)."""
+    return (await get_access_context(user_id, org_id, db)).company_unit_id
 
 
 def _audit(db: AsyncSession, req: AccessRequest, action: str,
@@ -624,7 +572,7 @@ async def available_resources(
         raise HTTPException(403, "No organization access")
 
     is_admin = await _require_active_member(current_user, org, db)
-    role_id = await _active_role_id(current_user.id, db)
+    role_id = await _active_role_id(current_user.id, org.id, db)
 
     q = select(ResourceCatalog).where(
         ResourceCatalog.org_id == org.id, ResourceCatalog.is_active.is_(True)
@@ -681,11 +629,13 @@ async def available_resources(
             return "rejected", req.id, {}
         return "none", req.id, {}   # revoked → снова можно запрашивать
 
+    used = await _used_this_month(current_user.id, [r.id for r in rows], db)
+
     out: List[ResourceOut] = []
     for r in rows:
         cond = r.unlock_condition or "always"
         unlocked = unlock.get(cond, True)
-        used_cnt, used_amount = await _used_this_month(current_user.id, r.id, db)
+        used_cnt, used_amount = used.get(r.id, (0, 0))
 
         locked, reason = False, None
         if not unlocked:
@@ -746,7 +696,7 @@ async def create_request(
 
     # Право по роли
     if not is_admin:
-        role_id = await _active_role_id(current_user.id, db)
+        role_id = await _active_role_id(current_user.id, org.id, db)
         allowed = role_id and (await db.execute(
             select(RoleResourceGrant.id).where(
                 RoleResourceGrant.role_id == role_id,
@@ -768,7 +718,7 @@ async def create_request(
         )
 
     # Лимиты
-    used_cnt, used_amount = await _used_this_month(target_id, res.id, db)
+    used_cnt, used_amount = (await _used_this_month(target_id, [res.id], db)).get(res.id, (0, 0))
     if res.limit_per_month is not None and used_cnt >= res.limit_per_month:
         raise HTTPException(429, f"Исчерпан лимит по ресурсу: {used_cnt}/{res.limit_per_month} в месяц")
     if res.limit_amount_month is not None:
@@ -786,7 +736,7 @@ async def create_request(
         requester_user_id=current_user.id,
         target_user_id=target_id if target_id != current_user.id else None,
         resource_id=res.id,
-        company_unit_id=await _company_unit_id(target_id, db),
+        company_unit_id=await _company_unit_id(target_id, org.id, db),
         params=data.params or {},
         comment=data.comment,
         status=AccessRequestStatus.new,
@@ -10,12 +10,13 @@ Endpoints:
 
 import csv
 import io
+import json
 import logging
 import re
 from datetime import date, datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import Select, case, cast, func, literal, or_, select, String, text
@@ -38,7 +39,11 @@ from api.models.database import (
     StageTransition,
     AccessLevel,
 )
-from api.services.auth import get_current_user, get_user_org, has_full_database_access
+from api.services.auth import get_current_user, get_current_principal, get_user_org, has_full_database_access
+from api.services.principal import Principal
+from api.services.change_versions import candidate_version, make_etag, not_modified
+from api.services import entity_extras
+from api.services.metrics import query_label
 from api.services.shadow_filter import get_isolated_creator_ids
 
 logger = logging.getLogger("hr-analyzer.candidate-search")
@@ -859,15 +864,32 @@ class KanbanBoardResponse(BaseModel):
 
 @router.get("/kanban", response_model=KanbanBoardResponse)
 async def get_candidates_kanban(
+    request: Request,
+    response: Response,
     q: Optional[str] = None,
     recruiter_id: Optional[int] = None,
     per_column: int = Query(50, ge=1, le=500),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ):
-    """Get candidates grouped by EntityStatus for kanban board view."""
-    current_user = await db.merge(current_user)
-    org_id = await _get_org_id(current_user, db)
+    """Get candidates grouped by EntityStatus for kanban board view.
+
+    Поллится раз в 15 с: ETag по версии кандидатов организации + всему, от чего
+    зависит выдача (пользователь, роль, фильтры, настройки колонок, дата —
+    возраст на карточках считается от сегодня). Без изменений — 304.
+    """
+    current_user = principal.user
+    org_id = None if principal.is_superadmin else principal.org_id
+    stage_config = (principal.org.settings or {}).get("stage_config") if org_id and principal.org else None
+
+    etag = make_etag(
+        "cand-kanban", await candidate_version(org_id), current_user.id,
+        current_user.role, principal.org_role, org_id, q, recruiter_id, per_column,
+        json.dumps(stage_config, sort_keys=True, default=str), date.today(),
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     isolated_ids = await get_isolated_creator_ids(current_user, db) if org_id else []
 
     # При ПОИСКЕ подмешиваем теневую базу: человека, который уже проходил у нас,
@@ -922,7 +944,8 @@ async def get_candidates_kanban(
     else:
         base_q = base_q.order_by(Entity.created_at.desc())
 
-    result = await db.execute(base_q)
+    with query_label("candidates.kanban"):
+        result = await db.execute(base_q)
     entities = result.scalars().all()
 
     # Группируем по статусу и берём только per_column на колонку ДО дорогой работы
@@ -1016,6 +1039,8 @@ async def get_candidates_kanban(
         except Exception as exc:
             logger.warning(f"Vacancy map query failed (non-critical): {exc}")
 
+    await entity_extras.attach(db, display_entities)
+
     # Group by status (display_entities уже обрезаны до per_column на колонку)
     grouped: dict[str, list] = {s: [] for s in KANBAN_STATUSES}
     for e in display_entities:
@@ -3,26 +3,17 @@ from typing import List, Dict, Any, Optional
 from pathlib import Path
 from pydantic import BaseModel
 import json
-import hashlib
 import zipfile
-import io
-import re
 import os
 import shutil
 import uuid
 import asyncio
 import logging
-import threading
-from html.parser import HTMLParser
 
 logger = logging.getLogger("hr-analyzer.chats")
 
 # Uploads directory for imported media
 UPLOADS_DIR = Path(__file__).parent.parent.parent / "uploads"
-
-# Import progress tracking (in-memory) with thread-safe access
-_import_progress_lock = threading.Lock()
-import_progress: Dict[str, Dict[str, Any]] = {}
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -39,10 +30,11 @@ from ..services.chat_types import (
     get_all_chat_types, get_chat_type_config, get_quick_actions,
     get_suggested_questions, get_default_criteria
 )
-from ..services.transcription import transcription_service
-from ..services.documents import document_parser
-from ..services.google_docs import google_docs_service
 from ..services.shadow_filter import get_isolated_creator_ids
+from ..services.telegram_import import (
+    TelegramExport, TelegramHistoryImporter, ImportFormatError, ImportInProgressError,
+    spool_upload, create_import_job, attach_import_source, fail_import_job, get_import_job, job_progress,
+)
 from .realtime import broadcast_chat_updated, broadcast_chat_deleted
 
 router = APIRouter()
@@ -691,455 +683,26 @@ async def cleanup_old_deleted_chats(db: AsyncSession):
     return len(old_chat_ids)
 
 
-def parse_telegram_date(date_str: str) -> datetime:
-    """Parse Telegram export date format."""
-    if not date_str:
-        return datetime.now()
-
-    # Strip timezone suffix like " UTC+03:00"
-    if ' UTC' in date_str:
-        date_str = date_str.split(' UTC')[0]
-
-    # Try ISO format first: 2024-12-10T14:30:00
-    try:
-        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-    except ValueError:
-        pass
-
-    # Try Russian format: DD.MM.YYYY HH:MM:SS
-    try:
-        if '.' in date_str and len(date_str.split('.')[0]) <= 2:
-            return datetime.strptime(date_str, '%d.%m.%Y %H:%M:%S')
-    except ValueError:
-        pass
-
-    # Try other common formats
-    formats = [
-        '%Y-%m-%d %H:%M:%S',
-        '%d/%m/%Y %H:%M:%S',
-        '%Y-%m-%dT%H:%M:%S',
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-
-    # Fallback - return now (shouldn't happen often)
-    return datetime.now()
-
-
-def detect_content_type(msg: dict) -> str:
-    """Detect message content type from Telegram export."""
-    if msg.get('media_type') == 'voice_message':
-        return 'voice'
-    if msg.get('media_type') == 'video_message':
-        return 'video_note'
-    if msg.get('media_type') == 'sticker':
-        return 'sticker'
-    if 'photo' in msg:
-        return 'photo'
-    if 'file' in msg and msg.get('mime_type', '').startswith('video'):
-        return 'video'
-    if 'file' in msg:
-        return 'document'
-    return 'text'
-
-
-def extract_text_content(msg: dict) -> str:
-    """Extract text content from Telegram message."""
-    text = msg.get('text', '')
-
-    # Handle complex text (with formatting entities)
-    if isinstance(text, list):
-        parts = []
-        for part in text:
-            if isinstance(part, str):
-                parts.append(part)
-            elif isinstance(part, dict):
-                parts.append(part.get('text', ''))
-        text = ''.join(parts)
-
-    # Add media type indicator if no text
-    if not text:
-        content_type = detect_content_type(msg)
-        type_labels = {
-            'voice': '[Голосовое сообщение]',
-            'video_note': '[Видеосообщение]',
-            'photo': '[Фото]',
-            'video': '[Видео]',
-            'sticker': '[Стикер]',
-            'document': f'[Файл: {msg.get("file_name", "документ")}]',
-        }
-        text = type_labels.get(content_type, '[Медиа]')
-
-    return text
-
-
-def get_content_hash(content: str, timestamp: datetime, media_file: str = None) -> str:
-    """Generate hash for deduplication when message_id is not available.
-
-    For media messages, use media_file instead of content to avoid
-    duplicates when content changes (e.g., transcription replaces placeholder).
-    """
-    if media_file:
-        # Use media file path - stable across auto-processing runs
-        data = f"media:{media_file}:{timestamp.isoformat()}"
-    else:
-        data = f"{content}:{timestamp.isoformat()}"
-    return hashlib.md5(data.encode()).hexdigest()
-
-
-class TelegramHTMLParser(HTMLParser):
-    """
-    Parser for Telegram Desktop HTML export format.
-
-    HTML structure:
-    - Message container: div.message.default (or div.message.default.joined for continuation)
-    - Sender name: div.from_name (only in first message of a sequence)
-    - Message body: div.body > div.text
-    - Date: div.date (datetime in title attribute, format: "DD.MM.YYYY HH:MM:SS")
-    - Media: div.media_wrap (photos, videos, etc.)
-
-    Messages with class "joined" don't have from_name - they continue from previous sender.
-    """
-
-    def __init__(self):
-        super().__init__()
-        self.messages = []
-        self.current_message = None
-        self.last_sender = None  # Track last sender for "joined" messages
-        self.in_from_name = False
-        self.in_text = False
-        self.in_media = False
-        self.text_buffer = ""
-        self.from_buffer = ""
-        self.div_depth = 0  # Track div nesting to know when message ends
-        self.message_div_depth = 0  # Depth where message div started
-        self.is_joined = False
-        self.media_type = None  # photo, video, sticker, video_note, voice
-        self.skipped_service = 0  # Track skipped service messages
-
-    def handle_starttag(self, tag, attrs):
-        attrs_dict = dict(attrs)
-        class_name = attrs_dict.get('class', '')
-        classes = class_name.split() if class_name else []
-
-        if tag == 'div':
-            self.div_depth += 1
-
-            # Check for message container: div.message.default or div.message.service
-            if 'message' in classes:
-                # Skip service messages (like "User joined the group")
-                if 'service' in classes:
-                    self.skipped_service += 1
-                    return  # Skip service messages
-
-                # Only process default messages
-                if 'default' in classes:
-                    self.message_div_depth = self.div_depth
-                    self.is_joined = 'joined' in classes
-                    self.current_message = {
-                        'id': None,
-                        'from': self.last_sender if self.is_joined else None,
-                        'date': '',
-                        'text': '',
-                        'has_media': False,
-                        'media_file': None,  # Path to media file in export
-                        'media_type': None,  # photo, video, sticker, video_note, voice
-                        'type': 'message'
-                    }
-                    # Get message ID from id attribute (format: "message123")
-                    msg_id = attrs_dict.get('id', '')
-                    if msg_id.startswith('message'):
-                        try:
-                            self.current_message['id'] = int(msg_id[7:])
-                        except ValueError:
-                            pass
-
-            elif self.current_message:
-                # Check for from_name
-                if 'from_name' in classes:
-                    self.in_from_name = True
-                    self.from_buffer = ""
-
-                # Check for text content
-                elif 'text' in classes:
-                    # IMPORTANT: Close from_name when text starts
-                    # This prevents message text from being added to sender name
-                    self.in_from_name = False
-                    self.in_text = True
-                    self.text_buffer = ""
-
-                # Check for media
-                elif 'media_wrap' in classes or 'media' in classes:
-                    # Also close from_name when media starts
-                    self.in_from_name = False
-                    self.in_media = True
-                    self.current_message['has_media'] = True
-                    # Detect media type from classes
-                    if 'photo' in classes:
-                        self.current_message['media_type'] = 'photo'
-                    elif 'video' in classes:
-                        self.current_message['media_type'] = 'video'
-                    elif 'sticker' in classes:
-                        self.current_message['media_type'] = 'sticker'
-                    elif 'document' in classes:
-                        self.current_message['media_type'] = 'document'
-                    elif 'audio_file' in classes:
-                        self.current_message['media_type'] = 'voice'
-
-                # Check for document wrapper (separate from media_wrap)
-                elif 'document_wrap' in classes or 'document' in classes:
-                    self.in_from_name = False  # Close from_name
-                    self.in_media = True
-                    self.current_message['has_media'] = True
-                    self.current_message['media_type'] = 'document'
-
-                # Check for date (datetime in title attribute)
-                elif 'date' in classes:
-                    title = attrs_dict.get('title', '')
-                    if title:
-                        self.current_message['date'] = title
-
-        # Capture media file paths from a, img, video tags inside media div
-        elif self.in_media and self.current_message:
-            if tag == 'a':
-                href = attrs_dict.get('href', '')
-                # Skip external links and anchors
-                if href and not href.startswith('#') and not href.startswith('http'):
-                    # For photos, prefer full-size over thumbnail
-                    # For stickers, accept thumbs (they only have thumb versions)
-                    is_thumb = '_thumb' in href
-                    is_sticker = 'sticker' in href.lower()
-
-                    # Accept if: not a thumb, OR is a sticker thumb, OR we don't have a file yet
-                    if not is_thumb or is_sticker or not self.current_message.get('media_file'):
-                        # Don't overwrite full-size with thumb for photos
-                        if is_thumb and self.current_message.get('media_file') and not is_sticker:
-                            pass  # Keep existing full-size file
-                        else:
-                            self.current_message['media_file'] = href
-                            # Detect type from file path
-                            if 'photos/' in href or href.endswith(('.jpg', '.jpeg', '.png')):
-                                self.current_message['media_type'] = 'photo'
-                            elif 'round_video' in href or 'video_messages/' in href:
-                                # Video notes (circles) are in round_video_messages/ folder
-                                self.current_message['media_type'] = 'video_note'
-                            elif 'video_files/' in href or 'videos/' in href or href.endswith(('.mp4', '.webm')):
-                                # Regular videos in video_files/ or videos/ folder
-                                self.current_message['media_type'] = 'video'
-                            elif 'stickers/' in href or is_sticker:
-                                self.current_message['media_type'] = 'sticker'
-                            elif 'voice_messages/' in href or href.endswith(('.ogg', '.mp3', '.wav', '.m4a', '.opus')):
-                                self.current_message['media_type'] = 'voice'
-                            elif 'files/' in href and not href.endswith(('.ogg', '.mp3', '.wav', '.m4a', '.opus', '.mp4', '.webm', '.mov')):
-                                self.current_message['media_type'] = 'document'
-                            elif href.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.zip', '.rar', '.7z', '.csv', '.json')):
-                                self.current_message['media_type'] = 'document'
-                            elif href.endswith('.webp'):
-                                # .webp can be sticker or photo
-                                if 'sticker' in href.lower():
-                                    self.current_message['media_type'] = 'sticker'
-                                else:
-                                    self.current_message['media_type'] = 'photo'
-            elif tag == 'img':
-                src = attrs_dict.get('src', '')
-                # Only use img src if we don't have a file from <a> tag yet
-                if src and not src.startswith('http') and not self.current_message.get('media_file'):
-                    self.current_message['media_file'] = src
-                    if 'sticker' in src.lower():
-                        self.current_message['media_type'] = 'sticker'
-                    else:
-                        self.current_message['media_type'] = 'photo'
-            elif tag == 'video':
-                src = attrs_dict.get('src', '')
-                if src and not self.current_message.get('media_file'):
-                    self.current_message['media_file'] = src
-                    if 'round' in src.lower():
-                        self.current_message['media_type'] = 'video_note'
-                    else:
-                        self.current_message['media_type'] = 'video'
-            elif tag == 'audio':
-                src = attrs_dict.get('src', '')
-                if src and not self.current_message.get('media_file'):
-                    self.current_message['media_file'] = src
-                    self.current_message['media_type'] = 'voice'
-            elif tag == 'source':
-                src = attrs_dict.get('src', '')
-                if src and not self.current_message.get('media_file'):
-                    self.current_message['media_file'] = src
-                    # Detect type from source src
-                    if 'voice' in src.lower() or src.endswith('.ogg'):
-                        self.current_message['media_type'] = 'voice'
-                    elif 'round' in src.lower():
-                        self.current_message['media_type'] = 'video_note'
-
-        # Handle links in text - might be document links
-        elif tag == 'a' and self.in_text and self.current_message:
-            href = attrs_dict.get('href', '')
-            # Check if it's a file link (not external)
-            if href and not href.startswith('#') and not href.startswith('http'):
-                # Check if it's a document/file by extension
-                doc_extensions = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
-                                  '.txt', '.zip', '.rar', '.7z', '.csv', '.json')
-                if href.endswith(doc_extensions) or 'files/' in href:
-                    if not self.current_message.get('media_file'):
-                        self.current_message['media_file'] = href
-                        self.current_message['media_type'] = 'document'
-                        self.current_message['has_media'] = True
-
-        elif tag == 'br' and self.in_text:
-            self.text_buffer += '\n'
-
-    def handle_endtag(self, tag):
-        if tag == 'div':
-            # Check if we're closing the message div
-            if self.current_message and self.div_depth == self.message_div_depth:
-                # Finalize the message
-                if self.from_buffer.strip():
-                    self.current_message['from'] = self.from_buffer.strip()
-                    self.last_sender = self.from_buffer.strip()
-
-                if self.text_buffer.strip():
-                    self.current_message['text'] = self.text_buffer.strip()
-
-                # Save message (use last sender or "Unknown" if no sender)
-                if not self.current_message.get('from'):
-                    self.current_message['from'] = self.last_sender or 'Unknown'
-                self.messages.append(self.current_message)
-
-                # Reset state
-                self.current_message = None
-                self.in_from_name = False
-                self.in_text = False
-                self.in_media = False
-                self.text_buffer = ""
-                self.from_buffer = ""
-                self.is_joined = False
-
-            self.div_depth -= 1
-
-        # Reset from_name flag when its span/div closes
-        elif tag in ('span', 'div') and self.in_from_name:
-            self.in_from_name = False
-
-    def handle_data(self, data):
-        if self.in_from_name:
-            self.from_buffer += data
-        elif self.in_text:
-            self.text_buffer += data
-
-
-def parse_html_export(html_content: str) -> List[dict]:
-    """Parse Telegram HTML export and return messages list."""
-    import logging
-    logger = logging.getLogger("hr-analyzer")
-
-    parser = TelegramHTMLParser()
-    try:
-        parser.feed(html_content)
-    except (ValueError, AssertionError, MemoryError) as e:
-        logger.error(f"HTML parse error: {e}")
-        return []
-
-    logger.info(f"HTML parser found {len(parser.messages)} raw messages")
-
-    messages = []
-    skipped_no_sender = 0
-    skipped_empty = 0
-
-    for msg in parser.messages:
-        # Log media detection
-        if msg.get('has_media') or msg.get('media_file'):
-            logger.info(f"Media message: type={msg.get('media_type')}, file={msg.get('media_file')}, has_media={msg.get('has_media')}")
-
-        # Skip if no sender (shouldn't happen now)
-        if not msg.get('from'):
-            skipped_no_sender += 1
-            continue
 
-        # Parse date (format: "DD.MM.YYYY HH:MM:SS" or "DD.MM.YYYY HH:MM:SS UTC+03:00")
-        date_str = msg.get('date', '')
 
-        # Strip timezone suffix like " UTC+03:00"
-        if ' UTC' in date_str:
-            date_str = date_str.split(' UTC')[0]
-
-        logger.info(f"HTML Parser - cleaned date string: '{date_str}'")
+async def _get_import_chat(chat_id: int, user: User, db: AsyncSession):
+    """Chat of the user's organization the user may read (404/403 otherwise)."""
+    org = await get_user_org(user, db)
+    if not org:
+        raise HTTPException(status_code=404, detail="Chat not found")
 
-        try:
-            if '.' in date_str and len(date_str.split('.')[0]) <= 2:
-                # Russian format: DD.MM.YYYY HH:MM:SS
-                parsed_date = datetime.strptime(date_str, '%d.%m.%Y %H:%M:%S')
-                logger.info(f"HTML Parser - parsed as DD.MM.YYYY: {parsed_date}")
-            elif 'T' in date_str:
-                # ISO format
-                parsed_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                logger.info(f"HTML Parser - parsed as ISO: {parsed_date}")
-            else:
-                parsed_date = datetime.now()
-                logger.warning(f"HTML Parser - using datetime.now() for unknown format: '{date_str}'")
-        except (ValueError, AttributeError) as e:
-            parsed_date = datetime.now()
-            logger.error(f"HTML Parser - date parse error for '{date_str}': {e}")
-
-        # Determine text content and media type
-        text = msg.get('text', '').strip()
-        media_file = msg.get('media_file')
-        media_type = msg.get('media_type')
-
-        # Handle messages with media
-        if msg.get('has_media') or media_file:
-            if not media_type:
-                # Try to detect type from file path
-                if media_file:
-                    if 'photo' in media_file or media_file.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                        media_type = 'photo'
-                    elif 'sticker' in media_file:
-                        media_type = 'sticker'
-                    elif 'round' in media_file or 'video_note' in media_file:
-                        media_type = 'video_note'
-                    elif 'video' in media_file or media_file.endswith(('.mp4', '.webm', '.mov')):
-                        media_type = 'video'
-                    elif 'voice' in media_file or media_file.endswith(('.ogg', '.opus', '.mp3', '.wav', '.m4a')):
-                        media_type = 'voice'
-                    elif ('files/' in media_file and not media_file.endswith(('.ogg', '.opus', '.mp3', '.wav', '.m4a', '.mp4', '.webm', '.mov'))) or media_file.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.zip', '.rar', '.7z', '.csv', '.json')):
-                        media_type = 'document'
-
-            if not text:
-                # Set appropriate placeholder based on media type
-                if media_type == 'photo':
-                    text = '[Фото]'
-                elif media_type == 'video_note':
-                    text = '[Видео-кружок]'
-                elif media_type == 'video':
-                    text = '[Видео]'
-                elif media_type == 'sticker':
-                    text = '[Стикер]'
-                elif media_type == 'voice':
-                    text = '[Голосовое сообщение]'
-                elif media_type == 'document':
-                    text = '[Файл]'
-                else:
-                    text = '[Медиа]'
-        elif not text:
-            skipped_empty += 1
-            continue  # Skip empty messages without media
-
-        messages.append({
-            'id': msg.get('id'),
-            'type': 'message',
-            'date': parsed_date.isoformat(),
-            'from': msg.get('from'),
-            'from_id': '',
-            'text': text,
-            'media_file': media_file,  # Path to media file in export
-            'media_type': media_type   # photo, video, sticker, video_note, voice
-        })
-
-    logger.info(f"HTML parse result: {len(messages)} messages, skipped {skipped_no_sender} (no sender), {skipped_empty} (empty), {parser.skipped_service} (service)")
-    return messages
+    result = await db.execute(select(Chat).where(
+        Chat.id == chat_id,
+        Chat.org_id == org.id,
+        Chat.deleted_at.is_(None)
+    ))
+    chat = result.scalar_one_or_none()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    permissions = PermissionService(db)
+    if not await permissions.can_access_resource(user, chat, "read"):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return chat, org
 
 
 @router.post("/{chat_id}/import")
@@ -1160,450 +723,89 @@ async def import_telegram_history(
     This is slow but provides immediate content. Otherwise use manual transcription buttons.
 
     Pass import_id to enable progress tracking via GET /{chat_id}/import/progress/{import_id}
-    """
-    import logging
-    logger = logging.getLogger("hr-analyzer")
-
-    # Initialize progress tracking
-    if import_id:
-        with _import_progress_lock:
-            import_progress[import_id] = {
-                "status": "starting",
-                "phase": "reading_file",
-                "current": 0,
-                "total": 0,
-                "imported": 0,
-                "skipped": 0,
-                "current_file": None
-            }
 
+    The upload is spooled to disk and parsed incrementally; messages are committed
+    in batches. Re-uploading the same file after a failure continues from the
+    last committed batch.
+    """
     user = await db.merge(user)
+    chat, org = await _get_import_chat(chat_id, user, db)
 
-    # Get user's organization
-    org = await get_user_org(user, db)
-    if not org:
-        raise HTTPException(status_code=404, detail="Chat not found")
-
-    # Check chat exists and user has access
-    result = await db.execute(select(Chat).where(
-        Chat.id == chat_id,
-        Chat.org_id == org.id,
-        Chat.deleted_at.is_(None)
-    ))
-    chat = result.scalar_one_or_none()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    permissions = PermissionService(db)
-    if not await permissions.can_access_resource(user, chat, "read"):
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # Read file content
-    messages_data = None
-    is_html_source = False  # Track if data came from HTML parser
-    filename = file.filename.lower() if file.filename else ""
-
-    logger.info(f"Import started for chat {chat_id}, file: {filename}")
+    logger.info(f"Import started for chat {chat_id}, file: {file.filename}")
 
+    # Задача заводится ДО спула: поллинг прогресса сразу видит starting/reading_file
     try:
-        content = await file.read()
-        logger.info(f"File size: {len(content)} bytes")
-
-        # Variables for ZIP file handling
-        zip_file = None
-        zip_bytes = None
-
-        # Check if it's a ZIP file
-        if filename.endswith('.zip'):
-            try:
-                zip_bytes = io.BytesIO(content)
-                zip_file = zipfile.ZipFile(zip_bytes)
-
-                # First try to find JSON file
-                target_file = None
-                is_html = False
-
-                file_list = zip_file.namelist()
-                logger.info(f"ZIP contents: {file_list}")
-
-                for name in file_list:
-                    if name.endswith('result.json') or name == 'result.json':
-                        target_file = name
-                        break
-
-                if not target_file:
-                    for name in file_list:
-                        if name.endswith('.json'):
-                            target_file = name
-                            break
-
-                # If no JSON, try HTML
-                if not target_file:
-                    for name in file_list:
-                        if name.endswith('.html') or name.endswith('.htm'):
-                            target_file = name
-                            is_html = True
-                            break
-
-                if not target_file:
-                    zip_file.close()
-                    raise HTTPException(status_code=400, detail="ZIP-архив не содержит JSON или HTML файл")
-
-                logger.info(f"Using file from ZIP: {target_file}, is_html: {is_html}")
-                file_content = zip_file.read(target_file).decode('utf-8')
-
-                if is_html:
-                    messages_data = parse_html_export(file_content)
-                    is_html_source = True
-                    logger.info(f"HTML parsed, got {len(messages_data)} messages")
-                else:
-                    data = json.loads(file_content)
-                    messages_data = data.get('messages', [])
-                    logger.info(f"JSON parsed, got {len(messages_data)} messages")
-
-            except zipfile.BadZipFile:
-                raise HTTPException(status_code=400, detail="Повреждённый ZIP-архив")
-
-        # Check if it's an HTML file
-        elif filename.endswith('.html') or filename.endswith('.htm'):
-            html_content = content.decode('utf-8')
-            messages_data = parse_html_export(html_content)
-            is_html_source = True
-            logger.info(f"HTML file parsed, got {len(messages_data)} messages")
-
-        # Regular JSON file
-        else:
-            data = json.loads(content.decode('utf-8'))
-            messages_data = data.get('messages', [])
-            logger.info(f"JSON file parsed, got {len(messages_data)} messages")
-
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
-        raise HTTPException(status_code=400, detail=f"Неверный формат JSON: {str(e)}")
-    except HTTPException:
-        raise
-    except (UnicodeDecodeError, OSError, KeyError, ValueError) as e:
-        logger.error(f"File read error: {e}", exc_info=True)
-        raise HTTPException(status_code=400, detail=f"Ошибка чтения файла: {str(e)}")
-
-    # Validate structure
-    if not messages_data:
-        if import_id:
-            with _import_progress_lock:
-                import_progress[import_id] = {"status": "error", "error": "Файл не содержит сообщений"}
-        raise HTTPException(status_code=400, detail="Файл не содержит сообщений")
-
-    # Update progress - parsing complete
-    if import_id:
-        with _import_progress_lock:
-            import_progress[import_id].update({
-                "status": "processing",
-                "phase": "importing",
-                "total": len(messages_data),
-                "current": 0
-            })
-
-    # Get existing message IDs and hashes for deduplication
-    existing_result = await db.execute(
-        select(Message.telegram_message_id, Message.content, Message.timestamp, Message.file_path)
-        .where(Message.chat_id == chat_id)
-    )
-    existing_messages = existing_result.fetchall()
-
-    existing_msg_ids = {row[0] for row in existing_messages if row[0] is not None}
-    existing_hashes = {get_content_hash(row[1], row[2], row[3]) for row in existing_messages}
-
-    imported_count = 0
-    skipped_count = 0
-    errors = []
+        job = await create_import_job(
+            db,
+            chat_id=chat_id,
+            org_id=org.id,
+            user_id=user.id,
+            import_id=import_id or str(uuid.uuid4()),
+            source_name=file.filename,
+        )
+    except ImportInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    for msg_idx, msg in enumerate(messages_data):
+    spool_path = None
+    export = None
+    try:
         try:
-            # Update progress every 10 messages
-            if import_id and msg_idx % 10 == 0:
-                with _import_progress_lock:
-                    import_progress[import_id].update({
-                        "current": msg_idx,
-                        "imported": imported_count,
-                        "skipped": skipped_count
-                    })
-
-            # Skip service messages
-            if msg.get('type') != 'message':
-                continue
+            spool_path, source_sha256, source_size = await spool_upload(file)
+            export = TelegramExport(spool_path, file.filename)
+            total = await asyncio.to_thread(export.count_messages)
+            if not total:
+                raise HTTPException(status_code=400, detail="Файл не содержит сообщений")
+        except HTTPException as e:
+            await fail_import_job(db, chat_id, job.import_id, str(e.detail))
+            raise
+        except ImportFormatError as e:
+            await fail_import_job(db, chat_id, job.import_id, str(e))
+            raise HTTPException(status_code=400, detail=str(e))
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e}")
+            await fail_import_job(db, chat_id, job.import_id, str(e))
+            raise HTTPException(status_code=400, detail=f"Неверный формат JSON: {str(e)}")
+        except (UnicodeDecodeError, OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            logger.error(f"File read error: {e}", exc_info=True)
+            await fail_import_job(db, chat_id, job.import_id, str(e))
+            raise HTTPException(status_code=400, detail=f"Ошибка чтения файла: {str(e)}")
+
+        logger.info(f"Export {source_size} bytes, {total} messages")
 
-            telegram_msg_id = msg.get('id')
-
-            # Check for duplicates by message_id
-            if telegram_msg_id and telegram_msg_id in existing_msg_ids:
-                skipped_count += 1
-                continue
-
-            # Handle differently based on source
-            file_path = None  # For imported media files
-            document_metadata = None
-            parse_status = None
-            parse_error = None
-
-            if is_html_source:
-                # HTML parser already extracted text in 'text' field
-                content = msg.get('text', '')
-                content_type = msg.get('media_type') or 'text'
-                timestamp = parse_telegram_date(msg.get('date', ''))
-                from_name = msg.get('from', 'Unknown')
-                from_id = msg.get('from_id', '')
-
-                # Extract media file from ZIP if available
-                media_file = msg.get('media_file')
-                if media_file and zip_file:
-                    try:
-                        # Create uploads directory for this chat
-                        chat_uploads_dir = UPLOADS_DIR / str(chat_id)
-                        chat_uploads_dir.mkdir(parents=True, exist_ok=True)
-
-                        # Try to find the file in ZIP (might have different path prefix)
-                        file_found = False
-
-                        # For video_note, if we have a thumb file, find the actual video
-                        search_file = media_file
-                        if content_type == 'video_note' and '_thumb.jpg' in media_file:
-                            # Strip _thumb.jpg to get actual video filename
-                            search_file = media_file.replace('_thumb.jpg', '')
-                            logger.info(f"Video note: looking for {search_file} instead of thumb {media_file}")
-
-                        # Get just the filename for more flexible matching
-                        search_filename = os.path.basename(search_file)
-
-                        for zip_path in zip_file.namelist():
-                            zip_filename = os.path.basename(zip_path)
-
-                            # Match by filename or full path
-                            if zip_filename == search_filename or zip_path.endswith(search_file) or search_file in zip_path:
-                                # Make sure it's the actual file, not another thumb
-                                if '_thumb' in zip_path and '_thumb' not in search_file:
-                                    logger.debug(f"Skipping thumb file: {zip_path}")
-                                    continue
-                                # Extract and save the file
-                                file_data = zip_file.read(zip_path)
-                                # Create a unique filename
-                                safe_name = os.path.basename(search_file)
-                                if telegram_msg_id:
-                                    safe_name = f"{telegram_msg_id}_{safe_name}"
-                                dest_path = chat_uploads_dir / safe_name
-                                dest_path.write_bytes(file_data)
-                                file_path = f"uploads/{chat_id}/{safe_name}"
-                                file_found = True
-                                logger.info(f"Extracted media: {zip_path} -> {file_path}")
-                                break
-
-                        if not file_found:
-                            logger.warning(f"Media file not found in ZIP: {media_file} (searching for: {search_filename})")
-                            # List available files in ZIP for debugging video_note issues
-                            if content_type == 'video_note':
-                                round_videos = [z for z in zip_file.namelist() if 'round_video' in z.lower()]
-                                logger.warning(f"Available round_video files in ZIP: {round_videos[:5]}")
-                        elif auto_process and file_data:
-                            # Update progress with current file
-                            if import_id:
-                                with _import_progress_lock:
-                                    import_progress[import_id].update({
-                                        "current_file": os.path.basename(media_file),
-                                        "phase": "processing_media"
-                                    })
-
-                            # Auto-transcribe voice and video files (only if auto_process=True)
-                            if content_type in ('voice', 'video_note', 'video'):
-                                try:
-                                    logger.info(f"Auto-transcribing {content_type}: {file_path}")
-                                    if content_type == 'voice':
-                                        transcription = await transcription_service.transcribe_audio(file_data)
-                                    else:
-                                        transcription = await transcription_service.transcribe_video(file_data, media_file)
-
-                                    # Only use transcription if successful (not an error message)
-                                    if transcription and not transcription.startswith("["):
-                                        content = transcription
-                                        logger.info(f"Transcription success: {transcription[:50]}...")
-                                    else:
-                                        logger.warning(f"Transcription returned: {transcription}")
-                                except Exception as e:
-                                    logger.error(f"Auto-transcription error: {e}")
-
-                            # Auto-parse documents and photos (OCR)
-                            elif content_type in ('document', 'photo'):
-                                try:
-                                    file_name_for_parse = os.path.basename(media_file)
-                                    logger.info(f"Auto-parsing {content_type}: {file_name_for_parse}")
-                                    result = await document_parser.parse(file_data, file_name_for_parse)
-                                    if result.content and result.status in ('parsed', 'partial'):
-                                        content = result.content
-                                        document_metadata = result.metadata
-                                        parse_status = result.status
-                                        logger.info(f"Parse success: {content[:50]}...")
-                                    else:
-                                        parse_status = result.status
-                                        parse_error = result.error
-                                        logger.warning(f"Parse returned: {result.error}")
-                                except Exception as e:
-                                    logger.error(f"Auto-parse error: {e}")
-                                    parse_status = "failed"
-                                    parse_error = str(e)
-                    except (KeyError, OSError, RuntimeError, zipfile.BadZipFile) as e:
-                        logger.error(f"Error extracting media {media_file}: {e}")
-            else:
-                # JSON format - use original extract functions
-                timestamp = parse_telegram_date(msg.get('date', ''))
-                content = extract_text_content(msg)
-                content_type = detect_content_type(msg)
-                from_name = msg.get('from', 'Unknown')
-                from_id = msg.get('from_id', '')
-
-            # Auto-parse Google Docs links in text messages
-            if auto_process and content_type == 'text' and content:
-                # Check for Google Docs links in the message
-                google_docs_urls = re.findall(
-                    r'https?://docs\.google\.com/document/d/[a-zA-Z0-9_-]+[^\s]*',
-                    content
-                )
-                if google_docs_urls:
-                    for gdoc_url in google_docs_urls[:3]:  # Limit to 3 links per message
-                        try:
-                            logger.info(f"Auto-parsing Google Doc: {gdoc_url}")
-                            result = await google_docs_service.parse_from_url(gdoc_url)
-                            if result.content and result.status in ('parsed', 'partial'):
-                                # Append parsed content to message
-                                content += f"\n\n--- Содержимое документа ---\n{result.content[:5000]}"
-                                if not document_metadata:
-                                    document_metadata = {}
-                                document_metadata['google_doc_url'] = gdoc_url
-                                document_metadata['google_doc_parsed'] = True
-                                parse_status = result.status
-                                logger.info(f"Google Doc parsed: {result.content[:100]}...")
-                            else:
-                                logger.warning(f"Google Doc parse failed: {result.error}")
-                        except Exception as e:
-                            logger.error(f"Google Doc auto-parse error: {e}")
-
-            # Check for duplicates by content hash (when no message_id)
-            # For media messages, use media_file for stable hash
-            media_file_for_hash = msg.get('media_file') if is_html_source else None
-            content_hash = get_content_hash(content, timestamp, media_file_for_hash)
-            if content_hash in existing_hashes:
-                skipped_count += 1
-                continue
-
-            # Parse telegram user ID from string like "user123456"
-            # For HTML imports without user IDs, generate consistent ID from name
-            telegram_user_id = 0
-            if isinstance(from_id, str) and from_id.startswith('user'):
-                try:
-                    telegram_user_id = int(from_id[4:])
-                except ValueError:
-                    pass
-            elif isinstance(from_id, int):
-                telegram_user_id = from_id
-
-            # If no user ID, generate one from the sender name (for HTML imports)
-            if telegram_user_id == 0 and from_name:
-                # Normalize name for consistent hashing (lowercase, strip spaces, remove extra whitespace)
-                normalized_name = ' '.join(from_name.lower().split())
-                # Generate consistent ID from name hash (negative to avoid collision with real IDs)
-                name_hash = hashlib.md5(normalized_name.encode()).hexdigest()[:8]
-                telegram_user_id = -abs(int(name_hash, 16) % 1000000000)
-
-            # Split name into first/last name
-            name_parts = from_name.split(' ', 1) if from_name else ['Unknown']
-            first_name = (name_parts[0] if name_parts else 'Unknown')[:255]  # Truncate to 255
-            last_name = (name_parts[1] if len(name_parts) > 1 else None)
-            if last_name:
-                last_name = last_name[:255]  # Truncate to 255
-
-            # Get file_name from msg or extract from media_file path
-            file_name = msg.get('file_name')
-            if not file_name and file_path:
-                # Extract filename from path like "uploads/3/123_document.pdf"
-                file_name = os.path.basename(file_path)
-                # Remove message ID prefix if present (e.g., "123_document.pdf" -> "document.pdf")
-                if '_' in file_name and file_name.split('_')[0].isdigit():
-                    file_name = '_'.join(file_name.split('_')[1:])
-            if file_name:
-                file_name = file_name[:255]
-
-            # Create message
-            new_message = Message(
-                chat_id=chat_id,
-                telegram_message_id=telegram_msg_id,
-                telegram_user_id=telegram_user_id,
-                username=None,  # Not available in export
-                first_name=first_name,
-                last_name=last_name,
-                content=content,
-                content_type=content_type[:50] if content_type else 'text',  # Truncate to 50
-                file_id=None,  # Telegram Bot API file_id (not available in export)
-                file_path=file_path,  # Local file path for imported media
-                file_name=file_name,
-                document_metadata=document_metadata,
-                parse_status=parse_status,
-                parse_error=parse_error,
-                is_imported=True,  # Mark as imported from file
-                timestamp=timestamp,
+        try:
+            job = await attach_import_source(
+                db, job, source_sha256=source_sha256, source_size=source_size, total=total,
             )
+        except ImportInProgressError as e:
+            raise HTTPException(status_code=409, detail=str(e))
 
-            db.add(new_message)
-            existing_msg_ids.add(telegram_msg_id)
-            existing_hashes.add(content_hash)
-            imported_count += 1
-
-        except Exception as e:
-            logger.error(f"Error importing message {msg.get('id', '?')}: {e}")
-            errors.append(f"Message {msg.get('id', '?')}: {str(e)}")
-            continue
-
-    # Close ZIP file if open
-    if zip_file:
+        importer = TelegramHistoryImporter(db=db, chat=chat, job=job, export=export, auto_process=auto_process)
         try:
-            zip_file.close()
-        except (OSError, RuntimeError):
-            pass  # Ignore errors when closing ZIP file
-
-    # Update chat's last_activity if we imported newer messages
-    if imported_count > 0:
-        await db.commit()
-        logger.info(f"Imported {imported_count} messages, skipped {skipped_count}")
-
-        # Get the latest message timestamp
-        latest_result = await db.execute(
-            select(func.max(Message.timestamp)).where(Message.chat_id == chat_id)
-        )
-        latest_timestamp = latest_result.scalar()
-        if latest_timestamp and (not chat.last_activity or latest_timestamp > chat.last_activity):
-            chat.last_activity = latest_timestamp
-            await db.commit()
-
-    # Update final progress
-    if import_id:
-        with _import_progress_lock:
-            import_progress[import_id] = {
-                "status": "completed",
-                "phase": "done",
-                "current": len(messages_data),
-                "total": len(messages_data),
-                "imported": imported_count,
-                "skipped": skipped_count,
-                "current_file": None
-            }
-        # Schedule cleanup after 60 seconds (thread-safe pop)
-        def _cleanup_progress():
-            with _import_progress_lock:
-                import_progress.pop(import_id, None)
-        asyncio.get_event_loop().call_later(60, _cleanup_progress)
-
+            await importer.run()
+        except Exception as e:
+            logger.error(f"Import {job.import_id} failed at message {job.processed}: {e}", exc_info=True)
+            await db.rollback()
+            await fail_import_job(db, chat_id, job.import_id, str(e))
+            raise HTTPException(
+                status_code=500,
+                detail="Импорт прерван. Повторная загрузка того же файла продолжит с места остановки",
+            )
+    finally:
+        if export is not None:
+            export.close()
+        if spool_path is not None:
+            spool_path.unlink(missing_ok=True)
+
+    logger.info(f"Imported {job.imported} messages, skipped {job.skipped}")
+    errors = importer.errors
     return {
         "success": True,
-        "imported": imported_count,
-        "skipped": skipped_count,
+        "imported": job.imported,
+        "skipped": job.skipped,
         "errors": errors[:10] if errors else [],  # Return first 10 errors
-        "total_errors": len(errors),
-        "import_id": import_id,
+        "total_errors": job.errors_count,
+        "import_id": job.import_id,
+        "resumed_from": job.resumed_from,
     }
 
 
@@ -1611,15 +813,15 @@ async def import_telegram_history(
 async def get_import_progress(
     chat_id: int,
     import_id: str,
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    """Get import progress by import_id."""
-    with _import_progress_lock:
-        progress = import_progress.get(import_id)
-        if not progress:
-            return {"status": "not_found"}
-        # Return a copy to avoid race conditions
-        return dict(progress)
+    """Get import progress by import_id (shared across workers)."""
+    user = await db.merge(user)
+    await _get_import_chat(chat_id, user, db)
+    job = await get_import_job(db, chat_id, import_id)
+    return job_progress(job)
+
 
 
 @router.post("/{chat_id}/repair-video-notes")
@@ -1657,74 +859,76 @@ async def repair_video_notes(
     if not await permissions.can_access_resource(user, chat, "read"):
         raise HTTPException(status_code=403, detail="Access denied")
 
-    # Read the ZIP file
-    content = await file.read()
-
+    # Spool the ZIP to disk — members are read lazily, one at a time
+    spool_path, _, _ = await spool_upload(file)
     try:
-        zip_file = zipfile.ZipFile(io.BytesIO(content))
+        zip_file = zipfile.ZipFile(spool_path)
     except zipfile.BadZipFile:
+        spool_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
 
-    # Find all video_note messages
-    result = await db.execute(
-        select(Message).where(
-            Message.chat_id == chat_id,
-            Message.content_type == 'video_note',
-            Message.file_path.isnot(None)
+    try:
+        # Find all video_note messages
+        result = await db.execute(
+            select(Message).where(
+                Message.chat_id == chat_id,
+                Message.content_type == 'video_note',
+                Message.file_path.isnot(None)
+            )
         )
-    )
-    video_notes = result.scalars().all()
-
-    if not video_notes:
-        return {"repaired": 0, "message": "No video_note messages found"}
-
-    # List all .mp4 files in ZIP (not thumbs)
-    mp4_files = [z for z in zip_file.namelist()
-                 if z.endswith('.mp4') and '_thumb' not in z and 'round_video' in z.lower()]
-
-    logger.info(f"Found {len(video_notes)} video_notes and {len(mp4_files)} mp4 files in ZIP")
-    logger.info(f"MP4 files: {mp4_files}")
-
-    repaired = 0
-    chat_uploads_dir = UPLOADS_DIR / str(chat_id)
-    chat_uploads_dir.mkdir(parents=True, exist_ok=True)
-
-    for msg in video_notes:
-        # Extract filename from current file_path
-        if not msg.file_path:
-            continue
-
-        current_filename = os.path.basename(msg.file_path)
-        # Remove message ID prefix if present
-        base_filename = current_filename
-        if '_' in current_filename:
-            parts = current_filename.split('_', 1)
-            if parts[0].isdigit():
-                base_filename = parts[1]
-
-        # Remove _thumb.jpg if present in base filename
-        if '_thumb.jpg' in base_filename:
-            base_filename = base_filename.replace('_thumb.jpg', '')
-
-        logger.info(f"Looking for video matching: {base_filename}")
-
-        # Find matching file in ZIP
-        for zip_path in mp4_files:
-            zip_filename = os.path.basename(zip_path)
-            if zip_filename == base_filename or base_filename in zip_filename:
-                # Found it! Extract and replace
-                file_data = zip_file.read(zip_path)
-
-                # Keep the same filename in uploads
-                dest_path = chat_uploads_dir / current_filename
-                dest_path.write_bytes(file_data)
-
-                logger.info(f"Repaired: {zip_path} -> {dest_path}")
-                repaired += 1
-                break
-
-    zip_file.close()
-    return {"repaired": repaired, "total": len(video_notes)}
+        video_notes = result.scalars().all()
+
+        if not video_notes:
+            return {"repaired": 0, "message": "No video_note messages found"}
+
+        # List all .mp4 files in ZIP (not thumbs)
+        mp4_files = [z for z in zip_file.namelist()
+                     if z.endswith('.mp4') and '_thumb' not in z and 'round_video' in z.lower()]
+
+        logger.info(f"Found {len(video_notes)} video_notes and {len(mp4_files)} mp4 files in ZIP")
+        logger.info(f"MP4 files: {mp4_files}")
+
+        repaired = 0
+        chat_uploads_dir = UPLOADS_DIR / str(chat_id)
+        chat_uploads_dir.mkdir(parents=True, exist_ok=True)
+
+        for msg in video_notes:
+            # Extract filename from current file_path
+            if not msg.file_path:
+                continue
+
+            current_filename = os.path.basename(msg.file_path)
+            # Remove message ID prefix if present
+            base_filename = current_filename
+            if '_' in current_filename:
+                parts = current_filename.split('_', 1)
+                if parts[0].isdigit():
+                    base_filename = parts[1]
+
+            # Remove _thumb.jpg if present in base filename
+            if '_thumb.jpg' in base_filename:
+                base_filename = base_filename.replace('_thumb.jpg', '')
+
+            logger.info(f"Looking for video matching: {base_filename}")
+
+            # Find matching file in ZIP
+            for zip_path in mp4_files:
+                zip_filename = os.path.basename(zip_path)
+                if zip_filename == base_filename or base_filename in zip_filename:
+                    # Found it! Extract and replace
+                    # Keep the same filename in uploads
+                    dest_path = chat_uploads_dir / current_filename
+                    with zip_file.open(zip_path) as src, open(dest_path, 'wb') as out:
+                        shutil.copyfileobj(src, out)
+
+                    logger.info(f"Repaired: {zip_path} -> {dest_path}")
+                    repaired += 1
+                    break
+
+        return {"repaired": repaired, "total": len(video_notes)}
+    finally:
+        zip_file.close()
+        spool_path.unlink(missing_ok=True)
 
 
 @router.delete("/{chat_id}/import/cleanup")
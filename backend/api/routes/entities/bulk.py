@@ -23,6 +23,7 @@ from .common import (
     limiter, _get_rate_limit_key
 )
 from .files import ENTITY_FILES_DIR, MAX_FILE_SIZE
+from ...services import entity_extras
 
 router = APIRouter()
 
@@ -327,6 +328,7 @@ async def create_entity_from_resume(
 
         await db.commit()
         await db.refresh(entity)
+        await entity_extras.attach(db, [entity])
 
         # Build response
         entity_response = {
@@ -3,12 +3,12 @@ CRUD operations for entities (create, read, update, delete).
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy import select, func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 import asyncio
-import logging
 
 from .common import (
     logger, get_db, Entity, EntityType, EntityStatus, EntityTransfer,
@@ -22,7 +22,10 @@ from .common import (
     normalize_and_validate_identifiers, check_entity_access,
     regenerate_entity_profile_background
 )
+from ...models.database import EntityNote, EntityTimelineReaction
+from ...services import entity_extras
 from ...services.shadow_filter import get_isolated_creator_ids
+from ...services.metrics import query_label
 
 router = APIRouter()
 
@@ -194,7 +197,8 @@ async def list_entities(
     query = query.order_by(Entity.updated_at.desc())
     query = query.offset(offset).limit(limit)
 
-    result = await db.execute(query)
+    with query_label("entities.list"):
+        result = await db.execute(query)
     entities = result.scalars().all()
 
     # DEBUG: Log query results
@@ -365,6 +369,9 @@ async def list_entities(
         logger.warning(f"Failed to fetch vacancy data: {e}")
         # Continue without vacancy data
 
+    # Заметки/реакции/HR-метки — из своих таблиц, тремя запросами на страницу
+    await entity_extras.attach(db, entities)
+
     # Build response using pre-fetched data
     response = []
     for entity in entities:
@@ -497,6 +504,8 @@ async def create_entity(
         except Exception as e:
             logger.warning(f"resume-text-twin detect failed for new entity {entity.id}: {e}")
 
+    await entity_extras.attach(db, [entity])
+
     response_data = {
         "id": entity.id,
         "type": entity.type,
@@ -557,18 +566,9 @@ async def get_entity(
     if not has_access:
         raise HTTPException(404, "Entity not found")
 
-    # Ленивый self-heal авто-меток HR: при открытии карточки пересчитываем
-    # закреплённых рекрутеров. Ловит заявки, созданные путями без явного вызова
-    # синка (формы, CSV-импорт, рекоммендер, magic-button). Diff-guard внутри:
-    # пишет (и коммитит) ТОЛЬКО при реальном изменении — обычный GET остаётся
-    # read-only. После коммита entity перечитается с уже свежим extra_data.
-    try:
-        from ...services.hr_tags import sync_for_entity
-        await sync_for_entity(db, entity_id)
-    except Exception:
-        logging.getLogger("hr-analyzer.entities").warning(
-            "HR-tags self-heal failed for entity %s", entity_id, exc_info=True
-        )
+    # HR-метки ведут события заявок/воронок (services/hr_tags.py) — карточка
+    # на чтении ничего не пересчитывает и не пишет.
+    await entity_extras.attach(db, [entity])
 
     # Load related data WITH ACCESS CONTROL
     # Full access users (superadmin, owner, or member with has_full_access) see all
@@ -950,6 +950,8 @@ async def update_entity(
         dept_result = await db.execute(select(Department.name).where(Department.id == entity.department_id))
         department_name = dept_result.scalar()
 
+    await entity_extras.attach(db, [entity])
+
     response_data = {
         "id": entity.id,
         "type": entity.type,
@@ -1060,15 +1062,10 @@ async def add_entity_note(
     if not org and current_user.role != UserRole.superadmin:
         raise HTTPException(403, "No organization access")
 
-    # FOR UPDATE: заметки живут в общем блобе extra_data, который перезаписывается
-    # ЦЕЛИКОМ и здесь, и в hr_tags.sync_for_entity (self-heal при открытии карточки).
-    # Без блокировки строки два таких писателя, прочитавших один снимок, при коммите
-    # затирают заметки друг друга (lost update) — ровно «пропали НЕКОТОРЫЕ
-    # комментарии» у Марии при переводе кандидата в отдел, когда self-heal HR-тегов
-    # реально пишет устаревший snapshot. Лок сериализует писателей.
-    result = await db.execute(
-        select(Entity).where(Entity.id == entity_id).with_for_update()
-    )
+    # Без FOR UPDATE: заметка — отдельная строка entity_notes, общий блоб
+    # extra_data больше не перезаписывается, так что параллельные комментарии,
+    # смена этапа и пересчёт HR-меток друг друга не затирают и не ждут.
+    result = await db.execute(select(Entity).where(Entity.id == entity_id))
     entity = result.scalar_one_or_none()
     if not entity:
         raise HTTPException(404, "Entity not found")
@@ -1080,8 +1077,6 @@ async def add_entity_note(
     if len(text_clean) > NOTE_TEXT_MAX_LENGTH:
         raise HTTPException(400, f"Comment too long (max {NOTE_TEXT_MAX_LENGTH})")
 
-    extra = dict(entity.extra_data or {})
-    notes = list(extra.get("notes") or [])
     note = {
         "id": str(uuid.uuid4()),
         "text": text_clean,
@@ -1091,14 +1086,15 @@ async def add_entity_note(
         "author_id": current_user.id,
         "author_name": current_user.name,
     }
-    notes.append(note)
-    extra["notes"] = notes
-    entity.extra_data = extra
+    db.add(EntityNote(**entity_extras.note_values(entity.id, note)))
     # Сначала ГАРАНТИРОВАННО коммитим сам комментарий — его сохранность не должна
     # зависеть от уведомлений об @-упоминаниях (иначе при сбое/медленном notify
     # коммент «появлялся только после F5»).
     await db.commit()
-    await db.refresh(entity)
+    total_notes = (await db.execute(
+        select(func.count(EntityNote.id))
+        .where(EntityNote.entity_id == entity_id, EntityNote.deleted_at.is_(None))
+    )).scalar() or 0
 
     # @-упоминания — ОТДЕЛЬНОЙ транзакцией: достаём data-uid из HTML и шлём
     # упомянутым уведомление «как у анкет». Падение здесь уже не трогает коммент.
@@ -1111,7 +1107,7 @@ async def add_entity_note(
     except Exception:
         await db.rollback()
 
-    return {"success": True, "note": note, "total_notes": len(notes)}
+    return {"success": True, "note": note, "total_notes": total_notes}
 
 
 class TimelineReactionRequest(BaseModel):
@@ -1129,8 +1125,9 @@ async def toggle_timeline_reaction(
     """Тоггл эмодзи-реакции на запись таймлайна (лог карточки).
 
     entry_key — стабильный ключ записи (id заметки / history-id события / 'created').
-    Реакции хранятся в extra_data.timeline_reactions[entry_key] = [{emoji, user_id,
-    user_name, date}]. Повторный клик тем же эмодзи снимает реакцию (toggle).
+    Реакции — строки entity_timeline_reactions; в карточке отдаются как
+    extra_data.timeline_reactions[entry_key] = [{emoji, user_id, user_name, date}].
+    Повторный клик тем же эмодзи снимает реакцию (toggle).
     Доступно любому в той же организации (как и заметки).
     """
     from datetime import timezone as _tz
@@ -1151,49 +1148,62 @@ async def toggle_timeline_reaction(
         raise HTTPException(400, "entry_key and emoji are required")
     if len(emoji) > 16:
         raise HTTPException(400, "emoji too long")
+    if len(key) > 255:
+        raise HTTPException(400, "entry_key too long")
 
-    extra = dict(entity.extra_data or {})
-    reactions = dict(extra.get("timeline_reactions") or {})
-    entry = list(reactions.get(key) or [])
     # toggle: снять, если я уже ставил ЭТОТ эмодзи; иначе добавить
-    idx = next(
-        (
-            i for i, r in enumerate(entry)
-            if isinstance(r, dict)
-            and r.get("user_id") == current_user.id
-            and r.get("emoji") == emoji
-        ),
-        -1,
-    )
-    if idx >= 0:
-        entry.pop(idx)
-    else:
-        entry.append({
-            "emoji": emoji,
-            "user_id": current_user.id,
-            "user_name": current_user.name,
-            "date": datetime.now(_tz.utc).isoformat(),
-        })
-    if entry:
-        reactions[key] = entry
+    mine = (await db.execute(
+        select(EntityTimelineReaction).where(
+            EntityTimelineReaction.entity_id == entity_id,
+            EntityTimelineReaction.entry_key == key,
+            EntityTimelineReaction.user_id == current_user.id,
+            EntityTimelineReaction.emoji == emoji,
+        )
+    )).scalar_one_or_none()
+    if mine is not None:
+        await db.delete(mine)
     else:
-        reactions.pop(key, None)
-    extra["timeline_reactions"] = reactions
-    entity.extra_data = extra
-    await db.commit()
+        db.add(EntityTimelineReaction(
+            entity_id=entity_id,
+            entry_key=key,
+            emoji=emoji,
+            user_id=current_user.id,
+            user_name=current_user.name,
+            date=datetime.now(_tz.utc).isoformat(),
+        ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # двойной клик: параллельный запрос уже поставил ту же реакцию
+        await db.rollback()
+
+    rows = (await db.execute(
+        select(EntityTimelineReaction)
+        .where(EntityTimelineReaction.entity_id == entity_id, EntityTimelineReaction.entry_key == key)
+        .order_by(EntityTimelineReaction.id)
+    )).scalars().all()
+    entry = [entity_extras.render_reaction(r) for r in rows]
     return {"success": True, "entry_key": key, "reactions": entry}
 
 
-def _find_note_index(notes: list, note_id: str) -> int:
+async def _find_note(db: AsyncSession, entity_id: int, note_id: str) -> Optional[EntityNote]:
     """Ищем по id; для legacy-комментов без id допускаем поиск по date."""
-    for i, n in enumerate(notes):
-        if isinstance(n, dict):
-            if n.get("id") == note_id:
-                return i
-            # legacy fallback: id-формат "date:<iso>" (фронт может прислать)
-            if note_id.startswith("date:") and n.get("date") == note_id[5:]:
-                return i
-    return -1
+    rows = (await db.execute(
+        select(EntityNote).where(
+            EntityNote.entity_id == entity_id,
+            EntityNote.deleted_at.is_(None),
+            EntityNote.payload.isnot(None),
+        ).order_by(EntityNote.id)
+    )).scalars().all()
+    for row in rows:
+        if row.uid == note_id:
+            return row
+    # legacy fallback: id-формат "date:<iso>" (фронт может прислать)
+    if note_id.startswith("date:"):
+        for row in rows:
+            if (row.payload or {}).get("date") == note_id[5:]:
+                return row
+    return None
 
 
 @router.patch("/{entity_id}/notes/{note_id}")
@@ -1221,24 +1231,17 @@ async def update_entity_note(
     if len(text_clean) > NOTE_TEXT_MAX_LENGTH:
         raise HTTPException(400, f"Comment too long (max {NOTE_TEXT_MAX_LENGTH})")
 
-    extra = dict(entity.extra_data or {})
-    notes = list(extra.get("notes") or [])
-    idx = _find_note_index(notes, note_id)
-    if idx < 0:
+    row = await _find_note(db, entity_id, note_id)
+    if row is None:
         raise HTTPException(404, "Comment not found")
 
-    note = dict(notes[idx])
-    if not await _note_can_modify(note, current_user, org, db):
+    if not await _note_can_modify(entity_extras.render_note(row), current_user, org, db):
         raise HTTPException(403, "You can only edit your own comments")
 
-    note["text"] = text_clean
-    note["edited_at"] = datetime.now(_tz.utc).isoformat()
-    notes[idx] = note
-    extra["notes"] = notes
-    entity.extra_data = extra
+    row.text = text_clean
+    row.payload = {**row.payload, "edited_at": datetime.now(_tz.utc).isoformat()}
     await db.commit()
-    await db.refresh(entity)
-    return {"success": True, "note": note}
+    return {"success": True, "note": entity_extras.render_note(row)}
 
 
 @router.delete("/{entity_id}/notes/{note_id}")
@@ -1258,20 +1261,22 @@ async def delete_entity_note(
         raise HTTPException(404, "Entity not found")
     _note_org_check(entity, current_user, org)
 
-    extra = dict(entity.extra_data or {})
-    notes = list(extra.get("notes") or [])
-    idx = _find_note_index(notes, note_id)
-    if idx < 0:
+    row = await _find_note(db, entity_id, note_id)
+    if row is None:
         raise HTTPException(404, "Comment not found")
 
-    if not await _note_can_modify(notes[idx], current_user, org, db):
+    if not await _note_can_modify(entity_extras.render_note(row), current_user, org, db):
         raise HTTPException(403, "You can only delete your own comments")
 
-    notes.pop(idx)
-    extra["notes"] = notes
-    entity.extra_data = extra
+    # мягкое удаление: uid остаётся занят, и старый блоб с этой заметкой
+    # (write-through из extra_data) её не воскресит
+    row.deleted_at = datetime.utcnow()
     await db.commit()
-    return {"success": True, "total_notes": len(notes)}
+    total_notes = (await db.execute(
+        select(func.count(EntityNote.id))
+        .where(EntityNote.entity_id == entity_id, EntityNote.deleted_at.is_(None))
+    )).scalar() or 0
+    return {"success": True, "total_notes": total_notes}
 
 
 @router.patch("/{entity_id}/status")
@@ -14,11 +14,11 @@ from pydantic import BaseModel
 from .common import (
     logger, get_db, Entity, EntityType, EntityStatus, Chat, CallRecording,
     User, UserRole, Department, Vacancy, VacancyApplication, VacancyStatus,
-    ApplicationStage, STAGE_SYNC_MAP, OrgRole, AccessLevel, Message,
+    ApplicationStage, STAGE_SYNC_MAP, OrgRole, AccessLevel,
     get_current_user, get_user_org, get_user_org_role, check_entity_access,
-    red_flags_service
 )
 from ...models.database import StageTransition
+from ...services import red_flag_cache
 
 router = APIRouter()
 
@@ -176,6 +176,7 @@ async def smart_search(
 async def get_entity_red_flags(
     entity_id: int,
     vacancy_id: Optional[int] = Query(None, description="Optional vacancy ID to compare against"),
+    refresh: bool = Query(False, description="Recompute now, including the AI pass over communications"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -184,6 +185,9 @@ async def get_entity_red_flags(
 
     Analyzes the candidate's profile and communications for potential red flags.
     Returns a list of detected red flags with severity levels and recommendations.
+    The result is stored per (entity, vacancy): unchanged inputs are served from
+    storage, changed ones return the previous result with stale=true while a
+    background refresh runs.
     """
     current_user = await db.merge(current_user)
     org = await get_user_org(current_user, db)
@@ -212,40 +216,9 @@ async def get_entity_red_flags(
         )
         vacancy = vacancy_result.scalar_one_or_none()
 
-    # Fetch linked chats with messages for AI analysis
-    chats_result = await db.execute(
-        select(Chat).where(Chat.entity_id == entity_id)
-    )
-    chats = list(chats_result.scalars().all())
-
-    # Load messages for each chat (limit to avoid memory issues)
-    for chat in chats:
-        messages_result = await db.execute(
-            select(Message)
-            .where(Message.chat_id == chat.id)
-            .order_by(Message.timestamp.desc())
-            .limit(100)
-        )
-        chat.messages = list(messages_result.scalars().all())
-
-    # Fetch linked calls with transcripts
-    calls_result = await db.execute(
-        select(CallRecording)
-        .where(CallRecording.entity_id == entity_id)
-        .order_by(CallRecording.created_at.desc())
-        .limit(5)
-    )
-    calls = list(calls_result.scalars().all())
-
-    # Run red flags analysis
+    # Stored analysis; recomputed in the background when its inputs changed
     try:
-        analysis = await red_flags_service.detect_red_flags(
-            entity=entity,
-            vacancy=vacancy,
-            chats=chats,
-            calls=calls
-        )
-        return analysis.to_dict()
+        return await red_flag_cache.get_analysis(db, entity, vacancy, refresh=refresh)
     except Exception as e:
         logger.error(f"Red flags analysis failed for entity {entity_id}: {e}")
         raise HTTPException(500, f"Failed to analyze red flags: {str(e)}")
@@ -260,7 +233,8 @@ async def get_entity_risk_score(
     """
     Get quick risk score for a candidate (0-100).
 
-    This is a fast synchronous calculation based on available profile data.
+    Served from the stored full analysis when there is one (source=analysis);
+    otherwise a fast rule-based calculation (source=quick).
     For full analysis with AI, use the /red-flags endpoint.
     """
     current_user = await db.merge(current_user)
@@ -280,11 +254,12 @@ async def get_entity_risk_score(
     if not has_access:
         raise HTTPException(404, "Entity not found")
 
-    risk_score = red_flags_service.get_risk_score(entity)
+    score = await red_flag_cache.get_risk_score(db, entity)
+    risk_score = score["risk_score"]
 
     return {
         "entity_id": entity_id,
-        "risk_score": risk_score,
+        **score,
         "risk_level": "high" if risk_score >= 60 else "medium" if risk_score >= 30 else "low"
     }
 
@@ -637,15 +612,6 @@ async def apply_entity_to_vacancy(
     await db.commit()
     await db.refresh(application)
 
-    # Авто-метка HR: пересчитываем закреплённых рекрутеров СРАЗУ после move —
-    # старая воронка ушла, новая появилась. Раньше sync тут не звался, поэтому
-    # метки «HR: … · воронка» появлялись/уходили с задержкой (по self-heal).
-    try:
-        from ...services.hr_tags import sync_for_entity
-        await sync_for_entity(db, entity_id)
-    except Exception:
-        logger.exception("HR-tags sync failed after apply/move (non-critical)")
-
     logger.info(f"Entity {entity_id} moved to vacancy {data.vacancy_id} by user {current_user.id}")
 
     return {
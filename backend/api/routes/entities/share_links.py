@@ -19,6 +19,7 @@ from api.models.database import (
     EntityType, User, Vacancy, VacancyApplication,
 )
 from api.services.auth import get_current_user, get_user_org
+from api.services import entity_extras
 from .common import check_entity_access
 
 router = APIRouter()
@@ -160,6 +161,7 @@ async def public_candidate_preview(
     if not entity:
         raise HTTPException(404, "Ссылка недействительна")
 
+    await entity_extras.attach(db, [entity])
     ed = dict(entity.extra_data or {})
 
     # Текущий этап: свежая заявка кандидата + её вакансия (лейбл через кастомные
@@ -14,8 +14,9 @@ from pathlib import Path
 
 from anthropic import AsyncAnthropic
 import asyncio
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, File, Form, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, File, Form, UploadFile
 from sqlalchemy import select, func, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
@@ -29,6 +30,7 @@ from ..models.database import (
     User, UserRole, Organization, OrgMember
 )
 from ..services.auth import get_current_user, get_user_org
+from ..services import form_intake
 
 # File upload settings for public forms
 ENTITY_FILES_DIR = Path(__file__).parent.parent.parent / "uploads" / "entity_files"
@@ -40,7 +42,6 @@ PUBLIC_MAX_VIDEO_SIZE = 100 * 1024 * 1024  # 100MB для видео (MP4/MOV/AV
 PUBLIC_MAX_FILES = 5  # Max files per public form submission
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi"}
 ALLOWED_EXTENSIONS = {".pdf", ".doc", ".docx", ".jpg", ".jpeg", ".png", ".webp"} | VIDEO_EXTENSIONS
-PDF_RENDER_DPI = 200
 
 logger = logging.getLogger("hr-analyzer.forms")
 
@@ -1247,16 +1248,16 @@ async def submit_public_form(
     return {"message": "Спасибо! Ваша анкета успешно отправлена.", "entity_id": entity.id}
 
 
-async def _save_public_form_files(db: AsyncSession, form, entity_id: int, files) -> tuple[int, list[dict]]:
+async def _save_public_form_files(db: AsyncSession, form, entity_id: int, files) -> tuple[list[EntityFile], list[dict]]:
     """Сохранить файлы публичной формы к кандидату entity_id (org_id — из формы).
-    PDF-резюме конвертирует в картинки для превью.
+    Превью страниц PDF-резюме рендерит фоновый конвейер (services/form_intake.py).
 
-    Возвращает (число сохранённых, список пропущенных [{name, reason}]). Пропущенные
+    Возвращает (сохранённые EntityFile, список пропущенных [{name, reason}]). Пропущенные
     файлы (неподдерживаемый формат / слишком большой / сверх лимита) больше НЕ
     теряются молча — кандидат видит предупреждение и может переотправить."""
     skipped: list[dict] = []
     if not files:
-        return 0, skipped
+        return [], skipped
     entity_files_dir = ENTITY_FILES_DIR / str(entity_id)
     entity_files_dir.mkdir(parents=True, exist_ok=True)
 
@@ -1306,43 +1307,10 @@ async def _save_public_form_files(db: AsyncSession, form, entity_id: int, files)
             uploaded_by=form.created_by,
         )
         db.add(entity_file)
-        # original_name несём с собой, чтобы имя страниц PDF бралось от своего файла.
-        saved_files.append((entity_file, file_path, content_type, original_name))
+        saved_files.append(entity_file)
 
     await db.flush()
-
-    # Convert PDF resumes to images for inline preview
-    for entity_file, fpath, ctype, orig_name in saved_files:
-        if ctype == "application/pdf" and entity_file.file_type == EntityFileType.resume:
-            try:
-                import fitz
-                doc = fitz.open(str(fpath))
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    mat = fitz.Matrix(PDF_RENDER_DPI / 72, PDF_RENDER_DPI / 72)
-                    pix = page.get_pixmap(matrix=mat)
-                    img_name = f"{uuid.uuid4().hex}.jpg"
-                    img_path = entity_files_dir / img_name
-                    pix.save(str(img_path))
-                    img_bytes = pix.tobytes("jpg")
-                    img_file = EntityFile(
-                        org_id=form.org_id,
-                        entity_id=entity_id,
-                        file_type=EntityFileType.resume,
-                        file_name=f"{Path(orig_name).stem}_page_{page_num + 1}.jpg",
-                        file_path=str(img_path),
-                        file_data=img_bytes,  # bytea — переживает редеплой
-                        file_size=len(img_bytes),
-                        mime_type="image/jpeg",
-                        description=f"Страница {page_num + 1} из {orig_name}",
-                        uploaded_by=form.created_by,
-                    )
-                    db.add(img_file)
-                doc.close()
-            except Exception:
-                logger.exception(f"PDF→image conversion failed for {fpath}")
-
-    return len(saved_files), skipped
+    return saved_files, skipped
 
 
 @router.post("/public/{slug}/submit-with-files")
@@ -1450,7 +1418,7 @@ async def submit_public_form_with_files(
     db.add(submission)
 
     # Save uploaded files (общий хелпер; org_id из формы)
-    files_saved_count, skipped_files = await _save_public_form_files(db, form, entity.id, files)
+    saved_files, skipped_files = await _save_public_form_files(db, form, entity.id, files)
 
     # Привязка воронок больше НЕ создаёт заявку по сабмиту (логику авто-добавления
     # убрали): vacancy_ids теперь только скоупят показ шаблона в воронке.
@@ -1466,7 +1434,7 @@ async def submit_public_form_with_files(
     return {
         "message": "Спасибо! Ваша анкета успешно отправлена.",
         "entity_id": entity.id,
-        "files_saved": files_saved_count,
+        "files_saved": len(saved_files),
         # Пропущенные файлы (формат/размер/лимит) — фронт покажет предупреждение,
         # чтобы кандидат не думал, что резюме доставлено, когда оно потерялось.
         "skipped_files": skipped_files,
@@ -1530,122 +1498,151 @@ async def get_public_form_by_token(token: str, db: AsyncSession = Depends(get_db
     }
 
 
-@router.post("/public/d/{token}/submit")
-async def submit_public_form_by_token(
-    token: str,
-    body: PublicSubmitSchema,
-    db: AsyncSession = Depends(get_db),
-):
-    """Публичная отправка персональной анкеты — привязка к существующему кандидату."""
+async def _dispatch_for_submit(token: str, idempotency_key: Optional[str], db: AsyncSession):
+    """(dispatch, form, replay): replay — уже принятая анкета с тем же Idempotency-Key."""
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 64:
+        raise HTTPException(status_code=422, detail="Idempotency-Key: от 1 до 64 символов")
     dispatch = (await db.execute(select(FormDispatch).where(FormDispatch.token == token))).scalar_one_or_none()
     if not dispatch:
         raise HTTPException(status_code=404, detail="Анкета не найдена")
     if dispatch.status == "submitted":
+        replay = await _replayed_submission(dispatch, idempotency_key, db)
+        if replay is not None:
+            return dispatch, None, replay
         raise HTTPException(status_code=409, detail="Анкета уже заполнена")
     form = (await db.execute(
         select(FormTemplate).where(FormTemplate.id == dispatch.form_id, FormTemplate.is_active == True)
     )).scalar_one_or_none()
     if not form:
         raise HTTPException(status_code=404, detail="Анкета недоступна")
+    return dispatch, form, None
+
 
+async def _replayed_submission(dispatch, idempotency_key: Optional[str], db: AsyncSession):
+    if not idempotency_key:
+        return None
+    return (await db.execute(
+        select(FormSubmission).where(
+            FormSubmission.dispatch_id == dispatch.id,
+            FormSubmission.idempotency_key == idempotency_key,
+        )
+    )).scalar_one_or_none()
+
+
+def _validate_required(form, form_data: dict) -> None:
     for field in (form.fields or []):
         if field.get("required") and field.get("type") != "file":
-            val = body.data.get(field["id"])
+            val = form_data.get(field["id"])
             if val is None or (isinstance(val, str) and not val.strip()):
                 raise HTTPException(status_code=422, detail=f"Поле '{field['label']}' обязательно для заполнения")
 
-    submission = FormSubmission(form_id=form.id, entity_id=dispatch.entity_id, data=body.data, dispatch_id=dispatch.id)
+
+def _accepted(token: str, submission: FormSubmission) -> dict:
+    state = submission.processing_state or {}
+    return {
+        "message": "Спасибо! Ваша анкета успешно отправлена.",
+        "entity_id": submission.entity_id,
+        "submission_id": submission.id,
+        "processing_status": submission.processing_status,
+        "status_url": f"/api/forms/public/d/{token}/status",
+        "files_saved": len(state.get("file_ids") or []),
+        "skipped_files": state.get("skipped_files") or [],
+    }
+
+
+async def _accept_submission(
+    token: str, dispatch, form, form_data: dict, idempotency_key: Optional[str],
+    db: AsyncSession, files=None,
+) -> dict:
+    """Быстрая надёжная вставка: ответы + файлы + статус рассылки одним commit.
+    Превью, уведомления и авто-промоут — в фоне (services/form_intake.py)."""
+    submission = FormSubmission(
+        form_id=form.id, entity_id=dispatch.entity_id, data=form_data, dispatch_id=dispatch.id,
+        idempotency_key=idempotency_key, processing_status=form_intake.PENDING,
+    )
     db.add(submission)
+    saved_files, skipped_files = await _save_public_form_files(db, form, dispatch.entity_id, files)
     await db.flush()
+    submission.processing_state = {
+        "file_ids": [f.id for f in saved_files],
+        "skipped_files": skipped_files,
+        "done": [],
+    }
 
     dispatch.status = "submitted"
     dispatch.submitted_at = datetime.utcnow()
     dispatch.submission_id = submission.id
     dispatch.seen_by_recruiter = False
-    await db.commit()
-
     try:
-        entity = (await db.execute(select(Entity).where(Entity.id == dispatch.entity_id))).scalar_one_or_none()
-        from ..services.hr_notifications import notify_form_submitted
-        await notify_form_submitted(db, dispatch, entity, form)
-        from .realtime import broadcast_form_submission
-        if dispatch.created_by:
-            await broadcast_form_submission(dispatch.created_by, {
-                "entity_id": dispatch.entity_id, "form_id": form.id, "dispatch_id": dispatch.id,
-                "form_title": form.title, "candidate_name": entity.name if entity else None,
-            })
-        else:
-            logger.warning("form.submission: dispatch %s has no created_by — no realtime sent", dispatch.id)
-    except Exception:
-        logger.error("form.submission notify/broadcast FAILED for dispatch %s", dispatch.id, exc_info=True)
+        await db.commit()
+    except IntegrityError:
+        # Параллельный дубль с тем же ключом успел раньше — отдаём его анкету
+        await db.rollback()
+        replay = await _replayed_submission(dispatch, idempotency_key, db)
+        if replay is None:
+            raise
+        return _accepted(token, replay)
+
+    form_intake.schedule(submission.id)
+    return _accepted(token, submission)
+
+
+@router.post("/public/d/{token}/submit", status_code=202)
+async def submit_public_form_by_token(
+    token: str,
+    body: PublicSubmitSchema,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Публичная отправка персональной анкеты — привязка к существующему кандидату.
 
-    return {"message": "Спасибо! Ваша анкета успешно отправлена.", "entity_id": dispatch.entity_id}
+    Отвечает 202 сразу после вставки; ход обработки — GET /public/d/{token}/status.
+    Повтор с тем же Idempotency-Key возвращает уже принятую анкету, а не 409."""
+    dispatch, form, replay = await _dispatch_for_submit(token, idempotency_key, db)
+    if replay is not None:
+        return _accepted(token, replay)
+    _validate_required(form, body.data)
+    return await _accept_submission(token, dispatch, form, body.data, idempotency_key, db)
 
 
-@router.post("/public/d/{token}/submit-with-files")
+@router.post("/public/d/{token}/submit-with-files", status_code=202)
 async def submit_public_form_by_token_with_files(
     token: str,
-    background_tasks: BackgroundTasks,
     data: str = Form(..., description="JSON string with form data {field_id: value}"),
     files: List[UploadFile] = File(default=[]),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
 ):
     """Персональная анкета С ФАЙЛАМИ: ответы и файлы привязываются к
-    существующему кандидату (dispatch.entity_id), без создания нового entity."""
+    существующему кандидату (dispatch.entity_id), без создания нового entity.
+
+    Файлы сохраняются в запросе (bytea); превью PDF-резюме и авто-промоут PDF
+    во вкладку «Резюме» делает фоновый конвейер."""
     try:
         form_data = json.loads(data)
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail="Невалидный JSON в поле data")
 
-    dispatch = (await db.execute(select(FormDispatch).where(FormDispatch.token == token))).scalar_one_or_none()
-    if not dispatch:
+    dispatch, form, replay = await _dispatch_for_submit(token, idempotency_key, db)
+    if replay is not None:
+        return _accepted(token, replay)
+    _validate_required(form, form_data)
+    return await _accept_submission(token, dispatch, form, form_data, idempotency_key, db, files=files)
+
+
+@router.get("/public/d/{token}/status")
+async def public_form_submission_status(token: str, db: AsyncSession = Depends(get_db)):
+    """Статус обработки отправленной анкеты — страница анкеты поллит после 202."""
+    row = (await db.execute(
+        select(FormDispatch.status, FormSubmission.id, FormSubmission.processing_status)
+        .outerjoin(FormSubmission, FormSubmission.id == FormDispatch.submission_id)
+        .where(FormDispatch.token == token)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Анкета не найдена")
-    if dispatch.status == "submitted":
-        raise HTTPException(status_code=409, detail="Анкета уже заполнена")
-    form = (await db.execute(
-        select(FormTemplate).where(FormTemplate.id == dispatch.form_id, FormTemplate.is_active == True)
-    )).scalar_one_or_none()
-    if not form:
-        raise HTTPException(status_code=404, detail="Анкета недоступна")
-
-    for field in (form.fields or []):
-        if field.get("required") and field.get("type") != "file":
-            val = form_data.get(field["id"])
-            if val is None or (isinstance(val, str) and not val.strip()):
-                raise HTTPException(status_code=422, detail=f"Поле '{field['label']}' обязательно для заполнения")
-
-    submission = FormSubmission(form_id=form.id, entity_id=dispatch.entity_id, data=form_data, dispatch_id=dispatch.id)
-    db.add(submission)
-    await db.flush()
-
-    files_saved_count, skipped_files = await _save_public_form_files(db, form, dispatch.entity_id, files)
-
-    dispatch.status = "submitted"
-    dispatch.submitted_at = datetime.utcnow()
-    dispatch.submission_id = submission.id
-    dispatch.seen_by_recruiter = False
-    await db.commit()
-
-    try:
-        entity = (await db.execute(select(Entity).where(Entity.id == dispatch.entity_id))).scalar_one_or_none()
-        from ..services.hr_notifications import notify_form_submitted
-        await notify_form_submitted(db, dispatch, entity, form)
-        from .realtime import broadcast_form_submission
-        if dispatch.created_by:
-            await broadcast_form_submission(dispatch.created_by, {
-                "entity_id": dispatch.entity_id, "form_id": form.id, "dispatch_id": dispatch.id,
-                "form_title": form.title, "candidate_name": entity.name if entity else None,
-            })
-    except Exception:
-        logger.error("form.submission notify/broadcast FAILED for dispatch %s", dispatch.id, exc_info=True)
-
-    # PDF без резюме → фоновый авто-промоут во вкладку «Резюме» (с проверкой Claude).
-    from ..services.resume_autopromote import promote_pdf_to_resume_if_needed
-    background_tasks.add_task(promote_pdf_to_resume_if_needed, dispatch.entity_id, form.org_id)
-
+    dispatch_status, submission_id, processing_status = row
     return {
-        "message": "Спасибо! Ваша анкета успешно отправлена.",
-        "entity_id": dispatch.entity_id,
-        "files_saved": files_saved_count,
-        "skipped_files": skipped_files,
+        "submitted": dispatch_status == "submitted",
+        "submission_id": submission_id,
+        "processing_status": processing_status,
     }
@@ -18,6 +18,7 @@ from api.config import settings
 from api.utils.http_client import get_http_client
 from api.database import get_db
 from api.models.database import Entity, EntityType, EntityStatus, User, Organization, PrometheusReviewCache
+from api.services import entity_extras
 from api.services.auth import get_current_user, get_user_org
 from api.services.prometheus_status import (
     fetch_statuses_bulk,
@@ -1042,6 +1043,7 @@ async def sync_prometheus_statuses(
                 try:
                     await db.commit()
                     await db.refresh(entity)
+                    await entity_extras.attach(db, [entity])
                     # Broadcast status change via WebSocket
                     await broadcast_entity_updated(org.id, {
                         "id": entity.id,
@@ -1261,6 +1263,7 @@ async def sync_prometheus_status_single(
                 try:
                     await db.commit()
                     await db.refresh(entity)
+                    await entity_extras.attach(db, [entity])
                     # Broadcast status change via WebSocket
                     await broadcast_entity_updated(org.id, {
                         "id": entity.id,
@@ -1,9 +1,10 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Tuple
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, tuple_
 import httpx
 import aiofiles
 
@@ -12,7 +13,9 @@ from ..models.database import User, UserRole, Chat, Message
 from ..models.schemas import MessageResponse, ParticipantResponse
 from ..services.auth import get_current_user, get_current_user_optional, get_user_from_token, get_user_org
 from ..services.transcription import transcription_service
-from ..services.permissions import PermissionService
+from ..services.permissions import PermissionService, can_read_memoized
+from ..services.metrics import query_label
+from ..services.telegram_media import TelegramFileNotFound, telegram_media
 from ..config import settings
 
 # Uploads directory for imported media
@@ -21,36 +24,79 @@ UPLOADS_DIR = Path(__file__).parent.parent.parent / "uploads"
 router = APIRouter()
 
 
+def _encode_cursor(message: Message) -> str:
+    return f"{message.timestamp.isoformat()}_{message.id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Cursor is "<iso timestamp>_<message id>" of the boundary message."""
+    try:
+        ts, _, message_id = cursor.rpartition("_")
+        return datetime.fromisoformat(ts), int(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/{chat_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     chat_id: int,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     page: int = Query(1, ge=1),
     limit: int = Query(100, le=500),  # Reduced from 1000/2000 for better performance
     content_type: str = Query(None),
+    before: Optional[str] = Query(None, description="Cursor: messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor: messages newer than this one"),
 ):
+    """
+    Chat history, oldest first within the page.
+
+    Two paging modes:
+    - cursor (preferred): `before` / `after` take the cursor of a boundary
+      message ("<timestamp>_<id>", see X-Before-Cursor / X-After-Cursor
+      response headers). Seeks via ix_message_chat_timestamp_id, so deep
+      pages cost the same as the first one;
+    - `page` (legacy): OFFSET-based, kept for existing clients.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
     user = await db.merge(user)
-    org = await get_user_org(user, db)
-    org_id = org.id if org else None
 
     result = await db.execute(select(Chat).where(Chat.id == chat_id))
     chat = result.scalar_one_or_none()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
-    # Use PermissionService for access check
-    permission_service = PermissionService(db)
-    if not await permission_service.can_access_resource(user, chat):
+    if not await can_read_memoized(db, user, chat):
         raise HTTPException(status_code=403, detail="Access denied")
 
     query = select(Message).where(Message.chat_id == chat_id)
     if content_type and content_type != "all":
         query = query.where(Message.content_type == content_type)
 
-    query = query.order_by(Message.timestamp.desc()).offset((page - 1) * limit).limit(limit)
+    # (timestamp, id) — stable order even when messages share a timestamp
+    newest_first = (Message.timestamp.desc(), Message.id.desc())
+    if after:
+        query = query.where(tuple_(Message.timestamp, Message.id) > _decode_cursor(after))
+        query = query.order_by(Message.timestamp.asc(), Message.id.asc()).limit(limit)
+    elif before:
+        query = query.where(tuple_(Message.timestamp, Message.id) < _decode_cursor(before))
+        query = query.order_by(*newest_first).limit(limit)
+    else:
+        query = query.order_by(*newest_first).offset((page - 1) * limit).limit(limit)
+
+    with query_label("chats.messages"):
+        result = await db.execute(query)
+    messages = list(result.scalars().all())
+    if not after:
+        messages.reverse()
 
-    result = await db.execute(query)
-    messages = result.scalars().all()
+    # Messages without a timestamp can't be addressed by a cursor
+    dated = [m for m in messages if m.timestamp is not None]
+    if dated:
+        response.headers["X-Before-Cursor"] = _encode_cursor(dated[0])
+        response.headers["X-After-Cursor"] = _encode_cursor(dated[-1])
 
     return [
         MessageResponse(
@@ -68,7 +114,7 @@ async def get_messages(
             parse_status=m.parse_status,
             parse_error=m.parse_error,
             timestamp=m.timestamp,
-        ) for m in reversed(messages)
+        ) for m in messages
     ]
 
 
@@ -86,8 +132,7 @@ async def get_participants(
     chat = result.scalar_one_or_none()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
-    permission_service = PermissionService(db)
-    if not await permission_service.can_access_resource(user, chat):
+    if not await can_read_memoized(db, user, chat):
         raise HTTPException(status_code=403, detail="Access denied")
 
     # Group by telegram_user_id only, take max of other fields to avoid duplicates
@@ -120,12 +165,16 @@ async def get_participants(
 @router.get("/file/{file_id}")
 async def get_telegram_file(
     file_id: str,
+    request: Request,
     token: str = Query(None, description="Auth token for img/video tags"),
     user: User = Depends(get_current_user_optional),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Proxy Telegram file downloads.
+    Proxy Telegram file downloads through the local media cache.
+
+    Files are fetched from the Bot API once, kept on disk by file_unique_id
+    and streamed from there with Range/ETag support.
 
     Supports two auth methods:
     - Authorization header (for fetch requests)
@@ -141,51 +190,20 @@ async def get_telegram_file(
         raise HTTPException(status_code=500, detail="Bot token not configured")
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Get file path from Telegram
-            response = await client.get(
-                f"https://api.telegram.org/bot{settings.telegram_bot_token}/getFile",
-                params={"file_id": file_id}
-            )
-            data = response.json()
-
-            if not data.get("ok"):
-                raise HTTPException(status_code=404, detail="File not found")
-
-            file_path = data["result"]["file_path"]
-
-            # Download file from Telegram
-            file_url = f"https://api.telegram.org/file/bot{settings.telegram_bot_token}/{file_path}"
-            file_response = await client.get(file_url)
-
-            if file_response.status_code != 200:
-                raise HTTPException(status_code=404, detail="File download failed")
-
-            # Determine content type
-            content_type = "application/octet-stream"
-            if file_path.endswith(('.jpg', '.jpeg')):
-                content_type = "image/jpeg"
-            elif file_path.endswith('.png'):
-                content_type = "image/png"
-            elif file_path.endswith('.gif'):
-                content_type = "image/gif"
-            elif file_path.endswith('.webp'):
-                content_type = "image/webp"
-            elif file_path.endswith('.webm'):
-                content_type = "video/webm"
-            elif file_path.endswith('.mp4'):
-                content_type = "video/mp4"
-            elif file_path.endswith('.tgs'):
-                content_type = "application/x-tgsticker"
-
-            return StreamingResponse(
-                iter([file_response.content]),
-                media_type=content_type,
-                headers={"Cache-Control": "public, max-age=86400"}  # Cache for 24h
-            )
+        media = await telegram_media.get(file_id, settings.telegram_bot_token)
+    except TelegramFileNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Network error: {str(e)}")
 
+    headers = {"ETag": media.etag, "Cache-Control": "public, max-age=86400"}  # Cache for 24h
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and media.etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse streams from disk and handles Range/If-Range (video seeking)
+    return FileResponse(media.path, media_type=media.content_type, headers=headers)
+
 
 @router.get("/local/{chat_id}/{filename:path}")
 async def get_local_file(
@@ -222,8 +240,7 @@ async def get_local_file(
     chat = result.scalar_one_or_none()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
-    permission_service = PermissionService(db)
-    if not await permission_service.can_access_resource(user, chat):
+    if not await can_read_memoized(db, user, chat):
         raise HTTPException(status_code=403, detail="Access denied")
 
     # Build file path and verify it exists
@@ -1,7 +1,7 @@
 """
 Notification routes for in-app notifications.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
@@ -11,6 +11,10 @@ from datetime import datetime
 from ..models.database import Notification, User
 from ..database import get_db
 from ..services.auth import get_current_user
+from ..services.metrics import query_label
+from ..services.change_versions import (
+    make_etag, not_modified, notification_version, notifications_changed,
+)
 
 router = APIRouter()
 
@@ -52,7 +56,11 @@ NOTIFICATION_TYPE_DEFAULTS: dict[str, bool] = {
 
 def _effective_prefs(user: User) -> dict[str, bool]:
     """Эффективные настройки: дефолт по типу, перекрытый сохранённым выбором."""
-    saved = dict(user.notification_prefs or {})
+    return _prefs_from(user.notification_prefs)
+
+
+def _prefs_from(saved: dict | None) -> dict[str, bool]:
+    saved = dict(saved or {})
     return {t: bool(saved.get(t, d)) for t, d in NOTIFICATION_TYPE_DEFAULTS.items()}
 
 
@@ -62,16 +70,43 @@ def _disabled_types(user: User) -> list[str]:
     return [t for t, on in _effective_prefs(user).items() if not on]
 
 
+async def count_unread(db: AsyncSession, user_id: int, prefs: dict | None) -> int:
+    """Непрочитанные без выключенных типов — для эндпоинта и WS-пуша."""
+    disabled = [t for t, on in _prefs_from(prefs).items() if not on]
+    stmt = (
+        select(func.count(Notification.id))
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+    )
+    if disabled:
+        stmt = stmt.where(Notification.type.notin_(disabled))
+    with query_label("notifications.unread_count"):
+        result = await db.execute(stmt)
+    return result.scalar() or 0
+
+
+async def _notifications_etag(user: User) -> str:
+    # Выключенные типы меняют ответ без изменения самих уведомлений
+    return make_etag("notif", user.id, await notification_version(user.id), sorted(_disabled_types(user)))
+
+
 class PrefsUpdate(BaseModel):
     prefs: dict[str, bool]
 
 
 @router.get("/notifications", response_model=List[NotificationResponse])
 async def list_notifications(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List user's notifications, unread first, limit 50. Скрывает выключенные типы."""
+    """List user's notifications, unread first, limit 50. Скрывает выключенные типы.
+
+    Поллится фронтом: ETag по версии уведомлений, без изменений — 304 без запросов.
+    """
+    cached = not_modified(request, response, await _notifications_etag(current_user))
+    if cached:
+        return cached
     disabled = _disabled_types(current_user)
     stmt = (
         select(Notification)
@@ -80,26 +115,24 @@ async def list_notifications(
     if disabled:
         stmt = stmt.where(Notification.type.notin_(disabled))
     stmt = stmt.order_by(Notification.is_read.asc(), Notification.created_at.desc()).limit(50)
-    result = await db.execute(stmt)
+    with query_label("notifications.list"):
+        result = await db.execute(stmt)
     notifications = list(result.scalars().all())
     return notifications
 
 
 @router.get("/notifications/unread-count", response_model=UnreadCountResponse)
 async def unread_count(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Get count of unread notifications. Не считает выключенные типы."""
-    disabled = _disabled_types(current_user)
-    stmt = (
-        select(func.count(Notification.id))
-        .where(Notification.user_id == current_user.id, Notification.is_read == False)
-    )
-    if disabled:
-        stmt = stmt.where(Notification.type.notin_(disabled))
-    result = await db.execute(stmt)
-    count = result.scalar() or 0
+    cached = not_modified(request, response, await _notifications_etag(current_user))
+    if cached:
+        return cached
+    count = await count_unread(db, current_user.id, current_user.notification_prefs)
     return {"count": count}
 
 
@@ -134,6 +167,8 @@ async def mark_all_read(
         .values(is_read=True)
     )
     await db.commit()
+    # bulk update не виден событиям сессии — версию/счётчик обновляем сами
+    await notifications_changed([current_user.id])
     return {"ok": True}
 
 
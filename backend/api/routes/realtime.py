@@ -264,6 +264,7 @@ async def websocket_endpoint(
     - call.progress (call processing progress update)
     - call.completed (call processing finished successfully)
     - call.failed (call processing failed with error)
+    - notification.unread_count (unread notifications counter changed)
     """
     # Аутентификация + org — на КОРОТКОЙ сессии, которую сразу закрываем. Раньше
     # WS держал коннект пула всю свою жизнь (десятки вкладок × долгая сессия →
@@ -610,3 +611,8 @@ async def broadcast_call_failed(org_id: int, call_data: Dict[str, Any]):
 async def broadcast_form_submission(user_id: int, payload: Dict[str, Any]):
     """Notify ONLY the recruiter who sent the form (dispatch.created_by)."""
     await manager.broadcast_to_user(user_id, "form.submission", payload)
+
+
+async def broadcast_unread_count(user_id: int, count: int):
+    """Push the fresh unread notification count to the user's open tabs."""
+    await manager.broadcast_to_user(user_id, "notification.unread_count", {"count": count})
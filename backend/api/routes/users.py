@@ -16,6 +16,9 @@ from ..services.auth import (
 )
 from pydantic import BaseModel
 from ..services.password_policy import validate_password
+from ..services.principal import invalidate_principal
+from ..services.change_versions import bump_candidates
+from ..services.participant_roster import invalidate_roster_users
 from ..utils.roles import map_role_string_to_user_role, map_user_role_to_dept_role, map_user_role_to_org_role
 
 router = APIRouter()
@@ -761,6 +764,13 @@ async def delete_user(
         # Delete user using raw SQL to avoid ORM session issues
         await db.execute(text("DELETE FROM users WHERE id = :user_id"), {"user_id": user_id})
         await db.commit()
+        # Сырой SQL мимо событий сессии — кэш принципала сбрасываем сами,
+        # иначе удалённый пользователь авторизуется до истечения TTL;
+        # ростер участников тоже, чтобы его не узнавали в чатах
+        invalidate_principal(user_id)
+        invalidate_roster_users(user_id)
+        # ...и версию канбана: у карточек сменился рекрутёр
+        await bump_candidates([None])
         logger.info(f"Successfully deleted user {user_id}")
     except Exception as e:
         logger.error(f"Error deleting user {user_id}: {e}", exc_info=True)
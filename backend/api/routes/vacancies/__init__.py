@@ -79,6 +79,7 @@ from .kanban import (
 from .matching import (
     get_vacancies_stats,
     get_matching_candidates,
+    score_vacancy_red_flags,
     notify_matching_candidates,
     invite_candidate_to_vacancy,
     CandidateMatchResponse,
@@ -153,6 +154,7 @@ router.add_api_route("/{vacancy_id}/kanban/column/{stage}", get_kanban_column, m
 
 # Vacancy matching
 router.add_api_route("/{vacancy_id}/matching-candidates", get_matching_candidates, methods=["GET"], tags=["vacancy-matching"])
+router.add_api_route("/{vacancy_id}/red-flags/score", score_vacancy_red_flags, methods=["POST"], tags=["vacancy-matching"])
 router.add_api_route("/{vacancy_id}/notify-candidates", notify_matching_candidates, methods=["POST"], tags=["vacancy-matching"])
 router.add_api_route("/{vacancy_id}/invite-candidate/{entity_id}", invite_candidate_to_vacancy, methods=["POST"], tags=["vacancy-matching"])
 
@@ -15,6 +15,9 @@ from .common import (
     is_org_admin_or_owner, sees_all_candidates,
 )
 from ...services.auth import get_user_org
+from ...services import entity_extras
+# подписывает пересчёт HR-меток на события заявок/воронок
+from ...services import hr_tags  # noqa: F401
 
 router = APIRouter()
 
@@ -189,6 +192,8 @@ async def list_applications(
         )
         for entity in entities_result.scalars().all():
             entities_map[entity.id] = entity
+        # комментарии для _notes_blob — из entity_notes, одним запросом на воронку
+        await entity_extras.attach(db, entities_map.values())
 
     photo_file_map = await _load_photo_file_map(db, entity_ids)
 
@@ -351,15 +356,6 @@ async def create_application(
     )
     await db.commit()
 
-    # Авто-метка HR: кандидат попал в воронку → пересчитываем закреплённых
-    # рекрутеров (по created_by активных заявок). Некритично: ошибка синка не
-    # должна валить добавление кандидата.
-    try:
-        from ...services.hr_tags import sync_for_entity
-        await sync_for_entity(db, data.entity_id)
-    except Exception:
-        logger.exception("HR-tags sync failed after add (non-critical)")
-
     # --- Notification: new candidate added ---
     try:
         from ...services.hr_notifications import notify_new_candidate
@@ -643,13 +639,4 @@ async def delete_application(
 
     await db.commit()
 
-    # Авто-метка HR: кандидата сняли с воронки → пересчитываем закреплённых
-    # рекрутеров. Если это была последняя активная заявка данного HR — его
-    # метка уходит. Некритично для удаления.
-    try:
-        from ...services.hr_tags import sync_for_entity
-        await sync_for_entity(db, entity_id)
-    except Exception:
-        logger.exception("HR-tags sync failed after delete (non-critical)")
-
     logger.info(f"Deleted application {application_id}")
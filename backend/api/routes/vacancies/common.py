@@ -30,7 +30,8 @@ from ...models.database import (
     UserRole, OrgMember, OrgRole, DepartmentMember, DeptRole,
     SharedAccess, ResourceType, AccessLevel
 )
-from ...services.auth import get_current_user, get_user_org, has_full_database_access as auth_has_full_database_access
+from ...services.auth import get_current_user, get_user_org, get_user_org_role, has_full_database_access as auth_has_full_database_access
+from ...services.principal import session_principal
 from ...services.features import can_access_feature
 from ...services.cache import scoring_cache
 
@@ -42,14 +43,7 @@ async def is_org_owner(user: User, org: Organization, db: AsyncSession) -> bool:
     if user.role == UserRole.superadmin:
         return True
 
-    result = await db.execute(
-        select(OrgMember).where(
-            OrgMember.org_id == org.id,
-            OrgMember.user_id == user.id,
-            OrgMember.role == OrgRole.owner  # Only owner, not admin
-        )
-    )
-    return result.scalar_one_or_none() is not None
+    return await get_user_org_role(user, org.id, db) == OrgRole.owner  # Only owner, not admin
 
 
 async def is_org_admin_or_owner(user: User, org: Organization, db: AsyncSession) -> bool:
@@ -62,14 +56,7 @@ async def is_org_admin_or_owner(user: User, org: Organization, db: AsyncSession)
     """
     if user.role == UserRole.superadmin:
         return True
-    result = await db.execute(
-        select(OrgMember).where(
-            OrgMember.org_id == org.id,
-            OrgMember.user_id == user.id,
-            OrgMember.role.in_([OrgRole.owner, OrgRole.admin])
-        )
-    )
-    return result.scalar_one_or_none() is not None
+    return await get_user_org_role(user, org.id, db) in (OrgRole.owner, OrgRole.admin)
 
 
 async def has_full_database_access(user: User, org: Organization, db: AsyncSession) -> bool:
@@ -98,6 +85,10 @@ async def sees_all_candidates(user: User, org: Organization, db: AsyncSession) -
 
 async def get_user_department_ids(user_id: int, org_id: int, db: AsyncSession) -> List[int]:
     """Get all department IDs user belongs to in the organization."""
+    principal = session_principal(db, user_id)
+    if principal is not None and principal.org_id == org_id:
+        return list(principal.department_ids)
+
     result = await db.execute(
         select(DepartmentMember.department_id)
         .join(Department, Department.id == DepartmentMember.department_id)
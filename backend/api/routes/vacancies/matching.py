@@ -164,6 +164,38 @@ async def get_matching_candidates(
     ]
 
 
+@router.post("/{vacancy_id}/red-flags/score")
+async def score_vacancy_red_flags(
+    vacancy_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(check_vacancy_access)
+):
+    """
+    Batch red-flags scoring for the whole vacancy pipeline.
+
+    Returns the stored risk score of every candidate in the vacancy and queues
+    a background recompute for those without an analysis or whose inputs
+    changed (stale=true). Call again to pick up the refreshed results.
+    """
+    from ...services import red_flag_cache
+
+    org = await get_user_org(current_user, db)
+    if not org:
+        raise HTTPException(status_code=403, detail="No organization access")
+
+    vacancy_result = await db.execute(
+        select(Vacancy).where(Vacancy.id == vacancy_id, Vacancy.org_id == org.id)
+    )
+    vacancy = vacancy_result.scalar()
+    if not vacancy:
+        raise HTTPException(status_code=404, detail="Vacancy not found")
+
+    if not await can_access_vacancy(vacancy, current_user, org, db):
+        raise HTTPException(status_code=403, detail="Access denied to this vacancy")
+
+    return await red_flag_cache.score_pipeline(db, vacancy)
+
+
 @router.post("/{vacancy_id}/notify-candidates", response_model=NotifyCandidatesResponse)
 async def notify_matching_candidates(
     vacancy_id: int,
@@ -12,6 +12,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ..config import get_settings
 from ..database import get_db
 from ..models.database import User, UserRole, Organization, OrgMember, OrgRole, Entity, Chat, CallRecording, Department, DepartmentMember, RefreshToken
+from .principal import Principal, resolve_principal, current_principal
 
 settings = get_settings()
 # CryptContext is thread-safe by design - it uses internal synchronization
@@ -146,8 +147,8 @@ async def get_current_user(
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalar_one_or_none()
+    principal = await resolve_principal(int(user_id), token_version, db)
+    user = principal.user if principal else None
 
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
@@ -163,25 +164,19 @@ async def get_current_user(
 
     # «Наблюдатель» (read-only набор прав, для менторов): ЛЮБОЙ изменяющий запрос
     # запрещаем — даже если кнопка где-то осталась активной, клик даст 403. Единая
-    # точка = гарантия «ничего не может нажать/поменять». Проверяем только не-GET
-    # (на чтении лишний запрос не делаем). Auth-операции (logout/refresh/смена своего
-    # пароля) не режем — иначе read-only юзер не смог бы даже выйти. Суперадмин — мимо.
+    # точка = гарантия «ничего не может нажать/поменять». Проверяем только не-GET.
+    # Auth-операции (logout/refresh/смена своего пароля) не режем — иначе read-only
+    # юзер не смог бы даже выйти. Суперадмин — мимо. Флаг уже в принципале.
     if request.method not in ("GET", "HEAD", "OPTIONS"):
         _path = request.url.path or ""
         if user.role != UserRole.superadmin and not _path.startswith("/api/auth/"):
-            from ..models.database import OrgMember
-            try:
-                _ro = (await db.execute(
-                    select(OrgMember.is_readonly).where(OrgMember.user_id == user.id)
-                )).scalars().first()
-            except Exception:
-                _ro = None  # колонки ещё нет (миграция не прошла) → не блокируем
-            if _ro:
+            if principal.is_readonly:
                 raise HTTPException(
                     status_code=403,
                     detail="Режим «Наблюдатель»: только просмотр, изменения запрещены",
                 )
 
+    request.state.principal = principal
     return user
 
 
@@ -219,6 +214,15 @@ def get_current_user_dependency(allow_inactive: bool = False):
 get_current_user_allow_inactive = get_current_user_dependency(allow_inactive=True)
 
 
+async def get_current_principal(
+    request: Request,
+    user: User = Depends(get_current_user),
+) -> Principal:
+    """Принципал текущего запроса: пользователь + организация, роль в ней,
+    «Наблюдатель» и отделы — без отдельных запросов в хендлере."""
+    return request.state.principal
+
+
 async def get_superadmin(user: User = Depends(get_current_user)) -> User:
     """Get current user and verify they are a superadmin (main or shadow)."""
     if user.role != UserRole.superadmin:
@@ -447,6 +451,10 @@ async def get_user_org(user: User, db: AsyncSession) -> Optional[Organization]:
     запись удалена руками и т.д.) — в этом случае возвращаем самую старую
     организацию, иначе org-scoped endpoint-ы (например /projects) падают 400.
     """
+    principal = current_principal(user, db)
+    if principal is not None:
+        return principal.org
+
     result = await db.execute(
         select(Organization)
         .join(OrgMember, OrgMember.org_id == Organization.id)
@@ -466,6 +474,10 @@ async def get_user_org(user: User, db: AsyncSession) -> Optional[Organization]:
 
 async def get_user_org_role(user: User, org_id: int, db: AsyncSession) -> Optional[OrgRole]:
     """Get user's role in specific organization."""
+    principal = current_principal(user, db)
+    if principal is not None and principal.org_id == org_id:
+        return principal.org_role
+
     result = await db.execute(
         select(OrgMember).where(
             OrgMember.org_id == org_id,
@@ -495,6 +507,10 @@ async def has_full_database_access(user: User, org_id: int, db: AsyncSession) ->
     if user.role == UserRole.superadmin:
         return True
 
+    principal = current_principal(user, db)
+    if principal is not None and principal.org_id == org_id:
+        return principal.has_full_database_access
+
     # Только org owner/admin (hr исключён — он ограниченный рекрутёр).
     result = await db.execute(
         select(OrgMember.id, OrgMember.role).where(
@@ -18,6 +18,7 @@ from typing import Optional, List, Dict, Any
 
 from ..config import settings
 from .redis_cache import redis_cache, get_redis, close_redis
+from .metrics import cache_result
 
 logger = logging.getLogger("hr-analyzer.cache")
 
@@ -164,6 +165,7 @@ class AnalysisCacheService:
 
         if not cache_entry:
             logger.debug(f"Cache miss: {cache_key} (no entry)")
+            cache_result("analysis", False)
             return None
 
         # Check hash match
@@ -173,6 +175,7 @@ class AnalysisCacheService:
             await redis_cache.delete(redis_key)
             async with cls._get_lock():
                 cls._cache.pop(cache_key, None)
+            cache_result("analysis", False)
             return None
 
         # Check expiry (only for in-memory, Redis handles TTL)
@@ -184,9 +187,11 @@ class AnalysisCacheService:
             await redis_cache.delete(redis_key)
             async with cls._get_lock():
                 cls._cache.pop(cache_key, None)
+            cache_result("analysis", False)
             return None
 
         logger.info(f"Cache hit: {cache_key}")
+        cache_result("analysis", True)
         return cache_entry.get('result')
 
     @classmethod
@@ -423,6 +428,7 @@ class ScoringCacheService:
 
         if not cache_entry:
             logger.debug(f"Score cache miss: {cache_key} (no entry)")
+            cache_result("scoring", False)
             return None
 
         # Check expiry (only for in-memory, Redis handles TTL)
@@ -434,9 +440,11 @@ class ScoringCacheService:
             await redis_cache.delete(cache_key)
             async with cls._get_lock():
                 cls._cache.pop(cache_key, None)
+            cache_result("scoring", False)
             return None
 
         logger.info(f"Score cache hit: {cache_key}")
+        cache_result("scoring", True)
         return cache_entry.get('score')
 
     @classmethod
@@ -0,0 +1,260 @@
+"""Версии данных для дешёвого поллинга (ETag / 304) + пуш счётчика непрочитанного.
+
+Фронт поллит уведомления (25 с), счётчик непрочитанного и /candidates/kanban
+(15 с). Почти всегда ничего не поменялось, а каждый опрос гонял полные запросы.
+Теперь у каждого «потока данных» есть версия в кэше (Redis, без него — память
+процесса):
+
+- ver:notif:{user_id}  — уведомления пользователя;
+- ver:cand:{org_id}    — кандидаты/канбан организации;
+- ver:cand:all         — изменения, чью организацию из сессии не определить
+  (bulk-апдейты, файлы/отклики) — старят доску всем организациям;
+- ver:cand:any         — любое изменение кандидатов (суперадмин видит все орги).
+
+Версия — случайный токен, а не счётчик: после рестарта Redis/процесса значение
+не может «совпасть» со старым ETag клиента. Если ключа нет — заводим новый токен
+(один лишний 200, зато никогда не ложный 304).
+
+Бампы делают события ORM-сессии после commit (как search_index / principal).
+Исключения — bulk update уведомлений (read-all): затронутых пользователей он не
+называет, такой код сам зовёт notifications_changed(); и сырой SQL (удаление
+пользователя) — там после commit зовут bump_candidates([None]). Изменения уведомлений
+дополнительно пушат свежий счётчик непрочитанного в /ws
+(событие notification.unread_count).
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+import time
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..models.database import (
+    Entity, EntityFile, EntityHrTag, EntityNote, EntityTimelineReaction, Notification,
+    Organization, StageTransition, User, Vacancy, VacancyApplication,
+)
+from .redis_cache import RedisCacheService
+
+logger = logging.getLogger("hr-analyzer.change_versions")
+
+# Версия живёт долго: истечение ключа = один лишний полный ответ, не ошибка
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+_NOTIF_KEY = "ver:notif:{user_id}"
+_CAND_KEY = "ver:cand:{scope}"
+_ALL = "all"
+_ANY = "any"
+
+# Что рисуется на канбане кандидатов (карточки, вакансии, фото, причины отказа)
+_CANDIDATE_MODELS = (
+    Entity, EntityFile, VacancyApplication, Vacancy, StageTransition,
+    # заметки/реакции/HR-метки отдаются в extra_data карточки доски
+    EntityNote, EntityTimelineReaction, EntityHrTag,
+)
+# Поля User, которые видны на доске (имя рекрутёра) или меняют видимость
+_USER_BOARD_FIELDS = ("name", "role", "is_shadow", "is_active")
+
+
+def _new_token() -> str:
+    return f"{time.time_ns():x}{secrets.token_hex(2)}"
+
+
+async def _read(keys: list) -> list:
+    values = await RedisCacheService.get_many(keys)
+    out = []
+    for key, value in zip(keys, values):
+        if value is None:
+            value = _new_token()
+            await RedisCacheService.set(key, value, VERSION_TTL_SECONDS)
+        out.append(value)
+    return out
+
+
+async def _bump(keys: Iterable[str]) -> None:
+    for key in keys:
+        await RedisCacheService.set(key, _new_token(), VERSION_TTL_SECONDS)
+
+
+async def notification_version(user_id: int) -> str:
+    return (await _read([_NOTIF_KEY.format(user_id=user_id)]))[0]
+
+
+async def candidate_version(org_id: Optional[int]) -> str:
+    """Версия канбана кандидатов для организации (None — все организации)."""
+    if org_id is None:
+        return (await _read([_CAND_KEY.format(scope=_ANY)]))[0]
+    return ":".join(await _read([_CAND_KEY.format(scope=org_id), _CAND_KEY.format(scope=_ALL)]))
+
+
+async def bump_notifications(user_ids: Iterable[int]) -> None:
+    await _bump(_NOTIF_KEY.format(user_id=uid) for uid in set(user_ids))
+
+
+async def bump_candidates(org_ids: Iterable[Optional[int]]) -> None:
+    """Бамп версий организаций; None в списке — «организация неизвестна», это
+    старит доску всем (через общий ключ all, который входит в каждую версию)."""
+    scopes = {_ANY}
+    for org_id in org_ids:
+        scopes.add(_ALL if org_id is None else org_id)
+    await _bump(_CAND_KEY.format(scope=scope) for scope in scopes)
+
+
+# --- ETag -----------------------------------------------------------------------
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из версии и всего, от чего зависит ответ (юзер, фильтры, права)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Проставить ETag ответу; если клиент прислал тот же — вернуть 304.
+
+    Cache-Control: no-cache — браузер хранит тело, но каждый раз переспрашивает
+    с If-None-Match; 304 он сам превращает для JS в 200 со старым телом.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        # Слабое сравнение: прокси могут снять/добавить префикс W/
+        if etag in candidates or etag[2:] in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+# --- Пуш счётчика непрочитанного --------------------------------------------------
+
+async def push_unread_counts(user_ids: Iterable[int]) -> None:
+    """Отправить свежий счётчик непрочитанного пользователям с открытым /ws.
+
+    Своя короткая сессия: вызывается фоном после commit запроса. Считаем только
+    тем, у кого есть соединение в ЭТОМ процессе — остальным хватит ETag-поллинга.
+    """
+    from ..routes.realtime import manager, broadcast_unread_count
+    online = [uid for uid in set(user_ids) if uid in manager.active_connections]
+    if not online:
+        return
+
+    from ..database import AsyncSessionLocal
+    from ..routes.notifications import count_unread
+    try:
+        async with AsyncSessionLocal() as db:
+            users = {u.id: u for u in (await db.execute(
+                User.__table__.select().where(User.id.in_(online))
+            )).all()}
+            for uid in online:
+                if uid in users:
+                    count = await count_unread(db, uid, users[uid].notification_prefs)
+                    await broadcast_unread_count(uid, count)
+    except Exception as e:
+        logger.warning(f"unread count push failed: {e}")
+
+
+async def notifications_changed(user_ids: Iterable[int]) -> None:
+    """Уведомления пользователей изменились: новая версия + пуш счётчика."""
+    user_ids = set(user_ids)
+    await bump_notifications(user_ids)
+    await push_unread_counts(user_ids)
+
+
+async def _after_commit_async(notif_users: set, cand_orgs: set) -> None:
+    if cand_orgs:
+        await bump_candidates(cand_orgs)
+    if notif_users:
+        await notifications_changed(notif_users)
+
+
+# Ссылки на фоновые задачи: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+
+
+async def drain() -> None:
+    """Дождаться отложенных после commit бампов (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+# --- События сессии --------------------------------------------------------------
+
+_NOTIF_PENDING = "change_versions_notif"
+_CAND_PENDING = "change_versions_cand"
+
+
+def _candidate_orgs(obj) -> set:
+    """Организации объекта канбана без похода в базу ({None} — не определить).
+    При переносе между оргами старят обе."""
+    if isinstance(obj, (Entity, Vacancy)):
+        history = inspect(obj).attrs.org_id.history
+        return {obj.org_id, *history.deleted}
+    return {None}
+
+
+def _after_flush(session, flush_context) -> None:
+    notif = session.info.setdefault(_NOTIF_PENDING, set())
+    cand = session.info.setdefault(_CAND_PENDING, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Notification):
+            notif.add(obj.user_id)
+        elif isinstance(obj, _CANDIDATE_MODELS):
+            cand.update(_candidate_orgs(obj))
+        elif isinstance(obj, Organization):
+            # settings.stage_config — подписи/цвета колонок доски
+            if obj in session.deleted or inspect(obj).attrs.settings.history.has_changes():
+                cand.add(obj.id)
+        elif isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.new or obj in session.deleted or any(
+                state.attrs[f].history.has_changes() for f in _USER_BOARD_FIELDS
+            ):
+                cand.add(None)
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    # Bulk по Notification (read-all) затронутых юзеров не называет — такие
+    # места зовут notifications_changed() сами после commit.
+    if mapper.class_ in _CANDIDATE_MODELS or mapper.class_ in (User, Organization):
+        orm_execute_state.session.info.setdefault(_CAND_PENDING, set()).add(None)
+
+
+def _after_commit(session) -> None:
+    notif = session.info.pop(_NOTIF_PENDING, None) or set()
+    cand = session.info.pop(_CAND_PENDING, None) or set()
+    if not (notif or cand):
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(_after_commit_async(notif, cand))
+    except RuntimeError:
+        return  # скрипт без event loop — версии доживут свой TTL
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _after_rollback(session) -> None:
+    for key in (_NOTIF_PENDING, _CAND_PENDING):
+        session.info.pop(key, None)
+
+
+def register_change_version_events() -> None:
+    """Подписать бампы версий на события ORM-сессий (идемпотентно)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _on_orm_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+register_change_version_events()
@@ -0,0 +1,286 @@
+"""Заметки, реакции таймлайна и HR-метки кандидата — в своих таблицах.
+
+Раньше всё это жило в общем JSON-блобе Entity.extra_data ("notes",
+"timeline_reactions", "system_hr_tags"): каждый писатель брал строку entities
+под FOR UPDATE и перезаписывал весь блоб, так что комментарии, self-heal
+HR-меток при открытии карточки, смена этапа и экспорт Prometheus вставали в
+очередь на одну блокировку и гоняли килобайты JSON ради одной заметки.
+
+Теперь:
+
+- entity_notes / entity_timeline_reactions / entity_hr_tags — источник правды;
+  комментарий — вставка одной строки без блокировки кандидата;
+- форма ответа API прежняя: attach() подмешивает данные таблиц в
+  entity.extra_data загруженных сущностей (set_committed_value — без записи в
+  базу), тремя запросами на любую пачку карточек;
+- старые писатели, кладущие эти ключи в extra_data (magic button, слияние
+  дублей, merge в PUT /entities после attach), не теряют данных: перед flush
+  ключи вырезаются из блоба, а новые заметки/реакции дописываются в таблицы.
+  HR-метки производные — их пишет только services/hr_tags.py.
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models.database import (
+    Entity, EntityHrTag, EntityNote, EntityTimelineReaction, User, Vacancy,
+)
+
+logger = logging.getLogger("hr-analyzer.entity_extras")
+
+NOTES = "notes"
+REACTIONS = "timeline_reactions"
+HR_TAGS = "system_hr_tags"
+TABLE_KEYS = (NOTES, REACTIONS, HR_TAGS)
+
+
+# ============================================================================
+# ROWS <-> LEGACY SHAPE
+# ============================================================================
+
+def note_uid(note) -> Optional[str]:
+    """Ключ заметки: её id; у легаси без id — "date:<iso>" (так их адресует фронт),
+    а без id и даты — хэш содержимого, чтобы повторный перенос не плодил дубли."""
+    if isinstance(note, dict):
+        if note.get("id"):
+            return str(note["id"])[:64]
+        if note.get("date"):
+            return f"date:{note['date']}"[:64]
+        raw = json.dumps(note, sort_keys=True, ensure_ascii=False, default=str)
+        return "hash:" + hashlib.sha1(raw.encode()).hexdigest()
+    return None
+
+
+def note_values(entity_id: int, note) -> Optional[dict]:
+    """Заметка из блоба → значения строки entity_notes (None — мусор, пропустить)."""
+    if isinstance(note, str):
+        if not note.strip():
+            return None
+        # легаси-строка: payload NULL, отдаётся обратно строкой
+        uid = "text:" + hashlib.sha1(note.encode()).hexdigest()
+        return {"entity_id": entity_id, "uid": uid, "text": note, "author_id": None, "payload": None}
+    uid = note_uid(note)
+    if uid is None:
+        return None
+    author_id = note.get("author_id")
+    try:
+        author_id = int(author_id) if author_id is not None else None
+    except (TypeError, ValueError):
+        author_id = None
+    text = note.get("text")
+    return {
+        "entity_id": entity_id,
+        "uid": uid,
+        "text": text if isinstance(text, str) else "",
+        "author_id": author_id,
+        "payload": {k: v for k, v in note.items() if k != "text"},
+    }
+
+
+def render_note(row: EntityNote):
+    if row.payload is None:
+        return row.text
+    return {**row.payload, "text": row.text}
+
+
+def render_reaction(row: EntityTimelineReaction) -> dict:
+    return {"emoji": row.emoji, "user_id": row.user_id, "user_name": row.user_name, "date": row.date}
+
+
+# ============================================================================
+# READ: overlay into extra_data
+# ============================================================================
+
+async def load(db: AsyncSession, entity_ids: Iterable[int]) -> Dict[int, dict]:
+    """{entity_id: {"notes": [...], "timeline_reactions": {...}, "system_hr_tags": [...]}}."""
+    entity_ids = list({eid for eid in entity_ids if eid is not None})
+    out: Dict[int, dict] = {eid: {NOTES: [], REACTIONS: {}, HR_TAGS: []} for eid in entity_ids}
+    if not entity_ids:
+        return out
+
+    notes = await db.execute(
+        select(EntityNote)
+        .where(EntityNote.entity_id.in_(entity_ids), EntityNote.deleted_at.is_(None))
+        .order_by(EntityNote.entity_id, EntityNote.id)
+    )
+    for row in notes.scalars().all():
+        out[row.entity_id][NOTES].append(render_note(row))
+
+    reactions = await db.execute(
+        select(EntityTimelineReaction)
+        .where(EntityTimelineReaction.entity_id.in_(entity_ids))
+        .order_by(EntityTimelineReaction.entity_id, EntityTimelineReaction.id)
+    )
+    for row in reactions.scalars().all():
+        out[row.entity_id][REACTIONS].setdefault(row.entry_key, []).append(render_reaction(row))
+
+    tags = await db.execute(
+        select(EntityHrTag.entity_id, EntityHrTag.hr_id, User.name, EntityHrTag.vacancy_id, Vacancy.title)
+        .join(User, User.id == EntityHrTag.hr_id)
+        .join(Vacancy, Vacancy.id == EntityHrTag.vacancy_id)
+        .where(EntityHrTag.entity_id.in_(entity_ids))
+        .order_by(EntityHrTag.entity_id, EntityHrTag.hr_id, EntityHrTag.vacancy_id)
+    )
+    for entity_id, hr_id, name, vacancy_id, title in tags.all():
+        out[entity_id][HR_TAGS].append(
+            {"hr_id": hr_id, "name": name, "vacancy_id": vacancy_id, "vacancy_title": title}
+        )
+    return out
+
+
+def merge_into(extra, loaded: dict) -> dict:
+    """extra_data без табличных ключей + непустые данные из таблиц."""
+    merged = {k: v for k, v in (extra if isinstance(extra, dict) else {}).items() if k not in TABLE_KEYS}
+    for key in TABLE_KEYS:
+        if loaded.get(key):
+            merged[key] = loaded[key]
+    return merged
+
+
+async def attach(db: AsyncSession, entities: Iterable[Entity]) -> None:
+    """Подмешать заметки/реакции/HR-метки в extra_data сущностей перед ответом.
+
+    Значение ставится как «закоммиченное»: UPDATE не будет. Сущности с
+    несохранённой правкой extra_data пропускаем — её сначала надо закоммитить.
+    """
+    entities = [
+        e for e in entities
+        if e is not None and not inspect(e).attrs.extra_data.history.has_changes()
+    ]
+    if not entities:
+        return
+    loaded = await load(db, [e.id for e in entities])
+    for entity in entities:
+        set_committed_value(entity, "extra_data", merge_into(entity.extra_data, loaded[entity.id]))
+
+
+# ============================================================================
+# WRITE-THROUGH: ключи, записанные в блоб старым кодом
+# ============================================================================
+
+def _store_from_extra(connection, entity_id: int, staged: dict) -> None:
+    """Дописать в таблицы заметки/реакции из блоба, которых там ещё нет. Синхронно."""
+    notes = staged.get(NOTES)
+    if isinstance(notes, list) and notes:
+        known = set(connection.execute(
+            select(EntityNote.uid).where(EntityNote.entity_id == entity_id)
+        ).scalars().all())
+        rows = []
+        for note in notes:
+            values = note_values(entity_id, note)
+            if values and values["uid"] not in known:
+                known.add(values["uid"])
+                rows.append(values)
+        if rows:
+            connection.execute(insert(EntityNote), rows)
+
+    reactions = staged.get(REACTIONS)
+    if isinstance(reactions, dict) and reactions:
+        known = set(connection.execute(
+            select(EntityTimelineReaction.entry_key, EntityTimelineReaction.user_id, EntityTimelineReaction.emoji)
+            .where(EntityTimelineReaction.entity_id == entity_id)
+        ).all())
+        rows = []
+        for entry_key, entry in reactions.items():
+            for r in entry if isinstance(entry, list) else []:
+                if not isinstance(r, dict) or not r.get("emoji"):
+                    continue
+                key = (str(entry_key)[:255], r.get("user_id"), str(r["emoji"])[:32])
+                if key in known:
+                    continue
+                known.add(key)
+                rows.append({"entity_id": entity_id, "entry_key": key[0], "user_id": key[1], "emoji": key[2],
+                             "user_name": r.get("user_name"), "date": r.get("date")})
+        if rows:
+            connection.execute(insert(EntityTimelineReaction), rows)
+
+
+_PENDING = "entity_extras_pending"
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Entity):
+            continue
+        extra = obj.extra_data
+        if not isinstance(extra, dict) or not any(k in extra for k in TABLE_KEYS):
+            continue
+        if obj not in session.new and not inspect(obj).attrs.extra_data.history.has_changes():
+            continue  # блоб не меняется (например, подмешан attach()) — писать нечего
+        staged = {k: extra[k] for k in (NOTES, REACTIONS) if k in extra}
+        obj.extra_data = {k: v for k, v in extra.items() if k not in TABLE_KEYS}
+        if staged:
+            session.info.setdefault(_PENDING, []).append((obj, staged))
+
+
+def _after_flush_postexec(session, flush_context) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    connection = session.connection()
+    for obj, staged in pending:
+        if obj.id is not None and obj not in session.deleted:
+            _store_from_extra(connection, obj.id, staged)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def register_entity_extras_events() -> None:
+    """Подписать перенос табличных ключей из extra_data на события сессий (идемпотентно)."""
+    for name, fn in (
+        ("before_flush", _before_flush),
+        ("after_flush_postexec", _after_flush_postexec),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def backfill_from_extra_data(connection, batch: int = 500) -> int:
+    """Перенести notes/timeline_reactions из блобов в таблицы и вычистить ключи.
+
+    Синхронно (миграция, start.sh через run_sync). Идемпотентно: уже
+    перенесённые заметки/реакции не дублируются. HR-метки из блоба не
+    переносим — они производные, их пересчитывает hr_tags.rebuild_hr_tags.
+    Возвращает число обработанных кандидатов.
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(Entity.id, Entity.extra_data)
+            .where(Entity.id > last_id, Entity.extra_data.isnot(None))
+            .order_by(Entity.id)
+            .limit(batch)
+        ).all()
+        if not rows:
+            return moved
+        last_id = rows[-1][0]
+        for entity_id, extra in rows:
+            if not isinstance(extra, dict) or not any(k in extra for k in TABLE_KEYS):
+                continue
+            _store_from_extra(connection, entity_id, extra)
+            table = Entity.__table__
+            connection.execute(
+                update(table)
+                .where(table.c.id == entity_id)
+                # updated_at — как было: перенос хранения не правка карточки
+                .values(extra_data={k: v for k, v in extra.items() if k not in TABLE_KEYS},
+                        updated_at=table.c.updated_at)
+            )
+            moved += 1
+
+
+register_entity_extras_events()
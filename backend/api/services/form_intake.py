@@ -0,0 +1,235 @@
+"""Фоновая обработка анкет, присланных по персональной ссылке.
+
+Публичный сабмит делает только быструю надёжную вставку (ответы, файлы в
+bytea, статус рассылки) и сразу отвечает 202. Всё тяжёлое — превью страниц
+PDF-резюме (PyMuPDF), уведомление рекрутёра + realtime, авто-промоут PDF в
+«Резюме» — выполняет этот конвейер:
+
+- параллельно не больше INTAKE_CONCURRENCY анкет, чтобы всплеск сабмитов не
+  выбирал пул соединений БД у остальных запросов;
+- анкету забирает один исполнитель (условный UPDATE pending → processing);
+- каждый шаг после успеха пишется в processing_state["done"], поэтому
+  повторный прогон (рестарт воркера, resume_pending при старте) не
+  дублирует превью и уведомления;
+- статус виден кандидату через GET /api/forms/public/d/{token}/status.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import flag_modified
+
+from ..models.database import (
+    Entity, EntityFile, EntityFileType, FormDispatch, FormSubmission, FormTemplate,
+)
+
+logger = logging.getLogger("hr-analyzer.form-intake")
+
+ENTITY_FILES_DIR = Path(__file__).parent.parent.parent / "uploads" / "entity_files"
+PDF_RENDER_DPI = 200
+
+# Одновременно обрабатываемых анкет на воркер
+INTAKE_CONCURRENCY = 4
+# processing дольше этого — исполнитель умер, анкету можно забрать заново
+STALE_AFTER = timedelta(minutes=10)
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+ERROR = "error"
+
+STEPS = ("previews", "notify", "autopromote")
+
+_semaphore = asyncio.Semaphore(INTAKE_CONCURRENCY)
+# Ссылки на запущенные задачи: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+
+
+def _open_session() -> AsyncSession:
+    from ..database import AsyncSessionLocal
+    return AsyncSessionLocal()
+
+
+def schedule(submission_id: int) -> None:
+    """Поставить анкету в конвейер (после commit вставки)."""
+    try:
+        task = asyncio.get_running_loop().create_task(process_submission(submission_id))
+    except RuntimeError:
+        return  # нет event loop — анкета останется pending до resume_pending()
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def drain() -> None:
+    """Дождаться запущенных обработок (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+async def resume_pending() -> int:
+    """При старте: вернуть в конвейер анкеты, не дообработанные до рестарта."""
+    async with _open_session() as db:
+        ids = (await db.execute(
+            select(FormSubmission.id).where(_claimable(datetime.utcnow()))
+            .order_by(FormSubmission.id)
+        )).scalars().all()
+    for submission_id in ids:
+        schedule(submission_id)
+    if ids:
+        logger.info("form intake: resumed %d pending submissions", len(ids))
+    return len(ids)
+
+
+def _claimable(now: datetime):
+    return or_(
+        FormSubmission.processing_status == PENDING,
+        and_(
+            FormSubmission.processing_status == PROCESSING,
+            FormSubmission.processing_started_at < now - STALE_AFTER,
+        ),
+    )
+
+
+async def process_submission(submission_id: int) -> None:
+    async with _semaphore:
+        async with _open_session() as db:
+            now = datetime.utcnow()
+            claimed = await db.execute(
+                update(FormSubmission)
+                .where(FormSubmission.id == submission_id, _claimable(now))
+                .values(processing_status=PROCESSING, processing_started_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return  # уже обработана или её ведёт другой исполнитель
+
+            try:
+                await _run_steps(db, submission_id)
+            except Exception as e:
+                logger.error("form intake failed for submission %s", submission_id, exc_info=True)
+                await db.rollback()
+                await db.execute(
+                    update(FormSubmission)
+                    .where(FormSubmission.id == submission_id)
+                    .values(processing_status=ERROR, processing_error=str(e)[:500])
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+
+async def _run_steps(db: AsyncSession, submission_id: int) -> None:
+    submission = (await db.execute(
+        select(FormSubmission).where(FormSubmission.id == submission_id)
+    )).scalar_one()
+    form = (await db.execute(
+        select(FormTemplate).where(FormTemplate.id == submission.form_id)
+    )).scalar_one()
+    dispatch = None
+    if submission.dispatch_id:
+        dispatch = (await db.execute(
+            select(FormDispatch).where(FormDispatch.id == submission.dispatch_id)
+        )).scalar_one_or_none()
+    entity = None
+    if submission.entity_id:
+        entity = (await db.execute(
+            select(Entity).where(Entity.id == submission.entity_id)
+        )).scalar_one_or_none()
+
+    state = dict(submission.processing_state or {})
+    done = list(state.get("done", []))
+
+    for step in STEPS:
+        if step in done:
+            continue
+        if step == "previews":
+            await _render_resume_previews(db, form, state.get("file_ids") or [])
+        elif step == "notify" and dispatch is not None:
+            await _notify(db, dispatch, entity, form)
+        elif step == "autopromote" and state.get("file_ids") and submission.entity_id:
+            from .resume_autopromote import promote_pdf_to_resume_if_needed
+            await promote_pdf_to_resume_if_needed(submission.entity_id, form.org_id)
+        done.append(step)
+        submission.processing_state = {**state, "done": done}
+        flag_modified(submission, "processing_state")
+        await db.commit()
+
+    submission.processing_status = DONE
+    submission.processing_error = None
+    await db.commit()
+
+
+def render_pdf_pages(pdf_bytes: bytes) -> list[bytes]:
+    """Страницы PDF → JPEG. Синхронно (PyMuPDF), вызывать через to_thread."""
+    import fitz
+    pages = []
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        mat = fitz.Matrix(PDF_RENDER_DPI / 72, PDF_RENDER_DPI / 72)
+        for page in doc:
+            pages.append(page.get_pixmap(matrix=mat).tobytes("jpg"))
+    finally:
+        doc.close()
+    return pages
+
+
+async def _render_resume_previews(db: AsyncSession, form: FormTemplate, file_ids: list[int]) -> None:
+    """PDF-резюме из анкеты → картинки страниц для превью в карточке."""
+    if not file_ids:
+        return
+    pdfs = (await db.execute(
+        select(EntityFile).where(
+            EntityFile.id.in_(file_ids),
+            EntityFile.file_type == EntityFileType.resume,
+            EntityFile.mime_type == "application/pdf",
+        )
+    )).scalars().all()
+    for pdf in pdfs:
+        if not pdf.file_data:
+            continue
+        try:
+            pages = await asyncio.to_thread(render_pdf_pages, pdf.file_data)
+        except Exception:
+            logger.exception(f"PDF→image conversion failed for entity file {pdf.id}")
+            continue
+        entity_files_dir = ENTITY_FILES_DIR / str(pdf.entity_id)
+        entity_files_dir.mkdir(parents=True, exist_ok=True)
+        for page_num, img_bytes in enumerate(pages, start=1):
+            img_path = entity_files_dir / f"{uuid.uuid4().hex}.jpg"
+            try:
+                img_path.write_bytes(img_bytes)
+            except OSError:
+                pass  # диск эфемерный, основная копия — bytea
+            db.add(EntityFile(
+                org_id=form.org_id,
+                entity_id=pdf.entity_id,
+                file_type=EntityFileType.resume,
+                file_name=f"{Path(pdf.file_name).stem}_page_{page_num}.jpg",
+                file_path=str(img_path),
+                file_data=img_bytes,  # bytea — переживает редеплой
+                file_size=len(img_bytes),
+                mime_type="image/jpeg",
+                description=f"Страница {page_num} из {pdf.file_name}",
+                uploaded_by=form.created_by,
+            ))
+
+
+async def _notify(db: AsyncSession, dispatch: FormDispatch, entity, form: FormTemplate) -> None:
+    from .hr_notifications import notify_form_submitted
+    from ..routes.realtime import broadcast_form_submission
+
+    await notify_form_submitted(db, dispatch, entity, form)
+    if not dispatch.created_by:
+        logger.warning("form.submission: dispatch %s has no created_by — no realtime sent", dispatch.id)
+        return
+    try:
+        await broadcast_form_submission(dispatch.created_by, {
+            "entity_id": dispatch.entity_id, "form_id": form.id, "dispatch_id": dispatch.id,
+            "form_title": form.title, "candidate_name": entity.name if entity else None,
+        })
+    except Exception:
+        logger.error("form.submission broadcast FAILED for dispatch %s", dispatch.id, exc_info=True)
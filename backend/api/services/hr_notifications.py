@@ -9,14 +9,16 @@ so that a notification failure never breaks the main operation.
 """
 import logging
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.database import (
     Notification,
+    SentReminder,
     VacancyApplication,
     ApplicationStage,
     Entity,
@@ -531,12 +533,43 @@ async def notify_probation_ending(
 # Scheduled task: check all probation endings within 7 days
 # ---------------------------------------------------------------------------
 
+def parse_probation_end(extra_data) -> Optional[datetime]:
+    """extra_data["probation_end_date"] (ISO string) -> naive UTC datetime or None."""
+    value = (extra_data or {}).get("probation_end_date") if isinstance(extra_data, dict) else None
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _sync_probation_end(mapper, connection, target):
+    parsed = parse_probation_end(target.extra_data)
+    if target.probation_end_date != parsed:
+        target.probation_end_date = parsed
+
+
+def register_probation_events() -> None:
+    """Автосинк entities.probation_end_date из extra_data. Идемпотентно."""
+    for name in ("before_insert", "before_update"):
+        if not event.contains(Entity, name, _sync_probation_end):
+            event.listen(Entity, name, _sync_probation_end)
+
+
+register_probation_events()
+
+
 async def check_probation_endings(db: AsyncSession) -> int:
     """Find candidates in 'hired' stage whose probation ends within 7 days.
 
-    Probation end date is stored in entity.extra_data["probation_end_date"]
-    (ISO format string).  We only send a notification once per application
-    by checking for an existing notification with the same type + link.
+    One windowed query over the indexed entities.probation_end_date; reminders
+    already sent are excluded by an anti-join on the sent_reminders ledger
+    (application, "probation_ending", end date), so the cost follows the
+    window, not the total number of hires.
 
     Returns the number of new notifications created.
     """
@@ -545,45 +578,45 @@ async def check_probation_endings(db: AsyncSession) -> int:
     count = 0
 
     try:
-        # Get all hired applications
         result = await db.execute(
             select(VacancyApplication, Entity)
             .join(Entity, VacancyApplication.entity_id == Entity.id)
-            .where(VacancyApplication.stage == ApplicationStage.hired)
+            .outerjoin(
+                SentReminder,
+                and_(
+                    SentReminder.application_id == VacancyApplication.id,
+                    SentReminder.kind == "probation_ending",
+                    SentReminder.period == Entity.probation_end_date,
+                ),
+            )
+            .where(
+                Entity.probation_end_date >= now,
+                Entity.probation_end_date <= seven_days,
+                VacancyApplication.stage == ApplicationStage.hired,
+                SentReminder.id.is_(None),
+            )
         )
         rows = result.all()
 
         for application, entity in rows:
-            # Check if probation_end_date is set in extra_data
-            extra = entity.extra_data or {}
-            probation_end_str = extra.get("probation_end_date")
-            if not probation_end_str:
-                continue
-
+            probation_end = entity.probation_end_date
+            # Claim the ledger key first: a concurrent sweep loses on the
+            # unique constraint instead of sending a duplicate. The row is
+            # committed together with the notifications.
             try:
-                probation_end = datetime.fromisoformat(probation_end_str)
-            except (ValueError, TypeError):
-                continue
-
-            # Only notify if ending within 7 days and not already passed
-            if not (now <= probation_end <= seven_days):
-                continue
-
-            # Check if we already sent a notification for this
-            link = f"/vacancies/{application.vacancy_id}"
-            existing = await db.execute(
-                select(Notification.id).where(
-                    Notification.type == "probation_ending",
-                    Notification.link == link,
-                    Notification.message.contains(entity.name),
-                ).limit(1)
-            )
-            if existing.scalar_one_or_none() is not None:
+                async with db.begin_nested():
+                    db.add(SentReminder(
+                        application_id=application.id,
+                        kind="probation_ending",
+                        period=probation_end,
+                    ))
+            except IntegrityError:
                 continue
 
             await notify_probation_ending(db, application, entity, probation_end)
             count += 1
 
+        await db.commit()
         logger.info(f"check_probation_endings: created {count} notification(s)")
         return count
 
@@ -3,22 +3,35 @@
 An HR-tag marks a recruiter who pulled this candidate into a funnel. The set is
 derived from ``VacancyApplication.created_by`` across the candidate's ACTIVE
 applications (``rejected`` / ``withdrawn`` excluded — see design §4: a rejected /
-withdrawn candidate is no longer that HR's responsibility) and stored, read-only,
-in ``entity.extra_data["system_hr_tags"]`` as a list of
-``{"hr_id", "name", "vacancy_id", "vacancy_title"}`` — one per (HR, funnel).
+withdrawn candidate is no longer that HR's responsibility) and stored as rows of
+``entity_hr_tags`` — one per (HR, funnel). Readers still see it as
+``entity.extra_data["system_hr_tags"]`` = ``[{"hr_id", "name", "vacancy_id",
+"vacancy_title"}]``: ``services/entity_extras.attach`` joins the current user and
+vacancy names in on read, so a rename needs no rewrite.
 
 Storage is deliberately separate from the manual string ``Entity.tags`` so the
 two never collide: sync never touches ``tags``, manual edits never touch this.
 
-This module is the SINGLE source of truth for the computation. The one-shot bulk
-backfill in ``start.sh`` mirrors the exact same rule in SQL — keep them in sync.
+Tags are maintained from the events that change them — application create /
+stage change / delete / move and vacancy owner change — and recomputed set-based
+at commit (see the EVENTS section below); card reads never write. An hourly
+:func:`check_drift` in ``main.py`` repairs whatever bypassed the ORM.
+
+This module is the SINGLE source of truth for the computation: the per-entity
+:func:`compute_hr_tags` and the set-based :func:`rebuild_hr_tags` (events,
+migration, ``start.sh`` backfill) express the same rule — keep them in sync.
 """
 import logging
+from typing import Iterable, Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import delete, event, func, insert, inspect, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from ..models.database import Entity, User, VacancyApplication, ApplicationStage, Vacancy
+from ..models.database import (
+    Entity, EntityHrTag, User, VacancyApplication, ApplicationStage, Vacancy,
+)
+from .metrics import HR_TAGS_DRIFT, HR_TAGS_RECOMPUTED, query_label
 
 logger = logging.getLogger("hr-analyzer.hr_tags")
 
@@ -27,7 +40,7 @@ logger = logging.getLogger("hr-analyzer.hr_tags")
 # не порождает метку. Любая другая стадия = активная воронка → метка.
 INACTIVE_STAGES = (ApplicationStage.rejected, ApplicationStage.withdrawn)
 
-# Ключ в extra_data, где живут авто-метки HR (read-only массив [{hr_id, name}]).
+# Ключ extra_data, под которым метки отдаются в карточке (entity_extras.attach).
 EXTRA_KEY = "system_hr_tags"
 
 
@@ -69,53 +82,45 @@ async def compute_hr_tags(db: AsyncSession, entity_id: int) -> list[dict]:
 async def sync_for_entity(
     db: AsyncSession, entity_id: int, *, commit: bool = True
 ) -> bool:
-    """Пересчитывает ``system_hr_tags`` кандидата и пишет в ``extra_data``.
+    """Пересчитывает HR-метки кандидата и приводит к ним строки ``entity_hr_tags``.
 
-    Diff-guard: если набор HR не изменился — НИЧЕГО не пишем и не коммитим, так
-    что горячий путь (self-heal при каждом открытии карточки) остаётся
-    фактически read-only. Возвращает ``True``, если данные поменялись.
+    Поштучный эквивалент :func:`rebuild_hr_tags` (тесты, :func:`backfill_all`);
+    в рабочих путях метки ведут события сессии. Diff-guard: если набор
+    (HR, воронка) не изменился — НИЧЕГО не пишем и не коммитим. Возвращает
+    ``True``, если данные поменялись.
 
-    ``version`` (optimistic-lock) НЕ трогаем намеренно: это служебная
-    синхронизация, а не пользовательская правка — она не должна конфликтовать с
-    параллельным редактированием карточки.
+    Строку кандидата не трогаем и не блокируем: метки — отдельные строки, так
+    что пересчёт больше не может затереть параллельно добавленные заметки
+    (раньше весь extra_data перезаписывался под FOR UPDATE). ``version``
+    (optimistic-lock) тем более не меняется.
     """
-    entity = await db.get(Entity, entity_id)
-    if entity is None:
+    if await db.get(Entity, entity_id) is None:
         return False
 
     new_tags = await compute_hr_tags(db, entity_id)
-    current = (entity.extra_data or {}).get(EXTRA_KEY) or []
+    wanted = {(t["hr_id"], t["vacancy_id"]) for t in new_tags}
+    current = set((await db.execute(
+        select(EntityHrTag.hr_id, EntityHrTag.vacancy_id).where(EntityHrTag.entity_id == entity_id)
+    )).all())
 
-    if current == new_tags:
+    if current == wanted:
         return False
 
-    # Дошли до реальной записи — БЕРЁМ строку под FOR UPDATE и перечитываем СВЕЖИЙ
-    # extra_data. Иначе reassign блоба затрёт заметки/правки, добавленные параллельно
-    # между нашим первым чтением и коммитом: это и есть первопричина «пропали
-    # некоторые комментарии» — self-heal HR-тегов запускается на каждом открытии
-    # карточки, а при переводе в отдел набор HR меняется, и он реально пишет старый
-    # snapshot поверх свежего. Diff-guard выше оставляет горячий путь read-only без
-    # лока; лок берём только когда действительно есть что писать.
-    locked = (await db.execute(
-        select(Entity).where(Entity.id == entity_id).with_for_update()
-    )).scalar_one_or_none()
-    if locked is None:
-        return False
-    # Пересчёт под локом — набор HR мог измениться, пока ждали блокировку.
-    new_tags = await compute_hr_tags(db, entity_id)
-    merged = dict(locked.extra_data or {})
-    if (merged.get(EXTRA_KEY) or []) == new_tags:
-        return False  # кто-то уже записал те же теги — второй проход не нужен
-    # Reassign целиком (не in-place мутация) — только так SQLAlchemy замечает
-    # изменение JSON-колонки (тот же приём, что crud.update_entity).
-    if new_tags:
-        merged[EXTRA_KEY] = new_tags
-    else:
-        merged.pop(EXTRA_KEY, None)  # нет активных HR → убираем ключ совсем
-    locked.extra_data = merged
+    stale = current - wanted
+    if stale:
+        await db.execute(
+            delete(EntityHrTag).where(
+                EntityHrTag.entity_id == entity_id,
+                tuple_(EntityHrTag.hr_id, EntityHrTag.vacancy_id).in_(stale),
+            )
+        )
+    for hr_id, vacancy_id in sorted(wanted - current):
+        db.add(EntityHrTag(entity_id=entity_id, hr_id=hr_id, vacancy_id=vacancy_id))
 
     if commit:
         await db.commit()
+    else:
+        await db.flush()
     logger.info(
         "HR-tags synced for entity %s: %s",
         entity_id,
@@ -124,11 +129,168 @@ async def sync_for_entity(
     return True
 
 
+# Сколько кандидатов пересчитываем одним DELETE + INSERT … SELECT
+REBUILD_BATCH = 500
+
+
+def _expected_pairs():
+    """SELECT (entity_id, hr_id, vacancy_id) по правилу :func:`compute_hr_tags`."""
+    effective_hr = func.coalesce(VacancyApplication.created_by, Vacancy.created_by)
+    return (
+        select(
+            VacancyApplication.entity_id.label("entity_id"),
+            effective_hr.label("hr_id"),
+            Vacancy.id.label("vacancy_id"),
+        )
+        .select_from(VacancyApplication)
+        .join(Vacancy, Vacancy.id == VacancyApplication.vacancy_id)
+        .join(User, User.id == effective_hr)
+        .where(VacancyApplication.stage.not_in(INACTIVE_STAGES))
+        .distinct()
+    )
+
+
+def rebuild_hr_tags(connection, entity_ids: Optional[Iterable[int]] = None) -> int:
+    """Set-based пересчёт ``entity_hr_tags``: DELETE + INSERT … SELECT по тому же
+    правилу, что :func:`compute_hr_tags`, пачками по ``REBUILD_BATCH`` кандидатов.
+
+    Синхронный (события сессии, миграция, start.sh через ``run_sync``).
+    ``entity_ids=None`` — все кандидаты. Возвращает число вставленных меток.
+    """
+    table = EntityHrTag.__table__
+    columns = ["entity_id", "hr_id", "vacancy_id"]
+    if entity_ids is None:
+        connection.execute(delete(table))
+        return connection.execute(insert(table).from_select(columns, _expected_pairs())).rowcount or 0
+
+    ids = sorted({eid for eid in entity_ids if eid is not None})
+    inserted = 0
+    for i in range(0, len(ids), REBUILD_BATCH):
+        chunk = ids[i:i + REBUILD_BATCH]
+        connection.execute(delete(table).where(table.c.entity_id.in_(chunk)))
+        source = _expected_pairs().where(VacancyApplication.entity_id.in_(chunk))
+        inserted += connection.execute(insert(table).from_select(columns, source)).rowcount or 0
+    return inserted
+
+
+def refresh(connection, entity_ids: Iterable[int] = (), vacancy_ids: Iterable[int] = (),
+            *, source: str = "event") -> int:
+    """Пересчитать метки кандидатов + всех кандидатов воронок ``vacancy_ids``
+    (сменился владелец — меняется fallback-HR). Синхронно. Возвращает число
+    пересчитанных кандидатов."""
+    ids = {eid for eid in entity_ids if eid is not None}
+    vacancy_ids = [vid for vid in vacancy_ids if vid is not None]
+    if vacancy_ids:
+        ids.update(connection.execute(
+            select(VacancyApplication.entity_id).where(VacancyApplication.vacancy_id.in_(vacancy_ids))
+            .union(select(EntityHrTag.entity_id).where(EntityHrTag.vacancy_id.in_(vacancy_ids)))
+        ).scalars().all())
+    if not ids:
+        return 0
+    rebuild_hr_tags(connection, ids)
+    HR_TAGS_RECOMPUTED.inc(source, amount=len(ids))
+    return len(ids)
+
+
+# ============================================================================
+# EVENTS: метки пересчитываются там, где меняются их входы
+# ============================================================================
+#
+# Входы правила — заявки (создание, этап, created_by, перенос между воронками,
+# удаление) и владелец воронки (Vacancy.created_by). after_flush копит
+# затронутых кандидатов/воронки в session.info, before_commit пересчитывает их
+# одной пачкой в той же транзакции — карточка на чтении уже ничего не пишет.
+# Имена HR и вакансий подтягиваются при чтении (entity_extras.attach), так что
+# переименование пересчёта не требует. Bulk UPDATE/DELETE по заявкам и
+# вакансиям строк не называет: такие места зовут mark_stale() сами
+# (recruiter_transfer), остальное ловит периодический check_drift().
+
+_PENDING = "hr_tags_pending"
+_APPLICATION_FIELDS = ("entity_id", "vacancy_id", "stage", "created_by")
+
+
+def mark_stale(session, entity_ids: Iterable[int] = (), vacancy_ids: Iterable[int] = ()) -> None:
+    """Пересчитать метки этих кандидатов / воронок при коммите сессии."""
+    entities, vacancies = session.info.setdefault(_PENDING, (set(), set()))
+    entities.update(eid for eid in entity_ids if eid is not None)
+    vacancies.update(vid for vid in vacancy_ids if vid is not None)
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def _after_flush(session, flush_context) -> None:
+    entities, vacancies = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, VacancyApplication):
+            if obj in session.dirty and not _changed(obj, _APPLICATION_FIELDS):
+                continue
+            entities.add(obj.entity_id)
+            entities.update(inspect(obj).attrs.entity_id.history.deleted)
+        elif isinstance(obj, Vacancy):
+            if obj in session.dirty and _changed(obj, ("created_by",)):
+                vacancies.add(obj.id)
+    if entities or vacancies:
+        mark_stale(session, entities, vacancies)
+
+
+def _before_commit(session) -> None:
+    if any(isinstance(o, (VacancyApplication, Vacancy)) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.flush()
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    entities, vacancies = pending
+    refresh(session.connection(), entities, vacancies)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def register_hr_tags_events() -> None:
+    """Подписать пересчёт HR-меток на события сессий (идемпотентно)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("before_commit", _before_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+# ============================================================================
+# DRIFT CHECK
+# ============================================================================
+
+async def check_drift(db: AsyncSession, *, repair: bool = True) -> int:
+    """Сверить entity_hr_tags с правилом целиком (две EXCEPT-выборки) и, если
+    ``repair``, пересчитать разошедшихся кандидатов. Ловит то, мимо чего прошли
+    события: bulk-апдейты, сырой SQL, ручные правки базы. Возвращает число
+    разошедшихся кандидатов (оно же — gauge ``hr_tags_drift_entities``)."""
+    expected = _expected_pairs()
+    actual = select(EntityHrTag.entity_id, EntityHrTag.hr_id, EntityHrTag.vacancy_id)
+    drifted = set()
+    with query_label("hr_tags.drift"):
+        for diff in (expected.except_(actual), actual.except_(expected)):
+            sub = diff.subquery()
+            drifted.update((await db.execute(select(sub.c.entity_id).distinct())).scalars().all())
+    HR_TAGS_DRIFT.set(len(drifted))
+    if drifted and repair:
+        conn = await db.connection()
+        await conn.run_sync(lambda c: refresh(c, drifted, source="drift"))
+        await db.commit()
+        logger.warning("HR-tags drift repaired on %d candidates", len(drifted))
+    return len(drifted)
+
+
 async def backfill_all(db: AsyncSession) -> int:
-    """Пересчитывает ``system_hr_tags`` для всех кандидатов с заявками.
+    """Пересчитывает HR-метки всех кандидатов с заявками (по одному).
 
     Возвращает число изменённых сущностей. Используется тестами и как
-    Python-эквивалент SQL-бэкафилла из ``start.sh`` (тот же результат).
+    поштучный эквивалент :func:`rebuild_hr_tags` (тот же результат).
     """
     rows = await db.execute(select(VacancyApplication.entity_id).distinct())
     entity_ids = [r[0] for r in rows.all() if r[0] is not None]
@@ -139,3 +301,6 @@ async def backfill_all(db: AsyncSession) -> int:
             changed += 1
     await db.commit()
     return changed
+
+
+register_hr_tags_events()
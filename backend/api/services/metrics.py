@@ -0,0 +1,514 @@
+"""Метрики приложения в формате Prometheus (GET /metrics).
+
+Что видно:
+- http_request_duration_seconds{method,route,status} — латентность по шаблону
+  роута (/api/chats/{chat_id}, а не конкретный id — иначе взрыв кардинальности);
+- db_pool_* — занятость пула SQLAlchemy (pool_size=20 + max_overflow=30) и время
+  ожидания свободного коннекта;
+- db_query_duration_seconds{label} — время SQL по метке из query_label()
+  (без метки — по шаблону роута запроса);
+- cache_requests_total{cache,result} — попадания/промахи кэшей;
+- ai_request_duration_seconds / ai_tokens_total — вызовы Claude/OpenAI/Whisper
+  по сервису (модуль, откуда позвали) и модели;
+- background_jobs{queue,status} — глубина фоновых очередей (parse_jobs, звонки,
+  импорты чатов), считается при скрейпе.
+
+Реестр свой, на пару сотен строк: формат экспозиции простой, а зависимость
+prometheus_client ради него не нужна. Запись на горячем пути — поиск в dict,
+bisect по бакетам и пара сложений, без локов (GIL + однопоточный event loop;
+редкие гонки из to_thread-вызовов для счётчиков метрик допустимы).
+"""
+import asyncio
+import logging
+import math
+import sys
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("hr-analyzer.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Бакеты латентности HTTP/SQL/AI (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}_total{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Гауж; с callback значения берутся в момент скрейпа (список (labels, value))."""
+    type = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Iterable[Tuple[Tuple, float]]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labelvalues) -> None:
+        self._values[labelvalues] = value
+
+    def set_all(self, values: Dict[Tuple, float]) -> None:
+        """Заменить все серии разом (сборщик при скрейпе: пропавший статус уходит)."""
+        self._values = dict(values)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        items = list(self._values.items())
+        if self.callback is not None:
+            try:
+                items = list(self.callback())
+            except Exception as e:
+                logger.debug(f"gauge {self.name} callback failed: {e}")
+                items = []
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count по бакетам (+Inf последним)..., sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues) -> None:
+        row = self._values.get(labelvalues)
+        if row is None:
+            row = self._values.setdefault(labelvalues, [0] * (len(self.buckets) + 1) + [0.0])
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def count(self, *labelvalues) -> int:
+        row = self._values.get(labelvalues)
+        return sum(row[:-1]) if row else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, row in list(self._values.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), row[:-1]):
+                cumulative += n
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Асинхронные сборщики (DB-запросы при скрейпе): вызываются до рендера
+        self._collectors: List[Callable] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable) -> None:
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    async def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                await collector()
+            except Exception as e:
+                logger.warning(f"metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# --- HTTP -----------------------------------------------------------------------
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+
+
+def route_label(scope: dict) -> str:
+    """Шаблон роута из scope (FastAPI кладёт сматченный APIRoute в scope['route'])."""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or "unmatched"
+
+
+def bind_request_scope(scope: dict) -> None:
+    """Запомнить scope запроса: SQL без явной метки подписывается шаблоном роута
+    (роутер кладёт scope['route'] в этот же dict уже после middleware)."""
+    _request_scope.set(scope)
+
+
+def observe_request(scope: dict, method: str, status_code: int, duration_s: float) -> None:
+    HTTP_LATENCY.observe(duration_s, method, route_label(scope), str(status_code))
+
+
+# --- DB ---------------------------------------------------------------------------
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by query label", ("label",),
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", (),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+
+_query_label: ContextVar[Optional[str]] = ContextVar("query_label", default=None)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("metrics_request_scope", default=None)
+
+
+def current_query_label() -> str:
+    """Явная метка из query_label(), иначе «route:<шаблон роута>», вне запроса — other."""
+    label = _query_label.get()
+    if label:
+        return label
+    scope = _request_scope.get()
+    if scope is not None and scope.get("route") is not None:
+        return "route:" + route_label(scope)
+    return "other"
+
+
+@contextmanager
+def query_label(label: str):
+    """Пометить SQL внутри блока: `with query_label("kanban.board"): ...`."""
+    token = _query_label.set(label)
+    try:
+        yield
+    finally:
+        _query_label.reset(token)
+
+
+# Движок приложения, чей пул показываем (первый прошедший instrument_engine)
+_pool_engine = None
+
+
+def _pool_stats() -> Iterable[Tuple[Tuple, float]]:
+    if _pool_engine is None:
+        return
+    pool = _pool_engine.pool
+    for name in ("size", "checkedout", "overflow", "checkedin"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            yield (name,), float(fn())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if starts:
+        DB_QUERY_LATENCY.observe(time.perf_counter() - starts.pop(), current_query_label())
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def instrument_engine(engine) -> None:
+    """Таймеры SQL по меткам + гаужи пула. Вызывается в api/database.py (идемпотентно)."""
+    global _pool_engine
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if _pool_engine is None:
+        _pool_engine = sync_engine
+    for name, fn in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(sync_engine, name, fn):
+            event.listen(sync_engine, name, fn)
+
+
+DB_POOL = Gauge(
+    "db_pool_connections", "SQLAlchemy pool state (size/checkedout/overflow/checkedin)",
+    ("state",), callback=_pool_stats,
+)
+
+
+def instrumented_pool_class(base):
+    """Подкласс пула, который меряет ожидание свободного коннекта (pool_timeout)."""
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+# --- Кэши -------------------------------------------------------------------------
+
+CACHE_REQUESTS = Counter(
+    "cache_requests", "Cache lookups by cache and result (hit/miss)", ("cache", "result"),
+)
+
+
+def cache_result(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+# --- AI ---------------------------------------------------------------------------
+
+AI_LATENCY = Histogram(
+    "ai_request_duration_seconds", "AI provider call latency",
+    ("provider", "service", "model", "operation", "outcome"), buckets=AI_BUCKETS,
+)
+AI_TOKENS = Counter(
+    "ai_tokens", "AI tokens by direction", ("provider", "service", "model", "direction"),
+)
+
+
+def _caller_service(depth: int = 2) -> str:
+    """Короткое имя модуля, откуда позвали SDK: api.services.entity_ai → entity_ai."""
+    try:
+        module = sys._getframe(depth).f_globals.get("__name__", "")
+    except ValueError:
+        return "unknown"
+    return module.rsplit(".", 1)[-1] or "unknown"
+
+
+def record_ai_call(provider: str, service: str, model: str, operation: str,
+                   duration_s: float, outcome: str, usage=None) -> None:
+    model = model or "unknown"
+    AI_LATENCY.observe(duration_s, provider, service, model, operation, outcome)
+    if usage is None:
+        return
+    # Anthropic: input_tokens/output_tokens; OpenAI: prompt_tokens/completion_tokens
+    for direction, attrs in (("input", ("input_tokens", "prompt_tokens")),
+                             ("output", ("output_tokens", "completion_tokens"))):
+        for attr in attrs:
+            value = getattr(usage, attr, None)
+            if isinstance(value, (int, float)):
+                AI_TOKENS.inc(provider, service, model, direction, amount=value)
+                break
+
+
+def _wrap_async(fn, provider: str, operation: str):
+    async def wrapper(self, *args, **kwargs):
+        service = _caller_service()
+        start = time.perf_counter()
+        outcome, usage = "error", None
+        try:
+            result = await fn(self, *args, **kwargs)
+            outcome, usage = "ok", getattr(result, "usage", None)
+            return result
+        finally:
+            record_ai_call(provider, service, kwargs.get("model"), operation,
+                           time.perf_counter() - start, outcome, usage)
+    wrapper._metrics_original = fn
+    return wrapper
+
+
+def _wrap_sync(fn, provider: str, operation: str):
+    def wrapper(self, *args, **kwargs):
+        service = _caller_service()
+        start = time.perf_counter()
+        outcome, usage = "error", None
+        try:
+            result = fn(self, *args, **kwargs)
+            outcome, usage = "ok", getattr(result, "usage", None)
+            return result
+        finally:
+            record_ai_call(provider, service, kwargs.get("model"), operation,
+                           time.perf_counter() - start, outcome, usage)
+    wrapper._metrics_original = fn
+    return wrapper
+
+
+class _TimedStreamManager:
+    """Обёртка над AsyncMessageStreamManager: время от открытия до закрытия стрима."""
+
+    def __init__(self, manager, service: str, model: str):
+        self._manager = manager
+        self._service = service
+        self._model = model
+        self._start = 0.0
+        self._stream = None
+
+    async def __aenter__(self):
+        self._start = time.perf_counter()
+        self._stream = await self._manager.__aenter__()
+        return self._stream
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self._manager.__aexit__(exc_type, exc, tb)
+        finally:
+            snapshot = getattr(self._stream, "current_message_snapshot", None)
+            record_ai_call("anthropic", self._service, self._model, "messages.stream",
+                           time.perf_counter() - self._start,
+                           "error" if exc_type else "ok", getattr(snapshot, "usage", None))
+
+    def __getattr__(self, name):
+        return getattr(self._manager, name)
+
+
+def _wrap_stream(fn):
+    def wrapper(self, *args, **kwargs):
+        return _TimedStreamManager(fn(self, *args, **kwargs), _caller_service(), kwargs.get("model"))
+    wrapper._metrics_original = fn
+    return wrapper
+
+
+def _patch(cls, attr: str, make) -> None:
+    original = getattr(cls, attr, None)
+    if original is None or hasattr(original, "_metrics_original"):
+        return
+    setattr(cls, attr, make(original))
+
+
+def instrument_ai_clients() -> None:
+    """Обернуть методы SDK (один раз на процесс): все ~20 мест вызова Claude/OpenAI
+    в сервисах получают метрики без правок. Отсутствующий SDK — пропускаем."""
+    try:
+        from anthropic.resources.messages import AsyncMessages, Messages
+        _patch(AsyncMessages, "create", lambda f: _wrap_async(f, "anthropic", "messages.create"))
+        _patch(Messages, "create", lambda f: _wrap_sync(f, "anthropic", "messages.create"))
+        _patch(AsyncMessages, "stream", _wrap_stream)
+    except ImportError:
+        pass
+    try:
+        from openai.resources.audio.transcriptions import AsyncTranscriptions, Transcriptions
+        from openai.resources.chat.completions import AsyncCompletions, Completions
+        from openai.resources.embeddings import AsyncEmbeddings, Embeddings
+        for cls, op in ((AsyncTranscriptions, "audio.transcriptions"), (AsyncCompletions, "chat.completions"),
+                        (AsyncEmbeddings, "embeddings")):
+            _patch(cls, "create", lambda f, op=op: _wrap_async(f, "openai", op))
+        for cls, op in ((Transcriptions, "audio.transcriptions"), (Completions, "chat.completions"),
+                        (Embeddings, "embeddings")):
+            _patch(cls, "create", lambda f, op=op: _wrap_sync(f, "openai", op))
+    except ImportError:
+        pass
+
+
+# --- HR-метки (services/hr_tags.py) ---------------------------------------------------
+
+HR_TAGS_RECOMPUTED = Counter(
+    "hr_tags_recomputed_entities_total", "Candidates whose HR tags were recomputed, by trigger", ("source",),
+)
+HR_TAGS_DRIFT = Gauge(
+    "hr_tags_drift_entities", "Candidates whose HR tags were out of sync at the last drift check", (),
+)
+
+
+# --- Фоновые очереди ----------------------------------------------------------------
+
+BACKGROUND_JOBS = Gauge(
+    "background_jobs", "Queued/running background jobs by queue and status", ("queue", "status"),
+)
+EVENT_LOOP_TASKS = Gauge(
+    "event_loop_tasks", "asyncio tasks alive in this process", (),
+    callback=lambda: [((), float(len(asyncio.all_tasks())))],
+)
+
+# Скрейп раз в 15-30 с; чаще базу не трогаем
+_QUEUE_TTL_SECONDS = 10.0
+_queue_checked_at = 0.0
+
+
+async def collect_queue_depths() -> None:
+    global _queue_checked_at
+    if time.monotonic() - _queue_checked_at < _QUEUE_TTL_SECONDS:
+        return
+    _queue_checked_at = time.monotonic()
+
+    from sqlalchemy import func, select
+    from ..database import AsyncSessionLocal
+    from ..models.database import (
+        CallRecording, CallStatus, ChatImportJob, FormSubmission, ParseJob, ParseJobStatus,
+    )
+
+    queues = (
+        ("parse_jobs", ParseJob.status, (ParseJobStatus.pending, ParseJobStatus.processing)),
+        ("calls", CallRecording.status, (
+            CallStatus.pending, CallStatus.processing, CallStatus.transcribing, CallStatus.analyzing,
+        )),
+        ("chat_imports", ChatImportJob.status, ("processing",)),
+        ("form_intake", FormSubmission.processing_status, ("pending", "processing", "error")),
+    )
+    values = {}
+    async with AsyncSessionLocal() as db:
+        with query_label("metrics.queues"):
+            for queue, column, statuses in queues:
+                for status in statuses:
+                    values[(queue, getattr(status, "value", status))] = 0
+                rows = await db.execute(
+                    select(column, func.count()).where(column.in_(statuses)).group_by(column)
+                )
+                for status, count in rows.all():
+                    values[(queue, getattr(status, "value", status))] = count
+    BACKGROUND_JOBS.set_all(values)
+
+
+REGISTRY.add_collector(collect_queue_depths)
@@ -0,0 +1,430 @@
+"""Иерархия org_units (closure-таблица) + кэш контекста сотрудника для хаба доступов.
+
+Хаб доступов на каждом экране (/available, /requests, создание заявки)
+выяснял про пользователя одно и то же по кусочку: роль в организации
+(OrgMember), запись сотрудника (Employee), активную кастомную роль, статус
+практики из Entity.extra_data и компанию холдинга — подъёмом по
+OrgUnit.parent_id по одному SELECT на уровень (до 10). Итого 6-15 запросов,
+ещё до каталога.
+
+Теперь:
+- org_unit_closure хранит все пары (предок, потомок, глубина). Пересчёт —
+  целиком по организации (дерево — десятки узлов) в том же flush, где
+  изменился OrgUnit, так что замыкание всегда согласовано с деревом;
+- AccessContext — всё про пользователя в организации ОДНИМ запросом
+  (users ⟕ org_members ⟕ employees ⟕ entities ⟕ closure): цепочка отделов
+  от компании вниз, роль, статус сотрудника, условия разблокировки;
+- снимки живут в процессном TTL-кэше (CACHE_TTL_PRINCIPAL — тот же бюджет
+  устаревания, что у принципала). Правки OrgMember/Employee/UserCustomRole
+  через ORM сбрасывают запись пользователя после commit, CustomRole/OrgUnit
+  и bulk-операции — весь кэш. Между воркерами — поколение access_ctx:gen в
+  Redis; без Redis остальное добивает TTL.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, insert, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models.database import (
+    CustomRole, Employee, Entity, OrgMember, OrgRole, OrgUnit, OrgUnitClosure,
+    User, UserCustomRole,
+)
+from .metrics import cache_result, query_label
+
+logger = logging.getLogger("hr-analyzer.org_hierarchy")
+
+_GEN_KEY = "access_ctx:gen"
+
+_MAX_ENTRIES = 4096
+
+# Ключи extra_data, по которым Prometheus отмечает успешную практику
+# (см. services/prometheus_status.STATUS_CODE_MAP)
+_PROMETHEUS_KEYS = ("prometheus_status", "prometheus_status_code")
+
+
+# --- Замыкание дерева ---------------------------------------------------------
+
+def closure_rows(parents: Dict[int, Optional[int]], org_id: int) -> List[dict]:
+    """Строки замыкания для дерева {unit_id: parent_id}. Цикл в кривых данных
+    обрывается на повторе, родитель вне дерева считается корнем."""
+    rows = []
+    for unit_id in parents:
+        node, depth, seen = unit_id, 0, set()
+        while node is not None and node in parents and node not in seen:
+            seen.add(node)
+            rows.append({"ancestor_id": node, "descendant_id": unit_id, "org_id": org_id, "depth": depth})
+            node, depth = parents[node], depth + 1
+    return rows
+
+
+def _rebuild_closure(connection, org_ids: Optional[Iterable[int]] = None) -> None:
+    """Пересчитать замыкание для организаций (None — для всех). Синхронно: зовётся
+    из событий flush и через AsyncConnection.run_sync."""
+    units = select(OrgUnit.id, OrgUnit.parent_id, OrgUnit.org_id)
+    stale = delete(OrgUnitClosure)
+    if org_ids is not None:
+        org_ids = list(org_ids)
+        if not org_ids:
+            return
+        units = units.where(OrgUnit.org_id.in_(org_ids))
+        stale = stale.where(OrgUnitClosure.org_id.in_(org_ids))
+
+    by_org: Dict[int, Dict[int, Optional[int]]] = {}
+    for unit_id, parent_id, org_id in connection.execute(units).all():
+        by_org.setdefault(org_id, {})[unit_id] = parent_id
+    connection.execute(stale)
+    rows = [row for org_id, parents in by_org.items() for row in closure_rows(parents, org_id)]
+    if rows:
+        connection.execute(insert(OrgUnitClosure), rows)
+
+
+async def rebuild_org_closure(db: AsyncSession, org_id: Optional[int] = None) -> None:
+    """Пересчитать замыкание (скрипты, сырой SQL по org_units). Коммитит вызывающий."""
+    conn = await db.connection()
+    await conn.run_sync(_rebuild_closure, None if org_id is None else [org_id])
+    clear_access_context_cache()
+
+
+# Однократная проверка на процесс: таблица замыкания появилась через
+# create_all на живой базе и пуста — достроить, а не отдавать пустые цепочки
+_closure_checked = False
+
+
+async def _ensure_closure(db: AsyncSession) -> None:
+    global _closure_checked
+    if _closure_checked:
+        return
+    has_closure = (await db.execute(select(OrgUnitClosure.ancestor_id).limit(1))).first()
+    if has_closure is None and (await db.execute(select(OrgUnit.id).limit(1))).first() is not None:
+        logger.info("org_unit_closure is empty, rebuilding")
+        await rebuild_org_closure(db)
+        await db.commit()
+    _closure_checked = True
+
+
+# --- Контекст пользователя ----------------------------------------------------
+
+@dataclass(frozen=True)
+class AccessContext:
+    """Пользователь в организации глазами хаба доступов."""
+    user_id: int
+    org_id: int
+    org_role: Optional[OrgRole] = None
+    # Запись сотрудника в ЭТОЙ организации: None — записи нет (владелец/админ
+    # не в штате), иначе Employee.is_active
+    employee_active: Optional[bool] = None
+    entity_id: Optional[int] = None
+    prometheus_accepted: bool = False
+    role_id: Optional[int] = None
+    # Отделы от компании холдинга (корня) вниз до отдела сотрудника
+    unit_chain: Tuple[int, ...] = ()
+
+    @property
+    def is_org_admin(self) -> bool:
+        return self.org_role in (OrgRole.owner, OrgRole.admin)
+
+    @property
+    def is_active(self) -> bool:
+        """Работает ли прямо сейчас. Нет записи сотрудника — не нарушение."""
+        return True if self.employee_active is None else self.employee_active
+
+    @property
+    def company_unit_id(self) -> Optional[int]:
+        return self.unit_chain[0] if self.unit_chain else None
+
+    @property
+    def unlock_state(self) -> Dict[str, bool]:
+        return {
+            "always": True,
+            "in_staff": bool(self.employee_active),
+            "prometheus_accepted": self.prometheus_accepted,
+        }
+
+
+@dataclass
+class _Entry:
+    context: AccessContext
+    generation: Optional[str]
+    expires_at: float
+
+
+_cache: Dict[Tuple[int, int], _Entry] = {}
+_admins: Dict[int, Tuple[Tuple[int, ...], Optional[str], float]] = {}
+
+
+async def _shared_generation() -> Optional[str]:
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(_GEN_KEY) or "0"
+    except Exception as e:
+        logger.debug(f"access context generation lookup failed: {e}")
+        return None
+
+
+def _store(key: Tuple[int, int], entry: _Entry) -> None:
+    _cache.pop(key, None)
+    if len(_cache) >= _MAX_ENTRIES:
+        now = time.monotonic()
+        for stale in [k for k, v in _cache.items() if v.expires_at <= now]:
+            del _cache[stale]
+        while len(_cache) >= _MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+    _cache[key] = entry
+
+
+def _context_query(user_id: int, org_id: int):
+    active_role = (
+        select(UserCustomRole.role_id)
+        .join(CustomRole, CustomRole.id == UserCustomRole.role_id)
+        .where(UserCustomRole.user_id == User.id, CustomRole.is_active.is_(True))
+        .order_by(UserCustomRole.assigned_at.desc())
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            OrgMember.role,
+            Employee.org_id,
+            Employee.is_active,
+            Employee.org_unit_id,
+            Employee.entity_id,
+            Entity.extra_data[_PROMETHEUS_KEYS[0]].as_string(),
+            Entity.extra_data[_PROMETHEUS_KEYS[1]].as_string(),
+            active_role,
+            OrgUnitClosure.ancestor_id,
+        )
+        .select_from(User)
+        .outerjoin(OrgMember, and_(OrgMember.user_id == User.id, OrgMember.org_id == org_id))
+        .outerjoin(Employee, Employee.user_id == User.id)
+        .outerjoin(Entity, Entity.id == Employee.entity_id)
+        .outerjoin(OrgUnitClosure, OrgUnitClosure.descendant_id == Employee.org_unit_id)
+        .where(User.id == user_id)
+        .order_by(OrgUnitClosure.depth.desc())
+    )
+
+
+async def _load(user_id: int, org_id: int, db: AsyncSession) -> AccessContext:
+    with query_label("access_hub.context"):
+        rows = (await db.execute(_context_query(user_id, org_id))).all()
+    if not rows:
+        return AccessContext(user_id=user_id, org_id=org_id)
+
+    org_role, emp_org_id, emp_active, unit_id, entity_id, status, status_code, role_id, _ = rows[0]
+    chain = tuple(r[-1] for r in rows if r[-1] is not None)
+    if unit_id and not chain:
+        chain = (unit_id,)
+    in_org = emp_org_id == org_id
+    return AccessContext(
+        user_id=user_id,
+        org_id=org_id,
+        org_role=org_role,
+        employee_active=bool(emp_active) if in_org else None,
+        entity_id=entity_id,
+        prometheus_accepted=in_org and bool(entity_id) and (
+            status == "Принят" or status_code == "ACCEPTED"
+        ),
+        role_id=role_id,
+        unit_chain=chain,
+    )
+
+
+async def get_access_context(user_id: int, org_id: int, db: AsyncSession) -> AccessContext:
+    """Контекст пользователя в организации: из кэша или одним запросом."""
+    await _ensure_closure(db)
+    ttl = get_settings().cache_ttl_principal
+    generation = await _shared_generation() if ttl > 0 else None
+    key = (org_id, user_id)
+
+    entry = _cache.get(key)
+    hit = entry is not None and entry.expires_at > time.monotonic() and entry.generation == generation
+    cache_result("access_context", hit)
+    if hit:
+        return entry.context
+
+    context = await _load(user_id, org_id, db)
+    if ttl > 0:
+        _store(key, _Entry(context, generation, time.monotonic() + ttl))
+    return context
+
+
+async def org_admin_ids(org_id: int, db: AsyncSession) -> List[int]:
+    """Владельцы и админы организации — запасные адресаты заявок."""
+    ttl = get_settings().cache_ttl_principal
+    generation = await _shared_generation() if ttl > 0 else None
+    cached = _admins.get(org_id)
+    hit = cached is not None and cached[2] > time.monotonic() and cached[1] == generation
+    cache_result("access_context", hit)
+    if hit:
+        return list(cached[0])
+
+    with query_label("access_hub.admins"):
+        ids = tuple((await db.execute(
+            select(OrgMember.user_id).where(
+                OrgMember.org_id == org_id,
+                OrgMember.role.in_([OrgRole.owner, OrgRole.admin]),
+            )
+        )).scalars().all())
+    if ttl > 0:
+        _admins[org_id] = (ids, generation, time.monotonic() + ttl)
+    return list(ids)
+
+
+def clear_access_context_cache() -> None:
+    """Полный сброс локального кэша (тесты, bulk-операции)."""
+    global _closure_checked
+    _cache.clear()
+    _admins.clear()
+    _closure_checked = False
+
+
+# Ссылки на фоновые бампы поколения: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+
+
+async def drain() -> None:
+    """Дождаться отложенных бампов поколения (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+async def _bump_shared_generation() -> None:
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return
+    try:
+        await client.incr(_GEN_KEY)
+        await client.expire(_GEN_KEY, max(get_settings().cache_ttl_principal * 4, 60))
+    except Exception as e:
+        logger.warning(f"access context generation bump failed: {e}")
+
+
+def invalidate_access_context(*user_ids: int, entity_ids: Iterable[int] = ()) -> None:
+    """Сбросить контекст пользователей (и тех, чья карточка — entity_ids) во всех
+    воркерах. Без аргументов — весь кэш. Сырой SQL событий сессии не порождает —
+    такой код зовёт это сам после commit."""
+    ids, entities = set(user_ids), set(entity_ids)
+    if not ids and not entities:
+        _cache.clear()
+        _admins.clear()
+    else:
+        for key in [k for k, v in _cache.items() if k[1] in ids or v.context.entity_id in entities]:
+            del _cache[key]
+        # Роль в организации меняет и список админов — он короткий, сбрасываем весь
+        _admins.clear()
+    try:
+        task = asyncio.get_running_loop().create_task(_bump_shared_generation())
+    except RuntimeError:
+        return  # нет event loop (скрипт/миграция) — остальные воркеры доживут TTL
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+# --- События сессии -------------------------------------------------------------
+
+_PENDING = "org_hierarchy_pending"
+_PER_USER_MODELS = (OrgMember, Employee, UserCustomRole)
+
+
+def _pending(session) -> dict:
+    return session.info.setdefault(
+        _PENDING, {"orgs": set(), "users": set(), "entities": set(), "all": False, "closure_all": False}
+    )
+
+
+def _prometheus_changed(obj: Entity) -> bool:
+    history = inspect(obj).attrs.extra_data.history
+    if not history.has_changes():
+        return False
+    if not history.deleted:
+        return True  # правка на месте + flag_modified: старого значения нет
+    old, new = history.deleted[0] or {}, (history.added[0] if history.added else None) or {}
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return True
+    return any(old.get(k) != new.get(k) for k in _PROMETHEUS_KEYS)
+
+
+def _after_flush(session, flush_context) -> None:
+    pending = _pending(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, OrgUnit):
+            state = inspect(obj)
+            if obj in session.new or obj in session.deleted or state.attrs.parent_id.history.has_changes() \
+                    or state.attrs.org_id.history.has_changes():
+                pending["orgs"].update(o for o in {obj.org_id, *state.attrs.org_id.history.deleted} if o)
+                pending["all"] = True
+        elif isinstance(obj, _PER_USER_MODELS):
+            pending["users"].add(obj.user_id)
+        elif isinstance(obj, CustomRole):
+            pending["all"] = True
+        elif isinstance(obj, Entity) and obj not in session.new:
+            if obj in session.deleted or _prometheus_changed(obj):
+                pending["entities"].add(obj.id)
+
+
+def _after_flush_postexec(session, flush_context) -> None:
+    pending = session.info.get(_PENDING)
+    if pending and pending["orgs"]:
+        orgs, pending["orgs"] = pending["orgs"], set()
+        _rebuild_closure(session.connection(), orgs)
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if mapper.class_ is OrgUnit:
+        _pending(orm_execute_state.session)["closure_all"] = True
+    if mapper.class_ in (OrgUnit, CustomRole, Entity, *_PER_USER_MODELS):
+        _pending(orm_execute_state.session)["all"] = True
+
+
+def _before_commit(session) -> None:
+    pending = session.info.get(_PENDING)
+    if pending and pending["closure_all"]:
+        pending["closure_all"] = False
+        # Bulk по org_units не говорит, какие организации задеты
+        _rebuild_closure(session.connection())
+
+
+def _after_commit(session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    if pending["all"]:
+        invalidate_access_context()
+    elif pending["users"] or pending["entities"]:
+        invalidate_access_context(*pending["users"], entity_ids=pending["entities"])
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def register_org_hierarchy_events() -> None:
+    """Подписать замыкание и сброс кэша на события ORM-сессий (идемпотентно)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_flush_postexec", _after_flush_postexec),
+        ("do_orm_execute", _on_orm_execute),
+        ("before_commit", _before_commit),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+register_org_hierarchy_events()
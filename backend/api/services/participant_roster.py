@@ -0,0 +1,469 @@
+"""Индекс «кто есть кто» для распознавания участников чатов и звонков.
+
+identify_participants / identify_call_participants раньше на каждого уникального
+отправителя/спикера делали до четырёх SELECT-ов по users/entities, а на
+неопознанных — ILIKE '%имя%' по всем Entity организации с разбором в Python.
+Групповой чат на 40 человек — сотня запросов и 40 сканов.
+
+Теперь ростер собирается ОДНИМ запросом на часть и живёт в памяти процесса:
+- пользователи (глобально, как и раньше — users не привязаны к организации):
+  telegram_username, additional_telegram_usernames, telegram_id, email,
+  additional_emails;
+- Entity организации: telegram_user_id, email, нормализованное имя.
+
+Обновление инкрементальное:
+- изменения User/Entity через ORM после commit помечают строки, и при
+  следующем обращении перечитываются только они (один запрос `id IN (...)`);
+- bulk update/delete через ORM сбрасывают затронутую часть целиком (в других
+  воркерах bulk по Entity добивает TTL — организацию он не называет);
+- сырой SQL (удаление пользователя) — вызывающий зовёт invalidate_roster_users();
+- между воркерами: при наличии Redis сверяем поколение roster:gen:{scope};
+  чужое изменение → полная пересборка части, своё → ростер уже догнан.
+  Без Redis остальное добивает TTL (CACHE_TTL_ROSTER).
+
+Неоднозначные совпадения (два пользователя с одним username) раньше роняли
+scalar_one_or_none(); теперь выигрывает меньший id.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models.database import Entity, User
+from .metrics import cache_result, query_label
+
+logger = logging.getLogger("hr-analyzer.participant_roster")
+
+_GEN_KEY = "roster:gen:{scope}"
+_USERS = "users"
+
+# Ростеры организаций держим для ограниченного числа оргов (самые старые — вон)
+_MAX_ORGS = 64
+
+# Уверенность нечёткого совпадения по имени (как в participants.fuzzy_match_name)
+NAME_EXACT_CONFIDENCE = 0.95
+NAME_CONTAINS_CONFIDENCE = 0.85
+
+
+@dataclass
+class RosterUser:
+    id: int
+    name: str
+
+
+@dataclass
+class RosterEntity:
+    id: int
+    name: str
+
+
+def _add(index: Dict, key, row_id: int) -> None:
+    if key:
+        index.setdefault(key, set()).add(row_id)
+
+
+def _discard(index: Dict, key, row_id: int) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(row_id)
+        if not ids:
+            del index[key]
+
+
+def _first(index: Dict, key) -> Optional[int]:
+    ids = index.get(key) if key else None
+    return min(ids) if ids else None
+
+
+@dataclass
+class _Part:
+    """Общая часть: поколение, срок жизни и строки, ждущие перечитывания."""
+    generation: Optional[str] = None
+    expires_at: float = 0.0
+    pending: Set[int] = field(default_factory=set)
+
+
+@dataclass
+class _UserIndex(_Part):
+    rows: Dict[int, tuple] = field(default_factory=dict)
+    by_username: Dict[str, Set[int]] = field(default_factory=dict)
+    by_extra_username: Dict[str, Set[int]] = field(default_factory=dict)
+    by_telegram_id: Dict[int, Set[int]] = field(default_factory=dict)
+    by_email: Dict[str, Set[int]] = field(default_factory=dict)
+    by_extra_email: Dict[str, Set[int]] = field(default_factory=dict)
+
+    _COLUMNS = (
+        User.id, User.name, User.telegram_username, User.additional_telegram_usernames,
+        User.telegram_id, User.email, User.additional_emails,
+    )
+
+    def put(self, row) -> None:
+        self.remove(row[0])
+        user_id, _name, username, extra_usernames, telegram_id, email, extra_emails = row
+        self.rows[user_id] = tuple(row)
+        _add(self.by_username, username, user_id)
+        for value in extra_usernames or ():
+            _add(self.by_extra_username, value, user_id)
+        _add(self.by_telegram_id, telegram_id, user_id)
+        _add(self.by_email, email, user_id)
+        for value in extra_emails or ():
+            _add(self.by_extra_email, value, user_id)
+
+    def remove(self, user_id: int) -> None:
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        _, _name, username, extra_usernames, telegram_id, email, extra_emails = row
+        _discard(self.by_username, username, user_id)
+        for value in extra_usernames or ():
+            _discard(self.by_extra_username, value, user_id)
+        _discard(self.by_telegram_id, telegram_id, user_id)
+        _discard(self.by_email, email, user_id)
+        for value in extra_emails or ():
+            _discard(self.by_extra_email, value, user_id)
+
+    def user(self, user_id: Optional[int]) -> Optional[RosterUser]:
+        if user_id is None:
+            return None
+        return RosterUser(id=user_id, name=self.rows[user_id][1])
+
+
+@dataclass
+class _EntityIndex(_Part):
+    rows: Dict[int, tuple] = field(default_factory=dict)
+    by_telegram_id: Dict[int, Set[int]] = field(default_factory=dict)
+    by_email: Dict[str, Set[int]] = field(default_factory=dict)
+    by_name: Dict[str, Set[int]] = field(default_factory=dict)
+
+    _COLUMNS = (Entity.id, Entity.name, Entity.telegram_user_id, Entity.email)
+
+    def put(self, row) -> None:
+        self.remove(row[0])
+        entity_id, name, telegram_id, email = row
+        self.rows[entity_id] = (entity_id, name, telegram_id, email, (name or "").lower())
+        _add(self.by_telegram_id, telegram_id, entity_id)
+        _add(self.by_email, email, entity_id)
+        _add(self.by_name, (name or "").lower(), entity_id)
+
+    def remove(self, entity_id: int) -> None:
+        row = self.rows.pop(entity_id, None)
+        if row is None:
+            return
+        _, _name, telegram_id, email, name_lower = row
+        _discard(self.by_telegram_id, telegram_id, entity_id)
+        _discard(self.by_email, email, entity_id)
+        _discard(self.by_name, name_lower, entity_id)
+
+    def entity(self, entity_id: Optional[int]) -> Optional[RosterEntity]:
+        if entity_id is None:
+            return None
+        return RosterEntity(id=entity_id, name=self.rows[entity_id][1])
+
+
+@dataclass
+class Roster:
+    """Снимок ростера для одного прохода распознавания (org_id может быть None —
+    тогда ищем только среди пользователей системы)."""
+    users: _UserIndex
+    entities: Optional[_EntityIndex]
+
+    def match_user(
+        self,
+        username: Optional[str] = None,
+        telegram_id: Optional[int] = None,
+        email: Optional[str] = None,
+    ) -> Optional[RosterUser]:
+        """Пользователь системы: основной username → дополнительные → telegram_id;
+        для звонков — основной email → дополнительные."""
+        users = self.users
+        if username:
+            found = _first(users.by_username, username) or _first(users.by_extra_username, username)
+            if found:
+                return users.user(found)
+        if telegram_id:
+            found = _first(users.by_telegram_id, telegram_id)
+            if found:
+                return users.user(found)
+        if email:
+            return users.user(_first(users.by_email, email) or _first(users.by_extra_email, email))
+        return None
+
+    def match_entity(
+        self, telegram_id: Optional[int] = None, email: Optional[str] = None,
+    ) -> Optional[RosterEntity]:
+        if self.entities is None:
+            return None
+        if telegram_id:
+            return self.entities.entity(_first(self.entities.by_telegram_id, telegram_id))
+        if email:
+            return self.entities.entity(_first(self.entities.by_email, email))
+        return None
+
+    def match_name(self, full_name: str) -> Tuple[Optional[RosterEntity], float]:
+        """Entity, чьё имя совпадает с full_name (0.95) или содержит его (0.85),
+        без учёта регистра — то же, что ILIKE '%full_name%' с прежней оценкой."""
+        if self.entities is None or not full_name:
+            return None, 0.0
+        needle = full_name.lower()
+        exact = _first(self.entities.by_name, needle)
+        if exact:
+            return self.entities.entity(exact), NAME_EXACT_CONFIDENCE
+        best = None
+        for entity_id, _name, _tg, _email, name_lower in self.entities.rows.values():
+            if needle in name_lower and (best is None or entity_id < best):
+                best = entity_id
+        if best is None:
+            return None, 0.0
+        return self.entities.entity(best), NAME_CONTAINS_CONFIDENCE
+
+
+_users: Optional[_UserIndex] = None
+_orgs: Dict[int, _EntityIndex] = {}
+
+
+async def _shared_generation(scope) -> Optional[str]:
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(_GEN_KEY.format(scope=scope)) or "0"
+    except Exception as e:
+        logger.debug(f"roster generation lookup failed: {e}")
+        return None
+
+
+def _fresh(part: Optional[_Part], generation: Optional[str]) -> bool:
+    return part is not None and part.expires_at > time.monotonic() and part.generation == generation
+
+
+async def _load_users(db: AsyncSession, generation: Optional[str], ttl: int) -> _UserIndex:
+    global _users
+    part = _users
+    hit = _fresh(part, generation)
+    cache_result("roster", hit)
+    if not hit:
+        part = _UserIndex(generation=generation, expires_at=time.monotonic() + ttl)
+        with query_label("roster.users"):
+            for row in (await db.execute(select(*_UserIndex._COLUMNS))).all():
+                part.put(row)
+        if ttl > 0:
+            _users = part
+    elif part.pending:
+        ids, part.pending = part.pending, set()
+        with query_label("roster.users"):
+            rows = (await db.execute(select(*_UserIndex._COLUMNS).where(User.id.in_(ids)))).all()
+        for user_id in ids:
+            part.remove(user_id)
+        for row in rows:
+            part.put(row)
+    return part
+
+
+async def _load_entities(
+    org_id: int, db: AsyncSession, generation: Optional[str], ttl: int,
+) -> _EntityIndex:
+    part = _orgs.get(org_id)
+    hit = _fresh(part, generation)
+    cache_result("roster", hit)
+    if not hit:
+        part = _EntityIndex(generation=generation, expires_at=time.monotonic() + ttl)
+        with query_label("roster.entities"):
+            for row in (await db.execute(
+                select(*_EntityIndex._COLUMNS).where(Entity.org_id == org_id)
+            )).all():
+                part.put(row)
+        if ttl > 0:
+            _orgs.pop(org_id, None)
+            while len(_orgs) >= _MAX_ORGS:
+                del _orgs[next(iter(_orgs))]
+            _orgs[org_id] = part
+    elif part.pending:
+        ids, part.pending = part.pending, set()
+        with query_label("roster.entities"):
+            rows = (await db.execute(
+                select(*_EntityIndex._COLUMNS).where(Entity.id.in_(ids), Entity.org_id == org_id)
+            )).all()
+        for entity_id in ids:
+            part.remove(entity_id)
+        for row in rows:
+            part.put(row)
+    return part
+
+
+async def get_roster(org_id: Optional[int], db: AsyncSession) -> Roster:
+    """Ростер для распознавания участников: из памяти, если он свежий,
+    иначе пересобрать/догнать изменённые строки."""
+    ttl = get_settings().cache_ttl_roster
+    users_gen = await _shared_generation(_USERS) if ttl > 0 else None
+    users = await _load_users(db, users_gen, ttl)
+    entities = None
+    if org_id:
+        org_gen = await _shared_generation(org_id) if ttl > 0 else None
+        entities = await _load_entities(org_id, db, org_gen, ttl)
+    return Roster(users=users, entities=entities)
+
+
+def clear_roster_cache() -> None:
+    """Полный сброс локального кэша (тесты)."""
+    global _users
+    _users = None
+    _orgs.clear()
+
+
+# Ссылки на фоновые бампы поколения: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+
+
+async def drain() -> None:
+    """Дождаться отложенных бампов поколения (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+async def _bump_shared_generation(scopes: Iterable) -> None:
+    """Поднять поколение в Redis. Если до нас его никто не трогал, локальный
+    ростер уже догнан инкрементально — переносим его на новое поколение."""
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return
+    ttl = max(get_settings().cache_ttl_roster * 4, 60)
+    try:
+        for scope in scopes:
+            key = _GEN_KEY.format(scope=scope)
+            new = await client.incr(key)
+            await client.expire(key, ttl)
+            part = _users if scope == _USERS else _orgs.get(scope)
+            if part is not None and part.generation == str(new - 1):
+                part.generation = str(new)
+    except Exception as e:
+        logger.warning(f"roster generation bump failed: {e}")
+
+
+def _schedule_bump(scopes: set) -> None:
+    if not scopes:
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(_bump_shared_generation(scopes))
+    except RuntimeError:
+        return  # нет event loop (скрипт/миграция) — остальные воркеры доживут TTL
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def invalidate_roster_users(*user_ids: int) -> None:
+    """Перечитать пользователей (без аргументов — всех) во всех воркерах.
+
+    Сырой SQL по users событий сессии не порождает — такой код зовёт это сам
+    после commit.
+    """
+    global _users
+    if not user_ids:
+        _users = None
+    elif _users is not None:
+        _users.pending.update(user_ids)
+    _schedule_bump({_USERS})
+
+
+def invalidate_roster_entities(org_id: Optional[int], *entity_ids: int) -> None:
+    """Перечитать Entity организации (без id — весь ростер; org_id=None — все организации)."""
+    if org_id is None:
+        scopes = set(_orgs)
+        _orgs.clear()
+    else:
+        scopes = {org_id}
+        part = _orgs.get(org_id)
+        if part is not None:
+            if entity_ids:
+                part.pending.update(entity_ids)
+            else:
+                del _orgs[org_id]
+    _schedule_bump(scopes)
+
+
+# --- Инвалидация по событиям сессии -------------------------------------------
+
+_PENDING = "roster_pending"
+
+# Поля, попадающие в ростер: правки остальных (заметки, статус) его не трогают
+_USER_FIELDS = (
+    "name", "telegram_username", "additional_telegram_usernames", "telegram_id",
+    "email", "additional_emails",
+)
+_ENTITY_FIELDS = ("org_id", "name", "telegram_user_id", "email")
+
+
+def _changed(obj, fields, session) -> bool:
+    if obj in session.new or obj in session.deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def _after_flush(session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING, {"users": set(), "entities": set(), "all": set()})
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            if _changed(obj, _USER_FIELDS, session):
+                pending["users"].add(obj.id)
+        elif isinstance(obj, Entity):
+            if _changed(obj, _ENTITY_FIELDS, session):
+                # При переносе между оргами строка уходит из старого ростера
+                for org_id in {obj.org_id, *inspect(obj).attrs.org_id.history.deleted}:
+                    if org_id is not None:
+                        pending["entities"].add((org_id, obj.id))
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (User, Entity):
+        pending = orm_execute_state.session.info.setdefault(
+            _PENDING, {"users": set(), "entities": set(), "all": set()}
+        )
+        pending["all"].add(mapper.class_)
+
+
+def _after_commit(session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    if User in pending["all"]:
+        invalidate_roster_users()
+    elif pending["users"]:
+        invalidate_roster_users(*pending["users"])
+    if Entity in pending["all"]:
+        invalidate_roster_entities(None)
+    else:
+        by_org: Dict[int, Set[int]] = {}
+        for org_id, entity_id in pending["entities"]:
+            by_org.setdefault(org_id, set()).add(entity_id)
+        for org_id, ids in by_org.items():
+            invalidate_roster_entities(org_id, *ids)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def register_roster_events() -> None:
+    """Подписать инвалидацию ростера на события ORM-сессий (идемпотентно)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _on_orm_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+register_roster_events()
@@ -4,6 +4,8 @@ Participant Identification Service - Identifies and categorizes chat and call pa
 Provides:
 - Exact matching by username and telegram_user_id
 - Fuzzy matching by name
+- Batched resolution of whole chats/calls against an in-memory org roster
+  (see participant_roster)
 - Role identification (system user, employee, target, contact, unknown)
 - Participant lists for chats and calls
 """
@@ -18,6 +20,7 @@ from anthropic import AsyncAnthropic, APIError, APIConnectionError
 
 from ..models.database import User, Entity, Message, Chat, CallRecording, EntityType
 from ..config import get_settings
+from .participant_roster import get_roster
 
 logger = logging.getLogger("hr-analyzer.participants")
 settings = get_settings()
@@ -152,6 +155,16 @@ async def exact_match(
     return ParticipantRole.unknown, None
 
 
+def _full_name(first_name: Optional[str], last_name: Optional[str]) -> str:
+    """Name used for fuzzy matching: "First Last" with parts stripped."""
+    parts = []
+    if first_name:
+        parts.append(first_name.strip())
+    if last_name:
+        parts.append(last_name.strip())
+    return " ".join(parts)
+
+
 async def fuzzy_match_name(
     first_name: Optional[str],
     last_name: Optional[str],
@@ -170,18 +183,10 @@ async def fuzzy_match_name(
     if not org_id:
         return ParticipantRole.unknown, None, 0.0
 
-    # Build full name for search
-    full_name_parts = []
-    if first_name:
-        full_name_parts.append(first_name.strip())
-    if last_name:
-        full_name_parts.append(last_name.strip())
-
-    if not full_name_parts:
+    full_name = _full_name(first_name, last_name)
+    if not full_name:
         return ParticipantRole.unknown, None, 0.0
 
-    full_name = " ".join(full_name_parts)
-
     # Search entities with ILIKE (case-insensitive)
     query = select(Entity).where(
         Entity.org_id == org_id,
@@ -275,6 +280,8 @@ async def identify_participants(
     result = await db.execute(query)
     unique_senders = result.all()
 
+    # One roster lookup for all senders instead of 2-4 queries per sender
+    roster = await get_roster(org_id, db)
     identified = []
 
     for sender in unique_senders:
@@ -291,36 +298,34 @@ async def identify_participants(
             display_name_parts.append(last_name)
         display_name = " ".join(display_name_parts) if display_name_parts else username or f"User {telegram_user_id}"
 
-        # Try exact match first
-        role, matched_obj = await exact_match(username, telegram_user_id, org_id, db)
-
         participant = IdentifiedParticipant(
             telegram_user_id=telegram_user_id,
             username=username,
             display_name=display_name,
-            role=role,
+            role=ParticipantRole.unknown,
             confidence=1.0
         )
 
-        if role == ParticipantRole.system_user and isinstance(matched_obj, User):
-            participant.user_id = matched_obj.id
-        elif role == ParticipantRole.contact and isinstance(matched_obj, Entity):
-            participant.entity_id = matched_obj.id
-            # Check if this entity is the target
-            if target_entity_id and matched_obj.id == target_entity_id:
-                participant.role = ParticipantRole.target
-        elif role == ParticipantRole.unknown:
+        # Try exact match first
+        user = roster.match_user(username=username, telegram_id=telegram_user_id)
+        entity = None if user else roster.match_entity(telegram_id=telegram_user_id)
+        if user:
+            participant.role = ParticipantRole.system_user
+            participant.user_id = user.id
+        elif entity:
+            participant.role = ParticipantRole.contact
+            participant.entity_id = entity.id
+        else:
             # Try fuzzy match by name
-            fuzzy_role, entity, confidence = await fuzzy_match_name(
-                first_name, last_name, org_id, db
-            )
+            entity, confidence = roster.match_name(_full_name(first_name, last_name))
             if entity:
-                participant.role = fuzzy_role
+                participant.role = ParticipantRole.contact
                 participant.entity_id = entity.id
                 participant.confidence = confidence
-                # Check if this entity is the target
-                if target_entity_id and entity.id == target_entity_id:
-                    participant.role = ParticipantRole.target
+
+        # Check if this entity is the target
+        if entity and target_entity_id and entity.id == target_entity_id:
+            participant.role = ParticipantRole.target
 
         identified.append(participant)
         logger.debug(f"Identified participant: {display_name} ({username}) as {participant.role} (confidence: {participant.confidence:.2f})")
@@ -390,11 +395,10 @@ async def identify_call_participants(
         if speaker_name not in unique_speakers:
             unique_speakers[speaker_name] = segment
 
+    roster = await get_roster(org_id, db)
+
     # Process each unique speaker
-    speaker_index = 0
     for speaker_name, segment in unique_speakers.items():
-        speaker_index += 1
-
         # Try to extract email from speaker name or segment
         # Common formats: "john@example.com", "John Doe (john@example.com)", etc.
         email = None
@@ -414,50 +418,26 @@ async def identify_call_participants(
             confidence=1.0
         )
 
-        # Try to match by email
+        # Try to match by email: User.email, User.additional_emails, then org Entity.email
         if email:
-            # Search in Users by primary email
-            query = select(User).where(User.email == email)
-            result = await db.execute(query)
-            user = result.scalar_one_or_none()
+            user = roster.match_user(email=email)
+            entity = None if user else roster.match_entity(email=email)
 
             if user:
                 participant.role = ParticipantRole.system_user
                 participant.user_id = user.id
                 participant.display_name = user.name
-                logger.debug(f"Matched call speaker '{speaker_name}' to User {user.id} by primary email")
-            else:
-                # Search in Users by additional_emails (JSON array)
-                query = select(User).where(
-                    User.additional_emails.contains([email])
-                )
-                result = await db.execute(query)
-                user = result.scalar_one_or_none()
-
-                if user:
-                    participant.role = ParticipantRole.system_user
-                    participant.user_id = user.id
-                    participant.display_name = user.name
-                    logger.debug(f"Matched call speaker '{speaker_name}' to User {user.id} by additional_email")
-                elif org_id:
-                    # Search in Entities (scoped to organization)
-                    query = select(Entity).where(
-                        Entity.org_id == org_id,
-                        Entity.email == email
-                    )
-                    result = await db.execute(query)
-                    entity = result.scalar_one_or_none()
-
-                    if entity:
-                        participant.role = ParticipantRole.contact
-                        participant.entity_id = entity.id
-                        participant.display_name = entity.name
-
-                        # Check if this is the target entity
-                        if target_entity_id and entity.id == target_entity_id:
-                            participant.role = ParticipantRole.target
-
-                        logger.debug(f"Matched call speaker '{speaker_name}' to Entity {entity.id} by email")
+                logger.debug(f"Matched call speaker '{speaker_name}' to User {user.id} by email")
+            elif entity:
+                participant.role = ParticipantRole.contact
+                participant.entity_id = entity.id
+                participant.display_name = entity.name
+
+                # Check if this is the target entity
+                if target_entity_id and entity.id == target_entity_id:
+                    participant.role = ParticipantRole.target
+
+                logger.debug(f"Matched call speaker '{speaker_name}' to Entity {entity.id} by email")
 
         # If no email match, try fuzzy match by name
         if participant.role == ParticipantRole.unknown and org_id:
@@ -467,15 +447,10 @@ async def identify_call_participants(
             name_parts = [p for p in name_parts if "@" not in p]
 
             if len(name_parts) >= 2:
-                first_name = name_parts[0]
-                last_name = name_parts[-1]
-
-                fuzzy_role, entity, confidence = await fuzzy_match_name(
-                    first_name, last_name, org_id, db
-                )
+                entity, confidence = roster.match_name(_full_name(name_parts[0], name_parts[-1]))
 
                 if entity:
-                    participant.role = fuzzy_role
+                    participant.role = ParticipantRole.contact
                     participant.entity_id = entity.id
                     participant.confidence = confidence
                     participant.display_name = entity.name
@@ -21,12 +21,14 @@ Resource Types: entity, chat, call, vacancy
 Actions: read, write, delete, share
 """
 
+import time
 from datetime import datetime
-from typing import Optional, List, Set, Tuple, Union, Any
+from typing import Dict, Optional, List, Set, Tuple, Union, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, func
 import logging
 
+from ..config import get_settings
 from ..models.database import (
     User, UserRole,
     Organization, OrgMember, OrgRole,
@@ -963,3 +965,45 @@ class PermissionService:
 async def get_permission_service(db: AsyncSession) -> PermissionService:
     """Factory function for dependency injection."""
     return PermissionService(db)
+
+
+# ==================== READ GRANT MEMO ====================
+
+# (user_id, token_version, resource_type, resource_id) -> expires_at (monotonic)
+_read_grants: Dict[Tuple[int, int, str, int], float] = {}
+_MAX_READ_GRANTS = 4096
+
+
+async def can_read_memoized(db: AsyncSession, user: User, resource: Union[Entity, Chat, CallRecording]) -> bool:
+    """can_access_resource(user, resource, "read"), remembered for the auth session.
+
+    Paged and polled endpoints (chat history, media) ask the same question on
+    every request. Grants are kept for CACHE_TTL_PRINCIPAL seconds, keyed by
+    user id + token_version, so logout or a password change drops them.
+    Denials are never cached: a new share applies immediately, a revoked one
+    within the TTL (the same staleness as the principal cache).
+    """
+    service = PermissionService(db)
+    ttl = get_settings().cache_ttl_principal
+    key = (
+        user.id, user.token_version or 0,
+        service._get_resource_type(resource), service._get_resource_id(resource),
+    )
+    now = time.monotonic()
+    if _read_grants.get(key, 0) > now:
+        return True
+
+    allowed = await service.can_access_resource(user, resource, "read")
+    if allowed and ttl > 0:
+        if len(_read_grants) >= _MAX_READ_GRANTS:
+            for stale in [k for k, exp in _read_grants.items() if exp <= now]:
+                del _read_grants[stale]
+            while len(_read_grants) >= _MAX_READ_GRANTS:
+                del _read_grants[next(iter(_read_grants))]
+        _read_grants[key] = now + ttl
+    return allowed
+
+
+def clear_read_grants() -> None:
+    """Drop all memoized read grants (tests, bulk permission changes)."""
+    _read_grants.clear()
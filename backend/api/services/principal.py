@@ -0,0 +1,348 @@
+"""Аутентифицированный принципал запроса + короткий кросс-запросный кэш.
+
+Каждый авторизованный запрос проходит get_current_user, а хендлеры следом
+спрашивают get_user_org / get_user_org_role / has_full_database_access /
+get_user_department_ids — 3-6 мелких SELECT-ов на запрос. Фронт поллит kanban,
+уведомления и счётчик непрочитанного, так что это заметная доля QPS базы.
+
+Principal собирает всё это ОДНИМ разом (пользователь, организация, роль в ней,
+«Наблюдатель», отделы) и кладётся в request.state.principal и db.info — хелперы
+в auth.py берут ответ оттуда, если спрашивают про того же пользователя.
+
+Поверх — процессный TTL-кэш снимков по ключу (user_id, token_version):
+- смена пароля/отзыв сессий поднимает token_version → старый ключ не сматчится;
+- изменения User/OrgMember/DepartmentMember через ORM сбрасывают запись
+  пользователя после commit (события сессии ниже, как в search_index);
+- bulk update/delete по этим таблицам, правки Organization/Department —
+  сбрасывают кэш целиком;
+- между воркерами: при наличии Redis сверяем счётчик поколения
+  principal:gen:{user_id}, который инкрементится при инвалидации. Без Redis
+  (один процесс / тесты) хватает локального сброса, остальное добивает TTL.
+"""
+import asyncio
+import copy
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..config import get_settings
+from ..models.database import (
+    User, UserRole, Organization, OrgMember, OrgRole, Department, DepartmentMember,
+)
+from .metrics import cache_result, query_label
+
+logger = logging.getLogger("hr-analyzer.principal")
+
+# Ключ в session.info, под которым лежит принципал текущего запроса
+SESSION_KEY = "principal"
+
+_GEN_KEY = "principal:gen:{user_id}"
+
+# Таблицы, чьи изменения влияют на принципал конкретного пользователя
+_PER_USER_MODELS = (User, OrgMember, DepartmentMember)
+# Таблицы, изменения которых проще всего отработать полным сбросом
+_GLOBAL_MODELS = (Organization, Department)
+
+
+@dataclass
+class Principal:
+    """Кто делает запрос и в каком качестве."""
+    user: User
+    org: Optional[Organization] = None
+    org_role: Optional[OrgRole] = None
+    is_readonly: bool = False
+    department_ids: List[int] = field(default_factory=list)
+
+    @property
+    def user_id(self) -> int:
+        return self.user.id
+
+    @property
+    def org_id(self) -> Optional[int]:
+        return self.org.id if self.org else None
+
+    @property
+    def is_superadmin(self) -> bool:
+        return self.user.role == UserRole.superadmin
+
+    @property
+    def has_full_database_access(self) -> bool:
+        """Та же логика, что auth.has_full_database_access для своей организации."""
+        return self.is_superadmin or self.org_role in (OrgRole.owner, OrgRole.admin)
+
+
+@dataclass
+class _Snapshot:
+    """То, что живёт в кэше между запросами: значения колонок, не ORM-объекты
+    (объект привязан к сессии своего запроса)."""
+    user: dict
+    org: Optional[dict]
+    org_role: Optional[OrgRole]
+    is_readonly: bool
+    department_ids: Tuple[int, ...]
+    generation: Optional[str]
+    expires_at: float
+
+
+_cache: Dict[Tuple[int, int], _Snapshot] = {}
+
+# Протухшие ключи (старый token_version, ушедшие пользователи) иначе копились бы
+# вечно: при записи чистим просроченные, сверх лимита выкидываем самые старые
+_MAX_ENTRIES = 4096
+
+
+def _store(key: Tuple[int, int], snap: _Snapshot) -> None:
+    _cache.pop(key, None)  # переставить в конец порядка вставки
+    if len(_cache) >= _MAX_ENTRIES:
+        now = time.monotonic()
+        for stale in [k for k, v in _cache.items() if v.expires_at <= now]:
+            del _cache[stale]
+        while len(_cache) >= _MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+    _cache[key] = snap
+
+
+def _columns(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+
+async def _attach(model, values: dict, db: AsyncSession):
+    """Вернуть persistent-объект из снимка без обращения к базе."""
+    obj = model()
+    for key, value in values.items():
+        # JSON-колонки (notification_prefs, settings) — копия, чтобы правка
+        # на месте в одном запросе не протекла в кэш
+        setattr(obj, key, copy.deepcopy(value))
+    make_transient_to_detached(obj)
+    return await db.merge(obj, load=False)
+
+
+async def _shared_generation(user_id: int) -> Optional[str]:
+    """Счётчик поколения из Redis (None, если Redis нет или он недоступен)."""
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(_GEN_KEY.format(user_id=user_id)) or "0"
+    except Exception as e:
+        logger.debug(f"principal generation lookup failed: {e}")
+        return None
+
+
+async def _bump_shared_generation(user_ids) -> None:
+    from .redis_cache import get_redis
+    client = await get_redis()
+    if client is None:
+        return
+    ttl = max(get_settings().cache_ttl_principal * 4, 60)
+    try:
+        for user_id in user_ids:
+            key = _GEN_KEY.format(user_id=user_id)
+            await client.incr(key)
+            await client.expire(key, ttl)
+    except Exception as e:
+        logger.warning(f"principal generation bump failed: {e}")
+
+
+async def _load(user: User, db: AsyncSession) -> Principal:
+    """Собрать принципал из базы. Семантика — как у get_user_org / get_user_org_role /
+    проверки «Наблюдателя» в get_current_user / get_user_department_ids."""
+    row = (await db.execute(
+        select(Organization, OrgMember.role, OrgMember.is_readonly)
+        .join(OrgMember, OrgMember.org_id == Organization.id)
+        .where(OrgMember.user_id == user.id)
+        .order_by(OrgMember.created_at)
+        .limit(1)
+    )).first()
+
+    if row:
+        org, org_role, is_readonly = row[0], row[1], bool(row[2])
+    else:
+        org, org_role, is_readonly = None, None, False
+        if user.role == UserRole.superadmin:
+            org = (await db.execute(
+                select(Organization).order_by(Organization.created_at).limit(1)
+            )).scalar_one_or_none()
+
+    department_ids: List[int] = []
+    if org is not None:
+        department_ids = list((await db.execute(
+            select(DepartmentMember.department_id)
+            .join(Department, Department.id == DepartmentMember.department_id)
+            .where(
+                Department.org_id == org.id,
+                DepartmentMember.user_id == user.id,
+                Department.is_active == True,
+            )
+        )).scalars().all())
+
+    return Principal(
+        user=user, org=org, org_role=org_role,
+        is_readonly=is_readonly, department_ids=department_ids,
+    )
+
+
+async def resolve_principal(
+    user_id: int, token_version: int, db: AsyncSession
+) -> Optional[Principal]:
+    """Принципал для (user_id, token_version) из JWT.
+
+    Возвращает None, если пользователя нет. Сверку token_version и is_active
+    делает вызывающий — по principal.user, как и раньше по User из базы.
+    """
+    key = (user_id, token_version)
+    ttl = get_settings().cache_ttl_principal
+    generation = await _shared_generation(user_id) if ttl > 0 else None
+
+    snap = _cache.get(key)
+    hit = snap is not None and snap.expires_at > time.monotonic() and snap.generation == generation
+    cache_result("principal", hit)
+    if hit:
+        user = await _attach(User, snap.user, db)
+        org = await _attach(Organization, snap.org, db) if snap.org else None
+        principal = Principal(
+            user=user, org=org, org_role=snap.org_role,
+            is_readonly=snap.is_readonly, department_ids=list(snap.department_ids),
+        )
+        db.info[SESSION_KEY] = principal
+        return principal
+
+    with query_label("auth.principal"):
+        user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+        if user is None:
+            _cache.pop(key, None)
+            return None
+        principal = await _load(user, db)
+    db.info[SESSION_KEY] = principal
+
+    db_token_version = user.token_version if user.token_version is not None else 0
+    if ttl > 0 and db_token_version == token_version:
+        _store(key, _Snapshot(
+            user=_columns(user),
+            org=_columns(principal.org) if principal.org else None,
+            org_role=principal.org_role,
+            is_readonly=principal.is_readonly,
+            department_ids=tuple(principal.department_ids),
+            generation=generation,
+            expires_at=time.monotonic() + ttl,
+        ))
+    return principal
+
+
+def current_principal(user: User, db: AsyncSession) -> Optional[Principal]:
+    """Принципал запроса, если он про этого же пользователя (иначе None)."""
+    return session_principal(db, user.id)
+
+
+def session_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    principal = getattr(db, "info", {}).get(SESSION_KEY)
+    if isinstance(principal, Principal) and principal.user_id == user_id:
+        return principal
+    return None
+
+
+# Ссылки на фоновые бампы поколения: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+
+
+async def drain() -> None:
+    """Дождаться отложенных бампов поколения (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+def invalidate_principal(*user_ids: int) -> None:
+    """Сбросить кэш для пользователей (все token_version) во всех воркерах.
+
+    Сырой SQL по users/org_members/department_members событий сессии не
+    порождает — такой код зовёт invalidate_principal() сам после commit.
+    """
+    ids = set(user_ids)
+    for key in [k for k in _cache if k[0] in ids]:
+        del _cache[key]
+    if ids:
+        try:
+            task = asyncio.get_running_loop().create_task(_bump_shared_generation(ids))
+        except RuntimeError:
+            return  # нет event loop (скрипт/миграция) — остальные воркеры доживут TTL
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+
+def clear_principal_cache() -> None:
+    """Полный сброс локального кэша (bulk-операции, тесты)."""
+    _cache.clear()
+
+
+# --- Инвалидация по событиям сессии -------------------------------------------
+
+_PENDING = "principal_invalidate"
+_PENDING_ALL = "principal_invalidate_all"
+
+
+def _affected_user_id(obj) -> Optional[int]:
+    if isinstance(obj, User):
+        return obj.id
+    if isinstance(obj, (OrgMember, DepartmentMember)):
+        return obj.user_id
+    return None
+
+
+def _after_flush(session, flush_context) -> None:
+    ids = session.info.setdefault(_PENDING, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _GLOBAL_MODELS):
+            session.info[_PENDING_ALL] = True
+            continue
+        user_id = _affected_user_id(obj)
+        if user_id is not None:
+            ids.add(user_id)
+
+    # Принципал этого же запроса тоже устарел — хелперы пойдут в базу
+    principal = session.info.get(SESSION_KEY)
+    if principal is not None and (session.info.get(_PENDING_ALL) or principal.user_id in ids):
+        session.info.pop(SESSION_KEY, None)
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (*_PER_USER_MODELS, *_GLOBAL_MODELS):
+        session = orm_execute_state.session
+        session.info[_PENDING_ALL] = True
+        session.info.pop(SESSION_KEY, None)
+
+
+def _after_commit(session) -> None:
+    ids = session.info.pop(_PENDING, None)
+    if session.info.pop(_PENDING_ALL, False):
+        clear_principal_cache()
+    if ids:
+        invalidate_principal(*ids)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_PENDING_ALL, None)
+
+
+def register_principal_events() -> None:
+    """Подписать сброс кэша на события ORM-сессий (идемпотентно)."""
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _on_orm_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+register_principal_events()
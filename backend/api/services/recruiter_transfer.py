@@ -5,7 +5,7 @@
 осиротеет. Поэтому ПЕРЕД удалением админ передаёт всё владение живому рекрутёру:
 
   • заявки (VacancyApplication.created_by)  X → Y  — это же чинит HR-метки,
-    т.к. они производны от created_by заявок (пересчитываем sync_for_entity);
+    т.к. они производны от created_by заявок (пересчёт при коммите, hr_tags.mark_stale);
   • вакансии: created_by, hiring_manager_id, а также участие в общей воронке
     (assigned_to / extra_data.accepted_by / dismissed_by)  X → Y;
   • кандидаты (Entity.created_by)  X → Y  — «мои кандидаты» уходящего.
@@ -21,6 +21,7 @@ from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.database import Entity, EntityType, Vacancy, VacancyApplication
+from .hr_tags import mark_stale
 
 
 async def reassign_recruiter_ownership(
@@ -64,7 +65,13 @@ async def reassign_recruiter_ownership(
     )
     counts["applications"] = res.rowcount or 0
 
-    # 2. Вакансии: авторство + ведущий менеджер.
+    # 2. Вакансии: авторство + ведущий менеджер. Смена владельца меняет
+    # fallback-HR у заявок без created_by — их кандидатам тоже нужен пересчёт.
+    moved_vacancy_ids = (
+        await db.execute(
+            select(Vacancy.id).where(Vacancy.org_id == org_id, Vacancy.created_by == from_user_id)
+        )
+    ).scalars().all()
     res = await db.execute(
         update(Vacancy)
         .where(Vacancy.org_id == org_id, Vacancy.created_by == from_user_id)
@@ -120,14 +127,9 @@ async def reassign_recruiter_ownership(
 
     await db.flush()
 
-    # 5. Пересчёт HR-меток на затронутых карточках (теперь укажут на нового).
-    from .hr_tags import sync_for_entity
-
-    for eid in affected_entities:
-        try:
-            await sync_for_entity(db, eid, commit=False)
-        except Exception:  # noqa: BLE001 — одна битая карточка не должна валить перенос
-            pass
+    # 5. HR-метки затронутых карточек (теперь укажут на нового) пересчитаются
+    # одной пачкой при коммите: bulk UPDATE строк не называет, помечаем сами.
+    mark_stale(db, affected_entities, moved_vacancy_ids)
 
     await db.commit()
     return counts
@@ -306,12 +308,7 @@ async def reassign_recruiter_split(
 
     await db.flush()
 
-    from .hr_tags import sync_for_entity
-    for eid in affected:
-        try:
-            await sync_for_entity(db, eid, commit=False)
-        except Exception:  # noqa: BLE001
-            pass
+    mark_stale(db, affected)
 
     await db.commit()
     return counts
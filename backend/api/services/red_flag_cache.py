@@ -0,0 +1,332 @@
+"""Сохранённые разборы red flags и risk score кандидатов.
+
+Раньше каждый просмотр панели заново гонял анализ опыта/зарплаты/навыков/
+локации и — главное — отдельный вызов Claude по привязанным чатам и звонкам.
+Теперь результат лежит в entity_red_flag_analyses на пару (кандидат, вакансия)
+вместе с fingerprint входов:
+
+- профиль: имя, extra_data, зарплатные ожидания;
+- коммуникации: по каждому чату (id, число сообщений, max id сообщения), по
+  каждому звонку (id, статус, processed_at, длина транскрипта);
+- вакансия: зарплатная вилка, требования, required_skills, уровень, локация.
+
+Просмотр считает fingerprint (два агрегатных запроса) и отдаёт сохранённое.
+Совпал — это и есть ответ; не совпал — отдаём прошлый результат со
+stale=True и пересчитываем в фоне. Синхронно считаем только когда разбора
+ещё нет (или просят refresh).
+
+AI-флаги коммуникаций от вакансии не зависят: они хранятся отдельно со своим
+communication_fingerprint и переиспользуются для других вакансий того же
+кандидата, так что пакетный скоринг воронки не делает лишних вызовов Claude.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models.database import (
+    CallRecording, Chat, Entity, EntityRedFlagAnalysis, Message, Vacancy, VacancyApplication,
+)
+from .red_flags import RedFlag, red_flags_service
+
+logger = logging.getLogger("hr-analyzer.red-flag-cache")
+
+# Поднять при изменении правил в services/red_flags.py — все разборы устареют
+ANALYSIS_VERSION = 1
+
+# Одновременных фоновых пересчётов на воркер (каждый — потенциально вызов Claude)
+REFRESH_CONCURRENCY = 2
+
+_semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
+# Ссылки на запущенные задачи: иначе event loop держит их слабо и GC может снести
+_tasks: set = set()
+# (entity_id, vacancy_id), уже стоящие в очереди: повторный просмотр не плодит пересчёты
+_queued: set = set()
+
+
+def _open_session() -> AsyncSession:
+    from ..database import AsyncSessionLocal
+    return AsyncSessionLocal()
+
+
+def _digest(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ============================================================================
+# FINGERPRINT
+# ============================================================================
+
+async def communication_versions(db: AsyncSession, entity_ids: Iterable[int]) -> Dict[int, dict]:
+    """{entity_id: {"chats": [...], "calls": [...]}} двумя агрегатными запросами."""
+    entity_ids = list(entity_ids)
+    versions: Dict[int, dict] = {eid: {"chats": [], "calls": []} for eid in entity_ids}
+    if not entity_ids:
+        return versions
+
+    chats = await db.execute(
+        select(Chat.entity_id, Chat.id, func.count(Message.id), func.max(Message.id))
+        .outerjoin(Message, Message.chat_id == Chat.id)
+        .where(Chat.entity_id.in_(entity_ids))
+        .group_by(Chat.entity_id, Chat.id)
+        .order_by(Chat.id)
+    )
+    for entity_id, chat_id, count, last_id in chats.all():
+        versions[entity_id]["chats"].append([chat_id, count, last_id])
+
+    calls = await db.execute(
+        select(CallRecording.entity_id, CallRecording.id, CallRecording.status,
+               CallRecording.processed_at, func.length(CallRecording.transcript))
+        .where(CallRecording.entity_id.in_(entity_ids))
+        .order_by(CallRecording.id)
+    )
+    for entity_id, call_id, status, processed_at, transcript_len in calls.all():
+        versions[entity_id]["calls"].append(
+            [call_id, getattr(status, "value", status), processed_at, transcript_len or 0]
+        )
+    return versions
+
+
+def communication_fingerprint(entity: Entity, versions: dict) -> str:
+    return _digest([ANALYSIS_VERSION, entity.name, versions["chats"], versions["calls"]])
+
+
+def fingerprint(entity: Entity, vacancy: Optional[Vacancy], communication_fp: str) -> str:
+    profile = [
+        entity.extra_data or {},
+        entity.expected_salary_min, entity.expected_salary_max, entity.expected_salary_currency,
+    ]
+    requirements = None
+    if vacancy is not None:
+        requirements = [
+            vacancy.id, vacancy.salary_min, vacancy.salary_max, vacancy.salary_currency,
+            vacancy.requirements, (vacancy.extra_data or {}).get("required_skills"),
+            vacancy.experience_level, vacancy.location,
+        ]
+    return _digest([ANALYSIS_VERSION, communication_fp, profile, requirements])
+
+
+def _key_filter(entity_ids: List[int], vacancy_id: Optional[int]):
+    vacancy_clause = (
+        EntityRedFlagAnalysis.vacancy_id.is_(None) if vacancy_id is None
+        else EntityRedFlagAnalysis.vacancy_id == vacancy_id
+    )
+    return [EntityRedFlagAnalysis.entity_id.in_(entity_ids), vacancy_clause]
+
+
+async def _stored(db: AsyncSession, entity_ids: List[int], vacancy_id: Optional[int]) -> Dict[int, EntityRedFlagAnalysis]:
+    rows = await db.execute(select(EntityRedFlagAnalysis).where(*_key_filter(entity_ids, vacancy_id)))
+    return {row.entity_id: row for row in rows.scalars().all()}
+
+
+# ============================================================================
+# COMPUTE
+# ============================================================================
+
+async def _load_communications(db: AsyncSession, entity_id: int) -> Tuple[List[Chat], List[CallRecording]]:
+    chats = list((await db.execute(
+        select(Chat).where(Chat.entity_id == entity_id).order_by(Chat.id)
+    )).scalars().all())
+    # Последние сообщения каждого чата (лимит — чтобы не тянуть всю историю)
+    for chat in chats:
+        messages_result = await db.execute(
+            select(Message)
+            .where(Message.chat_id == chat.id)
+            .order_by(Message.timestamp.desc())
+            .limit(100)
+        )
+        # без истории изменений: это срез для промпта, а не правка коллекции
+        set_committed_value(chat, "messages", list(messages_result.scalars().all()))
+    calls = list((await db.execute(
+        select(CallRecording)
+        .where(CallRecording.entity_id == entity_id)
+        .order_by(CallRecording.created_at.desc())
+        .limit(5)
+    )).scalars().all())
+    return chats, calls
+
+
+async def analyze(db: AsyncSession, entity: Entity, vacancy: Optional[Vacancy],
+                  reuse_communications: bool = True) -> EntityRedFlagAnalysis:
+    """Пересчитать и сохранить разбор для (entity, vacancy). Коммитит.
+
+    reuse_communications=False — заново спросить Claude, даже если входы
+    коммуникаций не менялись (ручной refresh).
+    """
+    versions = (await communication_versions(db, [entity.id]))[entity.id]
+    communication_fp = communication_fingerprint(entity, versions)
+    fp = fingerprint(entity, vacancy, communication_fp)
+
+    # AI-флаги с тем же входом коммуникаций — из любого разбора этого кандидата
+    reusable = None
+    if reuse_communications:
+        reusable = (await db.execute(
+            select(EntityRedFlagAnalysis.communication_flags).where(
+                EntityRedFlagAnalysis.entity_id == entity.id,
+                EntityRedFlagAnalysis.communication_fingerprint == communication_fp,
+            ).limit(1)
+        )).scalar_one_or_none()
+
+    if reusable is not None:
+        communication_flags = [RedFlag.from_dict(f) for f in reusable]
+    elif versions["chats"] or versions["calls"]:
+        chats, calls = await _load_communications(db, entity.id)
+        communication_flags = await red_flags_service._ai_analyze_communications(entity, chats, calls)
+    else:
+        communication_flags = []
+
+    analysis = await red_flags_service.detect_red_flags(
+        entity=entity, vacancy=vacancy, communication_flags=communication_flags,
+    )
+    values = dict(
+        fingerprint=fp,
+        communication_fingerprint=communication_fp,
+        communication_flags=[f.to_dict() for f in communication_flags],
+        result=analysis.to_dict(),
+        risk_score=analysis.risk_score,
+        computed_at=datetime.utcnow(),
+    )
+    vacancy_id = vacancy.id if vacancy is not None else None
+
+    row = (await _stored(db, [entity.id], vacancy_id)).get(entity.id)
+    if row is None:
+        row = EntityRedFlagAnalysis(entity_id=entity.id, vacancy_id=vacancy_id, **values)
+        db.add(row)
+        try:
+            await db.commit()
+            return row
+        except IntegrityError:
+            # параллельный пересчёт того же ключа успел вставить — обновим его строку
+            await db.rollback()
+            row = (await _stored(db, [entity.id], vacancy_id))[entity.id]
+    for name, value in values.items():
+        setattr(row, name, value)
+    await db.commit()
+    return row
+
+
+# ============================================================================
+# BACKGROUND REFRESH
+# ============================================================================
+
+def schedule(entity_id: int, vacancy_id: Optional[int]) -> bool:
+    """Поставить пересчёт в фон. False — уже в очереди (или нет event loop)."""
+    key = (entity_id, vacancy_id)
+    if key in _queued:
+        return False
+    try:
+        task = asyncio.get_running_loop().create_task(_refresh(entity_id, vacancy_id))
+    except RuntimeError:
+        return False
+    _queued.add(key)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+
+async def drain() -> None:
+    """Дождаться фоновых пересчётов (тесты, graceful shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+async def _refresh(entity_id: int, vacancy_id: Optional[int]) -> None:
+    try:
+        async with _semaphore:
+            async with _open_session() as db:
+                entity = await db.get(Entity, entity_id)
+                vacancy = await db.get(Vacancy, vacancy_id) if vacancy_id else None
+                if entity is None or (vacancy_id and vacancy is None):
+                    return
+                await analyze(db, entity, vacancy)
+    except Exception:
+        logger.error("red flags refresh failed for entity %s vacancy %s", entity_id, vacancy_id, exc_info=True)
+    finally:
+        _queued.discard((entity_id, vacancy_id))
+
+
+# ============================================================================
+# VIEWS
+# ============================================================================
+
+def _payload(row: EntityRedFlagAnalysis, stale: bool) -> dict:
+    return {**row.result, "computed_at": row.computed_at, "stale": stale}
+
+
+async def get_analysis(db: AsyncSession, entity: Entity, vacancy: Optional[Vacancy],
+                       refresh: bool = False) -> dict:
+    """Разбор для панели кандидата: сохранённый, при смене входов — с фоновым пересчётом."""
+    vacancy_id = vacancy.id if vacancy is not None else None
+    row = (await _stored(db, [entity.id], vacancy_id)).get(entity.id)
+    if row is None or refresh:
+        return _payload(await analyze(db, entity, vacancy, reuse_communications=not refresh), stale=False)
+
+    versions = (await communication_versions(db, [entity.id]))[entity.id]
+    fp = fingerprint(entity, vacancy, communication_fingerprint(entity, versions))
+    if row.fingerprint == fp:
+        return _payload(row, stale=False)
+    schedule(entity.id, vacancy_id)
+    return _payload(row, stale=True)
+
+
+async def get_risk_score(db: AsyncSession, entity: Entity) -> dict:
+    """Risk score из сохранённого общего разбора; без него — быстрый по правилам."""
+    row = (await _stored(db, [entity.id], None)).get(entity.id)
+    if row is None:
+        return {"risk_score": red_flags_service.get_risk_score(entity), "source": "quick", "stale": False}
+    versions = (await communication_versions(db, [entity.id]))[entity.id]
+    stale = row.fingerprint != fingerprint(entity, None, communication_fingerprint(entity, versions))
+    if stale:
+        schedule(entity.id, None)
+    return {"risk_score": row.risk_score, "source": "analysis", "stale": stale, "computed_at": row.computed_at}
+
+
+async def score_pipeline(db: AsyncSession, vacancy: Vacancy) -> dict:
+    """Пакетный скоринг воронки вакансии.
+
+    Отдаёт сохранённые результаты всех кандидатов вакансии и ставит в фон
+    пересчёт тех, у кого разбора нет или поменялся fingerprint. Повторный вызов
+    после пересчёта вернёт свежие данные без единого вызова Claude.
+    """
+    entities = list((await db.execute(
+        select(Entity)
+        .join(VacancyApplication, VacancyApplication.entity_id == Entity.id)
+        .where(VacancyApplication.vacancy_id == vacancy.id)
+        .order_by(Entity.id)
+    )).scalars().all())
+    entity_ids = [e.id for e in entities]
+    stored = await _stored(db, entity_ids, vacancy.id)
+    versions = await communication_versions(db, entity_ids)
+
+    results = []
+    scheduled = 0
+    for entity in entities:
+        row = stored.get(entity.id)
+        fp = fingerprint(entity, vacancy, communication_fingerprint(entity, versions[entity.id]))
+        stale = row is None or row.fingerprint != fp
+        if stale and schedule(entity.id, vacancy.id):
+            scheduled += 1
+        results.append({
+            "entity_id": entity.id,
+            "entity_name": entity.name,
+            "risk_score": row.risk_score if row else None,
+            "flags_count": row.result.get("flags_count") if row else None,
+            "high_severity_count": row.result.get("high_severity_count") if row else None,
+            "computed_at": row.computed_at if row else None,
+            "stale": stale,
+        })
+    return {
+        "vacancy_id": vacancy.id,
+        "total": len(results),
+        "fresh": sum(1 for r in results if not r["stale"]),
+        "scheduled": scheduled,
+        "results": results,
+    }
@@ -85,6 +85,17 @@ class RedFlag:
             "evidence": self.evidence
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "RedFlag":
+        """Inverse of to_dict() (stored analyses in red_flag_cache)."""
+        return cls(
+            type=RedFlagType(data["type"]),
+            severity=Severity(data["severity"]),
+            description=data.get("description", ""),
+            suggestion=data.get("suggestion", ""),
+            evidence=data.get("evidence"),
+        )
+
 
 @dataclass
 class RedFlagsAnalysis:
@@ -601,7 +612,8 @@ class RedFlagsService:
         entity: Entity,
         vacancy: Optional[Vacancy] = None,
         chats: Optional[List[Chat]] = None,
-        calls: Optional[List[CallRecording]] = None
+        calls: Optional[List[CallRecording]] = None,
+        communication_flags: Optional[List[RedFlag]] = None
     ) -> RedFlagsAnalysis:
         """
         Detect all red flags for a candidate.
@@ -611,6 +623,8 @@ class RedFlagsService:
             vacancy: Optional vacancy to compare against
             chats: Optional list of linked chats with messages
             calls: Optional list of linked call recordings
+            communication_flags: Already computed AI flags for these chats/calls;
+                when given, the AI call is skipped
 
         Returns:
             RedFlagsAnalysis with all detected flags and risk score
@@ -636,7 +650,9 @@ class RedFlagsService:
         all_flags.extend(self._check_location(entity, vacancy))
 
         # 6. AI analysis of communications
-        if chats or calls:
+        if communication_flags is not None:
+            all_flags.extend(communication_flags)
+        elif chats or calls:
             ai_flags = await self._ai_analyze_communications(
                 entity,
                 chats or [],
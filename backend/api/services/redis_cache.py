@@ -11,10 +11,11 @@ Provides:
 
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import timedelta
 
 from ..config import settings
+from .metrics import cache_result
 
 logger = logging.getLogger("hr-analyzer.redis")
 
@@ -95,17 +96,38 @@ class RedisCacheService:
                 value = await redis.get(key)
                 if value:
                     logger.debug(f"Redis cache hit: {key}")
+                cache_result("redis", value is not None)
                 return value
             except Exception as e:
                 logger.warning(f"Redis get error: {e}")
 
         # Fallback to memory cache
         entry = cls._memory_cache.get(key)
+        cache_result("memory", bool(entry))
         if entry:
             logger.debug(f"Memory cache hit: {key}")
             return entry.get('value')
         return None
 
+    @classmethod
+    async def get_many(cls, keys: List[str]) -> List[Optional[str]]:
+        """Get several values in one round trip (None for missing keys)."""
+        if not keys:
+            return []
+        redis = await get_redis()
+
+        if redis:
+            try:
+                return list(await redis.mget(keys))
+            except Exception as e:
+                logger.warning(f"Redis mget error: {e}")
+
+        values = []
+        for key in keys:
+            entry = cls._memory_cache.get(key)
+            values.append(entry.get('value') if entry else None)
+        return values
+
     @classmethod
     async def set(cls, key: str, value: str, ttl_seconds: int = 3600) -> bool:
         """Set value in cache with TTL."""
@@ -1,24 +1,57 @@
+import asyncio
+import hashlib
+import json
 import httpx
 import os
 import logging
 from datetime import datetime, timezone
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.database import (
     SaturnProject, SaturnApplication, SaturnSyncLog,
     Project, ProjectStatus, ProjectTaskStatus, Department,
 )
+from ..utils.http_client import get_http_client
 
 logger = logging.getLogger("hr-analyzer.saturn")
 
 SATURN_API_URL = os.getenv("SATURN_API_URL", "https://saturn.ac")
 SATURN_API_TOKEN = os.getenv("SATURN_API_TOKEN", "")
 
+# Parallel GET /projects/{uuid} requests while resolving environment -> project
+DETAIL_CONCURRENCY = 8
+
+DEFAULT_STATUSES = [
+    {"name": "Бэклог", "slug": "backlog", "color": "#6b7280", "sort_order": 0},
+    {"name": "К выполнению", "slug": "todo", "color": "#3b82f6", "sort_order": 1},
+    {"name": "В работе", "slug": "in_progress", "color": "#f59e0b", "sort_order": 2},
+    {"name": "Ревью", "slug": "review", "color": "#8b5cf6", "sort_order": 3},
+    {"name": "Готово", "slug": "done", "color": "#10b981", "sort_order": 4, "is_done": True},
+]
+
+APP_FIELDS = ("name", "fqdn", "status", "build_pack", "git_repository", "git_branch", "environment_name")
+
+
+def _content_hash(*values) -> str:
+    return hashlib.sha1(
+        json.dumps(values, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def project_hash(sp: dict) -> str:
+    return _content_hash(sp["id"], sp["name"], sp.get("description", ""))
+
+
+def app_hash(app: dict) -> str:
+    return _content_hash(*(app.get(field) for field in APP_FIELDS))
+
 
 class SaturnSyncService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, client: httpx.AsyncClient | None = None):
         self.db = db
+        # Shared keep-alive pool; tests pass a client over a mock transport
+        self.client = client or get_http_client()
         self.base_url = SATURN_API_URL.rstrip("/")
         self.token = SATURN_API_TOKEN
         self.headers = {
@@ -27,176 +60,163 @@ class SaturnSyncService:
         }
 
     async def _get(self, path: str) -> dict | list:
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.get(
-                f"{self.base_url}/api/v1{path}", headers=self.headers
+        resp = await self.client.get(
+            f"{self.base_url}/api/v1{path}", headers=self.headers, timeout=30
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _environment_map(self, saturn_projects: list[dict]) -> dict:
+        """environment id -> project uuid, one detail request per project."""
+        semaphore = asyncio.Semaphore(DETAIL_CONCURRENCY)
+
+        async def detail(sp: dict):
+            async with semaphore:
+                try:
+                    return sp["uuid"], await self._get(f"/projects/{sp['uuid']}")
+                except Exception as e:
+                    logger.warning(f"Saturn project detail {sp.get('uuid')} failed: {e}")
+                    return sp["uuid"], {}
+
+        env_to_project: dict = {}
+        for uuid, proj_detail in await asyncio.gather(*(detail(sp) for sp in saturn_projects)):
+            for env in proj_detail.get("environments", []):
+                env_to_project.setdefault(env.get("id"), uuid)
+        return env_to_project
+
+    async def _create_enceladus_project(self, sp: dict, dev_dept: Department) -> Project:
+        prefix = sp["name"][:4].upper().replace(" ", "")
+        if not prefix:
+            prefix = "SAT"
+        enceladus_proj = Project(
+            org_id=1,  # Default org
+            name=sp["name"],
+            prefix=prefix,
+            task_counter=0,
+            description=f"Saturn: {sp.get('description', '')}\nSaturn UUID: {sp['uuid']}",
+            status=ProjectStatus.active,
+            tags=["saturn", "auto-sync"],
+            extra_data={
+                "saturn_uuid": sp["uuid"],
+                "saturn_id": sp["id"],
+            },
+            department_id=dev_dept.id,
+        )
+        self.db.add(enceladus_proj)
+        await self.db.flush()
+
+        for s in DEFAULT_STATUSES:
+            self.db.add(ProjectTaskStatus(project_id=enceladus_proj.id, **s))
+        return enceladus_proj
+
+    async def _development_department(self) -> Department:
+        """Find or create the "Development" department new projects go to."""
+        dept_result = await self.db.execute(
+            select(Department).where(
+                Department.org_id == 1,
+                Department.name == "Development",
+            )
+        )
+        dev_dept = dept_result.scalars().first()
+        if not dev_dept:
+            dev_dept = Department(
+                org_id=1,
+                name="Development",
+                color="#3b82f6",
             )
-            resp.raise_for_status()
-            return resp.json()
+            self.db.add(dev_dept)
+            await self.db.flush()
+        return dev_dept
 
     async def sync_all(self) -> dict:
-        """Full sync: projects + applications from Saturn."""
-        # 1. Fetch all projects from Saturn
-        saturn_projects = await self._get("/projects")
-        # 2. Fetch all applications from Saturn
-        saturn_apps = await self._get("/applications")
+        """Full sync: projects + applications from Saturn.
+
+        Existing rows are loaded in two queries up front; rows whose content hash
+        matches the API payload only get last_synced_at bumped in bulk.
+        """
+        saturn_projects, saturn_apps = await asyncio.gather(
+            self._get("/projects"), self._get("/applications")
+        )
 
         projects_synced = 0
         apps_synced = 0
+        unchanged_projects: list[int] = []
+        unchanged_apps: list[int] = []
         errors: list[dict] = []
         now = datetime.utcnow()
 
-        # Build a lookup: saturn project id -> list of apps
-        apps_by_project: dict[int, list[dict]] = {}
-        for app in saturn_apps:
-            pid = app.get("project_id")
-            if pid:
-                apps_by_project.setdefault(pid, []).append(app)
+        projects_by_uuid: dict[str, SaturnProject] = {
+            p.saturn_uuid: p for p in (await self.db.execute(select(SaturnProject))).scalars()
+        }
+        apps_by_uuid: dict[str, SaturnApplication] = {
+            a.saturn_uuid: a for a in (await self.db.execute(select(SaturnApplication))).scalars()
+        }
+        dev_dept: Department | None = None
 
-        # 3. Upsert projects
+        # 1. Upsert projects
         for sp in saturn_projects:
             try:
-                result = await self.db.execute(
-                    select(SaturnProject).where(
-                        SaturnProject.saturn_uuid == sp["uuid"]
-                    )
-                )
-                existing = result.scalar_one_or_none()
+                digest = project_hash(sp)
+                existing = projects_by_uuid.get(sp["uuid"])
 
-                if existing:
+                if existing and existing.content_hash == digest:
+                    unchanged_projects.append(existing.id)
+                elif existing:
                     existing.name = sp["name"]
                     existing.description = sp.get("description", "")
                     existing.saturn_id = sp["id"]
+                    existing.content_hash = digest
                     existing.last_synced_at = now
                 else:
+                    if dev_dept is None:
+                        dev_dept = await self._development_department()
+                    enceladus_proj = await self._create_enceladus_project(sp, dev_dept)
                     new_proj = SaturnProject(
                         saturn_uuid=sp["uuid"],
                         saturn_id=sp["id"],
                         name=sp["name"],
                         description=sp.get("description", ""),
+                        content_hash=digest,
                         last_synced_at=now,
+                        enceladus_project_id=enceladus_proj.id,
                     )
                     self.db.add(new_proj)
-
-                    # Auto-create Enceladus project
-                    prefix = sp["name"][:4].upper().replace(" ", "")
-                    if not prefix:
-                        prefix = "SAT"
-                    enceladus_proj = Project(
-                        org_id=1,  # Default org
-                        name=sp["name"],
-                        prefix=prefix,
-                        task_counter=0,
-                        description=f"Saturn: {sp.get('description', '')}\nSaturn UUID: {sp['uuid']}",
-                        status=ProjectStatus.active,
-                        tags=["saturn", "auto-sync"],
-                        extra_data={
-                            "saturn_uuid": sp["uuid"],
-                            "saturn_id": sp["id"],
-                        },
-                    )
-                    self.db.add(enceladus_proj)
-                    await self.db.flush()
-
-                    # Add default task statuses
-                    DEFAULT_STATUSES = [
-                        {"name": "Бэклог", "slug": "backlog", "color": "#6b7280", "sort_order": 0},
-                        {"name": "К выполнению", "slug": "todo", "color": "#3b82f6", "sort_order": 1},
-                        {"name": "В работе", "slug": "in_progress", "color": "#f59e0b", "sort_order": 2},
-                        {"name": "Ревью", "slug": "review", "color": "#8b5cf6", "sort_order": 3},
-                        {"name": "Готово", "slug": "done", "color": "#10b981", "sort_order": 4, "is_done": True},
-                    ]
-                    for s in DEFAULT_STATUSES:
-                        self.db.add(
-                            ProjectTaskStatus(project_id=enceladus_proj.id, **s)
-                        )
-
-                    # Find or create "Development" department and assign
-                    dept_result = await self.db.execute(
-                        select(Department).where(
-                            Department.org_id == 1,
-                            Department.name == "Development",
-                        )
-                    )
-                    dev_dept = dept_result.scalar_one_or_none()
-                    if not dev_dept:
-                        dev_dept = Department(
-                            org_id=1,
-                            name="Development",
-                            color="#3b82f6",
-                        )
-                        self.db.add(dev_dept)
-                        await self.db.flush()
-
-                    enceladus_proj.department_id = dev_dept.id
-
-                    new_proj.enceladus_project_id = enceladus_proj.id
+                    projects_by_uuid[sp["uuid"]] = new_proj
 
                 projects_synced += 1
             except Exception as e:
                 logger.error(f"Error syncing Saturn project {sp.get('name')}: {e}")
                 errors.append({"project": sp.get("name"), "error": str(e)})
 
-        # Flush projects so we can look them up by saturn_id
+        # Flush projects so new apps can reference their ids
         await self.db.flush()
+        projects_by_saturn_id = {
+            p.saturn_id: p for p in projects_by_uuid.values() if p.saturn_id is not None
+        }
+        env_to_project: dict | None = None
 
-        # 4. Upsert applications
+        # 2. Upsert applications
         for app in saturn_apps:
             try:
-                result = await self.db.execute(
-                    select(SaturnApplication).where(
-                        SaturnApplication.saturn_uuid == app["uuid"]
-                    )
-                )
-                existing = result.scalar_one_or_none()
-
-                if existing:
-                    existing.name = app.get("name", existing.name)
-                    existing.fqdn = app.get("fqdn", existing.fqdn)
-                    existing.status = app.get("status", existing.status)
-                    existing.build_pack = app.get("build_pack", existing.build_pack)
-                    existing.git_repository = app.get("git_repository", existing.git_repository)
-                    existing.git_branch = app.get("git_branch", existing.git_branch)
-                    existing.environment_name = app.get("environment_name", existing.environment_name)
+                digest = app_hash(app)
+                existing = apps_by_uuid.get(app["uuid"])
+
+                if existing and existing.content_hash == digest:
+                    unchanged_apps.append(existing.id)
+                elif existing:
+                    for field in APP_FIELDS:
+                        setattr(existing, field, app.get(field, getattr(existing, field)))
+                    existing.content_hash = digest
                     existing.last_synced_at = now
                 else:
-                    # Find parent saturn project by saturn project_id
-                    # Saturn apps may reference project via environment -> project chain
-                    # Try to match via the project_id field on the app
-                    saturn_proj = None
-                    app_project_id = app.get("project_id")
-                    if app_project_id:
-                        proj_result = await self.db.execute(
-                            select(SaturnProject).where(
-                                SaturnProject.saturn_id == app_project_id
-                            )
-                        )
-                        saturn_proj = proj_result.scalar_one_or_none()
-
-                    if not saturn_proj:
-                        # Try to find via environment_id -> project mapping
-                        # Fetch project detail from Saturn if we have environment_id
-                        env_id = app.get("environment_id")
-                        if env_id:
-                            try:
-                                # Saturn API: GET /projects/{uuid} includes environments
-                                # We iterate known saturn projects to find the match
-                                for sp in saturn_projects:
-                                    proj_detail = await self._get(f"/projects/{sp['uuid']}")
-                                    envs = proj_detail.get("environments", [])
-                                    for env in envs:
-                                        if env.get("id") == env_id:
-                                            proj_result = await self.db.execute(
-                                                select(SaturnProject).where(
-                                                    SaturnProject.saturn_uuid == sp["uuid"]
-                                                )
-                                            )
-                                            saturn_proj = proj_result.scalar_one_or_none()
-                                            break
-                                    if saturn_proj:
-                                        break
-                            except Exception:
-                                pass  # Fallback: skip if we can't find
+                    # Apps reference their project either directly or via
+                    # environment -> project, which needs project details
+                    saturn_proj = projects_by_saturn_id.get(app.get("project_id"))
+                    env_id = app.get("environment_id")
+                    if not saturn_proj and env_id:
+                        if env_to_project is None:
+                            env_to_project = await self._environment_map(saturn_projects)
+                        saturn_proj = projects_by_uuid.get(env_to_project.get(env_id))
 
                     if saturn_proj:
                         new_app = SaturnApplication(
@@ -209,9 +229,11 @@ class SaturnSyncService:
                             git_repository=app.get("git_repository"),
                             git_branch=app.get("git_branch"),
                             environment_name=app.get("environment_name", "development"),
+                            content_hash=digest,
                             last_synced_at=now,
                         )
                         self.db.add(new_app)
+                        apps_by_uuid[app["uuid"]] = new_app
                     else:
                         logger.warning(
                             f"Skipping app {app.get('name')}: no matching Saturn project found"
@@ -222,7 +244,23 @@ class SaturnSyncService:
                 logger.error(f"Error syncing Saturn app {app.get('name')}: {e}")
                 errors.append({"app": app.get("name"), "error": str(e)})
 
-        # 5. Log sync
+        # 3. Unchanged rows: one UPDATE per table, updated_at stays as is
+        if unchanged_projects:
+            await self.db.execute(
+                update(SaturnProject)
+                .where(SaturnProject.id.in_(unchanged_projects))
+                .values(last_synced_at=now, updated_at=SaturnProject.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+        if unchanged_apps:
+            await self.db.execute(
+                update(SaturnApplication)
+                .where(SaturnApplication.id.in_(unchanged_apps))
+                .values(last_synced_at=now, updated_at=SaturnApplication.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+
+        # 4. Log sync
         log = SaturnSyncLog(
             sync_type="full",
             projects_synced=projects_synced,
@@ -232,6 +270,10 @@ class SaturnSyncService:
         self.db.add(log)
         await self.db.commit()
 
+        logger.info(
+            f"Saturn sync: {len(unchanged_projects)}/{projects_synced} projects "
+            f"and {len(unchanged_apps)}/{apps_synced} apps unchanged"
+        )
         return {
             "projects_synced": projects_synced,
             "apps_synced": apps_synced,
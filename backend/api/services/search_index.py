@@ -15,10 +15,10 @@
 """
 import re
 from typing import Optional, List
-from sqlalchemy import cast, event, func, or_, and_, text, String
+from sqlalchemy import cast, event, func, or_, and_, select, text, String
 from sqlalchemy.sql.elements import ColumnElement
 
-from ..models.database import Entity
+from ..models.database import Entity, EntityNote
 from .similarity import (
     generate_name_variants, _name_word_variants, fold_yo,
     transliterate_ru_to_en, transliterate_en_to_ru,
@@ -283,25 +283,35 @@ def is_nick_query(q: str) -> bool:
 
 def nick_search_conditions(q: str) -> List:
     """Строгий поиск по telegram-нику: поле telegram_usernames + текст комментариев
-    (extra_data.notes), БЕЗ нечёткого матча имени/должности/блоба. Ник уникален, так
+    (entity_notes), БЕЗ нечёткого матча имени/должности/блоба. Ник уникален, так
     что имя не примешиваем; но ник, вписанный рекрутёром в комментарий, тоже находим."""
     tg = (q or "").strip().lstrip("@").lower()
     if not tg:
         return []
     return [
         cast(Entity.telegram_usernames, String).ilike(f"%{tg}%"),
-        cast(Entity.extra_data["notes"], String).ilike(f"%{tg}%"),
+        _entity_with_note_like(tg),
     ]
 
 
+def _entity_with_note_like(q: str) -> ColumnElement:
+    """Кандидаты, у которых есть живой комментарий с подстрокой q."""
+    return Entity.id.in_(
+        select(EntityNote.entity_id).where(
+            EntityNote.deleted_at.is_(None),
+            EntityNote.text.ilike(f"%{q}%"),
+        )
+    )
+
+
 def notes_search_conditions(q: str) -> List:
-    """Поиск по тексту КОММЕНТАРИЕВ карточки (extra_data.notes) — прицельно, НЕ по
+    """Поиск по тексту КОММЕНТАРИЕВ карточки (entity_notes) — прицельно, НЕ по
     всему extra_data-блобу (там участия/анкеты/источники = шум). Рекрутёры пишут в
     комментарии актуальный ник/почту кандидата, и это должно находиться поиском."""
     q = (q or "").strip()
     if not q:
         return []
-    return [cast(Entity.extra_data["notes"], String).ilike(f"%{q}%")]
+    return [_entity_with_note_like(q)]
 
 
 # Регистрируем автосинк при импорте модуля (роуты поиска импортируют его на
@@ -1375,7 +1375,11 @@ class SimilarityService:
         all_tags.update(source_entity.tags or [])
         target_entity.tags = list(all_tags)
 
-        # Объединяем extra_data
+        # Объединяем extra_data. Заметки/реакции источника живут в своих таблицах
+        # (CASCADE при удалении) — подмешиваем их в блоб, и write-through в
+        # entity_extras перенесёт их на target при flush.
+        from .entity_extras import attach as _attach_extras
+        await _attach_extras(db, [target_entity, source_entity])
         target_extra = dict(target_entity.extra_data or {})
         source_extra = dict(source_entity.extra_data or {})
 
@@ -1657,6 +1661,7 @@ class SimilarityService:
         # Сохраняем изменения
         await db.commit()
         await db.refresh(target_entity)
+        await _attach_extras(db, [target_entity])
 
         logger.info(f"Merged entity {source_entity.id} into {target_entity.id}")
 
@@ -0,0 +1,1275 @@
+"""
+Streaming importer for Telegram Desktop chat exports (JSON, HTML, ZIP).
+
+The old importer did ``await file.read()`` on the whole upload, opened it as
+an in-memory ``ZipFile`` and ``json.loads``-ed all of ``result.json`` — a
+multi-GB export with media simply exhausted RAM. Here everything is bounded:
+
+- the upload is spooled to disk in chunks (:func:`spool_upload`);
+- messages are parsed incrementally — JSON via ``raw_decode`` over a sliding
+  buffer, HTML via ``TelegramHTMLParser.feed`` chunk by chunk;
+- media is extracted lazily from the zip, one member at a time, straight to
+  ``uploads/{chat_id}/`` without passing through memory;
+- messages are inserted in batches, each batch committed together with the
+  job cursor in :class:`ChatImportJob`.
+
+The job row is the shared progress/resume state: any worker can answer the
+progress poll, and a re-upload of the same file (same sha256) into the same
+chat continues from the last committed batch instead of starting over.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from io import TextIOWrapper
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.database import Chat, ChatImportJob, Message
+
+logger = logging.getLogger("hr-analyzer.telegram_import")
+
+# Uploads directory for imported media (same as routes/chats.py)
+UPLOADS_DIR = Path(__file__).parent.parent.parent / "uploads"
+# Временные копии загрузок: удаляются по завершении импорта
+SPOOL_DIR = UPLOADS_DIR / "import_spool"
+
+# Размер чанка при спулинге загрузки и чтении экспорта
+CHUNK_SIZE = 1024 * 1024
+# Сколько сообщений вставляем и коммитим за раз (вместе с курсором задачи)
+BATCH_SIZE = 500
+# Даже неполный пакет коммитим не реже, чем раз в N секунд — при auto_process
+# транскрипция медиа медленная, а прогресс должен двигаться.
+FLUSH_INTERVAL_SECONDS = 5.0
+# «processing»-задача без обновлений дольше этого считается упавшей вместе с
+# воркером — её можно продолжить повторной загрузкой.
+STALE_JOB_AFTER = timedelta(minutes=10)
+# Statuses of a job that is (or claims to be) still running
+ACTIVE_STATUSES = ("starting", "processing")
+
+
+class ImportFormatError(ValueError):
+    """The upload is not a usable Telegram export (maps to HTTP 400)."""
+
+
+class ImportInProgressError(RuntimeError):
+    """The same file is already being imported into this chat (maps to HTTP 409)."""
+
+
+# ============================================================================
+# MESSAGE PARSING HELPERS
+# ============================================================================
+
+def parse_telegram_date(date_str: str) -> datetime:
+    """Parse Telegram export date format."""
+    if not date_str:
+        return datetime.now()
+
+    # Strip timezone suffix like " UTC+03:00"
+    if ' UTC' in date_str:
+        date_str = date_str.split(' UTC')[0]
+
+    # Try ISO format first: 2024-12-10T14:30:00
+    try:
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+
+    # Try Russian format: DD.MM.YYYY HH:MM:SS
+    try:
+        if '.' in date_str and len(date_str.split('.')[0]) <= 2:
+            return datetime.strptime(date_str, '%d.%m.%Y %H:%M:%S')
+    except ValueError:
+        pass
+
+    # Try other common formats
+    formats = [
+        '%Y-%m-%d %H:%M:%S',
+        '%d/%m/%Y %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S',
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+
+    # Fallback - return now (shouldn't happen often)
+    return datetime.now()
+
+
+def detect_content_type(msg: dict) -> str:
+    """Detect message content type from Telegram export."""
+    if msg.get('media_type') == 'voice_message':
+        return 'voice'
+    if msg.get('media_type') == 'video_message':
+        return 'video_note'
+    if msg.get('media_type') == 'sticker':
+        return 'sticker'
+    if 'photo' in msg:
+        return 'photo'
+    if 'file' in msg and msg.get('mime_type', '').startswith('video'):
+        return 'video'
+    if 'file' in msg:
+        return 'document'
+    return 'text'
+
+
+def extract_text_content(msg: dict) -> str:
+    """Extract text content from Telegram message."""
+    text = msg.get('text', '')
+
+    # Handle complex text (with formatting entities)
+    if isinstance(text, list):
+        parts = []
+        for part in text:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict):
+                parts.append(part.get('text', ''))
+        text = ''.join(parts)
+
+    # Add media type indicator if no text
+    if not text:
+        content_type = detect_content_type(msg)
+        type_labels = {
+            'voice': '[Голосовое сообщение]',
+            'video_note': '[Видеосообщение]',
+            'photo': '[Фото]',
+            'video': '[Видео]',
+            'sticker': '[Стикер]',
+            'document': f'[Файл: {msg.get("file_name", "документ")}]',
+        }
+        text = type_labels.get(content_type, '[Медиа]')
+
+    return text
+
+
+def get_content_hash(content: str, timestamp: datetime, media_file: str = None) -> str:
+    """Generate hash for deduplication when message_id is not available.
+
+    For media messages, use media_file instead of content to avoid
+    duplicates when content changes (e.g., transcription replaces placeholder).
+    """
+    if media_file:
+        # Use media file path - stable across auto-processing runs
+        data = f"media:{media_file}:{timestamp.isoformat()}"
+    else:
+        data = f"{content}:{timestamp.isoformat()}"
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+class TelegramHTMLParser(HTMLParser):
+    """
+    Parser for Telegram Desktop HTML export format.
+
+    HTML structure:
+    - Message container: div.message.default (or div.message.default.joined for continuation)
+    - Sender name: div.from_name (only in first message of a sequence)
+    - Message body: div.body > div.text
+    - Date: div.date (datetime in title attribute, format: "DD.MM.YYYY HH:MM:SS")
+    - Media: div.media_wrap (photos, videos, etc.)
+
+    Messages with class "joined" don't have from_name - they continue from previous sender.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.current_message = None
+        self.last_sender = None  # Track last sender for "joined" messages
+        self.in_from_name = False
+        self.in_text = False
+        self.in_media = False
+        self.text_buffer = ""
+        self.from_buffer = ""
+        self.div_depth = 0  # Track div nesting to know when message ends
+        self.message_div_depth = 0  # Depth where message div started
+        self.is_joined = False
+        self.media_type = None  # photo, video, sticker, video_note, voice
+        self.skipped_service = 0  # Track skipped service messages
+
+    def handle_starttag(self, tag, attrs):
+        attrs_dict = dict(attrs)
+        class_name = attrs_dict.get('class', '')
+        classes = class_name.split() if class_name else []
+
+        if tag == 'div':
+            self.div_depth += 1
+
+            # Check for message container: div.message.default or div.message.service
+            if 'message' in classes:
+                # Skip service messages (like "User joined the group")
+                if 'service' in classes:
+                    self.skipped_service += 1
+                    return  # Skip service messages
+
+                # Only process default messages
+                if 'default' in classes:
+                    self.message_div_depth = self.div_depth
+                    self.is_joined = 'joined' in classes
+                    self.current_message = {
+                        'id': None,
+                        'from': self.last_sender if self.is_joined else None,
+                        'date': '',
+                        'text': '',
+                        'has_media': False,
+                        'media_file': None,  # Path to media file in export
+                        'media_type': None,  # photo, video, sticker, video_note, voice
+                        'type': 'message'
+                    }
+                    # Get message ID from id attribute (format: "message123")
+                    msg_id = attrs_dict.get('id', '')
+                    if msg_id.startswith('message'):
+                        try:
+                            self.current_message['id'] = int(msg_id[7:])
+                        except ValueError:
+                            pass
+
+            elif self.current_message:
+                # Check for from_name
+                if 'from_name' in classes:
+                    self.in_from_name = True
+                    self.from_buffer = ""
+
+                # Check for text content
+                elif 'text' in classes:
+                    # IMPORTANT: Close from_name when text starts
+                    # This prevents message text from being added to sender name
+                    self.in_from_name = False
+                    self.in_text = True
+                    self.text_buffer = ""
+
+                # Check for media
+                elif 'media_wrap' in classes or 'media' in classes:
+                    # Also close from_name when media starts
+                    self.in_from_name = False
+                    self.in_media = True
+                    self.current_message['has_media'] = True
+                    # Detect media type from classes
+                    if 'photo' in classes:
+                        self.current_message['media_type'] = 'photo'
+                    elif 'video' in classes:
+                        self.current_message['media_type'] = 'video'
+                    elif 'sticker' in classes:
+                        self.current_message['media_type'] = 'sticker'
+                    elif 'document' in classes:
+                        self.current_message['media_type'] = 'document'
+                    elif 'audio_file' in classes:
+                        self.current_message['media_type'] = 'voice'
+
+                # Check for document wrapper (separate from media_wrap)
+                elif 'document_wrap' in classes or 'document' in classes:
+                    self.in_from_name = False  # Close from_name
+                    self.in_media = True
+                    self.current_message['has_media'] = True
+                    self.current_message['media_type'] = 'document'
+
+                # Check for date (datetime in title attribute)
+                elif 'date' in classes:
+                    title = attrs_dict.get('title', '')
+                    if title:
+                        self.current_message['date'] = title
+
+        # Capture media file paths from a, img, video tags inside media div
+        elif self.in_media and self.current_message:
+            if tag == 'a':
+                href = attrs_dict.get('href', '')
+                # Skip external links and anchors
+                if href and not href.startswith('#') and not href.startswith('http'):
+                    # For photos, prefer full-size over thumbnail
+                    # For stickers, accept thumbs (they only have thumb versions)
+                    is_thumb = '_thumb' in href
+                    is_sticker = 'sticker' in href.lower()
+
+                    # Accept if: not a thumb, OR is a sticker thumb, OR we don't have a file yet
+                    if not is_thumb or is_sticker or not self.current_message.get('media_file'):
+                        # Don't overwrite full-size with thumb for photos
+                        if is_thumb and self.current_message.get('media_file') and not is_sticker:
+                            pass  # Keep existing full-size file
+                        else:
+                            self.current_message['media_file'] = href
+                            # Detect type from file path
+                            if 'photos/' in href or href.endswith(('.jpg', '.jpeg', '.png')):
+                                self.current_message['media_type'] = 'photo'
+                            elif 'round_video' in href or 'video_messages/' in href:
+                                # Video notes (circles) are in round_video_messages/ folder
+                                self.current_message['media_type'] = 'video_note'
+                            elif 'video_files/' in href or 'videos/' in href or href.endswith(('.mp4', '.webm')):
+                                # Regular videos in video_files/ or videos/ folder
+                                self.current_message['media_type'] = 'video'
+                            elif 'stickers/' in href or is_sticker:
+                                self.current_message['media_type'] = 'sticker'
+                            elif 'voice_messages/' in href or href.endswith(('.ogg', '.mp3', '.wav', '.m4a', '.opus')):
+                                self.current_message['media_type'] = 'voice'
+                            elif 'files/' in href and not href.endswith(('.ogg', '.mp3', '.wav', '.m4a', '.opus', '.mp4', '.webm', '.mov')):
+                                self.current_message['media_type'] = 'document'
+                            elif href.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.zip', '.rar', '.7z', '.csv', '.json')):
+                                self.current_message['media_type'] = 'document'
+                            elif href.endswith('.webp'):
+                                # .webp can be sticker or photo
+                                if 'sticker' in href.lower():
+                                    self.current_message['media_type'] = 'sticker'
+                                else:
+                                    self.current_message['media_type'] = 'photo'
+            elif tag == 'img':
+                src = attrs_dict.get('src', '')
+                # Only use img src if we don't have a file from <a> tag yet
+                if src and not src.startswith('http') and not self.current_message.get('media_file'):
+                    self.current_message['media_file'] = src
+                    if 'sticker' in src.lower():
+                        self.current_message['media_type'] = 'sticker'
+                    else:
+                        self.current_message['media_type'] = 'photo'
+            elif tag == 'video':
+                src = attrs_dict.get('src', '')
+                if src and not self.current_message.get('media_file'):
+                    self.current_message['media_file'] = src
+                    if 'round' in src.lower():
+                        self.current_message['media_type'] = 'video_note'
+                    else:
+                        self.current_message['media_type'] = 'video'
+            elif tag == 'audio':
+                src = attrs_dict.get('src', '')
+                if src and not self.current_message.get('media_file'):
+                    self.current_message['media_file'] = src
+                    self.current_message['media_type'] = 'voice'
+            elif tag == 'source':
+                src = attrs_dict.get('src', '')
+                if src and not self.current_message.get('media_file'):
+                    self.current_message['media_file'] = src
+                    # Detect type from source src
+                    if 'voice' in src.lower() or src.endswith('.ogg'):
+                        self.current_message['media_type'] = 'voice'
+                    elif 'round' in src.lower():
+                        self.current_message['media_type'] = 'video_note'
+
+        # Handle links in text - might be document links
+        elif tag == 'a' and self.in_text and self.current_message:
+            href = attrs_dict.get('href', '')
+            # Check if it's a file link (not external)
+            if href and not href.startswith('#') and not href.startswith('http'):
+                # Check if it's a document/file by extension
+                doc_extensions = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+                                  '.txt', '.zip', '.rar', '.7z', '.csv', '.json')
+                if href.endswith(doc_extensions) or 'files/' in href:
+                    if not self.current_message.get('media_file'):
+                        self.current_message['media_file'] = href
+                        self.current_message['media_type'] = 'document'
+                        self.current_message['has_media'] = True
+
+        elif tag == 'br' and self.in_text:
+            self.text_buffer += '\n'
+
+    def handle_endtag(self, tag):
+        if tag == 'div':
+            # Check if we're closing the message div
+            if self.current_message and self.div_depth == self.message_div_depth:
+                # Finalize the message
+                if self.from_buffer.strip():
+                    self.current_message['from'] = self.from_buffer.strip()
+                    self.last_sender = self.from_buffer.strip()
+
+                if self.text_buffer.strip():
+                    self.current_message['text'] = self.text_buffer.strip()
+
+                # Save message (use last sender or "Unknown" if no sender)
+                if not self.current_message.get('from'):
+                    self.current_message['from'] = self.last_sender or 'Unknown'
+                self.messages.append(self.current_message)
+
+                # Reset state
+                self.current_message = None
+                self.in_from_name = False
+                self.in_text = False
+                self.in_media = False
+                self.text_buffer = ""
+                self.from_buffer = ""
+                self.is_joined = False
+
+            self.div_depth -= 1
+
+        # Reset from_name flag when its span/div closes
+        elif tag in ('span', 'div') and self.in_from_name:
+            self.in_from_name = False
+
+    def handle_data(self, data):
+        if self.in_from_name:
+            self.from_buffer += data
+        elif self.in_text:
+            self.text_buffer += data
+
+
+def normalize_html_message(msg: dict) -> Optional[dict]:
+    """Turn one raw ``TelegramHTMLParser`` message into import format.
+
+    Returns ``None`` for messages that should be skipped (no sender, or
+    empty text without media).
+    """
+    # Skip if no sender (shouldn't happen now)
+    if not msg.get('from'):
+        return None
+
+    # Parse date (format: "DD.MM.YYYY HH:MM:SS" or "DD.MM.YYYY HH:MM:SS UTC+03:00")
+    date_str = msg.get('date', '')
+
+    # Strip timezone suffix like " UTC+03:00"
+    if ' UTC' in date_str:
+        date_str = date_str.split(' UTC')[0]
+
+    try:
+        if '.' in date_str and len(date_str.split('.')[0]) <= 2:
+            # Russian format: DD.MM.YYYY HH:MM:SS
+            parsed_date = datetime.strptime(date_str, '%d.%m.%Y %H:%M:%S')
+        elif 'T' in date_str:
+            # ISO format
+            parsed_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        else:
+            parsed_date = datetime.now()
+            logger.warning(f"HTML Parser - using datetime.now() for unknown format: '{date_str}'")
+    except (ValueError, AttributeError) as e:
+        parsed_date = datetime.now()
+        logger.error(f"HTML Parser - date parse error for '{date_str}': {e}")
+
+    # Determine text content and media type
+    text = msg.get('text', '').strip()
+    media_file = msg.get('media_file')
+    media_type = msg.get('media_type')
+
+    # Handle messages with media
+    if msg.get('has_media') or media_file:
+        if not media_type:
+            # Try to detect type from file path
+            if media_file:
+                if 'photo' in media_file or media_file.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
+                    media_type = 'photo'
+                elif 'sticker' in media_file:
+                    media_type = 'sticker'
+                elif 'round' in media_file or 'video_note' in media_file:
+                    media_type = 'video_note'
+                elif 'video' in media_file or media_file.endswith(('.mp4', '.webm', '.mov')):
+                    media_type = 'video'
+                elif 'voice' in media_file or media_file.endswith(('.ogg', '.opus', '.mp3', '.wav', '.m4a')):
+                    media_type = 'voice'
+                elif ('files/' in media_file and not media_file.endswith(('.ogg', '.opus', '.mp3', '.wav', '.m4a', '.mp4', '.webm', '.mov'))) or media_file.endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.zip', '.rar', '.7z', '.csv', '.json')):
+                    media_type = 'document'
+
+        if not text:
+            # Set appropriate placeholder based on media type
+            if media_type == 'photo':
+                text = '[Фото]'
+            elif media_type == 'video_note':
+                text = '[Видео-кружок]'
+            elif media_type == 'video':
+                text = '[Видео]'
+            elif media_type == 'sticker':
+                text = '[Стикер]'
+            elif media_type == 'voice':
+                text = '[Голосовое сообщение]'
+            elif media_type == 'document':
+                text = '[Файл]'
+            else:
+                text = '[Медиа]'
+    elif not text:
+        return None  # Skip empty messages without media
+
+    return {
+        'id': msg.get('id'),
+        'type': 'message',
+        'date': parsed_date.isoformat(),
+        'from': msg.get('from'),
+        'from_id': '',
+        'text': text,
+        'media_file': media_file,  # Path to media file in export
+        'media_type': media_type   # photo, video, sticker, video_note, voice
+    }
+
+
+def parse_html_export(html_content: str) -> List[dict]:
+    """Parse Telegram HTML export and return messages list.
+
+    Whole-document variant kept for small inputs; the importer streams via
+    :func:`iter_html_messages`.
+    """
+    parser = TelegramHTMLParser()
+    try:
+        parser.feed(html_content)
+    except (ValueError, AssertionError, MemoryError) as e:
+        logger.error(f"HTML parse error: {e}")
+        return []
+
+    messages = []
+    for msg in parser.messages:
+        normalized = normalize_html_message(msg)
+        if normalized is not None:
+            messages.append(normalized)
+
+    logger.info(f"HTML parse result: {len(messages)} of {len(parser.messages)} messages, skipped {parser.skipped_service} (service)")
+    return messages
+
+
+# ============================================================================
+# SPOOLING AND INCREMENTAL READERS
+# ============================================================================
+
+async def spool_upload(file: UploadFile, dest_dir: Path = SPOOL_DIR) -> Tuple[Path, str, int]:
+    """Copy the upload to a temp file chunk by chunk.
+
+    Returns ``(path, sha256, size)``. The hash identifies the export for
+    resuming an interrupted import.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    path = dest_dir / f"{uuid.uuid4().hex}.upload"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path, digest.hexdigest(), size
+
+
+class _JSONStream:
+    """Sliding-buffer reader over a text stream for ``raw_decode``."""
+
+    _ws = re.compile(r"\s*")
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Отбрасываем уже разобранный префикс, чтобы буфер не рос
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace char ('' at EOF)."""
+        while True:
+            self.pos = self._ws.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        got = self.peek()
+        if got != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode one complete JSON value starting at the cursor."""
+        decoder = json.JSONDecoder()
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Число на границе буфера могло быть обрезано ("12|345") —
+            # убеждаемся, что после значения есть хотя бы один символ.
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_messages(stream: IO[str]) -> Iterator[dict]:
+    """Yield elements of the top-level ``"messages"`` array one at a time.
+
+    Other top-level keys (name, type, id) are small and decoded normally;
+    the messages array itself is never materialised.
+    """
+    reader = _JSONStream(stream)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", reader.buf, reader.pos)
+        reader.expect(":")
+        if key == "messages" and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    item = reader.value()
+                    if isinstance(item, dict):
+                        yield item
+                    sep = reader.peek()
+                    reader.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise json.JSONDecodeError("Expecting ',' delimiter", reader.buf, reader.pos - 1)
+        else:
+            reader.value()
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", reader.buf, reader.pos - 1)
+
+
+def iter_html_messages(stream: IO[str]) -> Iterator[dict]:
+    """Feed the HTML export chunk by chunk and yield normalized messages."""
+    parser = TelegramHTMLParser()
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+        # Забираем готовые сообщения — парсер их не копит
+        ready, parser.messages = parser.messages, []
+        for raw in ready:
+            msg = normalize_html_message(raw)
+            if msg is not None:
+                yield msg
+        if not chunk:
+            return
+
+
+# ============================================================================
+# EXPORT SOURCE
+# ============================================================================
+
+class TelegramExport:
+    """An opened export: a message stream plus lazy access to zipped media."""
+
+    def __init__(self, path: Path, filename: str):
+        self.path = path
+        self.filename = (filename or "").lower()
+        self.zip_file: Optional[zipfile.ZipFile] = None
+        self.target: Optional[str] = None
+        self.is_html = False
+        # basename → пути в архиве (в порядке namelist); строится один раз
+        # вместо линейного прохода по namelist на каждое медиа-сообщение.
+        self._by_basename: Dict[str, List[str]] = {}
+
+        if self.filename.endswith(".zip"):
+            self._open_zip()
+        elif self.filename.endswith((".html", ".htm")):
+            self.is_html = True
+
+    def _open_zip(self) -> None:
+        try:
+            self.zip_file = zipfile.ZipFile(self.path)
+        except zipfile.BadZipFile:
+            raise ImportFormatError("Повреждённый ZIP-архив")
+
+        names = self.zip_file.namelist()
+        for name in names:
+            if name.endswith("result.json"):
+                self.target = name
+                break
+        if not self.target:
+            self.target = next((n for n in names if n.endswith(".json")), None)
+        if not self.target:
+            self.target = next((n for n in names if n.endswith((".html", ".htm"))), None)
+            self.is_html = self.target is not None
+        if not self.target:
+            self.close()
+            raise ImportFormatError("ZIP-архив не содержит JSON или HTML файл")
+
+        for name in names:
+            self._by_basename.setdefault(os.path.basename(name), []).append(name)
+        logger.info(f"Using file from ZIP: {self.target}, is_html: {self.is_html}, members: {len(names)}")
+
+    def _open_text(self) -> IO[str]:
+        if self.zip_file is not None:
+            raw = self.zip_file.open(self.target)
+        else:
+            raw = open(self.path, "rb")
+        return TextIOWrapper(raw, encoding="utf-8")
+
+    def iter_messages(self) -> Iterator[dict]:
+        """Yield raw messages in export order (HTML ones already normalized)."""
+        with self._open_text() as stream:
+            if self.is_html:
+                yield from iter_html_messages(stream)
+            else:
+                yield from iter_json_messages(stream)
+
+    def count_messages(self) -> int:
+        """Full validating pass without touching the DB (bounded memory)."""
+        return sum(1 for _ in self.iter_messages())
+
+    def find_media(self, search_file: str) -> Optional[str]:
+        """Locate an export-relative media path inside the zip."""
+        if self.zip_file is None:
+            return None
+        search_filename = os.path.basename(search_file)
+        candidates = self._by_basename.get(search_filename) or [
+            z for z in self.zip_file.namelist()
+            if z.endswith(search_file) or search_file in z
+        ]
+        for zip_path in candidates:
+            # Make sure it's the actual file, not another thumb
+            if "_thumb" in zip_path and "_thumb" not in search_file:
+                continue
+            return zip_path
+        return None
+
+    def extract(self, zip_path: str, dest: Path) -> None:
+        """Stream one zip member to ``dest``."""
+        with self.zip_file.open(zip_path) as src, open(dest, "wb") as out:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+
+    def close(self) -> None:
+        if self.zip_file is not None:
+            try:
+                self.zip_file.close()
+            except (OSError, RuntimeError):
+                pass  # Ignore errors when closing ZIP file
+            self.zip_file = None
+
+
+def _take(iterator: Iterator[dict], n: int) -> List[dict]:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= n:
+            break
+    return batch
+
+
+def _skip(iterator: Iterator[dict], n: int) -> None:
+    for _ in range(n):
+        if next(iterator, None) is None:
+            return
+
+
+# ============================================================================
+# JOB STATE
+# ============================================================================
+
+def job_progress(job: Optional[ChatImportJob]) -> Dict[str, Any]:
+    """Progress payload for ``GET /chats/{id}/import/progress/{import_id}``."""
+    if job is None:
+        return {"status": "not_found"}
+    payload = {
+        "status": job.status,
+        "phase": job.phase,
+        "current": job.processed or 0,
+        "total": job.total or 0,
+        "imported": job.imported or 0,
+        "skipped": job.skipped or 0,
+        "current_file": job.current_file,
+    }
+    if job.error:
+        payload["error"] = job.error
+    if job.resumed_from:
+        payload["resumed_from"] = job.resumed_from
+    return payload
+
+
+def _is_live(job: ChatImportJob) -> bool:
+    """Job is being worked on right now (not finished and not abandoned)."""
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    last_seen = job.updated_at or job.created_at
+    return bool(last_seen and datetime.utcnow() - last_seen < STALE_JOB_AFTER)
+
+
+async def create_import_job(
+    db: AsyncSession,
+    *,
+    chat_id: int,
+    org_id: int,
+    user_id: Optional[int],
+    import_id: str,
+    source_name: str,
+) -> ChatImportJob:
+    """Create the job row before the upload is spooled, so the progress poll
+    sees ``starting/reading_file`` right away.
+
+    ``import_id`` comes from the client. A retry with the id of a finished or
+    failed job of the same chat gets a fresh row (the old one is renamed and
+    stays resumable by file hash); an id that is live or belongs to another
+    chat → ImportInProgressError (409).
+    """
+    existing = (await db.execute(
+        select(ChatImportJob).where(ChatImportJob.import_id == import_id)
+    )).scalar_one_or_none()
+    if existing is not None:
+        if existing.chat_id != chat_id or _is_live(existing):
+            raise ImportInProgressError("Импорт с таким import_id уже существует")
+        if existing.status in ACTIVE_STATUSES:
+            # Брошенный воркером — дальше продолжается как обычный сбой
+            existing.status = "error"
+        existing.import_id = f"{import_id[:48]}~{existing.id}"
+        await db.flush()
+
+    job = ChatImportJob(
+        import_id=import_id,
+        chat_id=chat_id,
+        org_id=org_id,
+        user_id=user_id,
+        status="starting",
+        phase="reading_file",
+        source_name=(source_name or "")[:255],
+        processed=0,
+        imported=0,
+        skipped=0,
+        errors_count=0,
+        updated_at=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise ImportInProgressError("Импорт с таким import_id уже существует")
+    return job
+
+
+async def attach_import_source(
+    db: AsyncSession,
+    job: ChatImportJob,
+    *,
+    source_sha256: str,
+    source_size: int,
+    total: int,
+) -> ChatImportJob:
+    """Record the spooled file on the job, inheriting the cursor of an
+    interrupted import of the same file into the same chat.
+
+    ``error`` jobs are resumed always, ``starting``/``processing`` ones only
+    when stale (the worker died). A live one means a concurrent upload → 409.
+    The chat row is locked (FOR UPDATE) so two uploads of the same file can't
+    both pass the check; the partial unique index
+    ix_chat_import_job_active_source is the backstop.
+    """
+    await db.execute(select(Chat.id).where(Chat.id == job.chat_id).with_for_update())
+    previous = (await db.execute(
+        select(ChatImportJob)
+        .where(
+            ChatImportJob.chat_id == job.chat_id,
+            ChatImportJob.source_sha256 == source_sha256,
+            ChatImportJob.status.in_((*ACTIVE_STATUSES, "error")),
+            ChatImportJob.id != job.id,
+        )
+        .order_by(ChatImportJob.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+
+    if previous is not None and _is_live(previous):
+        await _fail_job(db, job, "Этот файл уже импортируется в чат")
+        raise ImportInProgressError("Этот файл уже импортируется в чат")
+
+    if previous is not None:
+        job.resumed_from = previous.import_id
+        job.processed = previous.processed or 0
+        job.imported = previous.imported or 0
+        job.skipped = previous.skipped or 0
+        previous.status = "resumed"
+        previous.updated_at = datetime.utcnow()
+        # Освободить «активный» слот до того, как его займёт новая задача
+        await db.flush()
+        logger.info(
+            f"Resuming import into chat {job.chat_id} from {previous.import_id} "
+            f"at message {job.processed}"
+        )
+
+    job.source_sha256 = source_sha256
+    job.source_size = source_size
+    job.total = total
+    job.updated_at = datetime.utcnow()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await _fail_job(db, job, "Этот файл уже импортируется в чат")
+        raise ImportInProgressError("Этот файл уже импортируется в чат")
+    return job
+
+
+async def _fail_job(db: AsyncSession, job: ChatImportJob, error: str) -> None:
+    job.status = "error"
+    job.error = error[:1000]
+    job.updated_at = datetime.utcnow()
+    await db.commit()
+
+
+async def fail_import_job(db: AsyncSession, chat_id: int, import_id: str, error: str) -> None:
+    """Mark a job failed after the request's transaction was rolled back."""
+    job = await get_import_job(db, chat_id, import_id)
+    if job is not None:
+        await _fail_job(db, job, error)
+
+
+async def get_import_job(db: AsyncSession, chat_id: int, import_id: str) -> Optional[ChatImportJob]:
+    return (await db.execute(
+        select(ChatImportJob).where(
+            ChatImportJob.chat_id == chat_id,
+            ChatImportJob.import_id == import_id,
+        )
+    )).scalar_one_or_none()
+
+
+# ============================================================================
+# IMPORTER
+# ============================================================================
+
+def _telegram_user_id(from_id: Any, from_name: str) -> int:
+    """Parse telegram user ID from "user123456"; derive a stable one from the
+    sender name for HTML imports without user IDs."""
+    telegram_user_id = 0
+    if isinstance(from_id, str) and from_id.startswith('user'):
+        try:
+            telegram_user_id = int(from_id[4:])
+        except ValueError:
+            pass
+    elif isinstance(from_id, int):
+        telegram_user_id = from_id
+
+    if telegram_user_id == 0 and from_name:
+        # Normalize name for consistent hashing (lowercase, strip spaces, remove extra whitespace)
+        normalized_name = ' '.join(from_name.lower().split())
+        # Generate consistent ID from name hash (negative to avoid collision with real IDs)
+        name_hash = hashlib.md5(normalized_name.encode()).hexdigest()[:8]
+        telegram_user_id = -abs(int(name_hash, 16) % 1000000000)
+    return telegram_user_id
+
+
+@dataclass
+class _Prepared:
+    """One export message turned into a ``messages`` row."""
+    row: Dict[str, Any]
+    content_hash: str
+
+
+@dataclass
+class TelegramHistoryImporter:
+    """Runs one import job over an opened :class:`TelegramExport`."""
+
+    db: AsyncSession
+    chat: Chat
+    job: ChatImportJob
+    export: TelegramExport
+    auto_process: bool = True
+    batch_size: Optional[int] = None  # default: module BATCH_SIZE
+    errors: List[str] = field(default_factory=list)
+
+    async def run(self) -> ChatImportJob:
+        job = self.job
+        iterator = self.export.iter_messages()
+        if job.processed:
+            # Продолжение: уже закоммиченные сообщения только пролистываем
+            await asyncio.to_thread(_skip, iterator, job.processed)
+
+        job.status = "processing"
+        job.phase = "importing"
+        await self._save_progress()
+
+        while True:
+            batch = await asyncio.to_thread(_take, iterator, self.batch_size or BATCH_SIZE)
+            if not batch:
+                break
+            await self._import_batch(batch)
+
+        job.status = "completed"
+        job.phase = "done"
+        job.current_file = None
+        job.completed_at = datetime.utcnow()
+        await self._save_progress()
+
+        if job.imported:
+            latest_timestamp = (await self.db.execute(
+                select(func.max(Message.timestamp)).where(Message.chat_id == self.chat.id)
+            )).scalar()
+            if latest_timestamp and (not self.chat.last_activity or latest_timestamp > self.chat.last_activity):
+                self.chat.last_activity = latest_timestamp
+                await self.db.commit()
+        return job
+
+    async def _save_progress(self) -> None:
+        self.job.updated_at = datetime.utcnow()
+        await self.db.commit()
+
+    async def _import_batch(self, batch: List[dict]) -> None:
+        """Insert one batch and advance the cursor in the same transaction.
+
+        Large batches with slow media processing are flushed in parts (see
+        ``FLUSH_INTERVAL_SECONDS``); the cursor always points right after the
+        last message whose row is committed.
+        """
+        chat_id = self.chat.id
+        job = self.job
+        messages = [m for m in batch if m.get('type') == 'message']
+
+        # Дедуп по telegram_message_id — один IN-запрос на пакет
+        tg_ids = {m.get('id') for m in messages if m.get('id')}
+        existing_ids = set()
+        if tg_ids:
+            existing_ids = set((await self.db.execute(
+                select(Message.telegram_message_id).where(
+                    Message.chat_id == chat_id,
+                    Message.telegram_message_id.in_(tg_ids),
+                )
+            )).scalars().all())
+
+        # Дедуп по хэшу содержимого — только строки в окне времени пакета
+        # (ix_message_chat_timestamp_id), а не вся история чата.
+        # Часть дат в экспорте с таймзоной, часть без — окно считаем по naive
+        # значениям с запасом в сутки на смещение.
+        timestamps = [
+            parse_telegram_date(m.get('date', '')).replace(tzinfo=None) for m in messages
+        ]
+        existing_hashes = set()
+        if timestamps:
+            rows = await self.db.execute(
+                select(Message.content, Message.timestamp, Message.file_path).where(
+                    Message.chat_id == chat_id,
+                    Message.timestamp >= min(timestamps) - timedelta(days=1),
+                    Message.timestamp <= max(timestamps) + timedelta(days=1),
+                )
+            )
+            existing_hashes = {get_content_hash(c, ts, fp) for c, ts, fp in rows.all()}
+
+        pending: List[Dict[str, Any]] = []
+        consumed = 0
+        last_flush = time.monotonic()
+
+        for msg in batch:
+            consumed += 1
+            try:
+                if msg.get('type') != 'message':
+                    continue
+                telegram_msg_id = msg.get('id')
+                if telegram_msg_id and telegram_msg_id in existing_ids:
+                    job.skipped += 1
+                    continue
+
+                prepared = await self._prepare(msg)
+                if prepared.content_hash in existing_hashes:
+                    job.skipped += 1
+                    continue
+
+                pending.append(prepared.row)
+                existing_ids.add(telegram_msg_id)
+                existing_hashes.add(prepared.content_hash)
+                job.imported += 1
+            except Exception as e:
+                logger.error(f"Error importing message {msg.get('id', '?')}: {e}")
+                self.errors.append(f"Message {msg.get('id', '?')}: {str(e)}")
+                job.errors_count += 1
+                continue
+
+            if self.auto_process and time.monotonic() - last_flush >= FLUSH_INTERVAL_SECONDS:
+                await self._flush(pending, consumed)
+                pending, consumed = [], 0
+                last_flush = time.monotonic()
+
+        await self._flush(pending, consumed)
+
+    async def _flush(self, rows: List[Dict[str, Any]], consumed: int) -> None:
+        """Insert rows and move the cursor past ``consumed`` messages — one commit."""
+        if rows:
+            await self.db.execute(insert(Message), rows)
+        self.job.processed += consumed
+        self.job.updated_at = datetime.utcnow()
+        await self.db.commit()
+
+    async def _prepare(self, msg: dict) -> _Prepared:
+        chat_id = self.chat.id
+        telegram_msg_id = msg.get('id')
+        file_path = None
+        document_metadata = None
+        parse_status = None
+        parse_error = None
+
+        if self.export.is_html:
+            content = msg.get('text', '')
+            content_type = msg.get('media_type') or 'text'
+            media_file = msg.get('media_file')
+            if media_file and self.export.zip_file is not None:
+                file_path, content, document_metadata, parse_status, parse_error = await self._extract_media(
+                    telegram_msg_id, media_file, content_type, content
+                )
+        else:
+            content = extract_text_content(msg)
+            content_type = detect_content_type(msg)
+        timestamp = parse_telegram_date(msg.get('date', ''))
+        from_name = msg.get('from', 'Unknown')
+        from_id = msg.get('from_id', '')
+
+        # Auto-parse Google Docs links in text messages
+        if self.auto_process and content_type == 'text' and content:
+            content, document_metadata, parse_status = await self._parse_google_docs(
+                content, document_metadata, parse_status
+            )
+
+        # For media messages, use media_file for stable hash
+        media_file_for_hash = msg.get('media_file') if self.export.is_html else None
+        content_hash = get_content_hash(content, timestamp, media_file_for_hash)
+
+        name_parts = from_name.split(' ', 1) if from_name else ['Unknown']
+        first_name = (name_parts[0] if name_parts else 'Unknown')[:255]
+        last_name = (name_parts[1] if len(name_parts) > 1 else None)
+        if last_name:
+            last_name = last_name[:255]
+
+        # Get file_name from msg or extract from media_file path
+        file_name = msg.get('file_name')
+        if not file_name and file_path:
+            file_name = os.path.basename(file_path)
+            # Remove message ID prefix if present (e.g., "123_document.pdf" -> "document.pdf")
+            if '_' in file_name and file_name.split('_')[0].isdigit():
+                file_name = '_'.join(file_name.split('_')[1:])
+        if file_name:
+            file_name = file_name[:255]
+
+        row = {
+            "chat_id": chat_id,
+            "telegram_message_id": telegram_msg_id,
+            "telegram_user_id": _telegram_user_id(from_id, from_name),
+            "username": None,  # Not available in export
+            "first_name": first_name,
+            "last_name": last_name,
+            "content": content,
+            "content_type": content_type[:50] if content_type else 'text',
+            "file_id": None,  # Telegram Bot API file_id (not available in export)
+            "file_path": file_path,
+            "file_name": file_name,
+            "document_metadata": document_metadata,
+            "parse_status": parse_status,
+            "parse_error": parse_error,
+            "is_imported": True,
+            "timestamp": timestamp,
+        }
+        return _Prepared(row=row, content_hash=content_hash)
+
+    async def _extract_media(self, telegram_msg_id, media_file: str, content_type: str, content: str):
+        """Pull one media file out of the zip and optionally transcribe/parse it."""
+        from .transcription import transcription_service
+        from .documents import document_parser
+
+        file_path = None
+        document_metadata = None
+        parse_status = None
+        parse_error = None
+        try:
+            chat_uploads_dir = UPLOADS_DIR / str(self.chat.id)
+            chat_uploads_dir.mkdir(parents=True, exist_ok=True)
+
+            # For video_note, if we have a thumb file, find the actual video
+            search_file = media_file
+            if content_type == 'video_note' and '_thumb.jpg' in media_file:
+                search_file = media_file.replace('_thumb.jpg', '')
+
+            zip_path = self.export.find_media(search_file)
+            if not zip_path:
+                logger.warning(f"Media file not found in ZIP: {media_file} (searching for: {os.path.basename(search_file)})")
+                return file_path, content, document_metadata, parse_status, parse_error
+
+            safe_name = os.path.basename(search_file)
+            if telegram_msg_id:
+                safe_name = f"{telegram_msg_id}_{safe_name}"
+            dest_path = chat_uploads_dir / safe_name
+            await asyncio.to_thread(self.export.extract, zip_path, dest_path)
+            file_path = f"uploads/{self.chat.id}/{safe_name}"
+            logger.debug(f"Extracted media: {zip_path} -> {file_path}")
+
+            if not self.auto_process:
+                return file_path, content, document_metadata, parse_status, parse_error
+
+            self.job.current_file = os.path.basename(media_file)
+            self.job.phase = "processing_media"
+            # Транскрипции/парсеру нужны байты — читаем один файл, не весь архив
+            file_data = await asyncio.to_thread(dest_path.read_bytes)
+            if not file_data:
+                return file_path, content, document_metadata, parse_status, parse_error
+
+            if content_type in ('voice', 'video_note', 'video'):
+                try:
+                    if content_type == 'voice':
+                        transcription = await transcription_service.transcribe_audio(file_data)
+                    else:
+                        transcription = await transcription_service.transcribe_video(file_data, media_file)
+                    # Only use transcription if successful (not an error message)
+                    if transcription and not transcription.startswith("["):
+                        content = transcription
+                    else:
+                        logger.warning(f"Transcription returned: {transcription}")
+                except Exception as e:
+                    logger.error(f"Auto-transcription error: {e}")
+            elif content_type in ('document', 'photo'):
+                try:
+                    result = await document_parser.parse(file_data, os.path.basename(media_file))
+                    if result.content and result.status in ('parsed', 'partial'):
+                        content = result.content
+                        document_metadata = result.metadata
+                        parse_status = result.status
+                    else:
+                        parse_status = result.status
+                        parse_error = result.error
+                        logger.warning(f"Parse returned: {result.error}")
+                except Exception as e:
+                    logger.error(f"Auto-parse error: {e}")
+                    parse_status = "failed"
+                    parse_error = str(e)
+        except (KeyError, OSError, RuntimeError, zipfile.BadZipFile) as e:
+            logger.error(f"Error extracting media {media_file}: {e}")
+        return file_path, content, document_metadata, parse_status, parse_error
+
+    async def _parse_google_docs(self, content: str, document_metadata, parse_status):
+        from .google_docs import google_docs_service
+
+        google_docs_urls = re.findall(
+            r'https?://docs\.google\.com/document/d/[a-zA-Z0-9_-]+[^\s]*',
+            content
+        )
+        for gdoc_url in google_docs_urls[:3]:  # Limit to 3 links per message
+            try:
+                result = await google_docs_service.parse_from_url(gdoc_url)
+                if result.content and result.status in ('parsed', 'partial'):
+                    content += f"\n\n--- Содержимое документа ---\n{result.content[:5000]}"
+                    if not document_metadata:
+                        document_metadata = {}
+                    document_metadata['google_doc_url'] = gdoc_url
+                    document_metadata['google_doc_parsed'] = True
+                    parse_status = result.status
+                else:
+                    logger.warning(f"Google Doc parse failed: {result.error}")
+            except Exception as e:
+                logger.error(f"Google Doc auto-parse error: {e}")
+        return content, document_metadata, parse_status
@@ -0,0 +1,228 @@
+"""Дисковый кэш медиа из Telegram Bot API для прокси /api/chats/file/{file_id}.
+
+Раньше каждый запрос открывал новый httpx.AsyncClient, звал getFile, качал файл
+целиком в память и отдавал его одним куском. Лента чата перерисовывает стикеры,
+фото и кружки постоянно — каждый раз та же загрузка и тот же файл в RAM.
+
+Теперь:
+- файл лежит на диске под своим file_unique_id (стабилен между ботами и
+  временем, в отличие от file_id); file_id → file_unique_id помним в памяти,
+  после рестарта первый запрос делает только getFile, без скачивания;
+- объём ограничен (TELEGRAM_MEDIA_CACHE_MB), выселяем давно не читанные (LRU
+  по atime — переживает рестарт);
+- скачивание идёт потоком во временный файл через общий пул соединений
+  (utils.http_client), в память целиком не попадает;
+- параллельные запросы одного file_id ждут одну загрузку; отмена одного
+  клиента загрузку не прерывает;
+- отдача — FileResponse: Range/If-Range для видео, ETag = file_unique_id.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiofiles
+
+from ..config import settings
+from ..utils.http_client import get_http_client
+from .metrics import cache_result
+
+logger = logging.getLogger("hr-analyzer.telegram_media")
+
+TELEGRAM_API = "https://api.telegram.org"
+
+_CHUNK_SIZE = 64 * 1024
+# file_id → file_unique_id: строки короткие, но копятся — держим последние
+_MAX_ALIASES = 50_000
+
+# file_unique_id — base64url; всё остальное (и пустое) хэшируем в имя файла
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+_SAFE_SUFFIX = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+_CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".webm": "video/webm",
+    ".mp4": "video/mp4",
+    ".tgs": "application/x-tgsticker",
+}
+
+
+class TelegramFileNotFound(Exception):
+    """getFile ответил ok=false или файл не скачался."""
+
+
+def content_type_for(path: str) -> str:
+    return _CONTENT_TYPES.get(Path(path).suffix.lower(), "application/octet-stream")
+
+
+@dataclass
+class CachedMedia:
+    path: Path
+    size: int
+    content_type: str
+    etag: str
+
+
+class TelegramMediaCache:
+    """Кэш файлов Bot API на диске с LRU-выселением и склейкой параллельных загрузок."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # file_unique_id -> путь на диске; порядок — от давно читанных к свежим
+        self._files: "OrderedDict[str, Path]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total = 0
+        self._aliases: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loaded = False
+
+    # --- Индекс на диске -------------------------------------------------------
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        tmp = self.root / "tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        for leftover in tmp.iterdir():
+            leftover.unlink(missing_ok=True)
+        found = []
+        for path in self.root.iterdir():
+            if path.is_file():
+                st = path.stat()
+                found.append((st.st_atime, path.stem, path, st.st_size))
+        for _, unique_id, path, size in sorted(found):
+            self._remember(unique_id, path, size)
+        self._loaded = True
+        self._evict()
+
+    def _remember(self, unique_id: str, path: Path, size: int) -> None:
+        self._forget(unique_id)
+        self._files[unique_id] = path
+        self._sizes[unique_id] = size
+        self._total += size
+
+    def _forget(self, unique_id: str) -> Optional[Path]:
+        path = self._files.pop(unique_id, None)
+        self._total -= self._sizes.pop(unique_id, 0)
+        return path
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        for unique_id in list(self._files):
+            if self._total <= self.max_bytes:
+                break
+            if unique_id == keep:
+                continue
+            path = self._forget(unique_id)
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"telegram media eviction failed for {path.name}: {e}")
+
+    def _hit(self, unique_id: str) -> Optional[CachedMedia]:
+        path = self._files.get(unique_id)
+        if path is None:
+            return None
+        try:
+            st = path.stat()
+            # atime — порядок LRU после рестарта; mtime не трогаем (Last-Modified)
+            os.utime(path, (time.time(), st.st_mtime))
+        except FileNotFoundError:
+            self._forget(unique_id)
+            return None
+        self._files.move_to_end(unique_id)
+        return CachedMedia(
+            path=path, size=st.st_size, content_type=content_type_for(path.name),
+            etag=f'"{unique_id}"',
+        )
+
+    # --- Загрузка ---------------------------------------------------------------
+
+    async def get(self, file_id: str, bot_token: str) -> CachedMedia:
+        """Файл из кэша; при промахе — одна загрузка на все параллельные запросы."""
+        self._load()
+        unique_id = self._aliases.get(file_id)
+        cached = self._hit(unique_id) if unique_id else None
+        cache_result("telegram_media", cached is not None)
+        if cached:
+            return cached
+
+        task = self._inflight.get(file_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(file_id, bot_token))
+            self._inflight[file_id] = task
+            task.add_done_callback(lambda t: self._done(file_id, t))
+        # shield: клиент ушёл — загрузка для остальных (и для кэша) доживает
+        return await asyncio.shield(task)
+
+    def _done(self, file_id: str, task: asyncio.Task) -> None:
+        if self._inflight.get(file_id) is task:
+            del self._inflight[file_id]
+        if not task.cancelled() and task.exception() is not None:
+            # все ждавшие могли уйти — иначе «exception was never retrieved»
+            logger.debug(f"telegram media fetch failed: {task.exception()!r}")
+
+    async def _fetch(self, file_id: str, bot_token: str) -> CachedMedia:
+        client = get_http_client()
+        response = await client.get(
+            f"{TELEGRAM_API}/bot{bot_token}/getFile", params={"file_id": file_id}
+        )
+        data = response.json()
+        if not data.get("ok"):
+            raise TelegramFileNotFound("File not found")
+        file_path = data["result"]["file_path"]
+
+        unique_id = data["result"].get("file_unique_id") or ""
+        if not _SAFE_ID.match(unique_id):
+            unique_id = hashlib.sha1(file_id.encode()).hexdigest()
+        self._aliases.pop(file_id, None)
+        self._aliases[file_id] = unique_id
+        while len(self._aliases) > _MAX_ALIASES:
+            del self._aliases[next(iter(self._aliases))]
+        cached = self._hit(unique_id)
+        if cached:
+            return cached
+
+        suffix = Path(file_path).suffix.lower()
+        target = self.root / (unique_id + (suffix if _SAFE_SUFFIX.match(suffix) else ""))
+        tmp = self.root / "tmp" / f"{unique_id}.{secrets.token_hex(4)}"
+        size = 0
+        try:
+            async with client.stream("GET", f"{TELEGRAM_API}/file/bot{bot_token}/{file_path}") as download:
+                if download.status_code != 200:
+                    raise TelegramFileNotFound("File download failed")
+                async with aiofiles.open(tmp, "wb") as f:
+                    async for chunk in download.aiter_bytes(_CHUNK_SIZE):
+                        await f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        self._remember(unique_id, target, size)
+        self._evict(keep=unique_id)
+        return self._hit(unique_id)
+
+
+def _default_root() -> Path:
+    if settings.telegram_media_cache_dir:
+        return Path(settings.telegram_media_cache_dir)
+    # Рядом с импортированными медиа; /local/{chat_id}/... сюда не достаёт (chat_id — int)
+    return Path(__file__).parent.parent.parent / "uploads" / ".telegram_cache"
+
+
+telegram_media = TelegramMediaCache(
+    root=_default_root(),
+    max_bytes=settings.telegram_media_cache_mb * 1024 * 1024,
+)
@@ -0,0 +1,133 @@
+"""Микробенчмарк middleware: сколько стоит каждый запрос «обёртка vs голое приложение».
+
+Сравнивает три стека на одном и том же крошечном Starlette-приложении:
+  • bare   — без middleware (нижняя граница);
+  • legacy — прежние BaseHTTPMiddleware-версии (Correlation + SecurityHeaders +
+             assets_cache_headers), скопированы сюда как эталон «до»;
+  • asgi   — текущие чистые ASGI-версии из api/middleware.
+
+Запросы гоняются in-process через httpx.ASGITransport — сеть и uvicorn не
+участвуют, разница между строками и есть накладные расходы middleware.
+Отдельно меряется потоковый ответ (64 чанка, как SSE в /api/ai).
+
+Запуск (из backend/):
+    python loadtest/middleware_bench.py
+    $env:BENCH_REQUESTS="5000"; python loadtest/middleware_bench.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SUPERADMIN_EMAIL", "bench@example.com")
+os.environ.setdefault("SUPERADMIN_PASSWORD", "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from api.middleware import (  # noqa: E402
+    AssetCacheHeadersMiddleware, CorrelationMiddleware, SecurityHeadersMiddleware,
+)
+from api.utils.logging import set_correlation_id, log_request  # noqa: E402
+
+REQUESTS = int(os.environ.get("BENCH_REQUESTS", "2000"))
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "5"))
+
+
+# --- Эталон «до»: BaseHTTPMiddleware-версии ------------------------------------
+
+class LegacyCorrelation(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        correlation_id = request.headers.get("X-Correlation-ID") or str(uuid.uuid4())[:8]
+        set_correlation_id(correlation_id)
+        start = time.perf_counter()
+        response = await call_next(request)
+        response.headers["X-Correlation-ID"] = correlation_id
+        if not request.url.path.startswith(("/health", "/static", "/favicon")):
+            log_request(request.method, request.url.path, response.status_code,
+                        (time.perf_counter() - start) * 1000)
+        return response
+
+
+class LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        if not request.url.path.startswith(("/api/", "/health")):
+            response.headers["X-Frame-Options"] = "DENY"
+        return response
+
+
+class LegacyAssetsCache(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        if request.url.path.startswith("/assets/"):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# --- Приложение ----------------------------------------------------------------
+
+async def ping(request):
+    return JSONResponse({"ok": True})
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(64):
+            yield f"data: {i}\n\n".encode()
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+def build(stack: str) -> Starlette:
+    app = Starlette(routes=[Route("/api/ping", ping), Route("/api/stream", stream)])
+    if stack == "legacy":
+        for mw in (LegacyAssetsCache, LegacySecurityHeaders, LegacyCorrelation):
+            app.add_middleware(mw)
+    elif stack == "asgi":
+        for mw in (AssetCacheHeadersMiddleware, SecurityHeadersMiddleware, CorrelationMiddleware):
+            app.add_middleware(mw)
+    return app
+
+
+async def run(app: Starlette, path: str) -> float:
+    """Лучшее из ROUNDS среднее время запроса, мкс."""
+    best = float("inf")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # прогрев
+            await client.get(path)
+        for _ in range(ROUNDS):
+            t0 = time.perf_counter()
+            for _ in range(REQUESTS):
+                await client.get(path)
+            best = min(best, (time.perf_counter() - t0) / REQUESTS * 1e6)
+    return best
+
+
+async def main():
+    import logging
+    logging.disable(logging.CRITICAL)  # меряем middleware, не форматирование логов
+
+    print(f"{REQUESTS} запросов × {ROUNDS} раундов, лучший раунд (мкс/запрос)\n")
+    print(f"{'endpoint':<14}{'bare':>10}{'legacy':>10}{'asgi':>10}{'Δ legacy':>11}{'Δ asgi':>10}")
+    for path in ("/api/ping", "/api/stream"):
+        results = {stack: await run(build(stack), path) for stack in ("bare", "legacy", "asgi")}
+        bare = results["bare"]
+        print(
+            f"{path:<14}{bare:>10.1f}{results['legacy']:>10.1f}{results['asgi']:>10.1f}"
+            f"{results['legacy'] - bare:>11.1f}{results['asgi'] - bare:>10.1f}"
+        )
+    print("\nΔ — накладные расходы стека middleware на запрос относительно bare.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,567 @@
+"""Детерминированный генератор синтетических данных в масштабе прода.
+
+seed_load_data.py создаёт одну org с плоскими кандидатами — этого мало, чтобы
+воспроизвести то, что реально тормозит: чаты на сотни тысяч сообщений, вакансии
+с длинной историей стадий, шаринги, деревья отделов, эмбеддинги, файлы и
+уведомления. Этот скрипт строит несколько организаций по именованному профилю:
+
+    small     — пара org, прогон за секунды (локально/SQLite)
+    prod-like — объёмы как на проде: тяжёлый чат на 300k сообщений
+    10x       — prod-like × 10 для запаса по росту
+
+Один и тот же --seed даёт одни и те же данные (тексты, распределения, даты от
+фиксированной точки), поэтому бенчмарки и нагрузка сравнимы между прогонами.
+Пишет напрямую в таблицы пачками: COPY на Postgres, executemany на SQLite;
+id выдаёт сам (от текущего max(id)), ORM-события не срабатывают — search_name
+и probation_end_date заполняются генератором.
+
+Запуск (из backend/):
+    DATABASE_URL=postgresql+asyncpg://... python -m loadtest.synthetic_data --profile prod-like --seed 42
+    python -m loadtest.synthetic_data --profile small --dry-run      # только посчитать строки
+    python -m loadtest.synthetic_data --cleanup                        # удалить все synthetic-* org
+
+⚠️ Только staging/локальная БД: prod-like — это миллионы строк.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from api.models.database import (
+    Base, AccessLevel, ApplicationStage, ChatType, DeptRole, EntityFileType, EntityStatus,
+    EntityType, OrgRole, ResourceType, UserRole, VacancyStatus,
+)
+from api.services.auth import hash_password
+from api.services.search_index import build_search_name
+
+SLUG_PREFIX = "synthetic-"
+EMAIL_DOMAIN = "synthetic.example"
+# Все даты — от фиксированной точки, а не от now(): иначе прогоны не совпадут
+EPOCH = datetime(2026, 1, 1)
+BATCH = 5000
+# Пароль всех синтетических пользователей (логин для hr_load.py)
+PASSWORD = os.environ.get("SYNTH_PASSWORD", "Synthetic123!")
+EMBEDDING_DIM = 1536
+
+
+@dataclass(frozen=True)
+class Profile:
+    orgs: int
+    users_per_org: int
+    dept_depth: int
+    dept_fanout: int
+    candidates_per_org: int
+    chats_per_org: int
+    messages_per_chat: int
+    heavy_chat_messages: int     # один «тяжёлый» чат на org
+    vacancies_per_org: int
+    applications_per_vacancy: int
+    max_stage_history: int
+    shares_per_org: int
+    files_per_org: int
+    file_bytes: int
+    notifications_per_user: int
+    embedded_share: float        # доля кандидатов с эмбеддингом (Postgres + pgvector)
+
+    def scaled(self, factor: float) -> "Profile":
+        """Тот же профиль с объёмами × factor (структура отделов не меняется)."""
+        keep = {"dept_depth", "dept_fanout", "max_stage_history", "file_bytes", "embedded_share"}
+        changes = {
+            f.name: max(1, int(getattr(self, f.name) * factor))
+            for f in fields(self) if f.name not in keep
+        }
+        return replace(self, **changes)
+
+
+PROFILES: Dict[str, Profile] = {
+    "small": Profile(
+        orgs=2, users_per_org=8, dept_depth=2, dept_fanout=3, candidates_per_org=300,
+        chats_per_org=10, messages_per_chat=50, heavy_chat_messages=5_000,
+        vacancies_per_org=10, applications_per_vacancy=15, max_stage_history=6,
+        shares_per_org=50, files_per_org=40, file_bytes=2_048, notifications_per_user=30,
+        embedded_share=0.5,
+    ),
+    "prod-like": Profile(
+        orgs=4, users_per_org=60, dept_depth=3, dept_fanout=4, candidates_per_org=20_000,
+        chats_per_org=300, messages_per_chat=400, heavy_chat_messages=300_000,
+        vacancies_per_org=150, applications_per_vacancy=60, max_stage_history=8,
+        shares_per_org=4_000, files_per_org=3_000, file_bytes=16_384, notifications_per_user=500,
+        embedded_share=0.3,
+    ),
+}
+PROFILES["10x"] = replace(
+    PROFILES["prod-like"].scaled(10), orgs=10, users_per_org=200, notifications_per_user=500,
+)
+
+FIRST_NAMES = ["Анна", "Иван", "Мария", "Дмитрий", "Екатерина", "Алексей", "Ольга", "Сергей",
+               "Наталья", "Андрей", "Юлия", "Павел", "Дарья", "Михаил", "Ксения", "Артём"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов",
+              "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев"]
+POSITIONS = ["Frontend-разработчик", "Backend-разработчик", "QA-инженер", "Маркетолог",
+             "Project Manager", "Аналитик", "DevOps", "Дизайнер", "Data Scientist", "HR BP"]
+COMPANIES = ["ООО Ромашка", "ГК Вертикаль", "TechCorp", "RedCore", "iMedia", "Северсталь", None]
+WORDS = ("привет да нет созвон завтра сегодня резюме оффер задача готово спасибо отлично "
+         "посмотрю вечером обсудим тестовое зарплата команда проект релиз баг ревью").split()
+NOTIFICATION_TYPES = ["form_submitted", "stage_changed", "task_assigned", "probation_ending", "comment_added"]
+# Путь по воронке: история стадий — префикс этой цепочки (+ иногда отказ)
+STAGE_PATH = [ApplicationStage.applied, ApplicationStage.screening, ApplicationStage.phone_screen,
+              ApplicationStage.interview, ApplicationStage.assessment, ApplicationStage.offer,
+              ApplicationStage.hired]
+
+
+def _person(rng: random.Random) -> str:
+    last = rng.choice(LAST_NAMES)
+    first = rng.choice(FIRST_NAMES)
+    if first.endswith("а") or first.endswith("я"):
+        last += "а"
+    return f"{last} {first}"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _embedding(rng: random.Random) -> str:
+    return "[" + ",".join(f"{rng.uniform(-1, 1):.4f}" for _ in range(EMBEDDING_DIM)) + "]"
+
+
+class IdAllocator:
+    """Следующий свободный id по таблице (от текущего max(id))."""
+
+    def __init__(self, start: Dict[str, int]):
+        self._next = dict(start)
+
+    def take(self, table: str, count: int = 1) -> int:
+        first = self._next.get(table, 1)
+        self._next[table] = first + count
+        return first
+
+
+@dataclass
+class OrgShape:
+    """Что уже создано в org — нужно дочерним таблицам."""
+    org_id: int
+    user_ids: List[int]
+    dept_ids: List[int]
+    candidate_ids: Tuple[int, int]  # [first, last]
+    chat_ids: List[int]
+    vacancy_ids: List[int]
+
+
+class SyntheticDataset:
+    """Поток строк по таблицам в порядке внешних ключей. Чистый Python, без БД."""
+
+    def __init__(self, profile: Profile, seed: int, ids: IdAllocator, password_hash: str = "!"):
+        self.profile = profile
+        self.seed = seed
+        self.ids = ids
+        self.password_hash = password_hash
+
+    def _rng(self, *scope) -> random.Random:
+        # Отдельный поток случайности на (раздел, org): разделы не сдвигают друг друга
+        digest = hashlib.sha256(repr((self.seed,) + scope).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def tables(self) -> Iterator[Tuple[str, Iterator[dict]]]:
+        for org_no in range(self.profile.orgs):
+            yield from self._org(org_no)
+
+    def _org(self, org_no: int) -> Iterator[Tuple[str, Iterator[dict]]]:
+        p = self.profile
+        rng = self._rng("org", org_no)
+        org_id = self.ids.take("organizations")
+        yield "organizations", iter([{
+            "id": org_id, "name": f"Synthetic Org {self.seed}-{org_no}",
+            "slug": f"{SLUG_PREFIX}{self.seed}-{org_no}", "settings": {}, "is_active": True,
+            "created_at": EPOCH - timedelta(days=700), "updated_at": EPOCH,
+        }])
+
+        first_user = self.ids.take("users", p.users_per_org)
+        user_ids = list(range(first_user, first_user + p.users_per_org))
+        yield "users", (
+            {
+                "id": uid, "email": f"u{n}.o{org_no}.s{self.seed}@{EMAIL_DOMAIN}",
+                "password_hash": self.password_hash, "name": _person(rng),
+                "role": UserRole.admin if n == 0 else UserRole.member,
+                "additional_emails": [], "additional_telegram_usernames": [], "notification_prefs": {},
+                "is_active": True, "token_version": 0,
+                "created_at": EPOCH - timedelta(days=rng.randint(30, 700)),
+            }
+            for n, uid in enumerate(user_ids)
+        )
+        first_member = self.ids.take("org_members", len(user_ids))
+        yield "org_members", (
+            {
+                "id": first_member + n, "org_id": org_id, "user_id": uid,
+                "role": OrgRole.owner if n == 0 else (OrgRole.hr if n % 3 else OrgRole.member),
+                "is_readonly": False, "created_at": EPOCH - timedelta(days=300),
+            }
+            for n, uid in enumerate(user_ids)
+        )
+
+        dept_rows = self._departments(org_id, rng)
+        dept_ids = [row["id"] for row in dept_rows]
+        yield "departments", iter(dept_rows)
+        first_dm = self.ids.take("department_members", len(user_ids))
+        yield "department_members", (
+            {
+                "id": first_dm + n, "department_id": dept_ids[n % len(dept_ids)], "user_id": uid,
+                "role": DeptRole.lead if n < len(dept_ids) else DeptRole.member,
+                "created_at": EPOCH - timedelta(days=200),
+            }
+            for n, uid in enumerate(user_ids)
+        )
+
+        first_cand = self.ids.take("entities", p.candidates_per_org)
+        candidates = (first_cand, first_cand + p.candidates_per_org - 1)
+        yield "entities", self._candidates(org_no, org_id, user_ids, dept_ids, first_cand)
+
+        first_chat = self.ids.take("chats", p.chats_per_org)
+        chat_ids = list(range(first_chat, first_chat + p.chats_per_org))
+        yield "chats", (
+            {
+                "id": cid, "org_id": org_id, "telegram_chat_id": -(4 * 10**12 + cid),
+                "title": f"Чат {n}" if n else "Общий HR-чат", "chat_type": ChatType.hr if n % 2 else ChatType.work,
+                "owner_id": user_ids[n % len(user_ids)],
+                "entity_id": candidates[0] + n if n % 2 and n < p.candidates_per_org else None,
+                "is_active": True, "auto_tasks_enabled": True, "remind_enabled": True,
+                "created_at": EPOCH - timedelta(days=400), "last_activity": EPOCH,
+            }
+            for n, cid in enumerate(chat_ids)
+        )
+        yield "messages", self._messages(chat_ids, self._rng("messages", org_no))
+
+        shape = OrgShape(org_id, user_ids, dept_ids, candidates, chat_ids, [])
+        first_vac = self.ids.take("vacancies", p.vacancies_per_org)
+        shape.vacancy_ids = list(range(first_vac, first_vac + p.vacancies_per_org))
+        vrng = self._rng("vacancies", org_no)
+        yield "vacancies", (
+            {
+                "id": vid, "org_id": org_id, "department_id": vrng.choice(dept_ids),
+                "title": vrng.choice(POSITIONS), "salary_min": 100_000 + 10_000 * vrng.randint(0, 10),
+                "salary_max": 250_000 + 10_000 * vrng.randint(0, 20), "salary_currency": "RUB",
+                "status": vrng.choice([VacancyStatus.open] * 3 + [VacancyStatus.paused, VacancyStatus.closed]),
+                "priority": vrng.randint(0, 2), "tags": [], "extra_data": {}, "visible_to_all": False,
+                "hiring_manager_id": vrng.choice(user_ids), "created_by": user_ids[0],
+                "assigned_to": vrng.sample(user_ids, min(2, len(user_ids))), "assigned_to_all": False,
+                "created_at": EPOCH - timedelta(days=vrng.randint(10, 400)), "updated_at": EPOCH,
+            }
+            for vid in shape.vacancy_ids
+        )
+        applications, transitions = self._applications(shape, self._rng("applications", org_no))
+        yield "vacancy_applications", iter(applications)
+        yield "stage_transitions", iter(transitions)
+        yield "shared_access", self._shares(shape, self._rng("shares", org_no))
+        yield "entity_files", self._files(shape, self._rng("files", org_no))
+        yield "notifications", self._notifications(shape, self._rng("notifications", org_no))
+
+    def _departments(self, org_id: int, rng: random.Random) -> List[dict]:
+        rows: List[dict] = []
+        level = [None]
+        for depth in range(self.profile.dept_depth):
+            next_level = []
+            for parent in level:
+                for n in range(self.profile.dept_fanout if depth else 1):
+                    dept_id = self.ids.take("departments")
+                    rows.append({
+                        "id": dept_id, "org_id": org_id, "parent_id": parent,
+                        "name": f"Отдел {depth}.{len(rows)}", "color": f"#{rng.randrange(0xFFFFFF):06x}",
+                        "is_active": True, "created_at": EPOCH - timedelta(days=500), "updated_at": EPOCH,
+                    })
+                    next_level.append(dept_id)
+            level = next_level
+        return rows
+
+    def _candidates(self, org_no, org_id, user_ids, dept_ids, first_id) -> Iterator[dict]:
+        rng = self._rng("entities", org_no)
+        statuses = list(EntityStatus)
+        for n in range(self.profile.candidates_per_org):
+            name = _person(rng)
+            position = rng.choice(POSITIONS)
+            company = rng.choice(COMPANIES)
+            status = rng.choice(statuses)
+            probation_end = EPOCH + timedelta(days=rng.randint(-60, 90)) if status == EntityStatus.hired else None
+            extra = {"source": rng.choice(["hh", "telegram", "referral", "form"]), "city": "Москва"}
+            if probation_end:
+                extra["probation_end_date"] = probation_end.date().isoformat()
+            embedded = rng.random() < self.profile.embedded_share
+            yield {
+                "id": first_id + n, "org_id": org_id, "department_id": rng.choice(dept_ids),
+                "type": EntityType.candidate, "name": name, "status": status,
+                "email": f"cand{n}.o{org_no}.s{self.seed}@{EMAIL_DOMAIN}", "phone": f"+7900{n:07d}",
+                "company": company, "position": position, "tags": [], "extra_data": extra,
+                "created_by": rng.choice(user_ids),
+                "created_at": EPOCH - timedelta(days=rng.randint(0, 700), minutes=rng.randint(0, 1440)),
+                "updated_at": EPOCH, "telegram_usernames": [], "emails": [], "phones": [],
+                "is_transferred": False, "is_archived": rng.random() < 0.1,
+                "search_name": build_search_name(name, position, company, []),
+                "probation_end_date": probation_end,
+                "expected_salary_min": 80_000 + 10_000 * rng.randint(0, 30), "expected_salary_currency": "RUB",
+                "key_events": [],
+                "embedding_updated_at": EPOCH if embedded else None,
+            }
+
+    def _messages(self, chat_ids: List[int], rng: random.Random) -> Iterator[dict]:
+        p = self.profile
+        for n, chat_id in enumerate(chat_ids):
+            # Первый чат — «тяжёлый»: на нём видно всё, что масштабируется по сообщениям
+            count = p.heavy_chat_messages if n == 0 else rng.randint(p.messages_per_chat // 2, p.messages_per_chat * 3 // 2)
+            first = self.ids.take("messages", count)
+            start = EPOCH - timedelta(days=365)
+            step = timedelta(days=365) / max(count, 1)
+            for k in range(count):
+                author = rng.randint(0, 6)
+                yield {
+                    "id": first + k, "chat_id": chat_id, "telegram_message_id": k + 1,
+                    "telegram_user_id": 10**9 + author, "username": f"user{author}",
+                    "first_name": FIRST_NAMES[author], "content": _sentence(rng, rng.randint(2, 18)),
+                    "content_type": "text" if rng.random() < 0.95 else "voice",
+                    "is_imported": n == 0, "timestamp": start + step * k,
+                }
+
+    def _applications(self, shape: OrgShape, rng: random.Random) -> Tuple[List[dict], List[dict]]:
+        p = self.profile
+        first_cand, last_cand = shape.candidate_ids
+        applications, transitions = [], []
+        for vacancy_id in shape.vacancy_ids:
+            picked = rng.sample(range(first_cand, last_cand + 1), min(p.applications_per_vacancy, last_cand - first_cand + 1))
+            for order, entity_id in enumerate(picked):
+                depth = min(int(rng.expovariate(0.6)) + 1, p.max_stage_history, len(STAGE_PATH))
+                path = STAGE_PATH[:depth]
+                if depth < len(STAGE_PATH) and rng.random() < 0.3:
+                    path = path + [ApplicationStage.rejected]
+                applied_at = EPOCH - timedelta(days=rng.randint(5, 300))
+                app_id = self.ids.take("vacancy_applications")
+                changed_at = applied_at
+                previous = None
+                for stage in path:
+                    changed_at += timedelta(days=rng.randint(0, 10), hours=rng.randint(0, 23))
+                    transitions.append({
+                        "id": self.ids.take("stage_transitions"), "application_id": app_id, "entity_id": entity_id,
+                        "from_stage": previous.value if previous else None, "to_stage": stage.value,
+                        "changed_by": rng.choice(shape.user_ids), "created_at": changed_at,
+                    })
+                    previous = stage
+                applications.append({
+                    "id": app_id, "vacancy_id": vacancy_id, "entity_id": entity_id, "stage": path[-1],
+                    "stage_order": order, "rating": rng.choice([None, 3, 4, 5]),
+                    "source": rng.choice(["hh", "referral", "telegram"]),
+                    "applied_at": applied_at, "last_stage_change_at": changed_at,
+                    "created_by": rng.choice(shape.user_ids), "updated_at": changed_at,
+                })
+        return applications, transitions
+
+    def _shares(self, shape: OrgShape, rng: random.Random) -> Iterator[dict]:
+        first_cand, last_cand = shape.candidate_ids
+        first = self.ids.take("shared_access", self.profile.shares_per_org)
+        for n in range(self.profile.shares_per_org):
+            by, to = rng.sample(shape.user_ids, 2) if len(shape.user_ids) > 1 else (shape.user_ids[0],) * 2
+            if rng.random() < 0.8:
+                entity_id = rng.randint(first_cand, last_cand)
+                target = {"resource_type": ResourceType.entity, "resource_id": entity_id, "entity_id": entity_id}
+            else:
+                chat_id = rng.choice(shape.chat_ids)
+                target = {"resource_type": ResourceType.chat, "resource_id": chat_id, "chat_id": chat_id}
+            yield {
+                "id": first + n, **target, "shared_by_id": by, "shared_with_id": to,
+                "access_level": rng.choice([AccessLevel.view, AccessLevel.view, AccessLevel.edit, AccessLevel.full]),
+                "created_at": EPOCH - timedelta(days=rng.randint(0, 200)),
+            }
+
+    def _files(self, shape: OrgShape, rng: random.Random) -> Iterator[dict]:
+        first_cand, last_cand = shape.candidate_ids
+        first = self.ids.take("entity_files", self.profile.files_per_org)
+        # Содержимое одно на прогон: размер важен для bytea/TOAST, не уникальность
+        blob = rng.randbytes(self.profile.file_bytes)
+        for n in range(self.profile.files_per_org):
+            resume = rng.random() < 0.6
+            yield {
+                "id": first + n, "entity_id": rng.randint(first_cand, last_cand), "org_id": shape.org_id,
+                "file_type": EntityFileType.resume if resume else EntityFileType.other,
+                "file_name": f"{'resume' if resume else 'file'}_{n}.pdf", "file_data": blob,
+                "file_size": len(blob), "mime_type": "application/pdf",
+                "uploaded_by": rng.choice(shape.user_ids),
+                "created_at": EPOCH - timedelta(days=rng.randint(0, 300)),
+            }
+
+    def _notifications(self, shape: OrgShape, rng: random.Random) -> Iterator[dict]:
+        per_user = self.profile.notifications_per_user
+        first = self.ids.take("notifications", per_user * len(shape.user_ids))
+        n = 0
+        for user_id in shape.user_ids:
+            for k in range(per_user):
+                kind = rng.choice(NOTIFICATION_TYPES)
+                yield {
+                    "id": first + n, "user_id": user_id, "type": kind, "title": kind.replace("_", " ").capitalize(),
+                    "message": _sentence(rng, 8), "link": "/all-candidates",
+                    "is_read": k < per_user * 0.8,
+                    "created_at": EPOCH - timedelta(minutes=(per_user - k) * 37),
+                }
+                n += 1
+
+
+# ---------------------------------------------------------------------------
+# Загрузка
+# ---------------------------------------------------------------------------
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    chunk: List[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _columns(rows: List[dict]) -> List[str]:
+    return sorted({key for row in rows for key in row})
+
+
+async def _insert_sqlite(conn: AsyncConnection, table: Table, rows: List[dict]) -> None:
+    # executemany требует одинаковый набор ключей во всех строках пачки
+    columns = _columns(rows)
+    await conn.execute(table.insert(), [{name: row.get(name) for name in columns} for row in rows])
+
+
+async def _copy_postgres(conn: AsyncConnection, table: Table, rows: List[dict]) -> None:
+    columns = _columns(rows)
+    dialect = conn.dialect
+    processors = [table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns]
+    records = [
+        tuple(proc(row.get(name)) if proc else row.get(name) for name, proc in zip(columns, processors))
+        for row in rows
+    ]
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+
+
+async def _start_ids(conn: AsyncConnection, tables: List[str]) -> Dict[str, int]:
+    start = {}
+    for name in tables:
+        table = Base.metadata.tables[name]
+        start[name] = ((await conn.execute(select(func.max(table.c.id)))).scalar() or 0) + 1
+    return start
+
+
+async def _fill_embeddings(conn: AsyncConnection, seed: int) -> int:
+    """pgvector: вектор для кандидатов с embedding_updated_at (COPY во временную + UPDATE)."""
+    has_column = (await conn.execute(text(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = 'entities' AND column_name = 'embedding'"
+    ))).scalar()
+    if not has_column:
+        return 0
+    ids = (await conn.execute(text(
+        "SELECT e.id FROM entities e JOIN organizations o ON o.id = e.org_id "
+        "WHERE o.slug LIKE :prefix AND e.embedding_updated_at IS NOT NULL AND e.embedding IS NULL"
+    ), {"prefix": f"{SLUG_PREFIX}{seed}-%"})).scalars().all()
+    await conn.execute(text("CREATE TEMP TABLE synthetic_embeddings (id integer, v text) ON COMMIT DROP"))
+    raw = await conn.get_raw_connection()
+    for chunk_start in range(0, len(ids), BATCH):
+        chunk = ids[chunk_start:chunk_start + BATCH]
+        records = [(entity_id, _embedding(random.Random(f"{seed}:{entity_id}"))) for entity_id in chunk]
+        await raw.driver_connection.copy_records_to_table("synthetic_embeddings", records=records)
+    await conn.execute(text(
+        "UPDATE entities e SET embedding = s.v::vector FROM synthetic_embeddings s WHERE s.id = e.id"
+    ))
+    return len(ids)
+
+
+TABLE_ORDER = [
+    "organizations", "users", "org_members", "departments", "department_members", "entities",
+    "chats", "messages", "vacancies", "vacancy_applications", "stage_transitions",
+    "shared_access", "entity_files", "notifications",
+]
+
+
+async def generate(engine: AsyncEngine, profile: Profile, seed: int, dry_run: bool = False,
+                   log=print) -> Dict[str, int]:
+    """Сгенерировать датасет; возвращает число строк по таблицам."""
+    postgres = engine.dialect.name == "postgresql"
+    write = _copy_postgres if postgres else _insert_sqlite
+    counts = {name: 0 for name in TABLE_ORDER}
+    started = time.monotonic()
+
+    async with engine.begin() as conn:
+        orgs = Base.metadata.tables["organizations"]
+        exists = (await conn.execute(
+            select(func.count()).select_from(orgs).where(orgs.c.slug.like(f"{SLUG_PREFIX}{seed}-%"))
+        )).scalar()
+        if exists and not dry_run:
+            raise SystemExit(f"Датасет с seed={seed} уже есть — сначала --cleanup")
+        ids = IdAllocator(await _start_ids(conn, TABLE_ORDER))
+        dataset = SyntheticDataset(profile, seed, ids, hash_password(PASSWORD))
+
+        for name, rows in dataset.tables():
+            table = Base.metadata.tables[name]
+            for chunk in _chunks(rows, BATCH):
+                if not dry_run:
+                    await write(conn, table, chunk)
+                counts[name] += len(chunk)
+            if name == "messages":
+                log(f"  messages: {counts[name]:,} ({time.monotonic() - started:.0f}s)")
+
+        if postgres and not dry_run:
+            for name in TABLE_ORDER:
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), (SELECT MAX(id) FROM {name}))"
+                ))
+            counts["embeddings"] = await _fill_embeddings(conn, seed)
+
+    log(f"Пароль пользователей: {PASSWORD}")
+    log(f"Готово за {time.monotonic() - started:.0f}s: " + ", ".join(f"{k}={v:,}" for k, v in counts.items()))
+    return counts
+
+
+async def cleanup(engine: AsyncEngine, seed: Optional[int] = None) -> int:
+    """Удалить synthetic-org (каскадом всё внутри) и их пользователей."""
+    orgs = Base.metadata.tables["organizations"]
+    users = Base.metadata.tables["users"]
+    slug = f"{SLUG_PREFIX}{seed}-%" if seed is not None else f"{SLUG_PREFIX}%"
+    email = f"%.s{seed}@{EMAIL_DOMAIN}" if seed is not None else f"%@{EMAIL_DOMAIN}"
+    async with engine.begin() as conn:
+        result = await conn.execute(delete(orgs).where(orgs.c.slug.like(slug)))
+        await conn.execute(delete(users).where(users.c.email.like(email)))
+    return result.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Синтетический датасет для бенчмарков и нагрузки")
+    parser.add_argument("--profile", default=os.environ.get("SYNTH_PROFILE", "small"), choices=sorted(PROFILES))
+    parser.add_argument("--seed", type=int, default=int(os.environ.get("SYNTH_SEED", "42")))
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель объёмов профиля")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать строки, без записи")
+    parser.add_argument("--cleanup", action="store_true", help="удалить synthetic-* (c --seed — только его)")
+    args = parser.parse_args()
+
+    from api.database import engine
+
+    async def run():
+        try:
+            if args.cleanup:
+                seed = args.seed if "--seed" in sys.argv else None
+                print(f"Удалено org: {await cleanup(engine, seed)}")
+                return
+            profile = PROFILES[args.profile]
+            if args.scale != 1.0:
+                profile = profile.scaled(args.scale)
+            print(f"Профиль {args.profile} (×{args.scale}), seed={args.seed}, БД: {engine.dialect.name}")
+            await generate(engine, profile, args.seed, dry_run=args.dry_run)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
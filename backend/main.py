@@ -6,6 +6,7 @@ route registration, and lifespan management.
 """
 
 import asyncio
+import hmac
 import logging
 import sys
 from contextlib import asynccontextmanager
@@ -26,9 +27,10 @@ from api.routes import candidate_database, recruiter_workspaces
 from api.routes import timeoff, blockers, tags, integrations, staff_board, access_hub
 from api.config import settings
 from api.db import init_database, run_alembic_migrations_sync
-from api.middleware import SecurityHeadersMiddleware, CorrelationMiddleware
+from api.middleware import AssetCacheHeadersMiddleware, SecurityHeadersMiddleware, CorrelationMiddleware
 from api.utils.logging import setup_logging, get_logger
 from api.services.redis_cache import get_redis, close_redis
+from api.services import metrics
 
 # Configure structured logging
 # Use JSON format in production, pretty format in development
@@ -87,6 +89,25 @@ async def prometheus_auto_export_task():
         await asyncio.sleep(300)
 
 
+async def hr_tags_drift_task():
+    """Hourly reconcile of entity_hr_tags against applications (bulk SQL bypasses events)."""
+    from api.database import AsyncSessionLocal
+    from api.services.hr_tags import check_drift
+
+    # Wait for database to initialize
+    await asyncio.sleep(180)
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await check_drift(db)
+        except Exception as e:
+            logger.error(f"HR-tags drift check error: {e}")
+
+        # Run every hour
+        await asyncio.sleep(3600)
+
+
 async def saturn_auto_sync_task():
     """Periodically sync projects from Saturn (every 5 min)."""
     from api.database import AsyncSessionLocal
@@ -479,6 +500,12 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Alembic migration failed: {e}")
 
+        try:
+            from api.services.form_intake import resume_pending
+            await resume_pending()
+        except Exception as e:
+            logger.warning(f"Form intake resume failed: {e}")
+
         try:
             redis = await asyncio.wait_for(get_redis(), timeout=10)
             if redis:
@@ -515,6 +542,9 @@ async def lifespan(app: FastAPI):
     # Start Prometheus auto-export task (every 5 min)
     auto_export_task = asyncio.create_task(prometheus_auto_export_task())
 
+    # Start HR-tags drift checker (hourly)
+    hr_tags_drift_bg_task = asyncio.create_task(hr_tags_drift_task())
+
     # Start Saturn auto-sync task (every 5 min)
     saturn_sync_task = None
     if os.environ.get("SATURN_API_TOKEN"):
@@ -556,6 +586,8 @@ async def lifespan(app: FastAPI):
         cleanup_task.cancel()
     if auto_export_task:
         auto_export_task.cancel()
+    if hr_tags_drift_bg_task:
+        hr_tags_drift_bg_task.cancel()
     if saturn_sync_task:
         saturn_sync_task.cancel()
     if employee_reminders_bg_task:
@@ -587,6 +619,9 @@ app = FastAPI(
     redirect_slashes=False,  # Prevent 307 redirects that convert POST to GET
 )
 
+# Латентность/токены вызовов Claude и OpenAI для /metrics
+metrics.instrument_ai_clients()
+
 # Rate limiting
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -601,6 +636,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
+    # Cursors of the message history page (GET /api/chats/{id}/messages)
+    expose_headers=["X-Before-Cursor", "X-After-Cursor"],
 )
 
 # Security headers middleware
@@ -900,6 +937,22 @@ async def health_check_deep():
     return health
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint (text exposition format).
+
+    Closed by default: without METRICS_TOKEN the endpoint does not exist (404);
+    with it the scraper must send `Authorization: Bearer <token>`.
+    """
+    if not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    auth_header = request.headers.get("authorization", "")
+    expected = f"Bearer {settings.metrics_token}"
+    if not hmac.compare_digest(auth_header.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=await metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/debug/routes")
 async def debug_routes():
     """Debug endpoint to list all registered routes."""
@@ -1124,12 +1177,7 @@ if STATIC_DIR.exists():
         app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
 
         # Add immutable cache headers for hashed asset files
-        @app.middleware("http")
-        async def assets_cache_headers(request: Request, call_next):
-            response = await call_next(request)
-            if request.url.path.startswith("/assets/"):
-                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
-            return response
+        app.add_middleware(AssetCacheHeadersMiddleware)
 
     index_file = STATIC_DIR / "index.html"
     if index_file.exists():
@@ -407,6 +407,29 @@ async def ensure_shadow_columns():
         # entities падает 500 (модель ссылается на неё).
         await conn.execute(text('ALTER TABLE entities ADD COLUMN IF NOT EXISTS search_name TEXT'))
 
+        # Хэш содержимого для инкрементального синка Saturn (services/saturn_sync.py)
+        await conn.execute(text('ALTER TABLE IF EXISTS saturn_projects ADD COLUMN IF NOT EXISTS content_hash VARCHAR(40)'))
+        await conn.execute(text('ALTER TABLE IF EXISTS saturn_applications ADD COLUMN IF NOT EXISTS content_hash VARCHAR(40)'))
+
+        # Дата конца испытательного срока из extra_data — колонка для оконного
+        # запроса напоминаний (services/hr_notifications.py) + дозаполнение
+        await conn.execute(text('ALTER TABLE entities ADD COLUMN IF NOT EXISTS probation_end_date TIMESTAMP'))
+        await conn.execute(text('CREATE INDEX IF NOT EXISTS ix_entities_probation_end_date ON entities (probation_end_date)'))
+        await conn.execute(text(
+            \"UPDATE entities SET probation_end_date = (extra_data->>'probation_end_date')::timestamp \"
+            \"WHERE probation_end_date IS NULL \"
+            \"AND extra_data->>'probation_end_date' ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}([T ][0-9]{2}:[0-9]{2}(:[0-9]{2}([.][0-9]{1,6})?)?)?$'\"
+        ))
+
+        # Фоновая обработка анкет (services/form_intake.py): статус, шаги, Idempotency-Key
+        await conn.execute(text(\"ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS processing_status VARCHAR(20) NOT NULL DEFAULT 'done'\"))
+        await conn.execute(text('ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS processing_state JSON'))
+        await conn.execute(text('ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS processing_error TEXT'))
+        await conn.execute(text('ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP'))
+        await conn.execute(text('ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64)'))
+        await conn.execute(text('CREATE INDEX IF NOT EXISTS ix_form_submissions_processing_status ON form_submissions (processing_status)'))
+        await conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_form_submission_dispatch_idempotency ON form_submissions (dispatch_id, idempotency_key)'))
+
         print('All columns verified')
 
     # ALTER TYPE ADD VALUE cannot run inside a transaction — use raw connection
@@ -672,56 +695,23 @@ async def ensure_shadow_columns():
         ))
         print(f\"Backfilled {res.rowcount} stage_transitions: Initial application -> Первичная заявка\")
 
-    # Backfill: авто-метки HR (system_hr_tags) — кандидат ↔ забравшие его в
-    # воронку рекрутеры. Та же логика, что api/services/hr_tags.py: уникальные
-    # created_by активных заявок (кроме rejected/withdrawn), [{hr_id, name}].
-    # Идемпотентно (distinct-guard) — доска корректна сразу после деплоя.
-    async with engine.begin() as hr_conn:
-        res = await hr_conn.execute(text(\"\"\"
-            UPDATE entities e
-            SET extra_data = (
-                CASE WHEN jsonb_typeof(e.extra_data::jsonb) = 'object'
-                     THEN e.extra_data::jsonb
-                     ELSE '{}'::jsonb END
-                || jsonb_build_object('system_hr_tags', sub.tags)
-            )::json
-            FROM (
-                SELECT t.entity_id,
-                       jsonb_agg(jsonb_build_object('hr_id', t.hr_id, 'name', u.name,
-                                                    'vacancy_id', t.vacancy_id, 'vacancy_title', t.vacancy_title)
-                                 ORDER BY t.hr_id, t.vacancy_id) AS tags
-                FROM (
-                    SELECT DISTINCT a.entity_id,
-                           COALESCE(a.created_by, vac.created_by) AS hr_id,
-                           a.vacancy_id,
-                           vac.title AS vacancy_title
-                    FROM vacancy_applications a
-                    JOIN vacancies vac ON vac.id = a.vacancy_id
-                    WHERE COALESCE(a.created_by, vac.created_by) IS NOT NULL
-                      AND a.stage NOT IN ('rejected', 'withdrawn')
-                ) t
-                JOIN users u ON u.id = t.hr_id
-                GROUP BY t.entity_id
-            ) sub
-            WHERE e.id = sub.entity_id
-              AND COALESCE(e.extra_data::jsonb -> 'system_hr_tags', 'null'::jsonb)
-                  IS DISTINCT FROM sub.tags
-        \"\"\"))
-        print(f\"Backfilled system_hr_tags on {res.rowcount} candidates\")
-
-        res = await hr_conn.execute(text(\"\"\"
-            UPDATE entities e
-            SET extra_data = (e.extra_data::jsonb - 'system_hr_tags')::json
-            WHERE jsonb_exists(e.extra_data::jsonb, 'system_hr_tags')
-              AND NOT EXISTS (
-                  SELECT 1 FROM vacancy_applications va
-                  JOIN vacancies vac ON vac.id = va.vacancy_id
-                  WHERE va.entity_id = e.id
-                    AND COALESCE(va.created_by, vac.created_by) IS NOT NULL
-                    AND va.stage NOT IN ('rejected', 'withdrawn')
-              )
-        \"\"\"))
-        print(f\"Cleared stale system_hr_tags on {res.rowcount} candidates\")
+    # Заметки, реакции таймлайна и авто-метки HR переехали из extra_data в
+    # entity_notes / entity_timeline_reactions / entity_hr_tags
+    # (api/services/entity_extras.py). Таблицы создаём здесь (checkfirst) —
+    # create_all в init_database() отработает уже после старта, а перенос
+    # нужен до первого запроса. Перенос идемпотентен: уже перенесённые
+    # заметки не дублируются, ключи из блобов вычищаются. HR-метки
+    # пересчитываются set-based тем же правилом, что api/services/hr_tags.py.
+    async with engine.begin() as ex_conn:
+        from api.models.database import EntityNote, EntityTimelineReaction, EntityHrTag
+        from api.services.entity_extras import backfill_from_extra_data
+        from api.services.hr_tags import rebuild_hr_tags
+        for _tbl in (EntityNote.__table__, EntityTimelineReaction.__table__, EntityHrTag.__table__):
+            await ex_conn.run_sync(lambda c, t=_tbl: t.create(c, checkfirst=True))
+        moved = await ex_conn.run_sync(backfill_from_extra_data)
+        print(f\"Moved notes/timeline_reactions out of extra_data on {moved} candidates\")
+        tagged = await ex_conn.run_sync(rebuild_hr_tags)
+        print(f\"Rebuilt {tagged} entity_hr_tags rows\")
 
     # Backfill: легаси-вакансии (созданы ДО фичи личного принятия, 2026-07-08
     # 55048d8) — юзер уже в assigned_to, но extra_data.accepted_by пуст (само
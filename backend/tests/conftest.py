@@ -80,9 +80,26 @@ async def db_session(async_engine) -> AsyncGenerator[AsyncSession, None]:
         expire_on_commit=False
     )
 
+    # Ростер участников живёт в памяти процесса; id в тестах повторяются
+    from api.services.participant_roster import clear_roster_cache
+    clear_roster_cache()
+    from api.services.org_hierarchy import clear_access_context_cache
+    clear_access_context_cache()
+
+    # Фоновые задачи (анкеты, пересчёт red flags) открывают свои сессии — на тот же тестовый движок
+    from api.services import form_intake, red_flag_cache
+    background = (form_intake, red_flag_cache)
+    open_sessions = [module._open_session for module in background]
+    for module in background:
+        module._open_session = async_session
+
     async with async_session() as session:
         yield session
+        for module in background:
+            await module.drain()
         await session.rollback()
+    for module, open_session in zip(background, open_sessions):
+        module._open_session = open_session
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -101,6 +118,12 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     except Exception:
         pass  # Ignore if reset fails
 
+    # Кэш принципала живёт между запросами; id пользователей в тестах повторяются
+    from api.services.principal import clear_principal_cache
+    from api.services.permissions import clear_read_grants
+    clear_principal_cache()
+    clear_read_grants()
+
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
@@ -0,0 +1,135 @@
+"""
+Query budget harness: declarative registry of endpoints and their SQL budgets.
+
+Each entry names an endpoint, a seed that adds N more rows it lists, and the
+budget: the statement count at the small size, the allowed growth per added
+row (0 for constant-cost endpoints) and optional wall-time ceilings per
+dialect. tests/test_query_budgets.py runs every entry at two sizes and fails
+when the count grows with the data; with QUERY_BUDGET_REPORT=<path> it also
+writes a JSON report that can be diffed between commits.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.models.database import Organization, User
+
+
+@dataclass
+class BudgetContext:
+    """What a seed gets: session, org, acting user and path parameters."""
+    db: AsyncSession
+    organization: Organization
+    user: User
+    params: Dict[str, Any] = field(default_factory=dict)
+    seeded: int = 0
+
+    def format_path(self, path: str) -> str:
+        return path.format(**self.params)
+
+
+Seed = Callable[[BudgetContext, int], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class EndpointBudget:
+    name: str
+    path: str
+    seed: Seed
+    max_queries: int
+    per_row: float = 0
+    max_ms: Dict[str, float] = field(default_factory=dict)  # {"sqlite": ..., "postgresql": ...}
+    method: str = "GET"
+    sizes: Tuple[int, int] = (3, 12)
+
+    def allowed(self, rows: int) -> int:
+        small = self.sizes[0]
+        return self.max_queries + int(self.per_row * max(rows - small, 0))
+
+
+REGISTRY: List[EndpointBudget] = []
+
+
+def budget(name: str, path: str, **kwargs) -> Callable[[Seed], Seed]:
+    """Register the decorated seed: ``@budget("chats.list", "/api/chats", max_queries=9)``."""
+    def register(seed: Seed) -> Seed:
+        if any(entry.name == name for entry in REGISTRY):
+            raise ValueError(f"duplicate query budget entry: {name}")
+        REGISTRY.append(EndpointBudget(name=name, path=path, seed=seed, **kwargs))
+        return seed
+    return register
+
+
+@dataclass
+class Measurement:
+    rows: int
+    queries: int
+    ms: float
+    statements: List[str]
+
+
+class StatementRecorder:
+    """Records statements on an AsyncEngine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements: List[str] = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "StatementRecorder":
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        return False
+
+
+async def measure(client, engine, entry: EndpointBudget, ctx: BudgetContext, headers: dict) -> Measurement:
+    """One warm-up call (fills process caches), then the counted and timed call."""
+    path = ctx.format_path(entry.path)
+    warm = await client.request(entry.method, path, headers=headers)
+    assert warm.status_code < 400, f"{entry.name}: {warm.status_code} {warm.text[:300]}"
+    with StatementRecorder(engine) as recorder:
+        started = time.perf_counter()
+        response = await client.request(entry.method, path, headers=headers)
+        elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code < 400, f"{entry.name}: {response.status_code} {response.text[:300]}"
+    return Measurement(ctx.seeded, len(recorder.statements), round(elapsed, 1), recorder.statements)
+
+
+def report_entry(entry: EndpointBudget, dialect: str, small: Measurement, large: Measurement) -> dict:
+    return {
+        "method": entry.method,
+        "path": entry.path,
+        "dialect": dialect,
+        "rows": [small.rows, large.rows],
+        "queries": [small.queries, large.queries],
+        "budget": [entry.allowed(small.rows), entry.allowed(large.rows)],
+        "ms": [small.ms, large.ms],
+        "max_ms": entry.max_ms.get(dialect),
+    }
+
+
+def budget_failures(entry: EndpointBudget, dialect: str, small: Measurement, large: Measurement) -> List[str]:
+    failures = []
+    for m in (small, large):
+        if m.queries > entry.allowed(m.rows):
+            failures.append(f"{m.queries} queries for {m.rows} rows, budget {entry.allowed(m.rows)}")
+    growth = large.queries - small.queries
+    allowed_growth = entry.allowed(large.rows) - entry.allowed(small.rows)
+    if growth > allowed_growth:
+        failures.append(
+            f"query count grows with rows: {small.queries} -> {large.queries} "
+            f"for {small.rows} -> {large.rows} rows (allowed +{allowed_growth})"
+        )
+    ceiling: Optional[float] = entry.max_ms.get(dialect)
+    if ceiling is not None and large.ms > ceiling:
+        failures.append(f"{large.ms} ms for {large.rows} rows, ceiling {ceiling} ms on {dialect}")
+    return failures
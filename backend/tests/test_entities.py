@@ -1018,6 +1018,7 @@ class TestUpdateEntity:
         свежие заметки. Серверные ключи (notes и пр.) теперь отбрасываются."""
         from sqlalchemy import select as _select
         from api.models.database import Entity as _Entity
+        from api.services import entity_extras
 
         entity.extra_data = {"notes": [{"id": "n1", "text": "серверный коммент"}]}
         await db_session.commit()
@@ -1034,6 +1035,7 @@ class TestUpdateEntity:
             _select(_Entity).where(_Entity.id == entity.id)
         )).scalar_one()
         await db_session.refresh(refreshed)
+        await entity_extras.attach(db_session, [refreshed])
         # серверный комментарий уцелел, а легитимное поле применилось
         assert refreshed.extra_data.get("notes") == [{"id": "n1", "text": "серверный коммент"}]
         assert refreshed.extra_data.get("salary_expectation") == "200k"
@@ -0,0 +1,102 @@
+"""Заметки, реакции таймлайна и HR-метки в своих таблицах (services/entity_extras.py).
+
+Форма API прежняя — всё отдаётся внутри extra_data, — но блоб entities их
+больше не хранит: комментарий — вставка строки, легаси-блобы переносятся.
+"""
+import pytest
+from sqlalchemy import func, select, update
+
+from api.models.database import Entity, EntityNote, EntityStatus, EntityTimelineReaction, EntityType
+from api.services import entity_extras
+from tests.conftest import auth_headers
+
+
+async def _raw_extra(db_session, entity_id):
+    """extra_data как он лежит в базе (минуя identity map и attach)."""
+    return (await db_session.execute(
+        select(Entity.__table__.c.extra_data).where(Entity.__table__.c.id == entity_id)
+    )).scalar_one()
+
+
+async def _candidate(db_session, organization, admin_user, extra_data=None):
+    entity = Entity(org_id=organization.id, type=EntityType.candidate, name="Мария", status=EntityStatus.new,
+                    created_by=admin_user.id, extra_data=extra_data)
+    db_session.add(entity)
+    await db_session.commit()
+    return entity
+
+
+@pytest.mark.asyncio
+async def test_note_is_a_row_and_card_keeps_shape(client, db_session, organization, admin_user, org_owner,
+                                                  admin_token):
+    entity = await _candidate(db_session, organization, admin_user, {"location": "Казань"})
+    headers = auth_headers(admin_token)
+
+    r = await client.post(f"/api/entities/{entity.id}/notes", json={"text": "Созвон во вторник"}, headers=headers)
+    assert r.status_code == 200, r.text
+    note = r.json()["note"]
+    assert r.json()["total_notes"] == 1 and note["author_id"] == admin_user.id
+    assert (await db_session.execute(select(func.count(EntityNote.id)))).scalar() == 1
+    assert await _raw_extra(db_session, entity.id) == {"location": "Казань"}
+
+    # частичный PUT формы правки не затирает комментарий
+    r = await client.put(f"/api/entities/{entity.id}", json={"extra_data": {"salary": "200k"}}, headers=headers)
+    assert r.status_code == 200, r.text
+    card = (await client.get(f"/api/entities/{entity.id}", headers=headers)).json()
+    assert card["extra_data"]["location"] == "Казань" and card["extra_data"]["salary"] == "200k"
+    assert card["extra_data"]["notes"] == [note]
+    assert "notes" not in await _raw_extra(db_session, entity.id)
+
+    r = await client.patch(f"/api/entities/{entity.id}/notes/{note['id']}", json={"text": "В среду"},
+                           headers=headers)
+    assert r.json()["note"]["text"] == "В среду" and r.json()["note"]["edited_at"]
+    r = await client.delete(f"/api/entities/{entity.id}/notes/{note['id']}", headers=headers)
+    assert r.json()["total_notes"] == 0
+    card = (await client.get(f"/api/entities/{entity.id}", headers=headers)).json()
+    assert "notes" not in card["extra_data"]
+
+
+@pytest.mark.asyncio
+async def test_timeline_reaction_toggle(client, db_session, organization, admin_user, org_owner, admin_token):
+    entity = await _candidate(db_session, organization, admin_user)
+    url = f"/api/entities/{entity.id}/timeline-reaction"
+    headers = auth_headers(admin_token)
+
+    on = (await client.post(url, json={"entry_key": "created", "emoji": "👍"}, headers=headers)).json()
+    assert [(r["emoji"], r["user_id"]) for r in on["reactions"]] == [("👍", admin_user.id)]
+    card = (await client.get(f"/api/entities/{entity.id}", headers=headers)).json()
+    assert card["extra_data"]["timeline_reactions"] == {"created": on["reactions"]}
+
+    off = (await client.post(url, json={"entry_key": "created", "emoji": "👍"}, headers=headers)).json()
+    assert off["reactions"] == []
+    assert (await db_session.execute(select(func.count(EntityTimelineReaction.id)))).scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_legacy_blob_write_through_and_backfill(db_session, organization, admin_user):
+    legacy = {
+        "notes": [{"id": "n1", "text": "из magic button", "author_id": admin_user.id}, "строкой"],
+        "timeline_reactions": {"n1": [{"emoji": "🔥", "user_id": admin_user.id, "user_name": "A", "date": "d"}]},
+        "system_hr_tags": [{"hr_id": 999, "name": "устарело"}],
+        "source": "hh",
+    }
+    # старый писатель кладёт ключи в блоб — при flush они переезжают в таблицы
+    entity = await _candidate(db_session, organization, admin_user, dict(legacy))
+    assert await _raw_extra(db_session, entity.id) == {"source": "hh"}
+    loaded = (await entity_extras.load(db_session, [entity.id]))[entity.id]
+    assert loaded["notes"] == [{"id": "n1", "text": "из magic button", "author_id": admin_user.id}, "строкой"]
+    assert list(loaded["timeline_reactions"]) == ["n1"]
+    assert loaded["system_hr_tags"] == []  # производные — только через hr_tags
+
+    # блоб из базы до миграции (в обход ORM) — backfill переносит идемпотентно
+    await db_session.execute(
+        update(Entity.__table__).where(Entity.__table__.c.id == entity.id).values(extra_data=legacy)
+    )
+    await db_session.commit()
+    conn = await db_session.connection()
+    assert await conn.run_sync(entity_extras.backfill_from_extra_data) == 1
+    assert await conn.run_sync(entity_extras.backfill_from_extra_data) == 0
+    await db_session.commit()
+    assert await _raw_extra(db_session, entity.id) == {"source": "hh"}
+    assert (await db_session.execute(select(func.count(EntityNote.id)))).scalar() == 2
+    assert (await db_session.execute(select(func.count(EntityTimelineReaction.id)))).scalar() == 1
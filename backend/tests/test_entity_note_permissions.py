@@ -1,13 +1,13 @@
-"""Права на удаление/редактирование комментариев кандидата (extra_data.notes).
+"""Права на удаление/редактирование комментариев кандидата (entity_notes).
 
 _note_can_modify докстрингом всегда обещал «автор ИЛИ админ/owner ИЛИ superadmin»,
 но код проверял только superadmin+автора — обычный org-admin/owner получал 403 при
 попытке удалить чужой комментарий (в т.ч. с @-упоминанием). Проверяем все 4 роли.
 """
 import pytest
-from sqlalchemy import select
 
 from api.models.database import Entity, EntityType, EntityStatus
+from api.services import entity_extras
 from api.services.auth import create_access_token
 
 
@@ -61,5 +61,4 @@ async def test_deleted_note_actually_removed(client, db_session, organization, s
     eid = await _make_candidate_with_note(db_session, organization, second_user)
     r = await client.delete(f"/api/entities/{eid}/notes/note-1", headers=_h(admin_user))
     assert r.status_code == 200, r.text
-    entity = (await db_session.execute(select(Entity).where(Entity.id == eid))).scalar_one()
-    assert entity.extra_data.get("notes") == []
+    assert (await entity_extras.load(db_session, [eid]))[eid]["notes"] == []
@@ -4,6 +4,7 @@ from sqlalchemy import select
 from api.models.database import (
     FormTemplate, FormDispatch, FormSubmission, Entity, EntityType, EntityStatus, Organization, Notification,
 )
+from api.services import form_intake
 from api.services.auth import create_access_token
 
 
@@ -79,7 +80,7 @@ async def test_token_submit_attaches_to_existing_candidate(client, db_session, o
 
     before = len((await db_session.execute(select(Entity))).scalars().all())
     resp = await client.post("/api/forms/public/d/toksub1/submit", json={"data": {"f1": "Анна Иванова"}})
-    assert resp.status_code == 200, resp.text
+    assert resp.status_code == 202, resp.text
 
     after = len((await db_session.execute(select(Entity))).scalars().all())
     assert after == before, "новый кандидат не должен создаваться"
@@ -125,6 +126,7 @@ async def test_submit_creates_notification(client, db_session, organization, adm
     await db_session.commit()
 
     await client.post("/api/forms/public/d/t-notif/submit", json={"data": {}})
+    await form_intake.drain()
     notifs = (await db_session.execute(
         select(Notification).where(Notification.user_id == second_user.id, Notification.type == "form_submitted")
     )).scalars().all()
@@ -144,7 +146,7 @@ async def test_submitted_answer_visible_in_entity_dispatches(client, db_session,
     await db_session.commit()
 
     sub = await client.post("/api/forms/public/d/t-vis/submit", json={"data": {"f1": "Иван Петров"}})
-    assert sub.status_code == 200, sub.text
+    assert sub.status_code == 202, sub.text
 
     r = await client.get(f"/api/forms/entity/{entity.id}/dispatches", headers=_headers(admin_user))
     assert r.status_code == 200, r.text
@@ -165,6 +167,7 @@ async def test_notification_only_to_sender(client, db_session, organization, adm
     await db_session.commit()
 
     await client.post("/api/forms/public/d/t-only/submit", json={"data": {}})
+    await form_intake.drain()
 
     sender = (await db_session.execute(select(Notification).where(
         Notification.user_id == admin_user.id, Notification.type == "form_submitted"))).scalars().all()
@@ -198,14 +201,15 @@ async def test_realtime_targets_only_sender(client, db_session, organization, ad
     await db_session.commit()
 
     r = await client.post("/api/forms/public/d/t-rt/submit", json={"data": {}})
-    assert r.status_code == 200, r.text
+    assert r.status_code == 202, r.text
+    await form_intake.drain()
     assert to_user == [admin_user.id]   # ушло отправителю
     assert to_org == []                 # НЕ ушло всему оргу
 
 
 @pytest.mark.asyncio
 async def test_submit_null_created_by_no_crash(client, db_session, organization, admin_user):
-    # dispatch без created_by: сабмит 200, уведомление не создаётся, без краша.
+    # dispatch без created_by: сабмит 202, уведомление не создаётся, без краша.
     form = FormTemplate(org_id=organization.id, created_by=admin_user.id, title="S", slug="scr-null", fields=[])
     entity = Entity(org_id=organization.id, type=EntityType.candidate, name="Анна", status=EntityStatus.new)
     db_session.add_all([form, entity])
@@ -214,7 +218,8 @@ async def test_submit_null_created_by_no_crash(client, db_session, organization,
     await db_session.commit()
 
     r = await client.post("/api/forms/public/d/t-null/submit", json={"data": {}})
-    assert r.status_code == 200, r.text
+    assert r.status_code == 202, r.text
+    await form_intake.drain()
     notifs = (await db_session.execute(select(Notification).where(
         Notification.type == "form_submitted"))).scalars().all()
     assert len(notifs) == 0
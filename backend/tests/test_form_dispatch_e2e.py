@@ -53,7 +53,7 @@ async def test_full_dispatch_flow_e2e(client, db_session, organization: Organiza
     before = len((await db_session.execute(select(Entity))).scalars().all())
     r = await client.post(f"/api/forms/public/d/{token}/submit",
                           json={"data": {"name": "Пётр Кандидатов", "exp": 8}})
-    assert r.status_code == 200, r.text
+    assert r.status_code == 202, r.text
     after = len((await db_session.execute(select(Entity))).scalars().all())
     assert after == before, "новый кандидат не должен создаваться — ответ к существующему"
 
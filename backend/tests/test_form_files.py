@@ -74,7 +74,7 @@ async def test_token_submit_with_files_attaches_to_existing_candidate(client, db
         data={"data": json.dumps({"name": "Файл Кандидатов", "cv": ""})},
         files={"files": ("portfolio.png", b"\x89PNG fake bytes", "image/png")},
     )
-    assert r.status_code == 200, r.text
+    assert r.status_code == 202, r.text
     assert r.json()["files_saved"] == 1
     assert r.json()["entity_id"] == cand_id
     after = len((await db_session.execute(select(Entity))).scalars().all())
@@ -122,7 +122,7 @@ async def test_anketa_file_link_in_dispatch_answers(client, db_session, organiza
         data={"data": json.dumps({"name": "Файл Линк", "cv": "portfolio.png"})},
         files={"files": ("portfolio.png", b"\x89PNG fake", "image/png")},
     )
-    assert r.status_code == 200, r.text
+    assert r.status_code == 202, r.text
 
     r = await client.get(f"/api/forms/entity/{cand_id}/all-dispatches", headers=H)
     assert r.status_code == 200, r.text
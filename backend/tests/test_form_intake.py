@@ -0,0 +1,118 @@
+"""Приём анкет по персональной ссылке: 202 + фоновый конвейер (services/form_intake.py)."""
+import json
+
+import fitz
+import pytest
+from sqlalchemy import func, select
+
+from api.models.database import (
+    Entity, EntityFile, EntityStatus, EntityType, FormDispatch, FormSubmission, FormTemplate, Notification,
+)
+from api.services import form_intake
+
+
+def _pdf(pages=2) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Страница {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def promoted(monkeypatch):
+    calls = []
+
+    async def fake_promote(entity_id, org_id):
+        calls.append((entity_id, org_id))
+
+    monkeypatch.setattr("api.services.resume_autopromote.promote_pdf_to_resume_if_needed", fake_promote)
+    return calls
+
+
+async def _dispatch(db_session, organization, admin_user, token):
+    form = FormTemplate(org_id=organization.id, created_by=admin_user.id, title="Скрининг", slug=f"s-{token}",
+                        fields=[{"id": "name", "type": "text", "label": "ФИО", "required": True}])
+    entity = Entity(org_id=organization.id, type=EntityType.candidate, name="Анна", status=EntityStatus.new)
+    db_session.add_all([form, entity])
+    await db_session.flush()
+    db_session.add(FormDispatch(form_id=form.id, entity_id=entity.id, token=token, created_by=admin_user.id))
+    await db_session.commit()
+    return entity
+
+
+async def _notifications(db_session):
+    return (await db_session.execute(
+        select(func.count(Notification.id)).where(Notification.type == "form_submitted")
+    )).scalar()
+
+
+@pytest.mark.asyncio
+async def test_accepts_with_202_and_renders_previews_in_background(
+    client, db_session, organization, admin_user, promoted,
+):
+    entity = await _dispatch(db_session, organization, admin_user, "t-intake")
+
+    r = await client.post(
+        "/api/forms/public/d/t-intake/submit-with-files",
+        data={"data": json.dumps({"name": "Анна"})},
+        files={"files": ("resume.pdf", _pdf(), "application/pdf")},
+    )
+    assert r.status_code == 202, r.text
+    body = r.json()
+    assert body["files_saved"] == 1 and body["processing_status"] == "pending"
+    assert body["status_url"] == "/api/forms/public/d/t-intake/status"
+
+    await form_intake.drain()
+    r = await client.get(body["status_url"])
+    assert r.json() == {"submitted": True, "submission_id": body["submission_id"], "processing_status": "done"}
+
+    files = (await db_session.execute(
+        select(EntityFile.file_name).where(EntityFile.entity_id == entity.id).order_by(EntityFile.id)
+    )).scalars().all()
+    assert files == ["resume.pdf", "resume_page_1.jpg", "resume_page_2.jpg"]
+    assert await _notifications(db_session) == 1
+    assert promoted == [(entity.id, organization.id)]
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_instead_of_409(client, db_session, organization, admin_user, promoted):
+    await _dispatch(db_session, organization, admin_user, "t-idem")
+    headers = {"Idempotency-Key": "form-page-1"}
+
+    first = await client.post("/api/forms/public/d/t-idem/submit", json={"data": {"name": "Анна"}}, headers=headers)
+    again = await client.post("/api/forms/public/d/t-idem/submit", json={"data": {"name": "Анна"}}, headers=headers)
+    assert first.status_code == again.status_code == 202, again.text
+    assert again.json()["submission_id"] == first.json()["submission_id"]
+
+    other = await client.post("/api/forms/public/d/t-idem/submit", json={"data": {"name": "Анна"}},
+                              headers={"Idempotency-Key": "another"})
+    assert other.status_code == 409
+    await form_intake.drain()
+    assert (await db_session.execute(select(func.count(FormSubmission.id)))).scalar() == 1
+    assert await _notifications(db_session) == 1
+    assert promoted == []  # без файлов промоутить нечего
+
+
+@pytest.mark.asyncio
+async def test_rerun_skips_completed_steps(client, db_session, organization, admin_user, promoted):
+    await _dispatch(db_session, organization, admin_user, "t-rerun")
+    r = await client.post("/api/forms/public/d/t-rerun/submit", json={"data": {"name": "Анна"}})
+    await form_intake.drain()
+    submission_id = r.json()["submission_id"]
+
+    # завершённую анкету повторно не забирают
+    await form_intake.process_submission(submission_id)
+    assert await _notifications(db_session) == 1
+
+    # упавший после уведомления воркер: шаг notify уже отмечен, дубля нет
+    submission = await db_session.get(FormSubmission, submission_id)
+    submission.processing_status = "pending"
+    submission.processing_state = {"file_ids": [], "done": ["previews", "notify"]}
+    await db_session.commit()
+    assert await form_intake.resume_pending() == 1
+    await form_intake.drain()
+    await db_session.refresh(submission)
+    assert submission.processing_status == "done"
+    assert await _notifications(db_session) == 1
@@ -1,20 +1,23 @@
 """Tests for the dynamic HR-tags service (api/services/hr_tags.py).
 
 The HR-tag set is derived from VacancyApplication.created_by across a candidate's
-ACTIVE applications (rejected/withdrawn excluded) and stored read-only in
-entity.extra_data["system_hr_tags"], separate from manual Entity.tags.
+ACTIVE applications (rejected/withdrawn excluded) and stored as entity_hr_tags
+rows, served as entity.extra_data["system_hr_tags"] — separate from manual Entity.tags.
 """
 from datetime import datetime
 
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.models.database import (
-    Entity, EntityType, EntityStatus, Vacancy, VacancyStatus,
+    Entity, EntityHrTag, EntityType, EntityStatus, Vacancy, VacancyStatus,
     VacancyApplication, ApplicationStage, User,
 )
+from api.services import entity_extras
 from api.services.hr_tags import (
-    compute_hr_tags, sync_for_entity, backfill_all, EXTRA_KEY,
+    compute_hr_tags, sync_for_entity, backfill_all, rebuild_hr_tags, check_drift, EXTRA_KEY,
 )
+from api.services.metrics import HR_TAGS_RECOMPUTED
 
 
 # ── helpers ─────────────────────────────────────────────────────────────────
@@ -57,6 +60,17 @@ async def _application(db, vac, entity, creator, stage=ApplicationStage.intervie
     return a
 
 
+async def _stored(db, entity) -> dict:
+    """То, что карточка отдаст в extra_data: данные entity_notes/entity_hr_tags."""
+    return (await entity_extras.load(db, [entity.id]))[entity.id]
+
+
+async def _drop_tags(db):
+    """Стереть метки в обход событий — как данные до миграции или ручная правка."""
+    await db.execute(delete(EntityHrTag.__table__))
+    await db.commit()
+
+
 async def _user(db, name, email) -> User:
     u = User(email=email, password_hash="x", name=name)
     db.add(u)
@@ -72,12 +86,11 @@ async def test_single_active_application_tags_creator(db_session: AsyncSession,
     vac = await _vacancy(db_session, organization, department, admin_user)
     await _application(db_session, vac, cand, admin_user)
 
-    changed = await sync_for_entity(db_session, cand.id)
-    assert changed is True
-    await db_session.refresh(cand)
-    assert cand.extra_data[EXTRA_KEY] == [
+    # метку пишет событие коммита заявки — явный sync уже нечего менять
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == [
         {"hr_id": admin_user.id, "name": admin_user.name, "vacancy_id": vac.id, "vacancy_title": "Vac"}
     ]
+    assert await sync_for_entity(db_session, cand.id) is False
 
 
 async def test_multiple_distinct_hrs_sorted(db_session: AsyncSession, organization, department, admin_user):
@@ -145,23 +158,19 @@ async def test_removal_clears_tag(db_session: AsyncSession, organization, depart
     cand = await _candidate(db_session, organization, department, admin_user)
     vac = await _vacancy(db_session, organization, department, admin_user)
     app = await _application(db_session, vac, cand, admin_user)
-    await sync_for_entity(db_session, cand.id)
-    await db_session.refresh(cand)
-    assert cand.extra_data.get(EXTRA_KEY)
+    assert (await _stored(db_session, cand))[EXTRA_KEY]
 
     # кандидата сняли с воронки → заявка удалена → метка уходит
     await db_session.delete(app)
     await db_session.commit()
-    changed = await sync_for_entity(db_session, cand.id)
-    assert changed is True
-    await db_session.refresh(cand)
-    assert EXTRA_KEY not in (cand.extra_data or {})
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == []
 
 
 async def test_diff_guard_no_op_on_second_run(db_session: AsyncSession, organization, department, admin_user):
     cand = await _candidate(db_session, organization, department, admin_user)
     vac = await _vacancy(db_session, organization, department, admin_user)
     await _application(db_session, vac, cand, admin_user)
+    await _drop_tags(db_session)
     assert await sync_for_entity(db_session, cand.id) is True
     assert await sync_for_entity(db_session, cand.id) is False   # ничего не поменялось
 
@@ -175,10 +184,9 @@ async def test_does_not_touch_manual_tags_or_other_extra(db_session: AsyncSessio
     await _application(db_session, vac, cand, admin_user)
 
     await sync_for_entity(db_session, cand.id)
-    await db_session.refresh(cand)
     assert cand.tags == ["python", "senior"]                       # ручные метки целы
-    assert cand.extra_data["notes"] == [{"text": "keep me"}]       # прочий extra_data цел
-    assert cand.extra_data[EXTRA_KEY] == [
+    assert (await _stored(db_session, cand))["notes"] == [{"text": "keep me"}]  # заметки целы
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == [
         {"hr_id": admin_user.id, "name": admin_user.name, "vacancy_id": vac.id, "vacancy_title": "Vac"}
     ]
 
@@ -187,10 +195,58 @@ async def test_backfill_all_populates(db_session: AsyncSession, organization, de
     cand = await _candidate(db_session, organization, department, admin_user)
     vac = await _vacancy(db_session, organization, department, admin_user)
     await _application(db_session, vac, cand, admin_user)
+    await _drop_tags(db_session)
 
     changed = await backfill_all(db_session)
     assert changed == 1
-    await db_session.refresh(cand)
-    assert cand.extra_data[EXTRA_KEY] == [
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == [
         {"hr_id": admin_user.id, "name": admin_user.name, "vacancy_id": vac.id, "vacancy_title": "Vac"}
     ]
+
+
+async def test_set_based_rebuild_matches_compute(db_session: AsyncSession, organization, department, admin_user):
+    cand = await _candidate(db_session, organization, department, admin_user)
+    hr2 = await _user(db_session, "Настя", "nastya3@example.com")
+    v1 = await _vacancy(db_session, organization, department, admin_user, "V1")
+    v2 = await _vacancy(db_session, organization, department, admin_user, "V2")
+    await _application(db_session, v1, cand, hr2)
+    await _application(db_session, v2, cand, admin_user, stage=ApplicationStage.rejected)
+
+    conn = await db_session.connection()
+    assert await conn.run_sync(rebuild_hr_tags) == 1
+    await db_session.commit()
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == await compute_hr_tags(db_session, cand.id)
+    assert await sync_for_entity(db_session, cand.id) is False  # rebuild и sync согласованы
+
+
+async def test_events_follow_stage_and_vacancy_owner(db_session: AsyncSession, organization, department, admin_user):
+    cand = await _candidate(db_session, organization, department, admin_user)
+    owner = await _user(db_session, "Владелец", "owner_ev@example.com")
+    vac = await _vacancy(db_session, organization, department, admin_user, "Funnel")
+    app = await _application(db_session, vac, cand, None)  # HR = владелец воронки
+    assert [t["hr_id"] for t in (await _stored(db_session, cand))[EXTRA_KEY]] == [admin_user.id]
+
+    before = HR_TAGS_RECOMPUTED.value("event")
+    vac.created_by = owner.id
+    await db_session.commit()
+    assert [t["hr_id"] for t in (await _stored(db_session, cand))[EXTRA_KEY]] == [owner.id]
+    assert HR_TAGS_RECOMPUTED.value("event") == before + 1
+
+    app.stage = ApplicationStage.rejected
+    await db_session.commit()
+    assert (await _stored(db_session, cand))[EXTRA_KEY] == []
+
+
+async def test_drift_check_repairs_bulk_sql(db_session: AsyncSession, organization, department, admin_user):
+    cand = await _candidate(db_session, organization, department, admin_user)
+    hr2 = await _user(db_session, "Настя", "nastya4@example.com")
+    vac = await _vacancy(db_session, organization, department, admin_user)
+    await _application(db_session, vac, cand, admin_user)
+    assert await check_drift(db_session) == 0
+
+    # bulk UPDATE строк не называет — событие его не видит
+    await db_session.execute(update(VacancyApplication.__table__).values(created_by=hr2.id))
+    await db_session.commit()
+    assert await check_drift(db_session) == 1
+    assert [t["hr_id"] for t in (await _stored(db_session, cand))[EXTRA_KEY]] == [hr2.id]
+    assert await check_drift(db_session) == 0
@@ -739,6 +739,135 @@ class TestMessageOrdering:
                 assert timestamps[i] <= timestamps[i + 1]
 
 
+class TestMessageCursorPagination:
+    """Test keyset (cursor) pagination of chat history."""
+
+    @pytest.mark.asyncio
+    async def test_walk_history_backwards(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        chat: Chat,
+        paginated_messages: list[Message],
+        get_auth_headers,
+        org_owner
+    ):
+        """Following X-Before-Cursor visits every message exactly once."""
+        headers = get_auth_headers(admin_token)
+        response = await client.get(f"/api/chats/{chat.id}/messages?limit=10", headers=headers)
+        pages = [response.json()]
+        while response.json():
+            cursor = response.headers["x-before-cursor"]
+            response = await client.get(
+                f"/api/chats/{chat.id}/messages", params={"limit": 10, "before": cursor}, headers=headers
+            )
+            assert response.status_code == 200
+            pages.insert(0, response.json())
+
+        contents = [m["content"] for page in pages for m in page]
+        assert contents == [f"Message number {i + 1}" for i in range(25)]
+        assert [len(p) for p in pages] == [0, 5, 10, 10]
+
+    @pytest.mark.asyncio
+    async def test_after_cursor_with_content_type(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        chat: Chat,
+        paginated_messages: list[Message],
+        get_auth_headers,
+        org_owner
+    ):
+        """after= returns newer messages (oldest first); the filter still applies."""
+        pivot = paginated_messages[11]
+        cursor = f"{pivot.timestamp.isoformat()}_{pivot.id}"
+        response = await client.get(
+            f"/api/chats/{chat.id}/messages",
+            params={"after": cursor, "content_type": "photo", "limit": 2},
+            headers=get_auth_headers(admin_token)
+        )
+
+        assert response.status_code == 200
+        assert [m["content"] for m in response.json()] == ["Message number 13", "Message number 16"]
+
+    @pytest.mark.asyncio
+    async def test_equal_timestamps_are_not_skipped(
+        self,
+        client: AsyncClient,
+        db_session: AsyncSession,
+        admin_token: str,
+        chat: Chat,
+        get_auth_headers,
+        org_owner
+    ):
+        """Messages sharing a timestamp (imported batches) page by id."""
+        same = datetime(2026, 1, 1, 12, 0, 0)
+        db_session.add_all([
+            Message(chat_id=chat.id, telegram_user_id=1, content=f"batch {i}",
+                    content_type="text", timestamp=same)
+            for i in range(5)
+        ])
+        await db_session.commit()
+        headers = get_auth_headers(admin_token)
+
+        first = await client.get(f"/api/chats/{chat.id}/messages?limit=3", headers=headers)
+        rest = await client.get(
+            f"/api/chats/{chat.id}/messages",
+            params={"limit": 3, "before": first.headers["x-before-cursor"]}, headers=headers
+        )
+
+        seen = [m["content"] for m in rest.json()] + [m["content"] for m in first.json()]
+        assert seen == [f"batch {i}" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        chat: Chat,
+        get_auth_headers,
+        org_owner
+    ):
+        headers = get_auth_headers(admin_token)
+        bad = await client.get(f"/api/chats/{chat.id}/messages?before=garbage", headers=headers)
+        both = await client.get(
+            f"/api/chats/{chat.id}/messages",
+            params={"before": "2026-01-01T00:00:00_1", "after": "2026-01-01T00:00:00_1"}, headers=headers
+        )
+        assert bad.status_code == 400
+        assert both.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_access_check_memoized_across_pages(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        chat: Chat,
+        paginated_messages: list[Message],
+        get_auth_headers,
+        org_owner
+    ):
+        """Scrolling re-uses the access decision instead of re-running the checks."""
+        from api.services.permissions import PermissionService
+
+        calls = []
+        original = PermissionService.can_access_resource
+
+        async def counting(self, user, resource, action="read"):
+            calls.append(resource.id)
+            return await original(self, user, resource, action)
+
+        with patch.object(PermissionService, "can_access_resource", counting):
+            for page in (1, 2, 3):
+                response = await client.get(
+                    f"/api/chats/{chat.id}/messages?limit=10&page={page}",
+                    headers=get_auth_headers(admin_token)
+                )
+                assert response.status_code == 200
+
+        assert calls == [chat.id]
+
+
 # ============================================================================
 # TEST: GET /{chat_id}/participants - Participant Listing
 # ============================================================================
@@ -934,6 +1063,49 @@ class TestGetParticipants:
 # TEST: GET /file/{file_id} - Telegram File Proxy
 # ============================================================================
 
+@pytest.fixture
+def fake_bot_api(tmp_path, monkeypatch):
+    """Local fake Bot API: getFile + file download, with call counters.
+
+    Files are registered as files[file_id] = (file_unique_id, file_path, body).
+    """
+    import asyncio
+    import httpx
+    from api.services import telegram_media as media_module
+
+    state = {"files": {}, "get_file": 0, "downloads": 0, "delay": 0.0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/getFile"):
+            state["get_file"] += 1
+            entry = state["files"].get(request.url.params.get("file_id"))
+            if entry is None:
+                return httpx.Response(200, json={"ok": False, "description": "Bad Request"})
+            unique_id, file_path, body = entry
+            return httpx.Response(200, json={"ok": True, "result": {
+                "file_id": request.url.params["file_id"], "file_unique_id": unique_id,
+                "file_size": len(body), "file_path": file_path,
+            }})
+        for unique_id, file_path, body in state["files"].values():
+            if path.endswith("/" + file_path):
+                state["downloads"] += 1
+                await asyncio.sleep(state["delay"])
+                return httpx.Response(200, content=body)
+        return httpx.Response(404)
+
+    import aiofiles.threadpool
+    # conftest подменяет aiofiles.open заглушкой — кэшу нужна настоящая запись на диск
+    monkeypatch.setattr("aiofiles.open", aiofiles.threadpool.open)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(media_module, "get_http_client", lambda: client)
+    cache = media_module.TelegramMediaCache(root=tmp_path / "tg", max_bytes=1024 * 1024)
+    monkeypatch.setattr("api.routes.messages.telegram_media", cache)
+    monkeypatch.setattr("api.routes.messages.settings.telegram_bot_token", "test_token_123")
+    state["cache"] = cache
+    return state
+
+
 class TestGetTelegramFile:
     """Test Telegram file proxy endpoint."""
 
@@ -942,71 +1114,38 @@ class TestGetTelegramFile:
         self,
         client: AsyncClient,
         admin_token: str,
-        get_auth_headers
+        get_auth_headers,
+        fake_bot_api
     ):
         """Test successful file retrieval with auth header."""
-        with patch("httpx.AsyncClient") as mock_client_class:
-            mock_client = AsyncMock()
-            mock_client_class.return_value.__aenter__.return_value = mock_client
-
-            # Mock getFile response
-            get_file_resp = MagicMock()
-            get_file_resp.json.return_value = {
-                "ok": True,
-                "result": {"file_path": "photos/file_123.jpg"}
-            }
-
-            # Mock file download response
-            file_resp = MagicMock()
-            file_resp.status_code = 200
-            file_resp.content = b"fake image data"
-
-            mock_client.get.side_effect = [get_file_resp, file_resp]
-
-            with patch("api.routes.messages.settings") as mock_settings:
-                mock_settings.telegram_bot_token = "test_token_123"
+        fake_bot_api["files"]["test_file_id"] = ("uniq1", "photos/file_123.jpg", b"fake image data")
 
-                response = await client.get(
-                    "/api/chats/file/test_file_id",
-                    headers=get_auth_headers(admin_token)
-                )
+        response = await client.get(
+            "/api/chats/file/test_file_id",
+            headers=get_auth_headers(admin_token)
+        )
 
-                assert response.status_code == 200
-                assert response.content == b"fake image data"
-                assert "image/jpeg" in response.headers["content-type"]
+        assert response.status_code == 200
+        assert response.content == b"fake image data"
+        assert "image/jpeg" in response.headers["content-type"]
+        assert response.headers["etag"] == '"uniq1"'
 
     @pytest.mark.asyncio
     async def test_get_file_with_token_query_param(
         self,
         client: AsyncClient,
-        admin_token: str
+        admin_token: str,
+        fake_bot_api
     ):
         """Test file retrieval with token query parameter."""
-        with patch("httpx.AsyncClient") as mock_client_class:
-            mock_client = AsyncMock()
-            mock_client_class.return_value.__aenter__.return_value = mock_client
+        fake_bot_api["files"]["test_file_id"] = ("uniq2", "videos/file.mp4", b"fake video data")
 
-            get_file_resp = MagicMock()
-            get_file_resp.json.return_value = {
-                "ok": True,
-                "result": {"file_path": "videos/file.mp4"}
-            }
-
-            file_resp = MagicMock()
-            file_resp.status_code = 200
-            file_resp.content = b"fake video data"
-
-            mock_client.get.side_effect = [get_file_resp, file_resp]
-
-            with patch("api.routes.messages.settings") as mock_settings:
-                mock_settings.telegram_bot_token = "test_token_123"
-
-                response = await client.get(
-                    f"/api/chats/file/test_file_id?token={admin_token}"
-                )
+        response = await client.get(
+            f"/api/chats/file/test_file_id?token={admin_token}"
+        )
 
-                assert response.status_code == 200
-                assert response.content == b"fake video data"
+        assert response.status_code == 200
+        assert response.content == b"fake video data"
 
     @pytest.mark.asyncio
     async def test_get_file_without_auth(
@@ -1023,27 +1162,16 @@ class TestGetTelegramFile:
         self,
         client: AsyncClient,
         admin_token: str,
-        get_auth_headers
+        get_auth_headers,
+        fake_bot_api
     ):
         """Test file not found in Telegram."""
-        with patch("httpx.AsyncClient") as mock_client_class:
-            mock_client = AsyncMock()
-            mock_client_class.return_value.__aenter__.return_value = mock_client
-
-            get_file_resp = MagicMock()
-            get_file_resp.json.return_value = {"ok": False}
-
-            mock_client.get.return_value = get_file_resp
-
-            with patch("api.routes.messages.settings") as mock_settings:
-                mock_settings.telegram_bot_token = "test_token_123"
-
-                response = await client.get(
-                    "/api/chats/file/invalid_file_id",
-                    headers=get_auth_headers(admin_token)
-                )
+        response = await client.get(
+            "/api/chats/file/invalid_file_id",
+            headers=get_auth_headers(admin_token)
+        )
 
-                assert response.status_code == 404
+        assert response.status_code == 404
 
     @pytest.mark.asyncio
     async def test_get_file_bot_token_not_configured(
@@ -1069,7 +1197,8 @@ class TestGetTelegramFile:
         self,
         client: AsyncClient,
         admin_token: str,
-        get_auth_headers
+        get_auth_headers,
+        fake_bot_api
     ):
         """Test various file content types are detected correctly."""
         test_cases = [
@@ -1083,33 +1212,95 @@ class TestGetTelegramFile:
             ("sticker.tgs", "application/x-tgsticker"),
         ]
 
-        for file_path, expected_type in test_cases:
-            with patch("httpx.AsyncClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
+        for i, (file_path, expected_type) in enumerate(test_cases):
+            fake_bot_api["files"][f"test_file_{i}"] = (f"u{i}", file_path, b"test data")
 
-                get_file_resp = MagicMock()
-                get_file_resp.json.return_value = {
-                    "ok": True,
-                    "result": {"file_path": file_path}
-                }
+            response = await client.get(
+                f"/api/chats/file/test_file_{i}",
+                headers=get_auth_headers(admin_token)
+            )
 
-                file_resp = MagicMock()
-                file_resp.status_code = 200
-                file_resp.content = b"test data"
+            assert response.status_code == 200
+            assert expected_type in response.headers["content-type"]
 
-                mock_client.get.side_effect = [get_file_resp, file_resp]
+    @pytest.mark.asyncio
+    async def test_repeat_requests_served_from_disk(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        get_auth_headers,
+        fake_bot_api
+    ):
+        """Second request for the same file_id touches neither getFile nor the download."""
+        fake_bot_api["files"]["sticker_id"] = ("stk", "stickers/s.webp", b"webp bytes")
+        # Another file_id for the same file (e.g. after bot token rotation)
+        fake_bot_api["files"]["sticker_id_2"] = ("stk", "stickers/s.webp", b"webp bytes")
 
-                with patch("api.routes.messages.settings") as mock_settings:
-                    mock_settings.telegram_bot_token = "test_token_123"
+        for file_id in ("sticker_id", "sticker_id", "sticker_id_2"):
+            response = await client.get(f"/api/chats/file/{file_id}", headers=get_auth_headers(admin_token))
+            assert response.content == b"webp bytes"
 
-                    response = await client.get(
-                        "/api/chats/file/test_file",
-                        headers=get_auth_headers(admin_token)
-                    )
+        assert fake_bot_api["get_file"] == 2
+        assert fake_bot_api["downloads"] == 1
 
-                    assert response.status_code == 200
-                    assert expected_type in response.headers["content-type"]
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_download(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        get_auth_headers,
+        fake_bot_api
+    ):
+        """Parallel requests for a cold file are coalesced into one upstream fetch."""
+        import asyncio
+        fake_bot_api["files"]["note_id"] = ("note", "video_notes/n.mp4", b"x" * 5000)
+        fake_bot_api["delay"] = 0.05
+
+        responses = await asyncio.gather(*[
+            client.get("/api/chats/file/note_id", headers=get_auth_headers(admin_token))
+            for _ in range(5)
+        ])
+
+        assert all(r.status_code == 200 and len(r.content) == 5000 for r in responses)
+        assert fake_bot_api["get_file"] == 1
+        assert fake_bot_api["downloads"] == 1
+
+    @pytest.mark.asyncio
+    async def test_range_and_etag(
+        self,
+        client: AsyncClient,
+        admin_token: str,
+        get_auth_headers,
+        fake_bot_api
+    ):
+        """Video seeking gets 206 slices; a matching If-None-Match gets 304."""
+        fake_bot_api["files"]["video_id"] = ("vid", "videos/v.mp4", bytes(range(256)))
+        headers = get_auth_headers(admin_token)
+
+        partial = await client.get("/api/chats/file/video_id", headers={**headers, "Range": "bytes=10-19"})
+        assert partial.status_code == 206
+        assert partial.content == bytes(range(10, 20))
+        assert partial.headers["content-range"] == "bytes 10-19/256"
+
+        cached = await client.get("/api/chats/file/video_id", headers={**headers, "If-None-Match": '"vid"'})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == '"vid"'
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_bounds_disk_usage(self, fake_bot_api):
+        """Least recently read files are evicted once the size limit is exceeded."""
+        cache = fake_bot_api["cache"]
+        cache.max_bytes = 250
+        for name in ("a", "b", "c"):
+            fake_bot_api["files"][name] = (name, f"photos/{name}.jpg", name.encode() * 100)
+
+        await cache.get("a", "t")
+        await cache.get("b", "t")
+        await cache.get("a", "t")  # a is now more recent than b
+        await cache.get("c", "t")
+
+        on_disk = sorted(p.name for p in cache.root.iterdir() if p.is_file())
+        assert on_disk == ["a.jpg", "c.jpg"]
 
 
 # ============================================================================
@@ -0,0 +1,164 @@
+"""Tests for the Prometheus registry and /metrics (api/services/metrics.py)."""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.models.database import ParseJob
+from api.services import metrics
+from api.services.metrics import (
+    Counter, Histogram, Registry, instrument_engine, query_label,
+)
+from api.services.redis_cache import RedisCacheService
+
+
+@pytest.fixture
+def scrape_db(db_session, monkeypatch):
+    """Сборщик очередей открывает свою сессию — направляем её в тестовую базу."""
+    monkeypatch.setattr(
+        "api.database.AsyncSessionLocal",
+        async_sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False),
+    )
+    monkeypatch.setattr(metrics, "_queue_checked_at", 0.0)
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    from api.config import settings
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    return {"Authorization": "Bearer s3cret"}
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", reg)
+    return reg
+
+
+class TestExposition:
+
+    @pytest.mark.asyncio
+    async def test_counter_and_histogram_format(self, registry):
+        hits = Counter("demo_requests", "Demo counter", ("kind",))
+        latency = Histogram("demo_seconds", "Demo histogram", ("op",), buckets=(0.1, 1.0))
+        hits.inc('a"b')
+        hits.inc('a"b', amount=2)
+        latency.observe(0.05, "read")
+        latency.observe(0.5, "read")
+        latency.observe(5, "read")
+
+        text = await registry.render()
+        assert "# TYPE demo_requests counter" in text
+        assert 'demo_requests_total{kind="a\\"b"} 3' in text
+        assert 'demo_seconds_bucket{op="read",le="0.1"} 1' in text
+        assert 'demo_seconds_bucket{op="read",le="1"} 2' in text
+        assert 'demo_seconds_bucket{op="read",le="+Inf"} 3' in text
+        assert 'demo_seconds_sum{op="read"} 5.55' in text
+        assert 'demo_seconds_count{op="read"} 3' in text
+
+    def test_ai_usage_tokens(self):
+        usage = SimpleNamespace(input_tokens=120, output_tokens=30)
+        metrics.record_ai_call("anthropic", "entity_ai", "claude-test", "messages.create", 1.2, "ok", usage)
+        assert metrics.AI_TOKENS.value("anthropic", "entity_ai", "claude-test", "input") >= 120
+        assert metrics.AI_LATENCY.count("anthropic", "entity_ai", "claude-test", "messages.create", "ok") >= 1
+
+
+class TestInstrumentation:
+
+    @pytest.mark.asyncio
+    async def test_anthropic_sdk_calls_are_timed(self):
+        import httpx
+        # anthropic.AsyncAnthropic в тестах подменён autouse-фикстурой — берём настоящий
+        from anthropic._client import AsyncAnthropic
+
+        def handler(request):
+            return httpx.Response(200, json={
+                "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-test",
+                "content": [{"type": "text", "text": "ok"}], "stop_reason": "end_turn",
+                "usage": {"input_tokens": 11, "output_tokens": 7},
+            })
+
+        metrics.instrument_ai_clients()
+        client = AsyncAnthropic(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        before = metrics.AI_TOKENS.value("anthropic", "test_metrics", "claude-test", "output")
+        await client.messages.create(
+            model="claude-test", max_tokens=10, messages=[{"role": "user", "content": "hi"}],
+        )
+        # service — модуль, из которого позвали SDK
+        assert metrics.AI_TOKENS.value("anthropic", "test_metrics", "claude-test", "output") == before + 7
+
+    @pytest.mark.asyncio
+    async def test_query_label_times_statements(self, db_session):
+        from sqlalchemy import text
+        instrument_engine(db_session.bind)
+        before = metrics.DB_QUERY_LATENCY.count("test.label")
+        with query_label("test.label"):
+            await db_session.execute(text("SELECT 1"))
+        assert metrics.DB_QUERY_LATENCY.count("test.label") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_unlabeled_query_uses_route_template(self, db_session):
+        from sqlalchemy import text
+        instrument_engine(db_session.bind)
+        label = "route:/api/chats/{chat_id}"
+        before = metrics.DB_QUERY_LATENCY.count(label)
+        metrics.bind_request_scope({"route": SimpleNamespace(path="/api/chats/{chat_id}")})
+        try:
+            await db_session.execute(text("SELECT 1"))
+        finally:
+            metrics.bind_request_scope(None)
+        assert metrics.DB_QUERY_LATENCY.count(label) == before + 1
+
+    @pytest.mark.asyncio
+    async def test_memory_cache_hit_and_miss(self, monkeypatch):
+        async def no_redis():
+            return None
+        monkeypatch.setattr("api.services.redis_cache.get_redis", no_redis)
+        hits = metrics.CACHE_REQUESTS.value("memory", "hit")
+        misses = metrics.CACHE_REQUESTS.value("memory", "miss")
+
+        await RedisCacheService.get("metrics-test:missing")
+        await RedisCacheService.set("metrics-test:key", "v", 60)
+        await RedisCacheService.get("metrics-test:key")
+
+        assert metrics.CACHE_REQUESTS.value("memory", "miss") == misses + 1
+        assert metrics.CACHE_REQUESTS.value("memory", "hit") == hits + 1
+
+
+class TestMetricsEndpoint:
+
+    @pytest.mark.asyncio
+    async def test_route_template_latency(
+        self, db_session, scrape_db, metrics_token, client, admin_user, organization, admin_token,
+        get_auth_headers,
+    ):
+        instrument_engine(db_session.bind)
+        db_session.add(ParseJob(
+            org_id=organization.id, user_id=admin_user.id, file_name="cv.pdf", file_path="/tmp/cv.pdf",
+        ))
+        await db_session.commit()
+
+        await client.get("/api/notifications/unread-count", headers=get_auth_headers(admin_token))
+
+        response = await client.get("/metrics", headers=metrics_token)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/notifications/unread-count",status="200"}' in body
+        assert "db_pool_connections" in body
+        assert 'db_query_duration_seconds_count{label="notifications.unread_count"}' in body
+        assert 'background_jobs{queue="parse_jobs",status="pending"} 1' in body
+        assert 'background_jobs{queue="calls",status="transcribing"} 0' in body
+
+    @pytest.mark.asyncio
+    async def test_token_required(self, scrape_db, metrics_token, client):
+        assert (await client.get("/metrics")).status_code == 401
+        wrong = await client.get("/metrics", headers={"Authorization": "Bearer nope"})
+        assert wrong.status_code == 401
+        ok = await client.get("/metrics", headers=metrics_token)
+        assert ok.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_closed_without_token(self, client):
+        assert (await client.get("/metrics")).status_code == 404
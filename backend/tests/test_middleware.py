@@ -0,0 +1,97 @@
+"""Tests for the pure ASGI middleware stack (api/middleware)."""
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from api.middleware import (
+    AssetCacheHeadersMiddleware, CorrelationMiddleware, SecurityHeadersMiddleware,
+)
+
+
+def _app(stream_log=None):
+    async def ping(request):
+        return JSONResponse({"ok": True})
+
+    async def stream(request):
+        async def chunks():
+            for i in range(3):
+                stream_log.append(i)
+                yield f"data: {i}\n\n".encode()
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    app = Starlette(routes=[
+        Route("/api/ping", ping),
+        Route("/api/stream", stream),
+        Route("/assets/app.js", ping),
+        Route("/page", ping),
+        Route("/api/boom", boom),
+    ])
+    app.add_middleware(AssetCacheHeadersMiddleware)
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(CorrelationMiddleware)
+    return app
+
+
+@pytest.fixture
+def make_client():
+    def _make(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        return httpx.AsyncClient(transport=transport, base_url="http://test")
+    return _make
+
+
+class TestMiddlewareHeaders:
+
+    @pytest.mark.asyncio
+    async def test_correlation_id_echoed_or_generated(self, make_client):
+        async with make_client(_app()) as client:
+            given = await client.get("/api/ping", headers={"X-Correlation-ID": "abc123"})
+            generated = await client.get("/api/ping")
+        assert given.headers["x-correlation-id"] == "abc123"
+        assert len(generated.headers["x-correlation-id"]) == 8
+
+    @pytest.mark.asyncio
+    async def test_api_vs_page_security_headers(self, make_client):
+        async with make_client(_app()) as client:
+            api = await client.get("/api/ping")
+            page = await client.get("/page")
+        assert api.headers["x-content-type-options"] == "nosniff"
+        assert "content-security-policy" not in api.headers
+        assert page.headers["x-frame-options"] == "DENY"
+        assert "default-src 'self'" in page.headers["content-security-policy"]
+
+    @pytest.mark.asyncio
+    async def test_assets_are_immutable(self, make_client):
+        async with make_client(_app()) as client:
+            asset = await client.get("/assets/app.js")
+            api = await client.get("/api/ping")
+        assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert "cache-control" not in api.headers
+
+    @pytest.mark.asyncio
+    async def test_streaming_body_passes_through(self, make_client):
+        produced = []
+        async with make_client(_app(produced)) as client:
+            async with client.stream("GET", "/api/stream") as response:
+                body = b"".join([chunk async for chunk in response.aiter_bytes()])
+        assert response.headers["x-correlation-id"]
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert body == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+        assert produced == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_unhandled_error_logged_as_500(self, make_client, monkeypatch):
+        logged = []
+        monkeypatch.setattr(
+            "api.middleware.correlation.log_request",
+            lambda **kw: logged.append(kw),
+        )
+        async with make_client(_app()) as client:
+            response = await client.get("/api/boom")
+        assert response.status_code == 500
+        assert logged and logged[-1]["path"] == "/api/boom" and logged[-1]["status_code"] == 500
@@ -0,0 +1,166 @@
+"""Замыкание org_units и контекст пользователя для хаба доступов (services/org_hierarchy.py)."""
+import pytest
+from sqlalchemy import event, select
+
+from api.models.database import (
+    AccessRequest, CustomRole, Employee, Entity, EntityType, OrgUnit, OrgUnitClosure,
+    ResourceCatalog, ResourceCategory, UserCustomRole,
+)
+from api.services.auth import create_access_token
+from api.services.org_hierarchy import closure_rows, get_access_context
+
+
+def _h(u):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': str(u.id)})}"}
+
+
+@pytest.fixture
+def count_selects(db_session):
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before)
+
+
+async def _tree(db_session, organization):
+    """Холдинг → Разработка → Бэкенд."""
+    holding = OrgUnit(org_id=organization.id, name="Холдинг")
+    db_session.add(holding)
+    await db_session.flush()
+    dev = OrgUnit(org_id=organization.id, name="Разработка", parent_id=holding.id)
+    db_session.add(dev)
+    await db_session.flush()
+    backend = OrgUnit(org_id=organization.id, name="Бэкенд", parent_id=dev.id)
+    db_session.add(backend)
+    await db_session.commit()
+    return holding, dev, backend
+
+
+async def _closure(db_session, organization):
+    rows = (await db_session.execute(
+        select(OrgUnitClosure.ancestor_id, OrgUnitClosure.descendant_id, OrgUnitClosure.depth)
+        .where(OrgUnitClosure.org_id == organization.id)
+    )).all()
+    return {(a, d): depth for a, d, depth in rows}
+
+
+def test_closure_rows_breaks_cycles():
+    rows = closure_rows({1: None, 2: 1, 3: 4, 4: 3}, org_id=7)
+    pairs = {(r["ancestor_id"], r["descendant_id"]): r["depth"] for r in rows}
+    assert pairs[(1, 2)] == 1 and pairs[(2, 2)] == 0
+    assert pairs[(4, 3)] == 1 and (3, 3) in pairs and len(pairs) == 7
+
+
+class TestClosureMaintenance:
+
+    @pytest.mark.asyncio
+    async def test_follows_tree_edits(self, db_session, organization):
+        holding, dev, backend = await _tree(db_session, organization)
+        closure = await _closure(db_session, organization)
+        assert closure[(holding.id, backend.id)] == 2
+        assert closure[(dev.id, backend.id)] == 1
+        assert len(closure) == 6
+
+        backend.parent_id = holding.id
+        await db_session.commit()
+        closure = await _closure(db_session, organization)
+        assert closure[(holding.id, backend.id)] == 1
+        assert (dev.id, backend.id) not in closure
+
+        await db_session.delete(dev)
+        await db_session.commit()
+        closure = await _closure(db_session, organization)
+        assert set(closure) == {(holding.id, holding.id), (backend.id, backend.id), (holding.id, backend.id)}
+
+
+class TestAccessContext:
+
+    @pytest.mark.asyncio
+    async def test_one_query_then_cached_until_edit(
+        self, db_session, organization, admin_user, org_owner, second_user, count_selects,
+    ):
+        holding, dev, backend = await _tree(db_session, organization)
+        card = Entity(org_id=organization.id, type=EntityType.candidate, name="Second",
+                      extra_data={"prometheus_status": "Принят"})
+        role = CustomRole(name="Прокси", base_role="member", org_id=organization.id)
+        db_session.add_all([card, role])
+        await db_session.flush()
+        employee = Employee(user_id=second_user.id, org_id=organization.id, entity_id=card.id,
+                            org_unit_id=backend.id, is_active=True)
+        db_session.add_all([employee, UserCustomRole(user_id=second_user.id, role_id=role.id)])
+        await db_session.commit()
+
+        await get_access_context(admin_user.id, organization.id, db_session)  # проверка замыкания
+        count_selects.clear()
+
+        ctx = await get_access_context(second_user.id, organization.id, db_session)
+        assert len(count_selects) == 1
+        assert ctx.unit_chain == (holding.id, dev.id, backend.id)
+        assert ctx.company_unit_id == holding.id
+        assert ctx.role_id == role.id and not ctx.is_org_admin
+        assert ctx.unlock_state == {"always": True, "in_staff": True, "prometheus_accepted": True}
+
+        owner = await get_access_context(admin_user.id, organization.id, db_session)
+        assert owner.is_org_admin and owner.is_active and owner.company_unit_id is None
+
+        count_selects.clear()
+        await get_access_context(second_user.id, organization.id, db_session)
+        assert count_selects == []
+
+        employee.is_active = False
+        await db_session.commit()
+        assert not (await get_access_context(second_user.id, organization.id, db_session)).is_active
+
+        card.extra_data = {"prometheus_status": "Отказ"}
+        await db_session.commit()
+        ctx = await get_access_context(second_user.id, organization.id, db_session)
+        assert ctx.prometheus_accepted is False
+
+
+class TestAccessHubRouting:
+
+    @pytest.mark.asyncio
+    async def test_request_gets_company_and_available_is_constant_cost(
+        self, client, db_session, organization, admin_user, org_owner, count_selects,
+    ):
+        holding, _, backend = await _tree(db_session, organization)
+        db_session.add(Employee(user_id=admin_user.id, org_id=organization.id,
+                                org_unit_id=backend.id, is_active=True))
+        for i in range(5):
+            db_session.add(ResourceCatalog(
+                org_id=organization.id, key=f"proxy_{i}", name=f"Прокси {i}",
+                category=ResourceCategory.other, available_to_all=True,
+            ))
+        await db_session.commit()
+        resources = (await db_session.execute(select(ResourceCatalog))).scalars().all()
+
+        r = await client.post("/api/access-hub/requests", headers=_h(admin_user),
+                              json={"resource_id": resources[0].id})
+        assert r.status_code == 201, r.text
+        req = (await db_session.execute(select(AccessRequest))).scalar_one()
+        assert req.company_unit_id == holding.id
+
+        r = await client.get("/api/access-hub/available", headers=_h(admin_user))
+        assert r.status_code == 200 and len(r.json()) == 5
+        count_selects.clear()
+        r = await client.get("/api/access-hub/available", headers=_h(admin_user))
+        warm = len(count_selects)
+
+        for i in range(5, 15):
+            db_session.add(ResourceCatalog(
+                org_id=organization.id, key=f"proxy_{i}", name=f"Прокси {i}",
+                category=ResourceCategory.other, available_to_all=True,
+            ))
+        await db_session.commit()
+        await client.get("/api/access-hub/available", headers=_h(admin_user))
+        count_selects.clear()
+        r = await client.get("/api/access-hub/available", headers=_h(admin_user))
+        assert len(r.json()) == 15
+        # лимиты считаются одним GROUP BY, а не запросом на ресурс
+        assert len(count_selects) == warm
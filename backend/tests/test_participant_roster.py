@@ -0,0 +1,160 @@
+"""Tests for batched participant resolution (api/services/participant_roster.py)."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+
+from api.models.database import (
+    CallRecording, CallSource, Entity, EntityType, Message, User, UserRole,
+)
+from api.services import participant_roster
+from api.services.participants import (
+    ParticipantRole, identify_call_participants, identify_participants,
+)
+
+
+@pytest.fixture
+def count_queries(db_session):
+    """Счётчик SELECT-ов, которые уходят в базу."""
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before)
+
+
+async def _message(db_session, chat, n, telegram_user_id, username=None, first_name=None, last_name=None):
+    db_session.add(Message(
+        chat_id=chat.id, telegram_message_id=n, telegram_user_id=telegram_user_id,
+        username=username, first_name=first_name, last_name=last_name,
+        content=f"msg {n}", content_type="text", timestamp=datetime.utcnow(),
+    ))
+
+
+class TestIdentifyParticipants:
+
+    @pytest.mark.asyncio
+    async def test_resolves_every_kind_of_sender(self, db_session, organization, admin_user, chat):
+        db_session.add(User(
+            email="lead@test.com", password_hash="x", name="Team Lead", role=UserRole.admin,
+            telegram_username="lead_main", additional_telegram_usernames=["lead_alt"],
+        ))
+        target = Entity(org_id=organization.id, type=EntityType.candidate, name="Ivan Petrov",
+                        telegram_user_id=5001)
+        contact = Entity(org_id=organization.id, type=EntityType.client, name="Maria Ivanova Sr")
+        db_session.add_all([target, contact])
+        await db_session.flush()
+        chat.entity_id = target.id
+
+        await _message(db_session, chat, 1, 4001, username="lead_alt", first_name="Team")
+        await _message(db_session, chat, 2, 5001, first_name="Whatever")
+        await _message(db_session, chat, 3, 6001, first_name="maria", last_name="ivanova")
+        await _message(db_session, chat, 4, 7001, first_name="Nobody", last_name="Known")
+        await db_session.commit()
+
+        found = {p.telegram_user_id: p for p in await identify_participants(chat.id, organization.id, db_session)}
+
+        assert found[4001].role == ParticipantRole.system_user
+        assert found[5001].role == ParticipantRole.target and found[5001].entity_id == target.id
+        assert found[6001].role == ParticipantRole.contact and found[6001].entity_id == contact.id
+        assert found[6001].confidence == 0.85
+        assert found[7001].role == ParticipantRole.unknown
+
+    @pytest.mark.asyncio
+    async def test_query_count_does_not_grow_with_senders(
+        self, db_session, organization, admin_user, chat, count_queries,
+    ):
+        for i in range(40):
+            db_session.add(Entity(org_id=organization.id, type=EntityType.candidate, name=f"Person {i}"))
+            await _message(db_session, chat, i, 9000 + i, username=f"user{i}", first_name="Person", last_name=str(i))
+        await db_session.commit()
+
+        participants = await identify_participants(chat.id, organization.id, db_session)
+        cold = len(count_queries)
+        count_queries.clear()
+        await identify_participants(chat.id, organization.id, db_session)
+
+        assert len(participants) == 40
+        assert all(p.role == ParticipantRole.contact and p.confidence == 0.95 for p in participants)
+        # chat + senders + users + entities на холодную, потом без ростера
+        assert cold <= 4
+        assert len(count_queries) == 2
+
+    @pytest.mark.asyncio
+    async def test_committed_changes_are_picked_up_incrementally(
+        self, db_session, organization, admin_user, chat, count_queries,
+    ):
+        await _message(db_session, chat, 1, 8001, first_name="New", last_name="Hire")
+        await db_session.commit()
+        [before] = await identify_participants(chat.id, organization.id, db_session)
+        assert before.role == ParticipantRole.unknown
+
+        hire = Entity(org_id=organization.id, type=EntityType.candidate, name="New Hire")
+        db_session.add(hire)
+        await db_session.commit()
+        count_queries.clear()
+
+        [after] = await identify_participants(chat.id, organization.id, db_session)
+        assert after.entity_id == hire.id and after.confidence == 0.95
+        # перечитана только новая строка, без полной пересборки
+        assert any("entities.id IN" in s for s in count_queries)
+
+        await db_session.delete(hire)
+        await db_session.commit()
+        [gone] = await identify_participants(chat.id, organization.id, db_session)
+        assert gone.role == ParticipantRole.unknown
+
+    @pytest.mark.asyncio
+    async def test_raw_user_delete_needs_explicit_invalidation(self, db_session, organization, chat):
+        user = User(email="gone@test.com", password_hash="x", name="Gone", role=UserRole.admin,
+                    telegram_id=3001)
+        db_session.add(user)
+        await _message(db_session, chat, 1, 3001, first_name="Gone")
+        await db_session.commit()
+        [p] = await identify_participants(chat.id, organization.id, db_session)
+        assert p.user_id == user.id
+
+        await db_session.execute(text("DELETE FROM users WHERE id = :id"), {"id": user.id})
+        await db_session.commit()
+        participant_roster.invalidate_roster_users(user.id)
+
+        [p] = await identify_participants(chat.id, organization.id, db_session)
+        assert p.role == ParticipantRole.unknown
+
+
+class TestIdentifyCallParticipants:
+
+    @pytest.mark.asyncio
+    async def test_email_and_name_matching(self, db_session, organization, admin_user):
+        db_session.add(User(
+            email="hr@test.com", password_hash="x", name="HR Person", role=UserRole.admin,
+            additional_emails=["hr.alt@test.com"],
+        ))
+        by_email = Entity(org_id=organization.id, type=EntityType.candidate, name="Oleg Sidorov",
+                          email="oleg@test.com")
+        by_name = Entity(org_id=organization.id, type=EntityType.candidate, name="Anna Smirnova")
+        db_session.add_all([by_email, by_name])
+        await db_session.flush()
+        call = CallRecording(
+            org_id=organization.id, source_type=CallSource.upload, entity_id=by_email.id,
+            speakers=[
+                {"speaker": "hr.alt@test.com"},
+                {"speaker": "Oleg (oleg@test.com)"},
+                {"speaker": "anna smirnova"},
+                {"speaker": "Speaker 4"},
+            ],
+        )
+        db_session.add(call)
+        await db_session.commit()
+
+        found = {p.display_name: p for p in await identify_call_participants(call.id, organization.id, db_session)}
+
+        assert found["HR Person"].role == ParticipantRole.system_user
+        assert found["Oleg Sidorov"].role == ParticipantRole.target
+        assert found["Anna Smirnova"].entity_id == by_name.id and found["Anna Smirnova"].confidence == 0.95
+        assert found["Speaker 4"].role == ParticipantRole.unknown
@@ -0,0 +1,156 @@
+"""ETag/304 for polled endpoints and the pushed unread counter (api/services/change_versions.py).
+
+Notifications are versioned per user, /candidates/kanban per organization; any
+committed change bumps the version so the next poll gets a fresh 200.
+"""
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.models.database import Entity, EntityStatus, EntityType, Notification
+from api.routes.realtime import manager
+from api.services import change_versions
+
+
+async def _poll(client, url, headers, etag=None):
+    h = dict(headers)
+    if etag:
+        h["If-None-Match"] = etag
+    return await client.get(url, headers=h)
+
+
+class TestNotificationETag:
+
+    @pytest.mark.asyncio
+    async def test_unchanged_poll_is_304(
+        self, client, second_user, org_member, second_user_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        first = await _poll(client, "/api/notifications/unread-count", headers)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+
+        again = await _poll(client, "/api/notifications/unread-count", headers, etag)
+        assert again.status_code == 304
+        assert again.headers["etag"] == etag
+
+    @pytest.mark.asyncio
+    async def test_new_notification_and_read_all_change_etag(
+        self, db_session, client, second_user, org_member, second_user_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        etag = (await _poll(client, "/api/notifications", headers)).headers["etag"]
+
+        db_session.add(Notification(user_id=second_user.id, type="form_submitted", title="Анкета"))
+        await db_session.commit()
+        await change_versions.drain()
+
+        fresh = await _poll(client, "/api/notifications", headers, etag)
+        assert fresh.status_code == 200
+        assert len(fresh.json()) == 1
+        etag = fresh.headers["etag"]
+
+        assert (await client.put("/api/notifications/read-all", headers=headers)).status_code == 200
+        after = await _poll(client, "/api/notifications", headers, etag)
+        assert after.status_code == 200
+        assert after.json()[0]["is_read"] is True
+
+    @pytest.mark.asyncio
+    async def test_unread_count_pushed_over_websocket(
+        self, db_session, second_user, org_member, monkeypatch
+    ):
+        socket = AsyncMock()
+        manager.active_connections[second_user.id] = {socket}
+        monkeypatch.setattr(
+            "api.database.AsyncSessionLocal",
+            async_sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False),
+        )
+        try:
+            db_session.add(Notification(user_id=second_user.id, type="form_submitted", title="Анкета"))
+            await db_session.commit()
+            await change_versions.drain()
+        finally:
+            manager.active_connections.pop(second_user.id, None)
+
+        sent = socket.send_text.await_args.args[0]
+        assert '"notification.unread_count"' in sent
+        assert '"count": 1' in sent
+
+
+class TestCandidateKanbanETag:
+
+    @pytest.mark.asyncio
+    async def test_entity_change_invalidates_board(
+        self, db_session, client, admin_user, org_owner, organization, admin_token, get_auth_headers
+    ):
+        headers = get_auth_headers(admin_token)
+        first = await _poll(client, "/api/candidates/kanban", headers)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert (await _poll(client, "/api/candidates/kanban", headers, etag)).status_code == 304
+
+        # Другие фильтры — другой ETag
+        filtered = await _poll(client, "/api/candidates/kanban?per_column=5", headers, etag)
+        assert filtered.status_code == 200
+
+        db_session.add(Entity(
+            org_id=organization.id, created_by=admin_user.id, name="Новый Кандидат",
+            type=EntityType.candidate, status=EntityStatus.new, created_at=datetime.utcnow(),
+        ))
+        await db_session.commit()
+        await change_versions.drain()
+
+        fresh = await _poll(client, "/api/candidates/kanban", headers, etag)
+        assert fresh.status_code == 200
+        assert fresh.json()["total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stage_config_change_invalidates_board(
+        self, db_session, client, admin_user, org_owner, organization, admin_token, get_auth_headers
+    ):
+        headers = get_auth_headers(admin_token)
+        etag = (await _poll(client, "/api/candidates/kanban", headers)).headers["etag"]
+
+        organization.settings = {"stage_config": [{"key": "new", "label": "Входящие", "color": "#f00"}]}
+        await db_session.commit()
+        await change_versions.drain()
+
+        fresh = await _poll(client, "/api/candidates/kanban", headers, etag)
+        assert fresh.status_code == 200
+        column = next(c for c in fresh.json()["columns"] if c["status"] == "new")
+        assert column["label"] == "Входящие"
+
+    @pytest.mark.asyncio
+    async def test_new_day_invalidates_board(
+        self, client, admin_user, org_owner, organization, admin_token, get_auth_headers, monkeypatch
+    ):
+        from datetime import date, timedelta
+        from api.routes import candidate_search
+
+        headers = get_auth_headers(admin_token)
+        etag = (await _poll(client, "/api/candidates/kanban", headers)).headers["etag"]
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=1)
+
+        # Возраст на карточках считается от сегодняшней даты
+        monkeypatch.setattr(candidate_search, "date", Tomorrow)
+        assert (await _poll(client, "/api/candidates/kanban", headers, etag)).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_user_delete_invalidates_board(
+        self, client, admin_user, org_owner, organization, second_user,
+        superadmin_user, superadmin_token, get_auth_headers
+    ):
+        headers = get_auth_headers(superadmin_token)
+        etag = (await _poll(client, "/api/candidates/kanban", headers)).headers["etag"]
+
+        deleted = await client.delete(f"/api/users/{second_user.id}", headers=headers)
+        assert deleted.status_code == 204
+
+        assert (await _poll(client, "/api/candidates/kanban", headers, etag)).status_code == 200
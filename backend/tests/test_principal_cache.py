@@ -0,0 +1,149 @@
+"""Tests for the request principal and its cross-request cache (api/services/principal.py).
+
+A warm cache must answer get_current_user / get_user_org / role checks without
+touching the database, and ORM changes to users, memberships and departments
+must be visible on the very next request.
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, update
+
+from api.models.database import OrgMember, OrgRole, User
+from api.services import principal as principal_mod
+from api.services.auth import get_user_org, has_full_database_access
+from api.services.principal import resolve_principal
+
+
+@contextmanager
+def count_queries(db_session):
+    engine = db_session.bind.sync_engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+class TestPrincipalResolution:
+
+    @pytest.mark.asyncio
+    async def test_warm_cache_needs_no_queries(self, db_session, second_user, org_member, organization):
+        principal_mod.clear_principal_cache()
+        cold = await resolve_principal(second_user.id, 0, db_session)
+        assert cold.org_id == organization.id
+        assert cold.org_role == OrgRole.member
+
+        with count_queries(db_session) as statements:
+            warm = await resolve_principal(second_user.id, 0, db_session)
+            org = await get_user_org(warm.user, db_session)
+            full = await has_full_database_access(warm.user, organization.id, db_session)
+        assert statements == []
+        assert warm.user is second_user  # тот же объект из identity map
+        assert org.id == organization.id
+        assert full is False
+
+    @pytest.mark.asyncio
+    async def test_membership_change_invalidates(self, db_session, second_user, org_member, organization):
+        principal_mod.clear_principal_cache()
+        await resolve_principal(second_user.id, 0, db_session)
+
+        org_member.role = OrgRole.admin
+        await db_session.commit()
+
+        principal = await resolve_principal(second_user.id, 0, db_session)
+        assert principal.org_role == OrgRole.admin
+        assert principal.has_full_database_access
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_clears_cache(self, db_session, second_user, org_member):
+        principal_mod.clear_principal_cache()
+        user_id = second_user.id
+        await resolve_principal(user_id, 0, db_session)
+
+        await db_session.execute(
+            update(OrgMember).where(OrgMember.user_id == user_id).values(is_readonly=True)
+        )
+        await db_session.commit()
+        db_session.expire_all()
+
+        principal = await resolve_principal(user_id, 0, db_session)
+        assert principal.is_readonly is True
+
+    @pytest.mark.asyncio
+    async def test_missing_user(self, db_session):
+        assert await resolve_principal(987654, 0, db_session) is None
+
+    def test_cache_is_bounded(self, monkeypatch):
+        principal_mod.clear_principal_cache()
+        monkeypatch.setattr(principal_mod, "_MAX_ENTRIES", 3)
+        snap = principal_mod._Snapshot(
+            user={}, org=None, org_role=None, is_readonly=False,
+            department_ids=(), generation=None, expires_at=0.0,  # уже протухли
+        )
+        for user_id in range(10):
+            principal_mod._store((user_id, 0), snap)
+        assert len(principal_mod._cache) <= 3
+        assert (9, 0) in principal_mod._cache
+        principal_mod.clear_principal_cache()
+
+
+class TestGetCurrentUser:
+
+    @pytest.mark.asyncio
+    async def test_second_request_skips_auth_queries(
+        self, db_session, client, second_user, org_member, second_user_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        assert (await client.get("/api/notifications/unread-count", headers=headers)).status_code == 200
+
+        with count_queries(db_session) as statements:
+            response = await client.get("/api/notifications/unread-count", headers=headers)
+        assert response.status_code == 200
+        assert len(statements) == 1  # только сам COUNT уведомлений
+
+    @pytest.mark.asyncio
+    async def test_readonly_flag_applies_immediately(
+        self, db_session, client, second_user, org_member, second_user_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        assert (await client.put("/api/notifications/read-all", headers=headers)).status_code == 200
+
+        org_member.is_readonly = True
+        await db_session.commit()
+
+        response = await client.put("/api/notifications/read-all", headers=headers)
+        assert response.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_deleted_user_stops_authenticating(
+        self, db_session, client, second_user, org_member, second_user_token,
+        superadmin_user, superadmin_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        assert (await client.get("/api/notifications/unread-count", headers=headers)).status_code == 200
+
+        deleted = await client.delete(f"/api/users/{second_user.id}", headers=get_auth_headers(superadmin_token))
+        assert deleted.status_code == 204
+
+        response = await client.get("/api/notifications/unread-count", headers=headers)
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_password_change_revokes_cached_token(
+        self, db_session, client, second_user, org_member, second_user_token, get_auth_headers
+    ):
+        headers = get_auth_headers(second_user_token)
+        assert (await client.get("/api/notifications/unread-count", headers=headers)).status_code == 200
+
+        user = await db_session.get(User, second_user.id)
+        user.token_version = (user.token_version or 0) + 1
+        await db_session.commit()
+
+        response = await client.get("/api/notifications/unread-count", headers=headers)
+        assert response.status_code == 401
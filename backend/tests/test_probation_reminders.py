@@ -0,0 +1,97 @@
+"""Напоминания об окончании испытательного срока: оконный запрос + журнал sent_reminders."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm.attributes import flag_modified
+
+from api.models.database import (
+    ApplicationStage, Entity, EntityType, Notification, SentReminder,
+    Vacancy, VacancyApplication, VacancyStatus,
+)
+from api.services.hr_notifications import check_probation_endings, parse_probation_end
+
+
+async def _hire(db_session, organization, admin_user, name, probation_end):
+    vacancy = Vacancy(org_id=organization.id, title=f"Вакансия {name}",
+                      status=VacancyStatus.open, created_by=admin_user.id)
+    entity = Entity(org_id=organization.id, type=EntityType.candidate, name=name,
+                    extra_data={"probation_end_date": probation_end} if probation_end else {})
+    db_session.add_all([vacancy, entity])
+    await db_session.flush()
+    app = VacancyApplication(vacancy_id=vacancy.id, entity_id=entity.id,
+                             stage=ApplicationStage.hired, created_by=admin_user.id)
+    db_session.add(app)
+    await db_session.commit()
+    return app, entity
+
+
+async def _notifications(db_session):
+    return (await db_session.execute(
+        select(func.count(Notification.id)).where(Notification.type == "probation_ending")
+    )).scalar()
+
+
+def test_parse_probation_end():
+    assert parse_probation_end({"probation_end_date": "2026-11-01"}) == datetime(2026, 11, 1)
+    assert parse_probation_end({"probation_end_date": "2026-11-01T12:00:00+03:00"}) == datetime(2026, 11, 1, 9)
+    assert parse_probation_end({"probation_end_date": "soon"}) is None
+    assert parse_probation_end(None) is None
+
+
+@pytest.mark.asyncio
+async def test_column_follows_extra_data(db_session, organization, admin_user):
+    end = (datetime.utcnow() + timedelta(days=3)).replace(microsecond=0)
+    _, entity = await _hire(db_session, organization, admin_user, "Ivan", end.isoformat())
+    assert entity.probation_end_date == end
+
+    entity.extra_data = {**entity.extra_data, "probation_end_date": None}
+    await db_session.commit()
+    assert entity.probation_end_date is None
+
+
+@pytest.mark.asyncio
+async def test_sweep_notifies_once_per_period(db_session, organization, admin_user, org_owner):
+    soon = datetime.utcnow() + timedelta(days=3)
+    app, entity = await _hire(db_session, organization, admin_user, "Ivan", soon.isoformat())
+    await _hire(db_session, organization, admin_user, "Later", (soon + timedelta(days=30)).isoformat())
+    await _hire(db_session, organization, admin_user, "Past", (soon - timedelta(days=10)).isoformat())
+    await _hire(db_session, organization, admin_user, "Unset", None)
+
+    assert await check_probation_endings(db_session) == 1
+    assert await _notifications(db_session) == 1
+    # повторный прогон и переименование не дают дубля
+    entity.name = "Ivan Renamed"
+    await db_session.commit()
+    assert await check_probation_endings(db_session) == 0
+    assert await _notifications(db_session) == 1
+
+    # перенос даты — новый период, новое напоминание
+    entity.extra_data["probation_end_date"] = (soon + timedelta(days=1)).isoformat()
+    flag_modified(entity, "extra_data")
+    await db_session.commit()
+    assert await check_probation_endings(db_session) == 1
+    ledger = (await db_session.execute(
+        select(SentReminder).where(SentReminder.application_id == app.id)
+    )).scalars().all()
+    assert len(ledger) == 2
+
+
+@pytest.mark.asyncio
+async def test_sweep_query_count_does_not_grow_with_hires(db_session, organization, admin_user):
+    for i in range(30):
+        await _hire(db_session, organization, admin_user, f"Old {i}",
+                    (datetime.utcnow() - timedelta(days=100 + i)).isoformat())
+
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        assert await check_probation_endings(db_session) == 0
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
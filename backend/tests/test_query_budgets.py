@@ -0,0 +1,180 @@
+"""
+Per-endpoint SQL query budgets (harness: tests/query_budget.py).
+
+Every registered endpoint is measured at two data sizes after a warm-up call.
+The test fails when the statement count exceeds the budget or grows with the
+number of rows (per-row lookups), or when a wall-time ceiling for the current
+dialect is exceeded.
+
+    QUERY_BUDGET_REPORT=budgets.json pytest tests/test_query_budgets.py
+
+writes {entry: {queries, budget, ms, ...}} sorted by name — diff it between
+commits to see which endpoint changed its query profile.
+"""
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from api.models.database import (
+    ApplicationStage, Chat, ChatType, Department, DepartmentMember, DeptRole,
+    Entity, EntityStatus, EntityType, FormDispatch, FormSubmission, FormTemplate,
+    Message, ResourceCatalog, ResourceCategory, Vacancy, VacancyApplication, VacancyStatus,
+)
+from api.services.auth import create_access_token
+from tests.query_budget import (
+    REGISTRY, BudgetContext, Measurement, budget, budget_failures, measure, report_entry,
+)
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+@budget("chats.list", "/api/chats", max_queries=7, max_ms={"sqlite": 500, "postgresql": 250})
+async def _chats(ctx: BudgetContext, count: int):
+    for i in range(ctx.seeded, ctx.seeded + count):
+        chat = Chat(org_id=ctx.organization.id, owner_id=ctx.user.id, telegram_chat_id=700000 + i,
+                    title=f"Chat {i}", chat_type=ChatType.hr, is_active=True)
+        ctx.db.add(chat)
+        await ctx.db.flush()
+        for j in range(2):
+            ctx.db.add(Message(chat_id=chat.id, telegram_message_id=i * 10 + j, telegram_user_id=100 + j,
+                               username=f"user{j}", content=f"m{j}", content_type="text",
+                               timestamp=datetime.utcnow()))
+
+
+@budget("departments.list", "/api/departments", max_queries=5)
+async def _departments(ctx: BudgetContext, count: int):
+    for i in range(ctx.seeded, ctx.seeded + count):
+        dept = Department(org_id=ctx.organization.id, name=f"Dept {i}")
+        ctx.db.add(dept)
+        await ctx.db.flush()
+        ctx.db.add(DepartmentMember(department_id=dept.id, user_id=ctx.user.id, role=DeptRole.lead))
+
+
+@budget("entities.list", "/api/entities", max_queries=10, max_ms={"sqlite": 500, "postgresql": 250})
+async def _entities(ctx: BudgetContext, count: int):
+    for i in range(ctx.seeded, ctx.seeded + count):
+        ctx.db.add(Entity(org_id=ctx.organization.id, type=EntityType.candidate, name=f"Candidate {i}",
+                          status=EntityStatus.new, created_by=ctx.user.id))
+
+
+async def _vacancy(ctx: BudgetContext) -> int:
+    if "vacancy_id" not in ctx.params:
+        vacancy = Vacancy(org_id=ctx.organization.id, title="Backend", status=VacancyStatus.open,
+                          created_by=ctx.user.id)
+        ctx.db.add(vacancy)
+        await ctx.db.flush()
+        ctx.params["vacancy_id"] = vacancy.id
+    return ctx.params["vacancy_id"]
+
+
+async def _applications(ctx: BudgetContext, count: int):
+    vacancy_id = await _vacancy(ctx)
+    stages = list(ApplicationStage)
+    for i in range(ctx.seeded, ctx.seeded + count):
+        entity = Entity(org_id=ctx.organization.id, type=EntityType.candidate, name=f"Applicant {i}",
+                        status=EntityStatus.new, created_by=ctx.user.id)
+        ctx.db.add(entity)
+        await ctx.db.flush()
+        ctx.db.add(VacancyApplication(vacancy_id=vacancy_id, entity_id=entity.id,
+                                      stage=stages[i % len(stages)], created_by=ctx.user.id))
+
+
+budget("kanban.vacancy", "/api/vacancies/{vacancy_id}/kanban", max_queries=6,
+       max_ms={"sqlite": 500, "postgresql": 250})(_applications)
+budget("analytics.dashboard_overview", "/api/analytics/dashboard/overview", max_queries=9)(_applications)
+budget("analytics.funnel_overview", "/api/analytics/funnel/overview", max_queries=1)(_applications)
+
+
+@budget("forms.list", "/api/forms", max_queries=3)
+async def _forms(ctx: BudgetContext, count: int):
+    for i in range(ctx.seeded, ctx.seeded + count):
+        form = FormTemplate(org_id=ctx.organization.id, created_by=ctx.user.id, title=f"Form {i}",
+                            slug=f"budget-form-{i}", fields=[])
+        ctx.db.add(form)
+        await ctx.db.flush()
+        ctx.db.add(FormSubmission(form_id=form.id, data={}))
+
+
+@budget("forms.entity_dispatches", "/api/forms/entity/{entity_id}/all-dispatches", max_queries=5)
+async def _dispatches(ctx: BudgetContext, count: int):
+    if "entity_id" not in ctx.params:
+        entity = Entity(org_id=ctx.organization.id, type=EntityType.candidate, name="Dispatched",
+                        status=EntityStatus.new, created_by=ctx.user.id)
+        ctx.db.add(entity)
+        await ctx.db.flush()
+        ctx.params["entity_id"] = entity.id
+    for i in range(ctx.seeded, ctx.seeded + count):
+        form = FormTemplate(org_id=ctx.organization.id, created_by=ctx.user.id, title=f"Form {i}",
+                            slug=f"budget-dispatch-{i}", fields=[])
+        ctx.db.add(form)
+        await ctx.db.flush()
+        dispatch = FormDispatch(form_id=form.id, entity_id=ctx.params["entity_id"],
+                                token=f"budget-{i}", created_by=ctx.user.id)
+        ctx.db.add(dispatch)
+        await ctx.db.flush()
+        submission = FormSubmission(form_id=form.id, entity_id=ctx.params["entity_id"],
+                                    data={}, dispatch_id=dispatch.id)
+        ctx.db.add(submission)
+        await ctx.db.flush()
+        dispatch.status = "submitted"
+        dispatch.submission_id = submission.id
+
+
+@budget("access_hub.available", "/api/access-hub/available", max_queries=3)
+async def _resources(ctx: BudgetContext, count: int):
+    for i in range(ctx.seeded, ctx.seeded + count):
+        ctx.db.add(ResourceCatalog(org_id=ctx.organization.id, key=f"res_{i}", name=f"Resource {i}",
+                                   category=ResourceCategory.other, available_to_all=True))
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+@pytest.fixture(scope="module")
+def budget_report():
+    report: dict = {}
+    yield report
+    path = os.environ.get("QUERY_BUDGET_REPORT")
+    if path and report:
+        with open(path, "w") as f:
+            json.dump(dict(sorted(report.items())), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entry", REGISTRY, ids=[entry.name for entry in REGISTRY])
+async def test_query_budget(entry, client, db_session, async_engine, organization, admin_user, org_owner,
+                            budget_report):
+    ctx = BudgetContext(db=db_session, organization=organization, user=admin_user)
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(admin_user.id)})}"}
+    measurements = []
+    for size in entry.sizes:
+        await entry.seed(ctx, size - ctx.seeded)
+        ctx.seeded = size
+        await db_session.commit()
+        measurements.append(await measure(client, async_engine, entry, ctx, headers))
+
+    dialect = async_engine.dialect.name
+    small, large = measurements
+    budget_report[entry.name] = report_entry(entry, dialect, small, large)
+    failures = budget_failures(entry, dialect, small, large)
+    assert not failures, f"{entry.name}: " + "; ".join(failures) + "\n" + "\n".join(large.statements)
+
+
+def test_registry_names_are_unique():
+    names = [entry.name for entry in REGISTRY]
+    assert len(names) == len(set(names))
+
+
+def test_growth_with_rows_is_reported():
+    entry = next(e for e in REGISTRY if e.name == "chats.list")
+    constant = budget_failures(entry, "sqlite", Measurement(3, 7, 10.0, []), Measurement(12, 7, 12.0, []))
+    per_row = budget_failures(entry, "sqlite", Measurement(3, 7, 10.0, []), Measurement(12, 16, 600.0, []))
+    assert constant == []
+    assert any("grows with rows" in f for f in per_row)
+    assert any("ceiling 500 ms" in f for f in per_row)
@@ -12,6 +12,7 @@ from api.models.database import (
     Entity, EntityType, EntityStatus, Vacancy, VacancyStatus,
     VacancyApplication, ApplicationStage, User, OrgMember, OrgRole,
 )
+from api.services import entity_extras
 from api.services.hr_tags import sync_for_entity, EXTRA_KEY
 
 
@@ -185,7 +186,7 @@ async def test_reassign_moves_ownership_and_hr_tags(
         e = await db_session.get(Entity, cid)
         await db_session.refresh(e)
         assert e.created_by == yid
-        tags = (e.extra_data or {}).get(EXTRA_KEY) or []
+        tags = (await entity_extras.load(db_session, [cid]))[cid][EXTRA_KEY]
         assert tags and all(t["hr_id"] == yid for t in tags), tags
     # Вакансия solo → Y как создатель
     vsolo = await db_session.get(Vacancy, v_solo_id)
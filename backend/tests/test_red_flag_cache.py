@@ -0,0 +1,122 @@
+"""Сохранённые разборы red flags: fingerprint входов и фоновый пересчёт (services/red_flag_cache.py)."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from api.models.database import (
+    ApplicationStage, Chat, ChatType, Entity, EntityRedFlagAnalysis, EntityStatus, EntityType,
+    Message, Vacancy, VacancyApplication, VacancyStatus,
+)
+from api.services import red_flag_cache
+from api.services.red_flags import RedFlag, RedFlagType, Severity, red_flags_service
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def ai_calls(monkeypatch):
+    calls = []
+
+    async def fake_ai(entity, chats, calls_):
+        calls.append(entity.id)
+        return [RedFlag(RedFlagType.NEGATIVE_ATTITUDE, Severity.HIGH, "Негатив о работодателе", "Уточнить")]
+
+    monkeypatch.setattr(red_flags_service, "_ai_analyze_communications", fake_ai)
+    return calls
+
+
+async def _candidate(db_session, organization, admin_user, name, with_chat=True):
+    entity = Entity(org_id=organization.id, type=EntityType.candidate, name=name, status=EntityStatus.new,
+                    created_by=admin_user.id, extra_data={"location": "Казань"})
+    db_session.add(entity)
+    await db_session.flush()
+    if with_chat:
+        chat = Chat(org_id=organization.id, owner_id=admin_user.id, entity_id=entity.id,
+                    telegram_chat_id=900000 + entity.id, title=name, chat_type=ChatType.hr)
+        db_session.add(chat)
+        await db_session.flush()
+        await _message(db_session, chat.id, 1)
+    await db_session.commit()
+    return entity
+
+
+async def _message(db_session, chat_id, n):
+    db_session.add(Message(chat_id=chat_id, telegram_message_id=n, telegram_user_id=1, username="c",
+                           content=f"сообщение {n}", content_type="text", timestamp=datetime.utcnow()))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_view_serves_stored_until_inputs_change(client, db_session, organization, admin_user, org_owner,
+                                                      admin_token, ai_calls):
+    entity = await _candidate(db_session, organization, admin_user, "Анна")
+    url = f"/api/entities/{entity.id}/red-flags"
+
+    first = (await client.get(url, headers=auth_headers(admin_token))).json()
+    again = (await client.get(url, headers=auth_headers(admin_token))).json()
+    assert first["stale"] is False and again["stale"] is False
+    assert again["risk_score"] == first["risk_score"] > 0
+    assert ai_calls == [entity.id]
+
+    # новое сообщение в привязанном чате — отдаём прошлый результат и пересчитываем в фоне
+    chat_id = (await db_session.execute(select(Chat.id).where(Chat.entity_id == entity.id))).scalar_one()
+    await _message(db_session, chat_id, 2)
+    stale = (await client.get(url, headers=auth_headers(admin_token))).json()
+    assert stale["stale"] is True and stale["computed_at"] == first["computed_at"]
+    await red_flag_cache.drain()
+    assert ai_calls == [entity.id, entity.id]
+
+    fresh = (await client.get(url, headers=auth_headers(admin_token))).json()
+    assert fresh["stale"] is False and fresh["computed_at"] != first["computed_at"]
+
+    score = (await client.get(f"/api/entities/{entity.id}/risk-score", headers=auth_headers(admin_token))).json()
+    assert score["source"] == "analysis" and score["risk_score"] == fresh["risk_score"]
+
+
+@pytest.mark.asyncio
+async def test_vacancy_change_reuses_communication_flags(client, db_session, organization, admin_user, org_owner,
+                                                         admin_token, ai_calls):
+    entity = await _candidate(db_session, organization, admin_user, "Борис")
+    vacancy = Vacancy(org_id=organization.id, title="Backend", status=VacancyStatus.open, location="Москва",
+                      created_by=admin_user.id)
+    db_session.add(vacancy)
+    await db_session.commit()
+    url = f"/api/entities/{entity.id}/red-flags"
+
+    general = (await client.get(url, headers=auth_headers(admin_token))).json()
+    scoped = (await client.get(url, params={"vacancy_id": vacancy.id}, headers=auth_headers(admin_token))).json()
+    assert scoped["flags_count"] > general["flags_count"]  # + локация вакансии
+    assert ai_calls == [entity.id]
+
+    vacancy.location = "Казань"
+    await db_session.commit()
+    stale = (await client.get(url, params={"vacancy_id": vacancy.id}, headers=auth_headers(admin_token))).json()
+    assert stale["stale"] is True
+    await red_flag_cache.drain()
+    fresh = (await client.get(url, params={"vacancy_id": vacancy.id}, headers=auth_headers(admin_token))).json()
+    assert fresh["flags_count"] == general["flags_count"]
+    assert ai_calls == [entity.id]  # коммуникации те же — Claude не зовём
+
+
+@pytest.mark.asyncio
+async def test_batch_scores_pipeline(client, db_session, organization, admin_user, org_owner, admin_token, ai_calls):
+    vacancy = Vacancy(org_id=organization.id, title="Data", status=VacancyStatus.open, created_by=admin_user.id)
+    db_session.add(vacancy)
+    await db_session.flush()
+    for i, name in enumerate(["Вера", "Глеб", "Дина"]):
+        entity = await _candidate(db_session, organization, admin_user, name, with_chat=i != 2)
+        db_session.add(VacancyApplication(vacancy_id=vacancy.id, entity_id=entity.id,
+                                          stage=ApplicationStage.applied, created_by=admin_user.id))
+    await db_session.commit()
+    url = f"/api/vacancies/{vacancy.id}/red-flags/score"
+
+    first = (await client.post(url, headers=auth_headers(admin_token))).json()
+    assert first["total"] == 3 and first["fresh"] == 0 and first["scheduled"] == 3
+    assert all(r["risk_score"] is None for r in first["results"])
+    await red_flag_cache.drain()
+
+    second = (await client.post(url, headers=auth_headers(admin_token))).json()
+    assert second["fresh"] == 3 and second["scheduled"] == 0
+    assert all(r["risk_score"] is not None for r in second["results"])
+    assert len(ai_calls) == 2  # у третьего кандидата нет чатов — без вызова Claude
+    assert (await db_session.execute(select(func.count(EntityRedFlagAnalysis.id)))).scalar() == 3
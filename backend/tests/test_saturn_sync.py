@@ -0,0 +1,146 @@
+"""Tests for Saturn sync (api/services/saturn_sync.py) against a mock Saturn API."""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import event, select
+
+from api.models.database import Project, ProjectTaskStatus, SaturnApplication, SaturnProject
+from api.services import saturn_sync
+from api.services.saturn_sync import SaturnSyncService
+
+
+class FakeSaturn:
+    """Saturn API в памяти: /projects, /projects/{uuid}, /applications."""
+
+    def __init__(self, n_projects=3):
+        self.projects = [
+            {"id": i, "uuid": f"p{i}", "name": f"Project {i}", "description": f"d{i}",
+             "environments": [{"id": 100 + i, "name": "production"}]}
+            for i in range(1, n_projects + 1)
+        ]
+        self.apps = [
+            {"uuid": "a1", "name": "api", "project_id": 1, "status": "running:healthy"},
+            {"uuid": "a2", "name": "web", "project_id": 2, "status": "running:healthy"},
+            {"uuid": "a3", "name": "worker", "environment_id": 102, "status": "exited"},
+            {"uuid": "a4", "name": "cron", "environment_id": 103, "status": "exited"},
+        ]
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handler(self, request):
+        path = request.url.path.removeprefix("/api/v1")
+        self.requests.append(path)
+        if path == "/projects":
+            return httpx.Response(200, json=[
+                {k: v for k, v in p.items() if k != "environments"} for p in self.projects
+            ])
+        if path == "/applications":
+            return httpx.Response(200, json=self.apps)
+        uuid = path.rsplit("/", 1)[-1]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        for p in self.projects:
+            if p["uuid"] == uuid:
+                return httpx.Response(200, json=p)
+        return httpx.Response(404)
+
+    def details(self):
+        return [r for r in self.requests if r.startswith("/projects/")]
+
+
+@pytest.fixture
+async def saturn_client():
+    fake = FakeSaturn()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    yield fake, client
+    await client.aclose()
+
+
+@pytest.fixture
+def count_writes(db_session):
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE")):
+            statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before)
+
+
+class TestSaturnSync:
+
+    @pytest.mark.asyncio
+    async def test_first_sync_creates_rows_and_fetches_details_once(
+        self, db_session, organization, saturn_client,
+    ):
+        fake, client = saturn_client
+        result = await SaturnSyncService(db_session, client).sync_all()
+
+        assert result == {"projects_synced": 3, "apps_synced": 4, "errors": []}
+        # два списка + по одной детали на проект, а не на каждую пару app×project
+        assert sorted(fake.details()) == ["/projects/p1", "/projects/p2", "/projects/p3"]
+        assert len(fake.requests) == 5
+
+        apps = {a.saturn_uuid: a for a in (await db_session.execute(select(SaturnApplication))).scalars()}
+        projects = {p.saturn_uuid: p for p in (await db_session.execute(select(SaturnProject))).scalars()}
+        assert apps["a3"].saturn_project_id == projects["p2"].id
+        assert apps["a4"].saturn_project_id == projects["p3"].id
+        assert all(p.enceladus_project_id and p.content_hash for p in projects.values())
+
+        statuses = (await db_session.execute(
+            select(ProjectTaskStatus).where(ProjectTaskStatus.project_id == projects["p1"].enceladus_project_id)
+        )).scalars().all()
+        assert len(statuses) == 5
+
+    @pytest.mark.asyncio
+    async def test_resync_skips_unchanged_rows(
+        self, db_session, organization, saturn_client, count_writes,
+    ):
+        fake, client = saturn_client
+        service = SaturnSyncService(db_session, client)
+        await service.sync_all()
+        fake.requests.clear()
+        count_writes.clear()
+
+        fake.apps[0]["status"] = "exited:unhealthy"
+        result = await service.sync_all()
+
+        assert result["errors"] == [] and result["apps_synced"] == 4
+        # все приложения уже привязаны — детали проектов не нужны
+        assert fake.details() == []
+        updates = [s for s in count_writes if s.lstrip().upper().startswith("UPDATE")]
+        # изменённое приложение + по одному массовому UPDATE last_synced_at на таблицу
+        assert len(updates) == 3
+        assert len([s for s in count_writes if "INSERT INTO projects" in s]) == 0
+
+        changed = (await db_session.execute(
+            select(SaturnApplication).where(SaturnApplication.saturn_uuid == "a1")
+        )).scalar_one()
+        assert changed.status == "exited:unhealthy"
+        assert len((await db_session.execute(select(Project))).scalars().all()) == 3
+
+    @pytest.mark.asyncio
+    async def test_detail_fan_out_is_bounded(self, db_session, organization, monkeypatch):
+        fake = FakeSaturn(n_projects=12)
+        fake.apps = [{"uuid": "late", "name": "late", "environment_id": 112}]
+        monkeypatch.setattr(saturn_sync, "DETAIL_CONCURRENCY", 3)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)) as client:
+            await SaturnSyncService(db_session, client).sync_all()
+
+        assert len(fake.details()) == 12
+        assert fake.max_in_flight == 3
+        app = (await db_session.execute(select(SaturnApplication))).scalar_one()
+        project = (await db_session.execute(
+            select(SaturnProject).where(SaturnProject.saturn_uuid == "p12")
+        )).scalar_one()
+        assert app.saturn_project_id == project.id
@@ -0,0 +1,262 @@
+"""Tests for the streaming Telegram history importer (api/services/telegram_import.py).
+
+Covers the incremental JSON/HTML readers (tiny chunk sizes force every value
+across buffer boundaries), zip media lookup and the shared job state that lets
+a re-upload continue from the last committed batch.
+"""
+import hashlib
+import io
+import json
+import zipfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, func
+
+from api.models.database import ChatImportJob, Message
+from api.services import telegram_import
+from api.services.telegram_import import (
+    TelegramExport, iter_json_messages, iter_html_messages, parse_html_export,
+)
+
+
+def _export(n: int, **extra) -> dict:
+    return {
+        "name": "messages",  # ключ-приманка: строка "messages" вне массива
+        "type": "personal_chat",
+        "id": 123456789,
+        **extra,
+        "messages": [
+            {
+                "id": i,
+                "type": "message",
+                "date": f"2024-01-01T10:{i:02d}:00",
+                "from": "Test User",
+                "from_id": "user1",
+                "text": [f"Message {i} ", {"type": "bold", "text": "bold"}],
+            }
+            for i in range(1, n + 1)
+        ],
+    }
+
+
+HTML = """
+<div class="message default" id="message1">
+    <div class="from_name">John Doe</div>
+    <div class="body"><div class="text">First &amp; foremost</div></div>
+    <div class="date" title="01.01.2024 10:00:00"></div>
+</div>
+<div class="message service" id="message2"><div class="body">joined</div></div>
+<div class="message default joined" id="message3">
+    <div class="body"><div class="text">Continued message</div></div>
+    <div class="date" title="01.01.2024 10:01:00"></div>
+</div>
+"""
+
+
+class TestIncrementalReaders:
+
+    @pytest.mark.parametrize("chunk", [1, 7, 64, 1024 * 1024])
+    def test_json_stream_matches_json_loads(self, monkeypatch, chunk):
+        monkeypatch.setattr(telegram_import, "CHUNK_SIZE", chunk)
+        data = _export(12, extra_field={"nested": [1, 2, 3]})
+        got = list(iter_json_messages(io.StringIO(json.dumps(data, indent=1))))
+        assert got == data["messages"]
+
+    def test_json_stream_messages_key_not_first(self, monkeypatch):
+        monkeypatch.setattr(telegram_import, "CHUNK_SIZE", 5)
+        raw = '{"messages": [], "name": "x"}'
+        assert list(iter_json_messages(io.StringIO(raw))) == []
+        raw = '{"id": 12345, "messages": [{"id": 1}], "tail": 67890}'
+        assert list(iter_json_messages(io.StringIO(raw))) == [{"id": 1}]
+
+    def test_json_stream_invalid(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_messages(io.StringIO("{ this is not valid json }")))
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_messages(io.StringIO('{"messages": [{"id": 1} {"id": 2}]}')))
+
+    @pytest.mark.parametrize("chunk", [3, 50, 1024 * 1024])
+    def test_html_stream_matches_whole_document_parse(self, monkeypatch, chunk):
+        monkeypatch.setattr(telegram_import, "CHUNK_SIZE", chunk)
+        streamed = list(iter_html_messages(io.StringIO(HTML)))
+        assert streamed == parse_html_export(HTML)
+        assert [m["text"] for m in streamed] == ["First & foremost", "Continued message"]
+        assert streamed[1]["from"] == "John Doe"
+
+
+class TestZipExport:
+
+    def test_media_lookup_prefers_full_file_over_thumb(self, tmp_path):
+        path = tmp_path / "export.zip"
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("ChatExport/messages.html", HTML)
+            zf.writestr("ChatExport/photos/photo_1.jpg_thumb.jpg", b"thumb")
+            zf.writestr("ChatExport/photos/photo_1.jpg", b"full")
+
+        export = TelegramExport(path, "export.zip")
+        try:
+            assert export.is_html
+            assert export.find_media("photos/photo_1.jpg") == "ChatExport/photos/photo_1.jpg"
+            assert export.find_media("photos/missing.jpg") is None
+            dest = tmp_path / "out.jpg"
+            export.extract("ChatExport/photos/photo_1.jpg", dest)
+            assert dest.read_bytes() == b"full"
+            assert export.count_messages() == 2
+        finally:
+            export.close()
+
+
+class TestResumableImport:
+
+    @pytest.mark.asyncio
+    async def test_reupload_resumes_from_committed_cursor(
+        self, db_session, client, admin_user, admin_token, chat,
+        get_auth_headers, org_owner, monkeypatch
+    ):
+        monkeypatch.setattr(telegram_import, "BATCH_SIZE", 2)
+        content = json.dumps(_export(5)).encode("utf-8")
+
+        # Прерванный импорт того же файла: закоммичены первые 2 сообщения
+        failed = ChatImportJob(
+            import_id="failed-run", chat_id=chat.id, org_id=chat.org_id,
+            user_id=admin_user.id, status="error", phase="importing",
+            source_sha256=hashlib.sha256(content).hexdigest(),
+            total=5, processed=2, imported=2, skipped=0,
+            updated_at=datetime.utcnow(),
+        )
+        db_session.add(failed)
+        await db_session.commit()
+
+        response = await client.post(
+            f"/api/chats/{chat.id}/import?import_id=second-run",
+            files={"file": ("result.json", io.BytesIO(content), "application/json")},
+            headers=get_auth_headers(admin_token),
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["resumed_from"] == "failed-run"
+        assert data["imported"] == 5  # 2 из первой попытки + 3 новых
+
+        ids = (await db_session.execute(
+            select(Message.telegram_message_id).where(Message.chat_id == chat.id)
+        )).scalars().all()
+        assert sorted(ids) == [3, 4, 5]  # первые два пролистаны курсором
+
+        progress = await client.get(
+            f"/api/chats/{chat.id}/import/progress/second-run",
+            headers=get_auth_headers(admin_token),
+        )
+        body = progress.json()
+        assert body["status"] == "completed"
+        assert body["current"] == body["total"] == 5
+
+    @pytest.mark.asyncio
+    async def test_concurrent_upload_of_same_file_conflicts(
+        self, db_session, client, admin_user, admin_token, chat,
+        get_auth_headers, org_owner
+    ):
+        content = json.dumps(_export(1)).encode("utf-8")
+        db_session.add(ChatImportJob(
+            import_id="running", chat_id=chat.id, org_id=chat.org_id,
+            status="processing", source_sha256=hashlib.sha256(content).hexdigest(),
+            updated_at=datetime.utcnow(),
+        ))
+        await db_session.commit()
+
+        response = await client.post(
+            f"/api/chats/{chat.id}/import",
+            files={"file": ("result.json", io.BytesIO(content), "application/json")},
+            headers=get_auth_headers(admin_token),
+        )
+        assert response.status_code == 409
+        count = (await db_session.execute(
+            select(func.count(Message.id)).where(Message.chat_id == chat.id)
+        )).scalar()
+        assert count == 0
+
+    @pytest.mark.asyncio
+    async def test_retry_with_same_import_id_resumes(
+        self, db_session, client, admin_user, admin_token, chat,
+        get_auth_headers, org_owner, monkeypatch
+    ):
+        monkeypatch.setattr(telegram_import, "BATCH_SIZE", 2)
+        content = json.dumps(_export(3)).encode("utf-8")
+        failed = ChatImportJob(
+            import_id="run-1", chat_id=chat.id, org_id=chat.org_id,
+            user_id=admin_user.id, status="error", phase="importing",
+            source_sha256=hashlib.sha256(content).hexdigest(),
+            total=3, processed=0, imported=0, skipped=0,
+            updated_at=datetime.utcnow(),
+        )
+        db_session.add(failed)
+        await db_session.commit()
+
+        response = await client.post(
+            f"/api/chats/{chat.id}/import?import_id=run-1",
+            files={"file": ("result.json", io.BytesIO(content), "application/json")},
+            headers=get_auth_headers(admin_token),
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["import_id"] == "run-1"
+        assert data["resumed_from"] == f"run-1~{failed.id}"
+        assert data["imported"] == 3
+
+    @pytest.mark.asyncio
+    async def test_import_id_of_another_chat_conflicts(
+        self, db_session, client, admin_user, admin_token, chat, second_chat,
+        get_auth_headers, org_owner
+    ):
+        db_session.add(ChatImportJob(
+            import_id="taken", chat_id=second_chat.id, org_id=second_chat.org_id,
+            status="completed", updated_at=datetime.utcnow(),
+        ))
+        await db_session.commit()
+
+        response = await client.post(
+            f"/api/chats/{chat.id}/import?import_id=taken",
+            files={"file": ("result.json", io.BytesIO(json.dumps(_export(1)).encode()), "application/json")},
+            headers=get_auth_headers(admin_token),
+        )
+        assert response.status_code == 409
+
+    @pytest.mark.asyncio
+    async def test_job_is_visible_while_upload_is_spooled(
+        self, db_session, client, admin_user, admin_token, chat,
+        get_auth_headers, org_owner, monkeypatch
+    ):
+        from api.routes import chats as chats_routes
+        seen = {}
+        spool = chats_routes.spool_upload
+
+        async def slow_spool(file):
+            job = await telegram_import.get_import_job(db_session, chat.id, "early")
+            seen.update(telegram_import.job_progress(job))
+            return await spool(file)
+
+        monkeypatch.setattr(chats_routes, "spool_upload", slow_spool)
+        response = await client.post(
+            f"/api/chats/{chat.id}/import?import_id=early",
+            files={"file": ("result.json", io.BytesIO(json.dumps(_export(1)).encode()), "application/json")},
+            headers=get_auth_headers(admin_token),
+        )
+        assert response.status_code == 200
+        assert seen["status"] == "starting"
+        assert seen["phase"] == "reading_file"
+
+    @pytest.mark.asyncio
+    async def test_progress_requires_chat_access(
+        self, db_session, client, chat, second_user, second_user_token, get_auth_headers
+    ):
+        db_session.add(ChatImportJob(
+            import_id="private", chat_id=chat.id, org_id=chat.org_id,
+            status="error", source_name="secret.json", error="boom",
+        ))
+        await db_session.commit()
+
+        response = await client.get(
+            f"/api/chats/{chat.id}/import/progress/private",
+            headers=get_auth_headers(second_user_token),
+        )
+        assert response.status_code == 404
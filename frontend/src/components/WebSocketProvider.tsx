@@ -7,7 +7,7 @@ import { useFormBadgeStore } from '@/stores/formBadgeStore';
 import { useNotificationStore } from '@/stores/notificationStore';
 import { logger } from '@/utils/logger';
 import { getNotifications } from '@/services/api/notifications';
-import type { FormSubmissionPayload } from '@/types/websocket';
+import type { FormSubmissionPayload, NotificationUnreadCountPayload } from '@/types/websocket';
 import { playAnketaChime, unlockAudio, showAnketaOsNotification } from '@/utils/notificationSound';
 
 /**
@@ -20,6 +20,7 @@ import { playAnketaChime, unlockAudio, showAnketaOsNotification } from '@/utils/
  * - call.progress, call.completed, call.failed -> callStore
  * - entity.created, entity.updated, entity.deleted -> entityStore
  * - chat.created, chat.updated, chat.deleted, chat.message -> chatStore
+ * - notification.unread_count -> notificationStore
  */
 export function WebSocketProvider({ children }: { children: React.ReactNode }) {
   // Call store handlers
@@ -62,6 +63,13 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
     [bumpEntityBadge],
   );
 
+  // Сервер шлёт актуальный счётчик сразу после создания/прочтения уведомлений —
+  // колокольчик обновляется без ожидания поллинга.
+  const onNotificationUnreadCount = useCallback(
+    (p: NotificationUnreadCountPayload) => setUnreadCount(p.count),
+    [setUnreadCount],
+  );
+
   const { isConnected, status } = useWebSocket({
     // Call events
     onCallProgress: handleCallProgress,
@@ -77,6 +85,7 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
     onChatDeleted: handleChatDeleted,
     onChatMessage: handleChatMessage,
     onFormSubmission,
+    onNotificationUnreadCount,
     // Connection settings
     autoReconnect: true,
     reconnectInterval: 3000,
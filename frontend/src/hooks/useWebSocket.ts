@@ -56,6 +56,7 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
     onChatDeleted,
     onChatMessage,
     onFormSubmission,
+    onNotificationUnreadCount,
     autoReconnect = true,
     reconnectInterval = 3000,  // Kept for backwards compatibility, but overridden by backoff
   } = options;
@@ -206,6 +207,10 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
               onFormSubmission?.(message.payload);
               break;
 
+            case 'notification.unread_count':
+              onNotificationUnreadCount?.(message.payload);
+              break;
+
             default: {
               // Exhaustiveness check - TypeScript will error if we miss a case
               const _exhaustive: never = message;
@@ -221,7 +226,7 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
       setError(err instanceof Error ? err : new Error('Failed to connect'));
       setStatus('error');
     }
-  }, [user, autoReconnect, reconnectInterval, onCallProgress, onCallCompleted, onCallFailed, onEntityCreated, onEntityUpdated, onEntityDeleted, onChatCreated, onChatUpdated, onChatDeleted, onChatMessage, onFormSubmission]);
+  }, [user, autoReconnect, reconnectInterval, onCallProgress, onCallCompleted, onCallFailed, onEntityCreated, onEntityUpdated, onEntityDeleted, onChatCreated, onChatUpdated, onChatDeleted, onChatMessage, onFormSubmission, onNotificationUnreadCount]);
 
   const disconnect = useCallback(() => {
     isManualClose.current = true;
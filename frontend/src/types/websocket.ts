@@ -20,7 +20,8 @@ export type WebSocketEventType =
   | 'chat.updated'
   | 'chat.deleted'
   | 'chat.message'
-  | 'form.submission';
+  | 'form.submission'
+  | 'notification.unread_count';
 
 // ============================================
 // Call Event Payloads
@@ -116,6 +117,10 @@ export interface FormSubmissionPayload {
   candidate_name: string | null;
 }
 
+export interface NotificationUnreadCountPayload {
+  count: number;
+}
+
 // ============================================
 // WebSocket Event Union Types
 // ============================================
@@ -131,7 +136,8 @@ export type WebSocketPayload =
   | ChatUpdatedPayload
   | ChatDeletedPayload
   | ChatMessagePayload
-  | FormSubmissionPayload;
+  | FormSubmissionPayload
+  | NotificationUnreadCountPayload;
 
 // ============================================
 // WebSocket Event Structure (Discriminated Union)
@@ -201,6 +207,11 @@ export interface FormSubmissionMessage extends BaseWebSocketMessage {
   payload: FormSubmissionPayload;
 }
 
+export interface NotificationUnreadCountMessage extends BaseWebSocketMessage {
+  type: 'notification.unread_count';
+  payload: NotificationUnreadCountPayload;
+}
+
 /**
  * Discriminated union of all WebSocket messages.
  * TypeScript will narrow the payload type based on the `type` field.
@@ -217,7 +228,8 @@ export type WebSocketMessage =
   | ChatUpdatedMessage
   | ChatDeletedMessage
   | ChatMessageMessage
-  | FormSubmissionMessage;
+  | FormSubmissionMessage
+  | NotificationUnreadCountMessage;
 
 // ============================================
 // WebSocket Hook Options Types
@@ -235,6 +247,7 @@ export interface WebSocketEventHandlers {
   onChatDeleted?: (data: ChatDeletedPayload) => void;
   onChatMessage?: (data: ChatMessagePayload) => void;
   onFormSubmission?: (data: FormSubmissionPayload) => void;
+  onNotificationUnreadCount?: (data: NotificationUnreadCountPayload) => void;
 }
 
 export interface WebSocketConnectionOptions {